@@ -14,6 +14,7 @@
 
 """
 import datetime
+import importlib
 import logging
 import os
 from pathlib import Path
@@ -24,6 +25,7 @@ import pytest
 import pandas as pd
 
 from tradeexecutor.analysis.trade_analyser import build_trade_analysis
+from tradeexecutor.backtest.backtest_cache import BacktestResultCache, get_universe_fingerprint, get_function_fingerprint
 from tradeexecutor.backtest.backtest_routing import BacktestRoutingModel
 from tradeexecutor.backtest.backtest_runner import run_backtest, setup_backtest_for_universe, run_backtest_inline
 from tradeexecutor.cli.log import setup_pytest_logging
@@ -759,4 +761,152 @@ def test_synthetic_data_backtest_stop_loss_usd(
     # Check are stop loss positions unprofitable
     stop_loss_positions = [p for p in state.portfolio.get_all_positions() if p.is_stop_loss()]
     for p in stop_loss_positions:
-        assert p.is_loss()
\ No newline at end of file
+        assert p.is_loss()
+
+@pytest.mark.parametrize("decide_trades_factory,kwargs", [
+    (stop_loss_decide_trades_factory, {"stop_loss_pct": 0.95}),
+    (take_profit_decide_trades_factory, {"take_profit_pct": 1.01}),
+    (trailing_stop_loss_decide_trades_factory, {"trailing_stop_loss_pct": 0.98}),
+])
+def test_synthetic_data_backtest_vectorised_trigger_checks(
+        logger: logging.Logger,
+        synthetic_universe: TradingStrategyUniverse,
+        decide_trades_factory,
+        kwargs,
+    ):
+    """Vectorised trigger checks give the same results as checking every stop loss tick."""
+
+    start_at, end_at = synthetic_universe.universe.candles.get_timestamp_range()
+
+    def run(vectorised_trigger_checks: bool) -> State:
+        state, universe, debug_dump = run_backtest_inline(
+            start_at=start_at.to_pydatetime(),
+            end_at=end_at.to_pydatetime(),
+            client=None,
+            cycle_duration=CycleDuration.cycle_1d,
+            decide_trades=decide_trades_factory(**kwargs),
+            create_trading_universe=None,
+            universe=synthetic_universe,
+            initial_deposit=10_000,
+            reserve_currency=ReserveCurrency.busd,
+            trade_routing=TradeRouting.user_supplied_routing_model,
+            routing_model=generate_simple_routing_model(synthetic_universe),
+            allow_missing_fees=True,
+            vectorised_trigger_checks=vectorised_trigger_checks,
+        )
+        return state
+
+    def summarise(state: State) -> list:
+        return [
+            (
+                p.position_id,
+                p.stop_loss,
+                [(t.trade_type, t.opened_at, t.executed_price, t.executed_quantity) for t in p.trades.values()],
+                [(u.timestamp, u.mid_price, u.stop_loss_before, u.stop_loss_after) for u in p.trigger_updates],
+            )
+            for p in state.portfolio.get_all_positions()
+        ]
+
+    vectorised = summarise(run(True))
+    every_tick = summarise(run(False))
+    assert len(vectorised) > 0
+    assert vectorised == every_tick
+
+
+def test_synthetic_data_backtest_result_cache(
+        logger: logging.Logger,
+        synthetic_universe: TradingStrategyUniverse,
+        tmp_path: Path,
+    ):
+    """Identical backtests are served from the cache, changes in the strategy or the data cause a rerun."""
+
+    start_at, end_at = synthetic_universe.universe.candles.get_timestamp_range()
+    routing_model = generate_simple_routing_model(synthetic_universe)
+    cache = BacktestResultCache(tmp_path)
+
+    def run(universe: TradingStrategyUniverse, stop_loss_pct: float):
+        return run_backtest_inline(
+            start_at=start_at.to_pydatetime(),
+            end_at=end_at.to_pydatetime(),
+            client=None,
+            cycle_duration=CycleDuration.cycle_1d,
+            decide_trades=stop_loss_decide_trades_factory(stop_loss_pct=stop_loss_pct),
+            create_trading_universe=None,
+            universe=universe,
+            initial_deposit=10_000,
+            reserve_currency=ReserveCurrency.busd,
+            trade_routing=TradeRouting.user_supplied_routing_model,
+            routing_model=routing_model,
+            allow_missing_fees=True,
+            cache=cache,
+        )
+
+    state, _, debug_dump = run(synthetic_universe, 0.95)
+    assert cache.misses == 1
+
+    cached_state, cached_universe, cached_debug_dump = run(synthetic_universe, 0.95)
+    assert cache.hits == 1
+    assert cached_universe is synthetic_universe
+    assert cached_state.to_json() == state.to_json()
+    assert len(cached_debug_dump) == len(debug_dump) == 213
+
+    # Strategy parameters are a part of the key
+    run(synthetic_universe, 0.90)
+    assert cache.misses == 2
+
+    # So is the data
+    stop_loss_candles = synthetic_universe.backtest_stop_loss_candles.df.copy()
+    stop_loss_candles["low"] *= 0.99
+    changed_universe = TradingStrategyUniverse(
+        universe=synthetic_universe.universe,
+        reserve_assets=synthetic_universe.reserve_assets,
+        backtest_stop_loss_candles=GroupedCandleUniverse(stop_loss_candles),
+        backtest_stop_loss_time_bucket=synthetic_universe.backtest_stop_loss_time_bucket,
+    )
+    assert get_universe_fingerprint(changed_universe) != get_universe_fingerprint(synthetic_universe)
+    run(changed_universe, 0.95)
+    assert cache.misses == 3
+    assert len(list(tmp_path.glob("*.backtest"))) == 3
+
+    # Evict by size, the given entry is kept
+    latest = max(tmp_path.glob("*.backtest"), key=lambda p: p.stat().st_mtime)
+    cache.max_size = 1
+    assert cache.evict(keep=latest) == 2
+    assert list(tmp_path.glob("*.backtest")) == [latest]
+
+    # Evict by age
+    cache.max_size = 2**30
+    cache.max_age = datetime.timedelta(0)
+    assert cache.evict() == 1
+
+
+def test_backtest_cache_key_helpers(tmp_path: Path, monkeypatch):
+    """Helper functions and classes from other modules are a part of the strategy fingerprint."""
+
+    helper_path = tmp_path / "backtest_cache_helpers.py"
+    helper_path.write_text("def get_signal():\n    return 1\n\nclass Signal:\n    threshold = 0.5\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    helpers = importlib.import_module("backtest_cache_helpers")
+
+    def create_decide_trades(helpers):
+        get_signal = helpers.get_signal
+        signal_class = helpers.Signal
+
+        def decide_trades(timestamp, universe, state, pricing_model, cycle_debug_data):
+            return [] if get_signal() > signal_class.threshold else []
+
+        return decide_trades
+
+    original = get_function_fingerprint(create_decide_trades(helpers))
+    assert get_function_fingerprint(create_decide_trades(helpers)) == original
+
+    # Changing the helper function changes the key
+    helper_path.write_text("def get_signal():\n    return 2 + 0\n\nclass Signal:\n    threshold = 0.5\n")
+    helpers = importlib.reload(helpers)
+    changed_function = get_function_fingerprint(create_decide_trades(helpers))
+    assert changed_function != original
+
+    # So does changing the class
+    helper_path.write_text("def get_signal():\n    return 2 + 0\n\nclass Signal:\n    threshold = 0.6\n")
+    helpers = importlib.reload(helpers)
+    assert get_function_fingerprint(create_decide_trades(helpers)) != changed_function
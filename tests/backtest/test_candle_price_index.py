@@ -0,0 +1,76 @@
+"""Indexed candle price lookup tests."""
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradeexecutor.backtest.candle_price_index import CandlePriceIndex
+from tradeexecutor.testing.synthetic_price_data import generate_ohlcv_candles
+from tradingstrategy.candle import GroupedCandleUniverse, CandleSampleUnavailable
+from tradingstrategy.timebucket import TimeBucket
+
+
+@pytest.fixture(scope="module")
+def candle_universe() -> GroupedCandleUniverse:
+    """Two pairs, the second one with gaps in the data."""
+    start = datetime.datetime(2021, 6, 1)
+    end = datetime.datetime(2021, 7, 1)
+    first = generate_ohlcv_candles(TimeBucket.h1, start, end, pair_id=1)
+    second = generate_ohlcv_candles(TimeBucket.h1, start + datetime.timedelta(days=2), end, pair_id=2, random_seed=2)
+    second = second.iloc[::7]
+    return GroupedCandleUniverse.create_from_multiple_candle_datafarames([first, second])
+
+
+@pytest.mark.parametrize("kind", ["open", "close"])
+def test_candle_price_index_same_as_pandas(candle_universe: GroupedCandleUniverse, kind: str):
+    """Exact hits, forward fills and missing samples match get_price_with_tolerance()."""
+
+    index = CandlePriceIndex(candle_universe)
+    tolerance = pd.Timedelta(hours=3)
+
+    timestamps = pd.date_range("2021-05-31 22:00", "2021-07-01 06:00", freq="37min")
+    for pair_id in (1, 2):
+        for ts in timestamps:
+            try:
+                expected = candle_universe.get_price_with_tolerance(pair_id, ts, tolerance=tolerance, kind=kind)
+            except CandleSampleUnavailable:
+                with pytest.raises(CandleSampleUnavailable):
+                    index.get_price_with_tolerance(pair_id, ts, tolerance=tolerance, kind=kind)
+                continue
+
+            price, delay = index.get_price_with_tolerance(pair_id, ts, tolerance=tolerance, kind=kind)
+            assert price == expected[0]
+            assert delay == expected[1]
+
+        prices = index.get_prices_with_tolerance([pair_id, 999], timestamps[100], tolerance=tolerance, kind=kind)
+        assert np.isnan(prices[1])
+
+    with pytest.raises(KeyError):
+        index.get_price_with_tolerance(999, timestamps[100], tolerance=tolerance)
+
+
+def test_candle_price_index_shared(candle_universe: GroupedCandleUniverse):
+    """Pricing models using the same candles share the index."""
+    assert CandlePriceIndex.get_for_universe(candle_universe) is CandlePriceIndex.get_for_universe(candle_universe)
+
+
+@pytest.mark.slow_test_group
+def test_candle_price_index_benchmark(candle_universe: GroupedCandleUniverse):
+    """Compare the lookup speed against get_price_with_tolerance()."""
+
+    index = CandlePriceIndex(candle_universe)
+    tolerance = pd.Timedelta(days=1)
+    timestamps = list(pd.date_range("2021-06-03", "2021-06-30", freq="13min"))
+
+    results = {}
+    for name, func in (("pandas", candle_universe.get_price_with_tolerance), ("index", index.get_price_with_tolerance)):
+        started = time.perf_counter()
+        for ts in timestamps:
+            for pair_id in (1, 2):
+                func(pair_id, ts, tolerance=tolerance, kind="close")
+        results[name] = time.perf_counter() - started
+        print(f"{name}: {len(timestamps) * 2:,} lookups in {results[name] * 1000:.1f} ms")
+
+    assert results["index"] < results["pandas"] / 5
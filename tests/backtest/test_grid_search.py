@@ -1,5 +1,7 @@
 """Grid search tests."""
 import datetime
+import pickle
+from collections import Counter
 from pathlib import Path
 
 import pandas as pd
@@ -13,8 +15,9 @@ from tradingstrategy.timebucket import TimeBucket
 from tradingstrategy.universe import Universe
 
 from tradeexecutor.analysis.grid_search import analyse_grid_search_result, visualise_table, visualise_heatmap_2d
+from tradeexecutor.backtest.shared_universe import SharedUniverse
 from tradeexecutor.backtest.grid_search import prepare_grid_combinations, run_grid_search_backtest, perform_grid_search, GridCombination, GridSearchResult, \
-    pick_grid_search_result, pick_best_grid_search_result
+    pick_grid_search_result, pick_best_grid_search_result, GridSearchResultStore, StoredGridSearchResult, RESULT_STORE_FILE
 from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
 from tradeexecutor.state.state import State
 from tradeexecutor.state.visualisation import PlotKind
@@ -332,3 +335,149 @@ def test_perform_grid_search_multiprocess(
     for r in results:
         assert r.metrics.loc["Sharpe"][0] != 0
         assert r.process_id > 1
+
+
+def test_shared_universe(universe: TradingStrategyUniverse):
+    """Candle data is reconstructed from the shared memory."""
+
+    with SharedUniverse.create(universe) as shared:
+        assert shared.get_shared_bytes() > 0
+        handle = pickle.loads(pickle.dumps(shared.handle))
+        attached = handle.attach()
+
+        candles = attached.universe.candles
+        assert candles.df.equals(universe.universe.candles.df)
+        assert candles.get_single_pair_data().equals(universe.universe.candles.get_single_pair_data())
+
+        # Candles and stop loss candles are the same object and are shared once
+        assert attached.backtest_stop_loss_candles is candles
+        assert attached.universe.liquidity is None
+
+        del candles
+        del attached
+
+
+def test_perform_grid_search_multiprocess_shared_memory(
+        universe: TradingStrategyUniverse,
+        tmp_path,
+):
+    """Run a grid search using multiple processes with the candle data in shared memory."""
+
+    parameters = {
+        "stop_loss_pct": [0.9, 0.95],
+        "slow_ema_candle_count": [7],
+        "fast_ema_candle_count": [1, 2],
+    }
+
+    combinations = prepare_grid_combinations(parameters, tmp_path)
+
+    stats = Counter()
+    results = perform_grid_search(
+        grid_search_worker,
+        universe,
+        combinations,
+        max_workers=4,
+        multiprocess=True,
+        shared_memory=True,
+        stats=stats,
+    )
+
+    assert len(results) == 4
+    assert stats["universe_shared_bytes"] > 0
+
+    for r in results:
+        assert r.metrics.loc["Sharpe"][0] != 0
+        assert r.process_max_rss > 0
+        assert r.process_time_to_first_backtest > 0
+        assert stats[f"worker_{r.process_id}_max_rss"] > 0
+
+
+def test_grid_search_result_store(
+        universe: TradingStrategyUniverse,
+        tmp_path,
+):
+    """Results are kept in a single file, read lazily and the search resumes from it."""
+
+    parameters = {
+        "stop_loss_pct": [0.9, 0.95],
+        "slow_ema_candle_count": [7],
+        "fast_ema_candle_count": [1, 2],
+    }
+
+    combinations = prepare_grid_combinations(parameters, tmp_path)
+
+    results = perform_grid_search(
+        grid_search_worker,
+        universe,
+        combinations,
+        max_workers=1,
+    )
+
+    store = GridSearchResultStore(tmp_path / RESULT_STORE_FILE)
+    assert len(store) == 4
+    assert not list(tmp_path.glob("**/result.pickle"))
+
+    # The table is read without loading the results
+    table = analyse_grid_search_result(store, min_positions_threshold=0)
+    pd.testing.assert_frame_equal(table, analyse_grid_search_result(results, min_positions_threshold=0), check_dtype=False)
+    fig = visualise_heatmap_2d(table.xs(7, level="slow_ema_candle_count"), "stop_loss_pct", "fast_ema_candle_count", "Sharpe")
+    assert isinstance(fig, Figure)
+
+    # States are read when accessed
+    stored = store.load_all()
+    assert [r.combination for r in stored] == combinations
+    assert all(isinstance(r, StoredGridSearchResult) and r.cached for r in stored)
+    assert stored[0].summary.total_positions == results[0].summary.total_positions
+    assert stored[0].state.portfolio.get_total_equity() == pytest.approx(results[0].state.portfolio.get_total_equity())
+    assert stored[0].state is stored[0].state
+
+    # Resume: only the new combinations are backtested
+    parameters["fast_ema_candle_count"] = [1, 2, 3]
+    combinations = prepare_grid_combinations(parameters, tmp_path)
+    stats = Counter()
+
+    def counting_worker(universe: TradingStrategyUniverse, combination: GridCombination) -> GridSearchResult:
+        stats["backtests"] += 1
+        return grid_search_worker(universe, combination)
+
+    results = perform_grid_search(
+        counting_worker,
+        universe,
+        combinations,
+        max_workers=1,
+        result_store=store,
+    )
+
+    assert stats["backtests"] == 2
+    assert [r.combination for r in results] == combinations
+    assert len(store) == 6
+    assert len(analyse_grid_search_result(store, min_positions_threshold=0)) == 6
+
+
+def test_grid_search_result_store_legacy_pickle(
+        universe: TradingStrategyUniverse,
+        tmp_path,
+):
+    """Results pickled by the earlier versions are moved to the result store."""
+
+    parameters = {
+        "stop_loss_pct": [0.9],
+        "slow_ema_candle_count": [7],
+        "fast_ema_candle_count": [1],
+    }
+
+    combinations = prepare_grid_combinations(parameters, tmp_path)
+    grid_search_worker(universe, combinations[0]).save()
+    assert GridSearchResult.has_result(combinations[0])
+
+    results = perform_grid_search(
+        grid_search_worker,
+        universe,
+        combinations,
+        max_workers=1,
+    )
+
+    assert results[0].cached
+    store = GridSearchResultStore(tmp_path / RESULT_STORE_FILE)
+    assert store.has_result(combinations[0])
+    assert store.load(combinations[0]).state.portfolio.get_total_equity() == pytest.approx(results[0].state.portfolio.get_total_equity())
@@ -7,6 +7,7 @@ from tradeexecutor.testing.pytest_helpers import phase_report_key
 from tradingstrategy.client import Client
 
 from tradeexecutor.cli.log import setup_pytest_logging
+from tradeexecutor.ethereum.token_cache import TokenCache, get_token_cache, set_token_cache
 
 
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
@@ -55,6 +56,19 @@ def logger() -> Logger:
     return setup_pytest_logging()
 
 
+@pytest.fixture(autouse=True)
+def token_cache() -> TokenCache:
+    """Do not share token metadata and allowances between tests.
+
+    Test chains reuse the same addresses for different tokens.
+    """
+    original = get_token_cache()
+    cache = TokenCache()
+    set_token_cache(cache)
+    yield cache
+    set_token_cache(original)
+
+
 def pytest_sessionstart(session):
     """
     Called after the Session object has been created and
@@ -20,6 +20,7 @@ from eth_defi.token import create_token
 from eth_defi.uniswap_v2.deployment import UniswapV2Deployment, deploy_uniswap_v2_like, deploy_trading_pair
 from eth_defi.uniswap_v2.fees import estimate_buy_quantity
 from tradeexecutor.ethereum.execution import get_held_assets
+from tradeexecutor.ethereum.onchain_balance import fetch_balances
 from tradeexecutor.ethereum.uniswap_v2.uniswap_v2_execution import get_current_price
 from tradeexecutor.ethereum.universe import create_pair_universe
 from tradeexecutor.ethereum.wallet import sync_reserves
@@ -489,6 +490,10 @@ def test_two_parallel_positions(
     assert balances[asset_aave.address] == Decimal('2.486302885086316575')
     assert balances[asset_weth.address] == Decimal("0.293149331800817389")
 
+    # Balances can be read in several multicall chunks
+    token_addresses = [asset_usdc.address, asset_aave.address, asset_weth.address]
+    assert fetch_balances(web3, hot_wallet.address, token_addresses, chunk_size=1) == balances
+
     #
     # 3. Sell all WETH
     # 4. Sell all AAVE
@@ -0,0 +1,323 @@
+"""Batched transaction receipt polling tests against a fake JSON-RPC node."""
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from typing import Dict, List, Set
+
+import pytest
+from eth_account import Account
+from eth_defi.hotwallet import HotWallet
+from eth_defi.trade import TradeFail, TradeSuccess
+from hexbytes import HexBytes
+from web3 import HTTPProvider, Web3
+
+from tradeexecutor.ethereum import execution, receipt_watcher
+from tradeexecutor.ethereum.execution import TradeExecutionFailed, watch_trades_to_complete, wait_trades_to_complete
+from tradeexecutor.ethereum.receipt_watcher import watch_receipts
+from tradeexecutor.ethereum.token_cache import get_chain_key, get_token_cache
+from tradeexecutor.ethereum.tx import HotWalletTransactionBuilder
+from tradeexecutor.ethereum.uniswap_v2.uniswap_v2_execution import UniswapV2ExecutionModel
+from tradeexecutor.state.blockhain_transaction import BlockchainTransaction
+from tradeexecutor.state.reserve import ReservePosition
+from tradeexecutor.state.state import State
+from tradeexecutor.state.trade import TradeStatus, TradeType
+from tradeexecutor.testing.synthetic_state import create_synthetic_pairs, create_synthetic_state
+
+
+class FakeNode:
+    """JSON-RPC node mining a few transactions every time receipts are asked."""
+
+    def __init__(self, tx_hashes: List[str], mined_per_poll=3, batch_supported=True):
+        self.pending = list(tx_hashes)
+        self.mined: Dict[str, int] = {}
+        self.mined_per_poll = mined_per_poll
+        self.batch_supported = batch_supported
+        self.block_number = 100
+        self.http_requests = 0
+        self.batch_sizes: List[int] = []
+        #: HTTP status codes to answer the next batch requests with
+        self.http_errors: List[int] = []
+        #: Transactions that revert
+        self.reverted: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def mine(self):
+        for tx_hash in self.pending[:self.mined_per_poll]:
+            self.mined[tx_hash] = self.block_number
+        del self.pending[:self.mined_per_poll]
+        self.block_number += 1
+
+    def answer(self, request: dict) -> dict:
+        method, params = request["method"], request["params"]
+        if method == "eth_chainId":
+            result = hex(1)
+        elif method == "eth_blockNumber":
+            result = hex(self.block_number)
+        elif method == "eth_getBlockByNumber":
+            result = {"number": "0x0", "hash": "0x" + "22" * 32}
+        elif method == "eth_sendRawTransaction":
+            result = Web3.to_hex(Web3.keccak(hexstr=params[0]))
+        elif method == "eth_getTransactionReceipt":
+            block_number = self.mined.get(params[0])
+            result = None if block_number is None else {
+                "transactionHash": params[0],
+                "blockHash": "0x" + "11" * 32,
+                "blockNumber": hex(block_number),
+                "status": "0x0" if params[0] in self.reverted else "0x1",
+                "gasUsed": hex(100_000),
+            }
+        else:
+            raise AssertionError(f"Unexpected {method}")
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def get_http_error(self, payload) -> int | None:
+        with self.lock:
+            if isinstance(payload, list) and self.http_errors:
+                self.http_requests += 1
+                return self.http_errors.pop(0)
+            return None
+
+    def handle(self, payload):
+        with self.lock:
+            self.http_requests += 1
+            if isinstance(payload, list):
+                self.batch_sizes.append(len(payload))
+            requests = payload if isinstance(payload, list) else [payload]
+            if any(r["method"] == "eth_blockNumber" for r in requests):
+                self.mine()
+            if isinstance(payload, list):
+                if not self.batch_supported:
+                    return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Batch not supported"}}
+                return [self.answer(r) for r in payload]
+            return self.answer(payload)
+
+
+@pytest.fixture
+def tx_hashes() -> List[str]:
+    return ["0x" + f"{i:064x}" for i in range(1, 11)]
+
+
+def _serve(node: FakeNode) -> ThreadingHTTPServer:
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            http_error = node.get_http_error(payload)
+            if http_error:
+                self.send_response(http_error)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps(node.handle(payload)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def batch_node(tx_hashes):
+    node = FakeNode(tx_hashes)
+    server = _serve(node)
+    yield node, Web3(HTTPProvider(f"http://127.0.0.1:{server.server_port}"))
+    server.shutdown()
+
+
+@pytest.fixture
+def no_batch_node(tx_hashes):
+    node = FakeNode(tx_hashes, batch_supported=False)
+    server = _serve(node)
+    yield node, Web3(HTTPProvider(f"http://127.0.0.1:{server.server_port}"))
+    server.shutdown()
+
+
+def test_watch_receipts_batched(batch_node, tx_hashes):
+    """All receipts are read with one request per poll and given out as soon as they land."""
+
+    node, web3 = batch_node
+    polls = list(watch_receipts(web3, tx_hashes, poll_delay=datetime.timedelta(0)))
+
+    assert [len(p) for p in polls] == [3, 3, 3, 1]
+    receipts = {k: v for p in polls for k, v in p.items()}
+    assert set(receipts.keys()) == {HexBytes(h) for h in tx_hashes}
+    receipt = receipts[HexBytes(tx_hashes[0])]
+    assert receipt["status"] == 1
+    assert receipt["blockNumber"] == 100
+    assert isinstance(receipt["blockHash"], HexBytes)
+
+    # eth_chainId + one batch per poll
+    assert node.http_requests == 1 + 4
+
+
+def test_watch_receipts_confirmation_block_count(batch_node, tx_hashes):
+    """Receipts are given out only after enough confirmations."""
+
+    node, web3 = batch_node
+    polls = list(watch_receipts(web3, tx_hashes, confirmation_block_count=2, poll_delay=datetime.timedelta(0)))
+    assert [len(p) for p in polls] == [3, 3, 3, 1]
+    # The fake node moves to the next block after mining, so one extra poll is needed
+    assert node.http_requests == 1 + 5
+
+
+def test_watch_receipts_batch_not_supported(no_batch_node, tx_hashes):
+    """Nodes without batch support are polled one request at a time."""
+
+    node, web3 = no_batch_node
+    receipts = {k: v for p in watch_receipts(web3, tx_hashes, poll_delay=datetime.timedelta(0)) for k, v in p.items()}
+    assert len(receipts) == 10
+    assert all(r["status"] == 1 for r in receipts.values())
+
+
+def test_watch_receipts_http_error(batch_node, tx_hashes):
+    """Failed batch requests are tried again on the next poll."""
+
+    node, web3 = batch_node
+    node.http_errors = [503, 429]
+    receipts = {k: v for p in watch_receipts(web3, tx_hashes, poll_delay=datetime.timedelta(0)) for k, v in p.items()}
+    assert len(receipts) == 10
+    assert node.http_errors == []
+    # Still polled in batches
+    assert node.batch_sizes == [11, 8, 5, 2]
+
+
+def test_watch_receipts_batch_rejected(batch_node, tx_hashes):
+    """Nodes rejecting batches with HTTP 4xx are polled one request at a time."""
+
+    node, web3 = batch_node
+    node.http_errors = [400]
+    receipts = {k: v for p in watch_receipts(web3, tx_hashes, poll_delay=datetime.timedelta(0)) for k, v in p.items()}
+    assert len(receipts) == 10
+    assert node.batch_sizes == []
+
+
+def test_watch_receipts_max_batch_size(batch_node, tx_hashes, monkeypatch):
+    """Large polls are split to several batch requests."""
+
+    monkeypatch.setattr(receipt_watcher, "MAX_BATCH_SIZE", 4)
+    node, web3 = batch_node
+    node.mined_per_poll = 10
+    polls = list(watch_receipts(web3, tx_hashes, poll_delay=datetime.timedelta(0)))
+    # Receipts + eth_blockNumber
+    assert node.batch_sizes == [5, 5, 3]
+    assert [len(p) for p in polls] == [10]
+
+
+def test_watch_trades_to_complete(batch_node, tx_hashes):
+    """Trades are given out as soon as all of their transactions are confirmed."""
+
+    node, web3 = batch_node
+    state = create_synthetic_state(position_count=5)
+    trades = [t for p in state.portfolio.closed_positions.values() for t in p.trades.values()]
+    for t, tx_hash in zip(trades, tx_hashes):
+        t.blockchain_transactions = [BlockchainTransaction(tx_hash=tx_hash)]
+
+    completed = []
+    for trade, receipts in watch_trades_to_complete(web3, trades, poll_delay=datetime.timedelta(0)):
+        assert list(receipts.keys()) == [HexBytes(trade.blockchain_transactions[0].tx_hash)]
+        completed.append((trade, node.block_number))
+
+    assert {t for t, _ in completed} == set(trades)
+    # The first trades were out before all transactions were mined
+    assert completed[0][1] < completed[-1][1]
+
+    node.pending, node.mined = list(tx_hashes), {}
+    assert len(wait_trades_to_complete(web3, trades, poll_delay=datetime.timedelta(0))) == 10
+
+
+class ReceiptStatusExecutionModel(UniswapV2ExecutionModel):
+    """Analyse trades by the receipt status only, as the fake node has no Uniswap."""
+
+    def mock_partial_deployment_for_analysis(self, web3, router_address):
+        return None
+
+    def analyse_trade_by_receipt(self, web3, uniswap, tx, tx_hash, tx_receipt, input_args):
+        if tx_receipt["status"] == 0:
+            return TradeFail(gas_used=tx_receipt["gasUsed"], effective_gas_price=0, revert_reason="Too little received")
+        trade = self.trades_by_tx_hash[HexBytes(tx_hash)]
+        return TradeSuccess(
+            gas_used=tx_receipt["gasUsed"],
+            effective_gas_price=0,
+            path=[trade.pair.quote.address, trade.pair.base.address],
+            amount_in=100 * 10**6,
+            amount_out_min=None,
+            amount_out=10**18,
+            price=Decimal(100),
+            amount_in_decimals=6,
+            amount_out_decimals=18,
+            token0=None,
+            token1=None,
+        )
+
+
+def test_broadcast_and_resolve_failed_trade(monkeypatch):
+    """A failed trade is raised only after all other confirmed trades are resolved."""
+
+    state = State()
+    pairs = create_synthetic_pairs(3)
+    usdc = pairs[0].quote
+    ts = datetime.datetime(2023, 1, 1)
+    state.portfolio.reserves[usdc.get_identifier()] = ReservePosition(usdc, Decimal(10_000), ts, 1.0, ts)
+
+    trades = []
+    for pair in pairs:
+        position, trade, created = state.create_trade(ts, pair, None, Decimal(100), 100.0, TradeType.rebalance, usdc, 1.0)
+        trades.append(trade)
+    state.start_trades(ts, trades)
+
+    # Sign the swaps, so that they can be broadcasted and decoded
+    account = Account.create()
+    router = "0x0000000000000000000000000000000000000003"
+    tx_hashes = []
+    for nonce, trade in enumerate(trades):
+        tx = {"to": router, "value": 0, "gas": 100_000, "maxFeePerGas": 1, "maxPriorityFeePerGas": 1, "nonce": nonce, "chainId": 1, "data": "0x"}
+        signed = account.sign_transaction(tx)
+        trade.blockchain_transactions = [BlockchainTransaction(
+            chain_id=1,
+            contract_address=router,
+            function_selector="swapExactTokensForTokens",
+            transaction_args=(),
+            details=tx,
+            tx_hash=signed.hash.hex(),
+            nonce=nonce,
+            signed_bytes=Web3.to_hex(signed.rawTransaction),
+        )]
+        tx_hashes.append(Web3.to_hex(signed.hash))
+
+    # The first trade to confirm reverts
+    node = FakeNode(tx_hashes, mined_per_poll=1)
+    node.reverted.add(tx_hashes[0])
+    server = _serve(node)
+    web3 = Web3(HTTPProvider(f"http://127.0.0.1:{server.server_port}"))
+    monkeypatch.setattr(execution, "fetch_transaction_revert_reason", lambda web3, tx_hash: "Too little received")
+
+    token_cache = get_token_cache()
+    for asset in [usdc] + [p.base for p in pairs]:
+        token_cache.tokens[(*get_chain_key(web3), asset.address.lower())] = {"name": asset.token_symbol, "symbol": asset.token_symbol, "decimals": asset.decimals}
+
+    execution_model = ReceiptStatusExecutionModel(HotWalletTransactionBuilder(web3, HotWallet(account)))
+    execution_model.trades_by_tx_hash = {HexBytes(tx_hash): trade for tx_hash, trade in zip(tx_hashes, trades)}
+
+    try:
+        with pytest.raises(TradeExecutionFailed):
+            execution_model.broadcast_and_resolve(
+                state,
+                trades,
+                confirmation_timeout=datetime.timedelta(seconds=30),
+                stop_on_execution_failure=True,
+            )
+    finally:
+        server.shutdown()
+
+    # The trades confirming after the failed one were resolved as well
+    assert [t.get_status() for t in trades] == [TradeStatus.failed, TradeStatus.success, TradeStatus.success]
+    assert all(t.blockchain_transactions[0].block_number is not None for t in trades)
@@ -0,0 +1,107 @@
+"""Token metadata and allowance cache tests."""
+from pathlib import Path
+
+import pytest
+from eth_typing import HexAddress
+from web3 import EthereumTesterProvider, Web3
+from web3.contract import Contract
+
+from eth_defi.token import create_token
+from tradeexecutor.ethereum.token_cache import TokenCache, get_chain_key
+
+
+@pytest.fixture
+def web3():
+    """Set up a local unit testing blockchain."""
+    return Web3(EthereumTesterProvider())
+
+
+@pytest.fixture()
+def deployer(web3) -> HexAddress:
+    return web3.eth.accounts[0]
+
+
+@pytest.fixture
+def usdc_token(web3, deployer: HexAddress) -> Contract:
+    """Create USDC with 10M supply."""
+    return create_token(web3, deployer, "Fake USDC coin", "USDC", 10_000_000 * 10**6, 6)
+
+
+@pytest.fixture
+def rpc_calls(web3) -> list:
+    """Record JSON-RPC methods called."""
+    calls = []
+
+    def middleware(make_request, w3):
+        def inner(method, params):
+            calls.append(method)
+            return make_request(method, params)
+        return inner
+
+    web3.middleware_onion.add(middleware)
+    return calls
+
+
+def test_token_cache_metadata(web3: Web3, usdc_token: Contract, rpc_calls: list, tmp_path: Path):
+    """Token metadata is read from the chain only once and kept over restarts."""
+
+    path = tmp_path / "token-cache.json"
+    cache = TokenCache(path)
+    details = cache.fetch_token_details(web3, usdc_token.address.lower())
+    assert details.symbol == "USDC"
+    assert details.decimals == 6
+    assert details.address == usdc_token.address
+    assert cache.metadata_fetches == 1
+
+    rpc_calls.clear()
+    again = cache.fetch_token_details(web3, usdc_token.address)
+    assert again == details
+    assert again.name == "Fake USDC coin"
+    assert again.convert_to_raw(1) == 1_000_000
+    assert rpc_calls == []
+
+    # Restart
+    cache = TokenCache(path)
+    assert cache.get_decimals(get_chain_key(web3), usdc_token.address) == 6
+    rpc_calls.clear()
+    assert cache.fetch_token_details(web3, usdc_token.address).symbol == "USDC"
+    assert cache.metadata_fetches == 0
+    assert rpc_calls == []
+
+
+def test_token_cache_allowances(tmp_path: Path):
+    """Allowances are forgotten when an approval is sent or a trade fails."""
+
+    cache = TokenCache(tmp_path / "token-cache.json")
+    usdc = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
+    weth = "0x7ceB23fD6bC0adD59E62ac25578270cFf1b9f619"
+    owner = "0x0000000000000000000000000000000000000001"
+    router = "0x0000000000000000000000000000000000000002"
+    polygon = (137, "0xa9c28ce2141b56c474f1dc504bee9b01eb1bd7d1a507580d5519d4437a97de1b")
+    # Same chain id, a different chain
+    restarted_dev_chain = (137, "0x01")
+
+    cache.mark_approved(polygon, usdc, owner, router)
+    cache.mark_approved(polygon, weth, owner, router)
+    assert cache.is_approved(polygon, usdc.lower(), owner, router)
+    assert not cache.is_approved(restarted_dev_chain, usdc, owner, router)
+
+    cache.invalidate_token_allowances(137, [usdc.lower()])
+    assert not cache.is_approved(polygon, usdc, owner, router)
+    assert cache.is_approved(polygon, weth, owner, router)
+
+    cache.invalidate_allowance(polygon, weth, owner, router)
+    assert not cache.is_approved(polygon, weth, owner, router)
+
+    # Allowances are not persistent, decimals are
+    cache.mark_approved(polygon, usdc, owner, router)
+    cache.set_decimals(polygon, usdc, 6)
+    cache.save()
+    cache = TokenCache(tmp_path / "token-cache.json")
+    assert cache.get_decimals(polygon, usdc.lower()) == 6
+    assert not cache.is_approved(polygon, usdc, owner, router)
+    assert cache.get_decimals(restarted_dev_chain, usdc) is None
+
+    # Damaged sidecar file is ignored
+    (tmp_path / "token-cache.json").write_text("{")
+    assert TokenCache(tmp_path / "token-cache.json").tokens == {}
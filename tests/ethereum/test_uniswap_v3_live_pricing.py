@@ -453,3 +453,32 @@ def test_uniswap_v3_three_leg_sell_price_with_price_impact(
     
     # makes sense 500 * 0.003 * 2 = 3
     assert price_structure.get_total_lp_fees() == pytest.approx(2.9954999999999843, rel=APPROX_REL)
+
+
+def test_uniswap_v3_batched_sell_prices(
+        web3: Web3,
+        exchange_universe,
+        pair_universe: PandasPairUniverse,
+        routing_model: UniswapV3SimpleRoutingModel,
+):
+    """Batched sell prices are the same as pricing one by one.
+
+    EthereumTester does not have Multicall3 deployed,
+    so this runs the fallback path.
+    """
+    pricing_method = UniswapV3LivePricing(web3, pair_universe, routing_model)
+
+    exchange = next(iter(exchange_universe.exchanges.values()))  # Get the first exchange from the universe
+    weth_usdc = translate_trading_pair(pair_universe.get_one_pair_from_pandas_universe(exchange.exchange_id, "WETH", "USDC"))
+    aave_weth = translate_trading_pair(pair_universe.get_one_pair_from_pandas_universe(exchange.exchange_id, "AAVE", "WETH"))
+
+    ts = datetime.datetime.utcnow()
+    requests = [(weth_usdc, Decimal(50)), (aave_weth, Decimal(500)), (weth_usdc, None)]
+    block_number = web3.eth.block_number
+    batched = pricing_method.get_sell_prices(ts, requests)
+
+    for (pair, quantity), price_structure in zip(requests, batched):
+        single = pricing_method.get_sell_price(ts, pair, quantity)
+        assert price_structure.price == pytest.approx(single.price, rel=APPROX_REL)
+        assert price_structure.get_total_lp_fees() == pytest.approx(single.get_total_lp_fees(), rel=APPROX_REL)
+        assert price_structure.block_number == block_number
@@ -0,0 +1,133 @@
+"""Strategy cycle with on-chain reads in parallel with the treasury sync."""
+import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import pytest
+
+from tradingstrategy.candle import GroupedCandleUniverse
+from tradingstrategy.chain import ChainId
+from tradingstrategy.timebucket import TimeBucket
+from tradingstrategy.universe import Universe
+
+from tradeexecutor.backtest.backtest_execution import BacktestExecutionModel
+from tradeexecutor.backtest.backtest_pricing import backtest_pricing_factory
+from tradeexecutor.backtest.backtest_valuation import backtest_valuation_factory
+from tradeexecutor.backtest.simulated_wallet import SimulatedWallet
+from tradeexecutor.cli.log import setup_pytest_logging
+from tradeexecutor.ethereum.enzyme.vault import EnzymeVaultSyncModel
+from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
+from tradeexecutor.state.reserve import ReservePosition
+from tradeexecutor.state.state import State
+from tradeexecutor.strategy.approval import UncheckedApprovalModel
+from tradeexecutor.strategy.execution_context import ExecutionContext, ExecutionMode
+from tradeexecutor.strategy.pandas_trader.runner import PandasTraderRunner
+from tradeexecutor.strategy.sync_model import OnChainBalance
+from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniverse, create_pair_universe_from_code
+from tradeexecutor.testing.synthetic_ethereum_data import generate_random_ethereum_address
+from tradeexecutor.testing.synthetic_exchange_data import generate_exchange, generate_simple_routing_model
+from tradeexecutor.testing.synthetic_price_data import generate_ohlcv_candles
+from tradeexecutor.utils.timer import timed_task
+
+
+class DepositDuringSyncModel(EnzymeVaultSyncModel):
+    """A vault that receives a deposit while its treasury is being synced.
+
+    Balances are served per block, like an archive node does.
+    """
+
+    def __init__(self, usdc: AssetIdentifier):
+        self.usdc = usdc
+        self.block_number = 100
+        self.deposit_block = 101
+        self.balance_reads: List[Optional[int]] = []
+
+    def get_latest_block_number(self) -> int:
+        return self.block_number
+
+    def sync_treasury(self, strategy_cycle_ts: datetime.datetime, state: State, supported_reserves=None) -> list:
+        # The deposit is mined while we are scanning the chain
+        self.block_number = self.deposit_block
+        reserve = state.portfolio.get_default_reserve_position()
+        reserve.quantity += Decimal(500)
+        state.sync.treasury.last_updated_at = datetime.datetime.utcnow()
+        state.sync.treasury.last_cycle_at = strategy_cycle_ts
+        state.sync.treasury.last_block_scanned = self.block_number
+        return []
+
+    def fetch_onchain_balances(self, assets: List[AssetIdentifier], filter_zero=True, block_number: Optional[int] = None):
+        self.balance_reads.append(block_number)
+        block_number = block_number or self.block_number
+        amount = Decimal(1500) if block_number >= self.deposit_block else Decimal(1000)
+        for asset in assets:
+            yield OnChainBalance(block_number, None, asset, amount if asset == self.usdc else Decimal(0))
+
+
+@pytest.fixture()
+def logger(request):
+    return setup_pytest_logging(request, mute_requests=False)
+
+
+@pytest.fixture()
+def usdc() -> AssetIdentifier:
+    return AssetIdentifier(ChainId.ethereum.value, generate_random_ethereum_address(), "USDC", 6, 1)
+
+
+@pytest.fixture()
+def universe(usdc) -> TradingStrategyUniverse:
+    exchange = generate_exchange(exchange_id=1, chain_id=ChainId.ethereum, address=generate_random_ethereum_address())
+    weth = AssetIdentifier(ChainId.ethereum.value, generate_random_ethereum_address(), "WETH", 18, 2)
+    weth_usdc = TradingPairIdentifier(
+        weth,
+        usdc,
+        generate_random_ethereum_address(),
+        exchange.address,
+        internal_id=1,
+        internal_exchange_id=exchange.exchange_id,
+        fee=0.0030
+    )
+    candles = generate_ohlcv_candles(TimeBucket.d1, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 7, 1), pair_id=weth_usdc.internal_id)
+    universe = Universe(
+        time_bucket=TimeBucket.d1,
+        chains={ChainId.ethereum},
+        exchanges={exchange},
+        pairs=create_pair_universe_from_code(ChainId.ethereum, [weth_usdc]),
+        candles=GroupedCandleUniverse.create_from_single_pair_dataframe(candles),
+        liquidity=None
+    )
+    return TradingStrategyUniverse(universe=universe, reserve_assets=[usdc])
+
+
+def test_concurrent_tick_deposit_during_sync(logger, usdc, universe):
+    """Account checks do not fail when a deposit is mined after the prefetch has started."""
+
+    ts = datetime.datetime(2021, 6, 10)
+    state = State()
+    state.portfolio.reserves[usdc.get_identifier()] = ReservePosition(usdc, Decimal(1000), ts, 1.0, ts)
+
+    sync_model = DepositDuringSyncModel(usdc)
+    decided_equity: Dict[str, float] = {}
+
+    def decide_trades(timestamp, universe, state, pricing_model, cycle_debug_data):
+        decided_equity["equity"] = state.portfolio.get_total_equity()
+        return []
+
+    runner = PandasTraderRunner(
+        timed_task_context_manager=timed_task,
+        execution_model=BacktestExecutionModel(SimulatedWallet(), max_slippage=0.01),
+        approval_model=UncheckedApprovalModel(),
+        valuation_model_factory=backtest_valuation_factory,
+        sync_model=sync_model,
+        pricing_model_factory=backtest_pricing_factory,
+        execution_context=ExecutionContext(mode=ExecutionMode.unit_testing_trading),
+        routing_model=generate_simple_routing_model(universe),
+        decide_trades=decide_trades,
+        accounting_checks=True,
+        concurrent_tick=True,
+    )
+
+    runner.tick(ts, universe, state, {})
+
+    # Balances were read at the block the treasury sync ended on
+    assert sync_model.balance_reads == [101]
+    assert decided_equity["equity"] == 1500
@@ -0,0 +1,204 @@
+"""Concurrent take profit and stop loss trigger check tests."""
+import datetime
+import threading
+from decimal import Decimal
+import time
+from queue import Queue
+
+import pytest
+from tradingstrategy.chain import ChainId
+from tradingstrategy.timebucket import TimeBucket
+
+from tradeexecutor.backtest.backtest_execution import BacktestExecutionModel
+from tradeexecutor.backtest.backtest_pricing import backtest_pricing_factory
+from tradeexecutor.backtest.backtest_valuation import backtest_valuation_factory
+from tradeexecutor.backtest.simulated_wallet import SimulatedWallet
+from tradeexecutor.cli.loop import ExecutionLoop
+from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
+from tradeexecutor.state.metadata import Metadata
+from tradeexecutor.state.reserve import ReservePosition
+from tradeexecutor.state.state import State
+from tradeexecutor.state.store import NoneStore
+from tradeexecutor.strategy.approval import UncheckedApprovalModel
+from tradeexecutor.strategy.cycle import CycleDuration
+from tradeexecutor.strategy.description import StrategyExecutionDescription
+from tradeexecutor.strategy.execution_context import ExecutionContext, ExecutionMode
+from tradeexecutor.strategy.pandas_trader.runner import PandasTraderRunner
+from tradeexecutor.strategy.run_state import RunState
+from tradeexecutor.strategy.state_lock import StateLock, hold_state, release_state
+from tradeexecutor.strategy.sync_model import DummySyncModel
+from tradeexecutor.strategy.universe_model import StaticUniverseModel
+from tradeexecutor.testing.synthetic_ethereum_data import generate_random_ethereum_address
+from tradeexecutor.testing.synthetic_exchange_data import generate_exchange, generate_simple_routing_model
+from tradeexecutor.testing.synthetic_price_data import generate_ohlcv_candles
+from tradeexecutor.testing.synthetic_universe_data import create_synthetic_single_pair_universe
+from tradeexecutor.testing.trigger_latency import measure_trigger_latency
+from tradeexecutor.utils.timer import timed_task
+
+
+class SlowUniverseModel(StaticUniverseModel):
+    """Download the universe for a while, without the state lock."""
+
+    def __init__(self, universe, delay: float):
+        super().__init__(universe)
+        self.delay = delay
+        self.downloads = []
+
+    def preload_universe(self, universe_options):
+        return self.universe
+
+    def construct_universe(self, ts, live, universe_options):
+        started_at = time.perf_counter()
+        time.sleep(self.delay)
+        self.downloads.append((started_at, time.perf_counter(), threading.get_ident()))
+        return self.universe
+
+
+def test_state_lock_release():
+    """Only a releasable holder lets other threads in while it waits."""
+
+    lock = StateLock()
+    entered = threading.Event()
+
+    def other():
+        with lock.hold():
+            entered.set()
+
+    with lock.hold(releasable=True):
+        # Reentrant
+        with hold_state(lock):
+            assert lock.depth == 2
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert not entered.wait(timeout=0.1)
+
+        with release_state(lock):
+            assert not lock.is_held()
+            assert entered.wait(timeout=5)
+
+        assert lock.is_held()
+        assert lock.depth == 1
+        thread.join()
+
+    # Non-releasable holder keeps the lock
+    entered.clear()
+    with lock.hold():
+        thread = threading.Thread(target=other)
+        thread.start()
+        with lock.unlocked():
+            assert lock.is_held()
+            assert not entered.wait(timeout=0.1)
+    thread.join()
+    assert entered.is_set()
+    assert not lock.is_held()
+
+    # No lock, no-op
+    with hold_state(None, releasable=True), release_state(None):
+        pass
+
+
+@pytest.mark.slow_test_group
+def test_concurrent_trigger_check_latency():
+    """Trigger checks are not blocked by a slow strategy cycle."""
+
+    result = measure_trigger_latency(concurrent_trigger_checks=True, price_moves=3)
+
+    # Check frequency + waiting for the cycle to finish its locked work,
+    # with plenty of slack for loaded CI machines.
+    # The blocking scheduler takes over a second.
+    assert result.get_max_latency() < 0.6
+    assert result.max_lock_wait < 0.5
+    assert result.cycles >= 2
+
+
+def test_execution_loop_concurrent_trigger_checks(logger):
+    """The live execution loop checks triggers on their own thread while the strategy cycle is downloading data."""
+
+    exchange = generate_exchange(exchange_id=1, chain_id=ChainId.ethereum, address=generate_random_ethereum_address())
+    usdc = AssetIdentifier(ChainId.ethereum.value, generate_random_ethereum_address(), "USDC", 6, 1)
+    weth = AssetIdentifier(ChainId.ethereum.value, generate_random_ethereum_address(), "WETH", 18, 2)
+    weth_usdc = TradingPairIdentifier(weth, usdc, generate_random_ethereum_address(), exchange.address, internal_id=1, internal_exchange_id=exchange.exchange_id, fee=0.0030)
+    candles = generate_ohlcv_candles(TimeBucket.d1, datetime.datetime(2021, 6, 1), datetime.datetime(2021, 7, 1), pair_id=weth_usdc.internal_id)
+    universe = create_synthetic_single_pair_universe(candles, ChainId.ethereum, exchange, TimeBucket.d1, weth_usdc)
+
+    execution_context = ExecutionContext(mode=ExecutionMode.unit_testing_trading)
+    execution_model = BacktestExecutionModel(SimulatedWallet(), max_slippage=0.01)
+    sync_model = DummySyncModel()
+    routing_model = generate_simple_routing_model(universe)
+    universe_model = SlowUniverseModel(universe, delay=0.5)
+
+    def decide_trades(timestamp, universe, state, pricing_model, cycle_debug_data):
+        return []
+
+    def strategy_factory(**kwargs):
+        runner = PandasTraderRunner(
+            timed_task_context_manager=timed_task,
+            execution_model=execution_model,
+            approval_model=UncheckedApprovalModel(),
+            valuation_model_factory=backtest_valuation_factory,
+            sync_model=sync_model,
+            pricing_model_factory=backtest_pricing_factory,
+            execution_context=execution_context,
+            routing_model=routing_model,
+            decide_trades=decide_trades,
+        )
+        return StrategyExecutionDescription(universe_model=universe_model, runner=runner)
+
+    loop = ExecutionLoop(
+        name="concurrent_trigger_checks",
+        command_queue=Queue(),
+        execution_model=execution_model,
+        execution_context=execution_context,
+        sync_model=sync_model,
+        approval_model=UncheckedApprovalModel(),
+        pricing_model_factory=backtest_pricing_factory,
+        valuation_model_factory=backtest_valuation_factory,
+        store=NoneStore(State()),
+        client=None,
+        strategy_factory=strategy_factory,
+        cycle_duration=CycleDuration.cycle_1s,
+        stats_refresh_frequency=None,
+        position_trigger_check_frequency=datetime.timedelta(seconds=0.1),
+        max_cycles=3,
+        run_state=RunState(),
+        metadata=Metadata.create_dummy(),
+        routing_model=routing_model,
+        concurrent_trigger_checks=True,
+    )
+
+    state = loop.setup()
+    assert loop.state_lock is not None
+    state.portfolio.reserves[usdc.get_identifier()] = ReservePosition(usdc, Decimal(1000), datetime.datetime.utcnow(), 1.0, datetime.datetime.utcnow())
+
+    checks = []
+    check_position_triggers = loop.runner.check_position_triggers
+
+    def record_check(*args, **kwargs):
+        checks.append((time.perf_counter(), threading.get_ident(), kwargs["skip_unconfirmed_positions"]))
+        return check_position_triggers(*args, **kwargs)
+
+    loop.runner.check_position_triggers = record_check
+    loop.run_with_state(state)
+
+    assert state.cycle == 3
+    assert len(universe_model.downloads) == 2
+    assert all(skip for ts, thread, skip in checks)
+
+    # Trigger checks kept running while the cycle was downloading the universe
+    for started_at, ended_at, cycle_thread in universe_model.downloads:
+        during_download = [thread for ts, thread, skip in checks if started_at < ts < ended_at]
+        assert len(during_download) > 0
+        assert cycle_thread not in during_download
+
+
+@pytest.mark.slow_test_group
+def test_trigger_check_latency_benchmark():
+    """Compare trigger latency of blocking and concurrent trigger checks."""
+
+    blocking = measure_trigger_latency(concurrent_trigger_checks=False, price_moves=8)
+    concurrent = measure_trigger_latency(concurrent_trigger_checks=True, price_moves=8)
+
+    print(f"Blocking: max {blocking.get_max_latency() * 1000:.0f} ms, mean {blocking.get_mean_latency() * 1000:.0f} ms")
+    print(f"Concurrent: max {concurrent.get_max_latency() * 1000:.0f} ms, mean {concurrent.get_mean_latency() * 1000:.0f} ms")
+    assert concurrent.get_max_latency() < blocking.get_max_latency() / 3
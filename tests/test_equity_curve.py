@@ -10,9 +10,12 @@
 
 """
 
+import copy
 import logging
 import random
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
 import pytest
@@ -41,7 +44,9 @@ from tradingstrategy.timebucket import TimeBucket
 from tradeexecutor.strategy.cycle import CycleDuration
 from tradeexecutor.strategy.reserve_currency import ReserveCurrency
 from tradeexecutor.strategy.default_routing_options import TradeRouting
-from tradeexecutor.visual.web_chart import render_web_chart, WebChartType, WebChartSource
+from tradeexecutor.strategy.state_lock import StateLock
+from tradeexecutor.visual import web_chart
+from tradeexecutor.visual.web_chart import render_web_chart, WebChartType, WebChartSource, WebChartCache, export_time_series
 
 
 def decide_trades(
@@ -321,4 +326,91 @@ def test_web_netflow(state: State):
 
     first_tuple = chart.data[0]
     assert first_tuple[0] == 1622505600.0
-    assert first_tuple[1] == 10000.0  # Initial deposit
\ No newline at end of file
+    assert first_tuple[1] == 10000.0  # Initial deposit
+
+def test_web_chart_cache(state: State):
+    """Live charts are rendered from the in-memory state once per state version."""
+
+    state = copy.deepcopy(state)
+    state_lock = StateLock()
+    live_types = [WebChartType.total_equity, WebChartType.netflow, WebChartType.compounding_realised_profitability]
+
+    def load_state():
+        raise AssertionError("The live state should be used")
+
+    # Start from the first half of the history
+    portfolio_stats = state.stats.portfolio
+    later_stats = portfolio_stats[len(portfolio_stats) // 2:]
+    del portfolio_stats[len(portfolio_stats) // 2:]
+    closed_positions = state.portfolio.closed_positions
+    later_positions = [closed_positions.pop(id) for id in list(closed_positions)[len(closed_positions) // 2:]]
+    assert len(later_stats) > 0
+    assert len(later_positions) > 0
+
+    cache = WebChartCache()
+    cache.update(state, state_lock)
+
+    for type in live_types:
+        chart = cache.get_chart(type, WebChartSource.live_trading, load_state)
+        assert chart.version == 1
+        assert chart.text == render_web_chart(state, type, WebChartSource.live_trading).to_json()
+        assert cache.get_chart(type, WebChartSource.live_trading, load_state) is chart
+
+    # The main loop adds new entries, only they are read on the next render
+    with state_lock.hold():
+        portfolio_stats += later_stats
+        for p in later_positions:
+            closed_positions[p.position_id] = p
+    cache.update(state, state_lock)
+
+    equity_points = cache.points[WebChartType.total_equity]
+    equity_data = equity_points.data
+    for type in live_types:
+        chart = cache.get_chart(type, WebChartSource.live_trading, load_state)
+        assert chart.version == 2
+        assert chart.text == render_web_chart(state, type, WebChartSource.live_trading).to_json()
+    assert equity_points.data is equity_data
+    assert equity_points.count == len(portfolio_stats)
+
+    # Concurrent requests for the same version share one render
+    cache.update(state, state_lock)
+    renders = []
+    original_extend = web_chart._extend_web_chart
+
+    def extend(*args):
+        renders.append(1)
+        time.sleep(0.1)
+        return original_extend(*args)
+
+    web_chart._extend_web_chart = extend
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            charts = list(executor.map(lambda _: cache.get_chart(WebChartType.total_equity, WebChartSource.live_trading, load_state), range(4)))
+    finally:
+        web_chart._extend_web_chart = original_extend
+
+    assert len(renders) == 1
+    assert all(c is charts[0] for c in charts)
+    assert charts[0].version == 3
+
+    # Without the live state, load the state for every request
+    loads = []
+
+    def load_stored_state():
+        loads.append(1)
+        return state
+
+    cache = WebChartCache()
+    chart = cache.get_chart(WebChartType.total_equity, WebChartSource.live_trading, load_stored_state)
+    assert chart.text == render_web_chart(state, WebChartType.total_equity, WebChartSource.live_trading).to_json()
+    cache.get_chart(WebChartType.total_equity, WebChartSource.live_trading, load_stored_state)
+    assert len(loads) == 2
+
+
+def test_export_time_series():
+    """Vectorised export gives the same result as Timestamp.timestamp()."""
+    series = pd.Series([1.5, 2.0, float("nan")], index=pd.to_datetime(["2021-06-01", "2021-06-01 00:00:01.5", "2021-07-01"]))
+    data = export_time_series(series)
+    assert data[:2] == [(index.timestamp(), value) for index, value in series.items()][:2]
+    assert type(data[0][0]) == float
+    assert type(data[0][1]) == float
@@ -0,0 +1,107 @@
+"""Interned trading pair and asset identifier tests."""
+import json
+from pathlib import Path
+
+from tradingstrategy.chain import ChainId
+
+from tradeexecutor.state.identifier_registry import IdentifierStorage
+from tradeexecutor.state.journal_store import JournalFileStore
+from tradeexecutor.state.state import State
+from tradeexecutor.state.store import JSONFileStore
+from tradeexecutor.strategy.trading_strategy_universe import create_pair_universe_from_code, translate_trading_pair
+from tradeexecutor.testing.dummy_trader import DummyTestTrader
+from tradeexecutor.testing.synthetic_state import create_synthetic_state, create_synthetic_pairs, advance_synthetic_state
+
+
+def test_interned_identifiers_round_trip():
+    """States with interned identifiers are smaller and read back the same."""
+
+    state = create_synthetic_state(position_count=100)
+
+    inline_json = state.to_json_safe()
+    interned_json = state.to_json_safe(identifier_storage=IdentifierStorage.interned)
+
+    data = json.loads(interned_json)
+    assert len(data["identifiers"]["pairs"]) == 10
+    # 10 base tokens + USDC
+    assert len(data["identifiers"]["assets"]) == 11
+    assert "TOKEN0" not in json.dumps(data["portfolio"])
+    assert len(interned_json) < len(inline_json) * 0.7
+
+    interned = State.read_json_blob(interned_json)
+    inline = State.read_json_blob(inline_json)
+    assert interned == inline
+    assert interned.to_json_safe() == inline_json
+    assert inline.to_json_safe(identifier_storage=IdentifierStorage.interned) == interned_json
+
+
+def test_identifiers_shared_after_load():
+    """Equal identifiers are one object after loading both formats."""
+
+    state = create_synthetic_state(position_count=30, pair_count=3)
+
+    for storage in IdentifierStorage:
+        loaded = State.read_json_blob(state.to_json_safe(identifier_storage=storage))
+        positions = list(loaded.portfolio.closed_positions.values())
+
+        pairs = {id(p.pair) for p in positions}
+        pairs |= {id(t.pair) for p in positions for t in p.trades.values()}
+        assert len(pairs) == 3, f"Failed for {storage}"
+
+        usdc = {id(p.pair.quote) for p in positions}
+        usdc |= {id(p.reserve_currency) for p in positions}
+        usdc |= {id(r.asset) for r in loaded.portfolio.reserves.values()}
+        assert len(usdc) == 1, f"Failed for {storage}"
+
+
+def test_interned_identifiers_file_store(tmp_path: Path):
+    """State stores read both formats, the webhook is served inline."""
+
+    state = create_synthetic_state(position_count=20)
+    inline_json = state.to_json_safe()
+
+    store = JSONFileStore(tmp_path / "state.json", identifier_storage=IdentifierStorage.interned)
+    store.sync(state)
+    assert "identifiers" in json.loads(store.path.read_text())
+
+    loaded = store.load()
+    assert loaded.portfolio == state.portfolio
+    assert "$pair" not in loaded.to_json_safe()
+
+    # Old inline files load with the same store
+    store.path.write_text(inline_json)
+    assert store.load().portfolio == state.portfolio
+
+    # Interned snapshot + inline journal entries
+    journal_store = JournalFileStore(tmp_path / "journal.json", identifier_storage=IdentifierStorage.interned)
+    journal_store.sync(state)
+    trader = DummyTestTrader(state)
+    trader.time_travel(state.portfolio.closed_positions[20].closed_at)
+    advance_synthetic_state(state, trader, state.portfolio.closed_positions[1].pair)
+    journal_store.sync(state)
+    assert journal_store.has_journal()
+    loaded = journal_store.load()
+    assert loaded.portfolio == state.portfolio
+    assert loaded.portfolio.closed_positions[21].pair is loaded.portfolio.closed_positions[1].pair
+
+
+def test_translate_trading_pair_memoised():
+    """Translating the same pair again gives the same identifier."""
+
+    pairs = create_synthetic_pairs(3)
+    pair_universe = create_pair_universe_from_code(ChainId.ethereum, pairs)
+    dex_pair = pair_universe.get_pair_by_id(pairs[0].internal_id)
+
+    translated = translate_trading_pair(dex_pair)
+    assert translated.base.token_symbol == "TOKEN0"
+    assert translate_trading_pair(pair_universe.get_pair_by_id(pairs[0].internal_id)) is translated
+
+    other = translate_trading_pair(pair_universe.get_pair_by_id(pairs[1].internal_id))
+    assert other is not translated
+    assert other.quote is translated.quote
+
+    # Manually overridden fee is not given out again
+    translated.fee = 0.02
+    again = translate_trading_pair(dex_pair)
+    assert again is not translated
+    assert again.fee == 0.0030
@@ -0,0 +1,117 @@
+"""Background strategy thinking image rendering tests."""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import plotly.graph_objects as go
+import pytest
+
+from tradeexecutor.strategy.run_state import LatestStateVisualisation, RunState
+from tradeexecutor.visual.image_renderer import BackgroundImageRenderer
+
+
+class RecordingRenderer:
+    """Render function recording its calls, optionally blocking until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self, figure_json: str, width: int, height: int, theme: str) -> bytes:
+        self.calls.append((width, theme))
+        self.started.set()
+        assert self.release.wait(timeout=10)
+        title = go.Figure(**json.loads(figure_json)).layout.title.text
+        return f"{title} {width}x{height} {theme}".encode()
+
+
+def _figure(title: str) -> go.Figure:
+    figure = go.Figure()
+    figure.update_layout(title=title)
+    return figure
+
+
+@pytest.fixture()
+def render_function() -> RecordingRenderer:
+    return RecordingRenderer()
+
+
+@pytest.fixture()
+def renderer(render_function):
+    renderer = BackgroundImageRenderer(executor=ThreadPoolExecutor(max_workers=1), render_function=render_function)
+    yield renderer
+    renderer.close()
+
+
+def test_render_on_demand_once_per_frame(renderer: BackgroundImageRenderer, render_function: RecordingRenderer):
+    """Only asked variants are rendered, each once per frame."""
+
+    assert renderer.get_image("small") is None
+
+    renderer.update_figure(_figure("Cycle 1"))
+    assert render_function.calls == []
+
+    assert renderer.get_image("small") == b"Cycle 1 512x512 light"
+    assert renderer.get_image("small") == b"Cycle 1 512x512 light"
+    assert renderer.get_image("large", "dark") == b"Cycle 1 1024x1024 dark"
+    assert render_function.calls == [(512, "light"), (1024, "dark")]
+
+    # Asked variants are rendered in the background for the next frame
+    renderer.update_figure(_figure("Cycle 2"))
+    renderer.executor.submit(lambda: None).result()
+    assert render_function.calls[2:] == [(1024, "dark"), (512, "light")]
+    assert renderer.images[("small", "light")] == b"Cycle 2 512x512 light"
+
+    assert renderer.get_image("small") == b"Cycle 2 512x512 light"
+    assert len(render_function.calls) == 4
+    assert renderer.render_count == 4
+
+
+def test_stale_frames_dropped(renderer: BackgroundImageRenderer, render_function: RecordingRenderer):
+    """A new frame cancels queued renders and drops results of the old frame."""
+
+    renderer.update_figure(_figure("Cycle 1"))
+    render_function.release.clear()
+    running = renderer.get_image_future("small")
+    render_function.started.wait(timeout=10)
+    queued = renderer.get_image_future("large")
+
+    renderer.update_figure(_figure("Cycle 2"))
+    assert queued.cancelled()
+    render_function.release.set()
+
+    # The running render finishes, but its result is not cached
+    assert running.result(timeout=10) == b"Cycle 1 512x512 light"
+    assert renderer.get_image("small") == b"Cycle 2 512x512 light"
+    assert renderer.get_image("large") == b"Cycle 2 1024x1024 light"
+    assert renderer.dropped_count == 2
+
+
+def test_failed_render_retried(renderer: BackgroundImageRenderer, render_function: RecordingRenderer):
+    """A failed render is not cached."""
+
+    renderer.update_figure(_figure("Cycle 1"))
+    renderer.render_function = lambda *args: 1 / 0
+    with pytest.raises(ZeroDivisionError):
+        renderer.get_image("small")
+
+    renderer.render_function = render_function
+    assert renderer.get_image("small") == b"Cycle 1 512x512 light"
+
+
+def test_latest_state_visualisation_renderer(renderer: BackgroundImageRenderer):
+    """Run state visualisation serves rendered images and is still exportable."""
+
+    visualisation = LatestStateVisualisation()
+    visualisation.update_image_data(b"1", b"2", b"3", b"4")
+    assert visualisation.get_image("small") == b"1"
+    assert visualisation.get_image("large", "dark") == b"4"
+
+    visualisation.renderer = renderer
+    visualisation.update_figure(_figure("Cycle 1"))
+    assert visualisation.get_image("small", "dark") == b"Cycle 1 512x512 dark"
+
+    assert "renderer" not in visualisation.to_dict()
+    RunState(visualisation=visualisation).make_exportable_copy()
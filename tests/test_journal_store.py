@@ -0,0 +1,170 @@
+"""Journaled state store tests."""
+import datetime
+import json
+import random
+import time
+from pathlib import Path
+
+import pytest
+
+from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
+from tradeexecutor.state.journal_store import JournalFileStore
+from tradeexecutor.state.state import State
+from tradeexecutor.state.store import JSONFileStore
+from tradeexecutor.testing.dummy_trader import DummyTestTrader
+from tradeexecutor.testing.synthetic_state import create_synthetic_state, advance_synthetic_state
+
+
+@pytest.fixture(autouse=True)
+def patch_json():
+    patch_dataclasses_json()
+
+
+def _continue_trading(state: State, cycles: int) -> DummyTestTrader:
+    """Add more trading history on the top of a synthetic state."""
+    trader = DummyTestTrader(state)
+    last_position = next(reversed(state.portfolio.closed_positions.values()))
+    trader.time_travel(last_position.closed_at.replace(microsecond=0) + datetime.timedelta(hours=1))
+    pair = last_position.pair
+    rand = random.Random(2)
+    for i in range(cycles):
+        advance_synthetic_state(state, trader, pair, rand=rand)
+    return trader
+
+
+def _dump(state: State) -> str:
+    return json.dumps(json.loads(state.to_json_safe()), sort_keys=True)
+
+
+def test_journal_store_roundtrip(tmp_path: Path):
+    """Snapshot + journal replay gives the same state as a full JSON dump."""
+
+    state = create_synthetic_state(position_count=20)
+
+    store = JournalFileStore(tmp_path / "state.json")
+    assert store.is_pristine()
+
+    # First sync writes a full snapshot
+    store.sync(state)
+    assert not store.has_journal()
+
+    _continue_trading(state, 5)
+    state.visualisation.add_message(state.portfolio.closed_positions[1].closed_at, "Hello")
+    state.visualisation.add_calculations(state.portfolio.closed_positions[1].closed_at, {"foo": 1})
+    store.sync(state)
+
+    _continue_trading(state, 5)
+    store.sync(state)
+
+    assert store.has_journal()
+    assert store.journal_entry_count == 2
+
+    reference_store = JSONFileStore(tmp_path / "reference.json")
+    reference_store.sync(state)
+
+    journal_state = store.load()
+    reference_state = reference_store.load()
+
+    assert len(journal_state.portfolio.closed_positions) == 30
+    assert len(journal_state.stats.portfolio) == 30
+    assert journal_state.visualisation.get_total_points() == 30 * 4
+    assert _dump(journal_state) == _dump(reference_state)
+
+
+def test_journal_store_replay_idempotent(tmp_path: Path):
+    """Replaying the journal on a newer snapshot does not duplicate entries."""
+
+    state = create_synthetic_state(position_count=10)
+    store = JournalFileStore(tmp_path / "state.json")
+    store.sync(state)
+    _continue_trading(state, 3)
+    store.sync(state)
+
+    journal = store.journal_path.read_text()
+
+    # Simulate a crash after writing a new snapshot, but before the journal was truncated
+    store.compact(state)
+    store.journal_path.write_text(journal)
+
+    loaded = store.load()
+    assert len(loaded.stats.portfolio) == 13
+    assert len(loaded.portfolio.closed_positions) == 13
+    assert _dump(loaded) == _dump(state)
+
+
+def test_journal_store_damaged_last_entry(tmp_path: Path):
+    """A half-written journal line is ignored."""
+
+    state = create_synthetic_state(position_count=10)
+    store = JournalFileStore(tmp_path / "state.json")
+    store.sync(state)
+    _continue_trading(state, 1)
+    store.sync(state)
+
+    with store.journal_path.open("at") as out:
+        out.write('{"state": {"cyc')
+
+    loaded = store.load()
+    assert len(loaded.portfolio.closed_positions) == 11
+
+
+def test_journal_store_compaction(tmp_path: Path):
+    """Full snapshot is written after the journal grows too long."""
+
+    state = create_synthetic_state(position_count=5)
+    store = JournalFileStore(tmp_path / "state.json", compact_every=2)
+    store.sync(state)
+
+    _continue_trading(state, 1)
+    store.sync(state)
+    store.sync(state)
+    assert store.journal_entry_count == 2
+
+    # Third sync compacts
+    store.sync(state)
+    assert store.journal_entry_count == 0
+    assert not store.has_journal()
+
+    # Syncing another state object always writes a full snapshot
+    another_state = store.load()
+    store.sync(another_state)
+    assert not store.has_journal()
+    assert _dump(store.load()) == _dump(state)
+
+
+@pytest.mark.slow_test_group
+def test_journal_store_benchmark(tmp_path: Path):
+    """Compare sync latency and written bytes against JSONFileStore on a large state."""
+
+    state = create_synthetic_state(position_count=5000)
+    cycles = 10
+
+    json_store = JSONFileStore(tmp_path / "full.json")
+    journal_store = JournalFileStore(tmp_path / "journal.json", compact_every=cycles + 1)
+    journal_store.sync(state)
+
+    json_time = journal_time = 0
+    json_bytes = journal_bytes = 0
+
+    trader = _continue_trading(state, 0)
+    rand = random.Random(3)
+    pair = next(iter(state.portfolio.closed_positions.values())).pair
+    for i in range(cycles):
+        advance_synthetic_state(state, trader, pair, rand=rand)
+
+        started = time.perf_counter()
+        json_store.sync(state)
+        json_time += time.perf_counter() - started
+        json_bytes += json_store.path.stat().st_size
+
+        started = time.perf_counter()
+        journal_store.sync(state)
+        journal_time += time.perf_counter() - started
+        journal_bytes += journal_store.last_sync_bytes
+
+    print(f"JSONFileStore: {json_time / cycles * 1000:.1f} ms/sync, {json_bytes // cycles:,} bytes/sync")
+    print(f"JournalFileStore: {journal_time / cycles * 1000:.1f} ms/sync, {journal_bytes // cycles:,} bytes/sync")
+
+    assert journal_bytes < json_bytes / 10
+    assert journal_time < json_time
+    assert _dump(journal_store.load()) == _dump(state)
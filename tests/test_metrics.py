@@ -0,0 +1,56 @@
+"""Hot code path metrics."""
+import json
+
+from tradeexecutor.strategy.run_state import RunState
+from tradeexecutor.utils.metrics import MetricsRegistry, get_metrics_registry
+from tradeexecutor.utils.timer import timed_task
+
+
+def test_metrics_registry():
+    """Histograms, Prometheus export and per-cycle breakdown."""
+
+    registry = MetricsRegistry()
+
+    registry.start_cycle(1)
+    for duration in (1.0, 2.0, 3.0):
+        registry.record("decide_trades", duration)
+    registry.record("strategy_tick", 10.0, {"cycle_duration": "1h"})
+    registry.start_cycle(2)
+    registry.record("decide_trades", 0.5)
+    registry.end_cycle()
+    registry.record("decide_trades", 100.0)
+
+    summary = registry.get_summary()
+    decide_trades = summary["decide_trades"]
+    assert decide_trades.count == 5
+    assert decide_trades.p50 == 2.0
+    assert decide_trades.max == 100.0
+    assert decide_trades.last == 100.0
+    assert summary['strategy_tick{cycle_duration="1h"}'].count == 1
+
+    text = registry.export_prometheus()
+    assert "# TYPE trade_executor_task_duration_seconds summary" in text
+    assert 'trade_executor_task_duration_seconds{task="decide_trades",quantile="0.5"} 2.0' in text
+    assert 'trade_executor_task_duration_seconds_count{task="strategy_tick",cycle_duration="1h"} 1' in text
+    assert 'trade_executor_task_max_duration_seconds{task="decide_trades"} 100.0' in text
+
+    df = registry.get_cycle_breakdown()
+    assert df.loc[1, "decide_trades"] == 6.0
+    assert df.loc[1, "strategy_tick"] == 10.0
+    assert df.loc[2, "decide_trades"] == 0.5
+
+
+def test_timed_task_records_metrics():
+    """timed_task() feeds the process-wide registry and the summary goes to RunState."""
+
+    with timed_task("test_timed_task_records_metrics", cycle_duration="1d", trade_count=2):
+        pass
+
+    summary = get_metrics_registry().get_summary()
+    # Only string values are labels
+    assert summary['test_timed_task_records_metrics{cycle_duration="1d"}'].count == 1
+
+    run_state = RunState()
+    run_state.task_metrics = summary
+    data = json.loads(run_state.make_exportable_copy().to_json())
+    assert data["task_metrics"]['test_timed_task_records_metrics{cycle_duration="1d"}']["count"] == 1
@@ -0,0 +1,260 @@
+"""Columnar plot storage, retention and plot sidecar file tests."""
+import datetime
+import json
+import random
+import time
+from pathlib import Path
+
+import pytest
+
+from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
+from tradeexecutor.state.journal_store import JournalFileStore
+from tradeexecutor.state.plot_sidecar import get_plot_sidecar_path, inline_sidecar_points
+from tradeexecutor.state.sectioned_store import SectionedFileStore
+from tradeexecutor.state.state import State
+from tradeexecutor.state.store import JSONFileStore
+from tradeexecutor.state.visualisation import PlotStorage, PlotPoints, VisualisationRetention, PlotKind, Visualisation
+from tradeexecutor.testing.dummy_trader import DummyTestTrader
+from tradeexecutor.testing.synthetic_state import create_synthetic_state, advance_synthetic_state
+
+
+@pytest.fixture(autouse=True)
+def patch_json():
+    patch_dataclasses_json()
+
+
+def _continue_trading(state: State, cycles: int):
+    """Add more trading history and plot points on the top of a synthetic state."""
+    trader = DummyTestTrader(state)
+    last_position = next(reversed(state.portfolio.closed_positions.values()))
+    trader.time_travel(last_position.closed_at.replace(microsecond=0) + datetime.timedelta(hours=1))
+    pair = last_position.pair
+    rand = random.Random(2)
+    for i in range(cycles):
+        advance_synthetic_state(state, trader, pair, rand=rand)
+
+
+def _get_points(state: State) -> dict:
+    return {name: dict(plot.points.items()) for name, plot in state.visualisation.plots.items()}
+
+
+def test_plot_points_columnar():
+    """Columnar plots behave like dict plots."""
+
+    inline = Visualisation()
+    columnar = Visualisation()
+    columnar.set_plot_storage(PlotStorage.columnar)
+
+    start = datetime.datetime(2023, 1, 1)
+    for v in (inline, columnar):
+        for i in range(10):
+            value = None if i == 5 else float(i)
+            v.plot_indicator(start + datetime.timedelta(hours=i), "Foo", PlotKind.technical_indicator_on_price, value)
+
+    points = columnar.plots["Foo"].points
+    assert isinstance(points, PlotPoints)
+    assert points == inline.plots["Foo"].points
+    assert list(points.items()) == list(inline.plots["Foo"].points.items())
+    assert columnar.get_timestamp_range() == inline.get_timestamp_range()
+    assert columnar.get_total_points() == 10
+    assert columnar.plots["Foo"].get_last_value() == 9.0
+    assert columnar.plots["Foo"].get_entries() == inline.plots["Foo"].get_entries()
+
+    # Out of order points are kept sorted
+    points[int(start.timestamp()) - 3600] = 1.5
+    assert points.get_first() == (int(start.timestamp()) - 3600, 1.5)
+    assert points.version == 1
+
+    # Same plot name twice on the same cycle
+    with pytest.raises(AssertionError):
+        columnar.plot_indicator(start, "Foo", PlotKind.technical_indicator_on_price, 1.0)
+
+    # Columnar points are serialised as a dict and decoded back to columns
+    data = json.loads(columnar.to_json())
+    decoded = Visualisation.from_dict(data)
+    assert isinstance(decoded.plots["Foo"].points, PlotPoints)
+    assert decoded.plots["Foo"].points == points
+
+
+def test_plot_retention():
+    """Old points are removed and downsampled in batches."""
+
+    visualisation = Visualisation()
+    visualisation.set_plot_storage(
+        PlotStorage.columnar,
+        VisualisationRetention(
+            max_age=datetime.timedelta(days=30),
+            downsample_after=datetime.timedelta(days=7),
+            downsample_interval=datetime.timedelta(days=1),
+            prune_batch_size=24,
+        )
+    )
+
+    start = datetime.datetime(2023, 1, 1)
+    hours = 24 * 60
+    for i in range(hours):
+        ts = start + datetime.timedelta(hours=i)
+        visualisation.plot_indicator(ts, "Foo", PlotKind.technical_indicator_on_price, float(i))
+        visualisation.add_calculations(ts, {"i": i})
+
+    points = visualisation.plots["Foo"].points
+    last_timestamp, last_value = points.get_last()
+    assert last_value == hours - 1
+    first_timestamp, _ = points.get_first()
+
+    # Max age, with the slack of one prune batch of downsampled points
+    day = 24 * 3600
+    assert last_timestamp - first_timestamp <= (30 + 24) * day
+
+    # One point per day before the downsampling window, every point after
+    downsampled_until = points.downsampled_until
+    assert downsampled_until % day == 0
+    old = [ts for ts in points if ts < downsampled_until]
+    assert len(old) == len({ts // day for ts in old})
+    assert all(ts % day == 23 * 3600 for ts in old)
+    recent = [ts for ts in points if ts >= downsampled_until]
+    assert len(recent) == (last_timestamp - downsampled_until) // 3600 + 1
+
+    assert len(visualisation.calculations) <= (30 + 1) * 24 + 1
+
+    visualisation.set_plot_storage(PlotStorage.columnar, VisualisationRetention(max_points=100, prune_batch_size=1))
+    assert len(points) == 100
+    assert points.get_last() == (last_timestamp, last_value)
+
+
+@pytest.mark.parametrize("store_class,file_name", [
+    (JSONFileStore, "state.json"),
+    (JournalFileStore, "state.json"),
+    (SectionedFileStore, "state.state"),
+])
+def test_plot_sidecar_roundtrip(tmp_path: Path, store_class, file_name):
+    """Plot points are appended to the sidecar file, not written in the state."""
+
+    state = create_synthetic_state(position_count=20)
+    state.visualisation.set_plot_storage(PlotStorage.sidecar)
+    expected_points = _get_points(state)
+
+    store = store_class(tmp_path / file_name)
+    store.sync(state)
+
+    sidecar_path = get_plot_sidecar_path(tmp_path / file_name)
+    head = sidecar_path.read_bytes()
+
+    _continue_trading(state, 5)
+    store.sync(state)
+    _continue_trading(state, 5)
+    store.sync(state)
+
+    # Earlier points were not rewritten
+    assert sidecar_path.read_bytes().startswith(head)
+    assert len(sidecar_path.read_bytes()) < 2 * len(head)
+
+    # Points are not in the state itself
+    assert "points" not in json.loads(state.to_json_safe())["visualisation"]["plots"]["Indicator 0"]
+
+    loaded = store_class(tmp_path / file_name).load()
+    assert loaded.visualisation.plot_storage == PlotStorage.sidecar
+    assert loaded.visualisation.get_total_points() == 30 * 4
+    assert _get_points(loaded) == _get_points(state)
+    for name, points in expected_points.items():
+        assert points.items() <= _get_points(loaded)[name].items()
+
+
+def test_plot_sidecar_rewrite(tmp_path: Path):
+    """Sidecar is rewritten when retention removes points, damaged chunks are ignored."""
+
+    state = create_synthetic_state(position_count=20)
+    state.visualisation.set_plot_storage(PlotStorage.sidecar)
+    store = JSONFileStore(tmp_path / "state.json")
+    store.sync(state)
+
+    state.visualisation.set_plot_storage(PlotStorage.sidecar, VisualisationRetention(max_points=5, prune_batch_size=1))
+    store.sync(state)
+    assert _get_points(store.load()) == _get_points(state)
+    assert store.load().visualisation.get_total_points() == 5 * 4
+
+    # Simulate a crash in the middle of an append
+    _continue_trading(state, 1)
+    store.sync(state)
+    sidecar_path = get_plot_sidecar_path(tmp_path / "state.json")
+    with sidecar_path.open("ab") as out:
+        out.write(b"\x05\x00\x01\x00\x00\x00Foo")
+
+    loaded = store.load()
+    assert _get_points(loaded) == _get_points(state)
+
+    # Syncing the loaded state drops the damaged chunk
+    store.sync(loaded)
+    assert _get_points(store.load()) == _get_points(state)
+
+
+def test_inline_sidecar_points(tmp_path: Path):
+    """Loaded sidecar points can be served as a part of the state."""
+
+    state = create_synthetic_state(position_count=20)
+    state.visualisation.set_plot_storage(PlotStorage.sidecar)
+    store = JSONFileStore(tmp_path / "state.json")
+    store.sync(state)
+
+    loaded = store.load()
+    inline_sidecar_points(loaded)
+    data = json.loads(loaded.to_json_safe())
+    assert len(data["visualisation"]["plots"]["Indicator 0"]["points"]) == 20
+    assert _get_points(State.read_json_blob(json.dumps(data))) == _get_points(state)
+
+
+def test_journal_store_columnar_retention(tmp_path: Path):
+    """Journal store writes a full snapshot when retention removes already journaled points."""
+
+    state = create_synthetic_state(position_count=20)
+    state.visualisation.set_plot_storage(PlotStorage.columnar, VisualisationRetention(max_points=20, prune_batch_size=5))
+    store = JournalFileStore(tmp_path / "state.json")
+    store.sync(state)
+
+    # Below the prune batch size, points are journaled
+    _continue_trading(state, 4)
+    store.sync(state)
+    assert store.has_journal()
+    assert state.visualisation.get_total_points() == 24 * 4
+
+    # Pruning compacts
+    _continue_trading(state, 1)
+    store.sync(state)
+    assert not store.has_journal()
+    assert state.visualisation.get_total_points() == 20 * 4
+
+    _continue_trading(state, 1)
+    store.sync(state)
+    assert store.has_journal()
+    assert _get_points(store.load()) == _get_points(state)
+
+
+@pytest.mark.slow_test_group
+def test_plot_sidecar_benchmark(tmp_path: Path):
+    """Compare sync time and written bytes of inline and sidecar plot storage."""
+
+    cycles = 10
+    results = {}
+    for plot_storage in (PlotStorage.inline, PlotStorage.sidecar):
+        state = create_synthetic_state(position_count=100, plot_count=12)
+        last_position = next(reversed(state.portfolio.closed_positions.values()))
+        start = last_position.closed_at.replace(microsecond=0) + datetime.timedelta(hours=1)
+        state.visualisation.set_plot_storage(plot_storage)
+
+        # A year of hourly points for a dozen indicators
+        for i in range(24 * 365):
+            for plot_idx in range(12):
+                state.visualisation.plot_indicator(start + datetime.timedelta(hours=i), f"Indicator {plot_idx}", PlotKind.technical_indicator_detached, float(i))
+
+        store = JSONFileStore(tmp_path / f"{plot_storage.value}.json")
+        store.sync(state)
+
+        started = time.perf_counter()
+        for i in range(cycles):
+            state.visualisation.get_timestamp_range()
+            store.sync(state)
+        results[plot_storage] = (time.perf_counter() - started) / cycles, store.path.stat().st_size
+
+    print(f"Inline: {results[PlotStorage.inline][0] * 1000:.1f} ms/sync, {results[PlotStorage.inline][1]:,} bytes")
+    print(f"Sidecar: {results[PlotStorage.sidecar][0] * 1000:.1f} ms/sync, {results[PlotStorage.sidecar][1]:,} bytes")
+    assert results[PlotStorage.sidecar][0] < results[PlotStorage.inline][0] / 2
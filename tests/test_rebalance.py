@@ -6,11 +6,13 @@
   WETH/USD and AAVE/USD
 
 """
+import copy
 import os
 import datetime
 import random
 from decimal import Decimal
 
+import numpy as np
 import pytest
 from hexbytes import HexBytes
 
@@ -27,7 +29,8 @@ from tradeexecutor.strategy.alpha_model import AlphaModel
 from tradeexecutor.strategy.pandas_trader.position_manager import PositionManager
 from tradeexecutor.strategy.pandas_trader.rebalance import get_existing_portfolio_weights, rebalance_portfolio_old, \
     get_weight_diffs
-from tradeexecutor.strategy.weighting import BadWeightsException, clip_to_normalised, weight_passthrouh
+from tradeexecutor.strategy.vectorised_alpha_model import VectorisedAlphaModel
+from tradeexecutor.strategy.weighting import BadWeightsException, clip_to_normalised, weight_passthrouh, weight_by_1_slash_n
 from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniverse, create_pair_universe_from_code
 from tradeexecutor.testing.synthetic_ethereum_data import generate_random_ethereum_address
 from tradeexecutor.testing.synthetic_exchange_data import generate_exchange, generate_simple_routing_model
@@ -630,3 +633,98 @@ def test_alpha_model_flip_position_partially(
     assert t.is_planned()
     assert t.planned_price == pytest.approx(100.29999999999998)
     assert t.get_planned_value() == 78.85
+
+
+def test_vectorised_alpha_model_flip_position_partially(
+    single_asset_portfolio: Portfolio,
+    universe,
+    pricing_model,
+    weth_usdc: TradingPairIdentifier,
+    aave_usdc: TradingPairIdentifier,
+    start_ts,
+):
+    """VectorisedAlphaModel gives the same trades and recorded signals as AlphaModel."""
+
+    def rebalance(alpha_model, state):
+        position_manager = PositionManager(
+            start_ts + datetime.timedelta(days=1),
+            universe.universe,
+            state,
+            pricing_model,
+        )
+        alpha_model.set_signal(aave_usdc, 0.5, stop_loss=0.95)
+        alpha_model.set_signal(weth_usdc, 0.5)
+        alpha_model.select_top_signals(9999)
+        alpha_model.assign_weights(method=weight_passthrouh)
+        alpha_model.normalise_weights()
+        alpha_model.update_old_weights(state.portfolio)
+        alpha_model.calculate_target_positions(position_manager, state.portfolio.get_open_position_equity())
+        return alpha_model.generate_rebalance_trades_and_triggers(position_manager)
+
+    state = State(portfolio=single_asset_portfolio)
+    reference_state = copy.deepcopy(state)
+
+    reference_model = AlphaModel(start_ts)
+    reference_trades = rebalance(reference_model, reference_state)
+
+    alpha_model = VectorisedAlphaModel(start_ts)
+    trades = rebalance(alpha_model, state)
+
+    assert [(t.pair, t.planned_quantity, t.planned_reserve) for t in trades] == \
+        [(t.pair, t.planned_quantity, t.planned_reserve) for t in reference_trades]
+    assert alpha_model.get_signal_by_pair(weth_usdc).old_value == pytest.approx(157.7)
+    assert alpha_model.get_signal_by_pair(aave_usdc).stop_loss == 0.95
+
+    data = alpha_model.to_dict()
+    reference_data = reference_model.to_dict()
+    for key in ("raw_signals", "signals"):
+        for pair_id, signal_data in reference_data[key].items():
+            recorded = data[key][pair_id]
+            for name in ("signal", "raw_weight", "normalised_weight", "old_weight", "old_value", "position_target", "position_adjust_usd", "position_adjust_quantity"):
+                assert recorded[name] == pytest.approx(signal_data[name]), f"{key} {pair_id} {name}"
+    assert AlphaModel.from_dict(data).get_signal_by_pair(aave_usdc).position_id
+
+
+def test_vectorised_alpha_model_top_signals(
+    mock_exchange,
+    usdc,
+):
+    """Choose and weight top signals from a large universe."""
+
+    pairs = [
+        TradingPairIdentifier(
+            AssetIdentifier(ChainId.ethereum.value, f"0x{i + 100:x}", f"T{i}", 18),
+            usdc,
+            f"0x{i + 10_000:x}",
+            mock_exchange.address,
+            internal_id=i + 1,
+            internal_exchange_id=mock_exchange.exchange_id,
+            fee=0.0030,
+        )
+        for i in range(500)
+    ]
+    signals = np.random.default_rng(1).uniform(-1, 1, len(pairs))
+
+    alpha_model = VectorisedAlphaModel(capacity=1)
+    alpha_model.set_signals(pairs, signals)
+    alpha_model.set_signal(pairs[int(np.argmax(signals))], 0)
+    alpha_model.select_top_signals(10, threshold=0.1)
+    alpha_model.assign_weights(method=weight_by_1_slash_n)
+    alpha_model.normalise_weights()
+
+    # AlphaModel keeps the insertion order among the chosen signals
+    reference_model = AlphaModel()
+    for idx in np.argsort(-signals):
+        reference_model.set_signal(pairs[idx], signals[idx])
+    reference_model.set_signal(pairs[int(np.argmax(signals))], 0)
+    reference_model.select_top_signals(10, threshold=0.1)
+    reference_model.assign_weights(method=weight_by_1_slash_n)
+    reference_model.normalise_weights()
+
+    signals_by_weight = list(alpha_model.to_alpha_model(record_raw_signals=False).get_signals_sorted_by_weight())
+    reference_signals = list(reference_model.get_signals_sorted_by_weight())
+    assert len(signals_by_weight) == 10
+    assert [s.pair.internal_id for s in signals_by_weight] == [s.pair.internal_id for s in reference_signals]
+    assert [s.normalised_weight for s in signals_by_weight] == pytest.approx([s.normalised_weight for s in reference_signals])
+    assert sum(s.normalised_weight for s in signals_by_weight) <= 1
+    assert len(alpha_model.to_alpha_model().raw_signals) == len(pairs) - 1
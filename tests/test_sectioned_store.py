@@ -0,0 +1,125 @@
+"""Sectioned state file tests."""
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
+from tradeexecutor.state.sectioned_store import SectionedFileStore, LazySectionMapping, LazyPortfolioStatistics, SectionedStateFileError
+from tradeexecutor.state.state import State
+from tradeexecutor.state.statistics import PortfolioStatistics
+from tradeexecutor.state.store import JSONFileStore
+from tradeexecutor.testing.synthetic_state import create_synthetic_state
+
+
+@pytest.fixture(autouse=True)
+def patch_json():
+    patch_dataclasses_json()
+
+
+def _dump(state: State) -> str:
+    return json.dumps(json.loads(state.to_json_safe()), sort_keys=True)
+
+
+def test_sectioned_store_lazy_load(tmp_path: Path):
+    """Trading history is decoded only when accessed."""
+
+    state = create_synthetic_state(position_count=20)
+    store = SectionedFileStore(tmp_path / "state.state")
+    assert store.is_pristine()
+    store.sync(state)
+
+    loaded = store.load()
+    closed_positions = loaded.portfolio.closed_positions
+    assert isinstance(closed_positions, LazySectionMapping)
+    assert isinstance(loaded.stats.portfolio, LazyPortfolioStatistics)
+    assert len(closed_positions) == 20
+    assert len(loaded.stats.portfolio) == 20
+    assert len(closed_positions.loaded) == 0
+
+    position = closed_positions[1]
+    assert position.position_id == 1
+    assert len(closed_positions.loaded) == 1
+    assert not loaded.stats.portfolio.is_loaded()
+
+    assert _dump(loaded) == _dump(state)
+
+
+def test_sectioned_store_sync_unloaded_history(tmp_path: Path):
+    """Unaccessed sections survive a sync, and new entries are added without loading the history."""
+
+    state = create_synthetic_state(position_count=10)
+    store = SectionedFileStore(tmp_path / "state.state")
+    store.sync(state)
+
+    loaded = store.load()
+    stats = PortfolioStatistics(calculated_at=state.created_at, total_equity=1.0)
+    loaded.stats.portfolio.append(stats)
+    assert loaded.stats.get_latest_portfolio_stats() is stats
+    assert not loaded.stats.portfolio.is_loaded()
+
+    # Sync twice, so that the second sync copies sections from the file the first one wrote
+    store.sync(loaded)
+    store.sync(loaded)
+
+    state.stats.portfolio.append(stats)
+    reloaded = store.load()
+    assert len(reloaded.stats.portfolio) == 11
+    assert _dump(reloaded) == _dump(state)
+    assert _dump(loaded) == _dump(state)
+
+
+def test_sectioned_store_read_after_replace(tmp_path: Path):
+    """A loaded state can read its history after another process has replaced the file."""
+
+    state = create_synthetic_state(position_count=10)
+    store = SectionedFileStore(tmp_path / "state.state")
+    store.sync(state)
+
+    reader_state = store.load()
+
+    another = create_synthetic_state(position_count=5, seed=2)
+    store.sync(another)
+
+    assert len(reader_state.portfolio.closed_positions) == 10
+    assert _dump(reader_state) == _dump(state)
+
+
+def test_sectioned_store_bad_file(tmp_path: Path):
+    """JSON state files are not accepted."""
+    path = tmp_path / "state.state"
+    JSONFileStore(path).sync(create_synthetic_state(position_count=1))
+    with pytest.raises(SectionedStateFileError):
+        SectionedFileStore(path).load()
+
+
+@pytest.mark.slow_test_group
+def test_sectioned_store_benchmark(tmp_path: Path):
+    """Startup time and memory do not grow with the trading history."""
+
+    for position_count in (1000, 5000):
+        state = create_synthetic_state(position_count=position_count)
+
+        json_store = JSONFileStore(tmp_path / f"{position_count}.json")
+        json_store.sync(state)
+        sectioned_store = SectionedFileStore(tmp_path / f"{position_count}.state")
+        sectioned_store.sync(state)
+
+        results = {}
+        for store in (json_store, sectioned_store):
+            tracemalloc.start()
+            started = time.perf_counter()
+            loaded = store.load()
+            load_time = time.perf_counter() - started
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            results[store.__class__.__name__] = (load_time, memory)
+            print(f"{position_count:,} positions, {store.__class__.__name__}: load {load_time * 1000:.1f} ms, {memory:,} bytes resident, file {store.path.stat().st_size:,} bytes")
+            del loaded
+
+        json_time, json_memory = results["JSONFileStore"]
+        sectioned_time, sectioned_memory = results["SectionedFileStore"]
+        assert sectioned_time < json_time / 5
+        assert sectioned_memory < json_memory / 5
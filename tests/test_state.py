@@ -2,7 +2,10 @@
 
 TODO: Clean txid and nonce references properly.
 """
+import dataclasses
 import datetime
+import time
+from concurrent.futures import Future
 from decimal import Decimal
 from typing import Tuple
 import numpy as np
@@ -20,13 +23,20 @@ from tradeexecutor.state.position import TradingPosition
 from tradeexecutor.state.trade import TradeExecution, TradeStatus
 from tradeexecutor.state.blockhain_transaction import BlockchainTransaction, solidity_arg_encoder
 from tradeexecutor.state.reserve import ReservePosition
+from tradeexecutor.state.balance_update import BalanceUpdate, BalanceUpdateCause, BalanceUpdatePositionType
 from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
-from tradeexecutor.state.validator import validate_nested_state_dict, BadStateData
+from tradeexecutor.state.serialisation import encode_dataclass
+from tradeexecutor.state.store import JSONFileStore
+from tradeexecutor.state.validator import validate_nested_state_dict, BadStateData, ValidationMode, IncrementalStateValidator
 from tradeexecutor.statistics.core import update_statistics
 from tradeexecutor.testing.dummy_trader import DummyTestTrader
+from tradeexecutor.utils.accuracy import sum_decimal
+from tradeexecutor.testing.synthetic_state import create_synthetic_state, create_synthetic_pairs
 from tradingstrategy.chain import ChainId
 from tradingstrategy.types import USDollarAmount
 from tradeexecutor.strategy.execution_context import ExecutionMode
+from tradeexecutor.strategy.runner import TickPrefetch
+from tradeexecutor.ethereum.eth_valuation import EthereumPoolRevaluator
 
 
 
@@ -592,6 +602,92 @@ def test_revalue(usdc, weth_usdc, start_ts: datetime.datetime):
     assert state.portfolio.get_total_equity() == pytest.approx(914.15)
 
 
+def test_revalue_batch(usdc, weth_usdc, start_ts: datetime.datetime):
+    """Valuation models supporting batching value all positions with one call."""
+
+    state = State()
+    state.update_reserves([ReservePosition(usdc, Decimal(1000), start_ts, 1.0, start_ts)])
+    trader = DummyTestTrader(state)
+    position, trade = trader.buy(weth_usdc, Decimal(0.1), 1700)
+
+    revalue_date = datetime.datetime(2020, 1, 2, tzinfo=None)
+
+    class BatchValuator:
+
+        def __init__(self):
+            self.batches = []
+
+        def __call__(self, ts, position):
+            raise AssertionError("Should not be called")
+
+        def revalue_batch(self, ts, positions):
+            self.batches.append(list(positions))
+            return [(revalue_date, 850.0) for p in positions]
+
+    valuator = BatchValuator()
+    state.revalue_positions(start_ts, valuator)
+
+    assert valuator.batches == [[position]]
+    assert position.last_pricing_at == revalue_date
+    assert position.last_token_price == 850.0
+    assert state.portfolio.get_total_equity() == pytest.approx(914.15)
+
+
+def test_revalue_prefetched(usdc, weth_usdc, start_ts: datetime.datetime):
+    """Valuations read in parallel with the treasury sync are used only for unchanged positions."""
+
+    state = State()
+    state.update_reserves([ReservePosition(usdc, Decimal(1000), start_ts, 1.0, start_ts)])
+    trader = DummyTestTrader(state)
+    position, trade = trader.buy(weth_usdc, Decimal(0.1), 1700)
+
+    revalue_date = datetime.datetime(2020, 1, 2, tzinfo=None)
+
+    valuations = Future()
+    valuations.set_result({position.position_id: (revalue_date, 850.0)})
+    prefetch = TickPrefetch(block_number=1, quantities={position.position_id: position.get_quantity()}, valuations=valuations)
+
+    def valuator(ts, position):
+        raise AssertionError("Should not be called")
+
+    state.revalue_positions(start_ts, valuator, prefetched_valuations=prefetch.get_valuations(state))
+    assert position.last_token_price == 850.0
+
+    # Position changed after the prefetch started, e.g. a redemption
+    prefetch.quantities[position.position_id] = Decimal(1)
+    assert prefetch.get_valuations(state) == {}
+
+    failed = Future()
+    failed.set_exception(RuntimeError("RPC down"))
+    assert TickPrefetch(valuations=failed).get_valuations(state) is None
+    assert TickPrefetch().get_onchain_balances() is None
+
+
+def test_revalue_batch_quantities(weth_usdc, start_ts: datetime.datetime):
+    """Background revaluation prices the quantity snapshot without touching the positions."""
+
+    class BatchPricingModel:
+
+        def __init__(self):
+            self.requests = []
+
+        def get_sell_prices(self, ts, requests, block_identifier=None):
+            self.requests.append((list(requests), block_identifier))
+            return [TradePricing(price=850.0, mid_price=850.0, lp_fee=[0.0]) for r in requests]
+
+    pricing_model = BatchPricingModel()
+    revaluator = EthereumPoolRevaluator(pricing_model)
+    valuations = revaluator.revalue_batch(
+        start_ts,
+        None,
+        block_identifier=1,
+        quantities=[(weth_usdc, Decimal("0.1")), (weth_usdc, Decimal(0))],
+    )
+
+    assert valuations == [(start_ts, 850.0), (start_ts, 0.0)]
+    assert pricing_model.requests == [([(weth_usdc, Decimal("0.1"))], 1)]
+
+
 def test_realised_profit_calculation(usdc, weth_usdc, start_ts: datetime.datetime):
     """Calculate realised profits correctly."""
 
@@ -855,6 +951,219 @@ def test_serialize_state(usdc, weth_usdc, start_ts: datetime.datetime):
     state3.perform_integrity_check()
 
 
+def test_portfolio_indexes(usdc, weth_usdc, aave_usdc, start_ts: datetime.datetime):
+    """Trade and position lookups follow positions moving between open, closed and frozen."""
+
+    state = State()
+    state.update_reserves([ReservePosition(usdc, Decimal(1000), start_ts, 1.0, start_ts)])
+    trader = DummyTestTrader(state)
+    portfolio = state.portfolio
+
+    weth_position, weth_trade = trader.buy(weth_usdc, Decimal(0.1), 1700)
+    assert portfolio.get_trade_by_id(weth_trade.trade_id) is weth_trade
+    assert portfolio.get_open_position_for_pair(weth_usdc) is weth_position
+    assert portfolio.get_open_position_for_pair(aave_usdc) is None
+
+    aave_position, aave_trade = trader.buy(aave_usdc, Decimal(0.5), 200)
+    assert portfolio.get_trade_by_id(aave_trade.trade_id) is aave_trade
+    assert portfolio.get_position_by_trading_pair(aave_usdc) is aave_position
+    assert portfolio.get_open_position_for_asset(aave_usdc.base) is aave_position
+    assert portfolio.get_trade_by_id(999) is None
+
+    # Close WETH
+    trader.time_travel(start_ts + datetime.timedelta(days=1))
+    _, sell_trade = trader.sell(weth_usdc, portfolio.get_equity_for_pair(weth_usdc), 1700)
+    assert portfolio.get_open_position_for_pair(weth_usdc) is None
+    assert portfolio.get_trade_by_id(sell_trade.trade_id) is sell_trade
+    assert list(portfolio.get_positions_closed_at(weth_position.closed_at)) == [weth_position]
+    assert list(portfolio.get_positions_closed_at(start_ts)) == []
+
+    # Freeze AAVE by moving the position directly
+    portfolio.frozen_positions[aave_position.position_id] = aave_position
+    del portfolio.open_positions[aave_position.position_id]
+    portfolio.invalidate_index()
+    assert portfolio.get_open_position_for_asset(aave_usdc.base) is None
+    assert portfolio.get_trade_by_id(aave_trade.trade_id) is aave_trade
+
+    # Unfreeze AAVE and freeze a new WETH position,
+    # the number of open positions and the position counter stay the same
+    weth_position_2, _ = trader.buy(weth_usdc, Decimal(0.1), 1700)
+    assert portfolio.get_open_position_for_pair(weth_usdc) is weth_position_2
+    portfolio.frozen_positions[weth_position_2.position_id] = weth_position_2
+    del portfolio.open_positions[weth_position_2.position_id]
+    portfolio.open_positions[aave_position.position_id] = portfolio.frozen_positions.pop(aave_position.position_id)
+    portfolio.invalidate_index()
+    assert portfolio.get_open_position_for_pair(weth_usdc) is None
+    assert portfolio.get_open_position_for_pair(aave_usdc) is aave_position
+
+    # Replace the dict
+    portfolio.open_positions = {aave_position.position_id: aave_position}
+    portfolio.frozen_positions = {}
+    assert portfolio.get_position_by_trading_pair(aave_usdc) is aave_position
+
+    # Indexes are rebuilt after load
+    state2 = State.from_json(state.to_json_safe())
+    portfolio2 = state2.portfolio
+    assert portfolio2.get_trade_by_id(sell_trade.trade_id).trade_id == sell_trade.trade_id
+    assert portfolio2.get_position_by_trading_pair(aave_usdc).position_id == aave_position.position_id
+    assert [p.position_id for p in portfolio2.get_positions_closed_at(weth_position.closed_at)] == [weth_position.position_id]
+    assert "index" not in state.portfolio.to_dict()
+
+
+@pytest.mark.slow_test_group
+def test_portfolio_indexes_benchmark():
+    """Lookups do not slow down with the trading history."""
+
+    state = create_synthetic_state(position_count=6000, pair_count=100)
+    portfolio = state.portfolio
+    pairs = create_synthetic_pairs(100)
+    trade_ids = list(range(1, portfolio.next_trade_id))
+    assert len(trade_ids) >= 10_000
+
+    def scan_trade(trade_id):
+        for p in portfolio.get_all_positions():
+            t = p.trades.get(trade_id)
+            if t is not None:
+                return t
+
+    def lookup():
+        for trade_id in trade_ids[::10]:
+            assert portfolio.get_trade_by_id(trade_id)
+        for pair in pairs:
+            portfolio.get_position_by_trading_pair(pair)
+            portfolio.get_open_position_for_pair(pair)
+        for ts in range(100):
+            list(portfolio.get_positions_closed_at(datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=ts)))
+
+    # Build the indexes
+    lookup()
+
+    started = time.perf_counter()
+    lookup()
+    indexed_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for trade_id in trade_ids[::10]:
+        assert scan_trade(trade_id)
+    scan_time = time.perf_counter() - started
+
+    print(f"{len(trade_ids):,} trades, indexed lookups {indexed_time * 1000:.1f} ms, scanning trades {scan_time * 1000:.1f} ms")
+    assert indexed_time < scan_time / 10
+
+
+def test_position_cached_aggregates(usdc, weth_usdc, start_ts: datetime.datetime):
+    """Cached trade sums follow new, pending, failed and repaired trades and balance updates."""
+
+    state = State()
+    state.update_reserves([ReservePosition(usdc, Decimal(10_000), start_ts, 1.0, start_ts)])
+    trader = DummyTestTrader(state)
+
+    def check(position: TradingPosition):
+        trades = list(position.trades.values())
+        assert position.get_quantity() == sum_decimal([t.get_position_quantity() for t in trades if t.is_success()]) + sum_decimal([b.quantity for b in position.balance_updates.values()])
+        assert position.get_total_bought_usd() == sum([t.get_value() for t in trades if t.is_success() if t.is_buy()])
+        assert position.get_total_sold_usd() == sum([t.get_value() for t in trades if t.is_success() if t.is_sell()])
+        assert position.get_buy_quantity() == sum_decimal([t.get_position_quantity() for t in trades if t.is_success() if t.is_buy()])
+        assert position.get_sell_quantity() == sum_decimal([abs(t.get_position_quantity()) for t in trades if t.is_success() if t.is_sell()])
+        assert position.get_total_lp_fees_paid() == sum([t.lp_fees_paid or 0 for t in trades])
+        token_quantity = sum([t.get_equity_for_position() for t in trades if t.is_accounted_for_equity()])
+        reserve_quantity = sum([t.get_equity_for_reserve() for t in trades if t.is_accounted_for_equity()])
+        assert position.calculate_value_using_price(2000, 1) == float(token_quantity) * 2000 + float(reserve_quantity)
+
+    position, trade = trader.buy(weth_usdc, Decimal("1.0"), 1700)
+    check(position)
+    trader.buy(weth_usdc, Decimal("0.5"), 1800)
+    check(position)
+    trader.sell(weth_usdc, Decimal("0.3"), 1900)
+    check(position)
+
+    # Planned trades are counted when they execute
+    quantity = position.get_quantity()
+    _, pending = trader.prepare_buy(weth_usdc, Decimal("0.2"), 1750)
+    check(position)
+    state.start_execution(trader.ts, pending, "0x1234", 1234)
+    state.mark_broadcasted(trader.ts, pending)
+    check(position)
+    state.mark_trade_success(trader.ts, pending, 1750.0, Decimal("0.2"), Decimal(0), 0.0, 1.0)
+    check(position)
+    assert position.get_quantity() == quantity + Decimal("0.2")
+    quantity = position.get_quantity()
+
+    # Failed trades are never counted
+    _, failed = trader.prepare_buy(weth_usdc, Decimal("0.2"), 1750)
+    state.start_execution(trader.ts, failed, "0x1235", 1235)
+    state.mark_broadcasted(trader.ts, failed)
+    state.mark_trade_failed(trader.ts, failed)
+    check(position)
+    assert position.get_quantity() == quantity
+
+    # Executed trades marked as repaired must invalidate the cache
+    trade.repaired_at = trader.ts
+    position.invalidate_cached_aggregates()
+    assert trade.get_status() == TradeStatus.repaired
+    check(position)
+
+    # Balance updates
+    position.balance_updates[1] = BalanceUpdate(
+        balance_update_id=1,
+        cause=BalanceUpdateCause.correction,
+        position_type=BalanceUpdatePositionType.open_position,
+        asset=weth_usdc.base,
+        block_mined_at=trader.ts,
+        strategy_cycle_included_at=None,
+        chain_id=weth_usdc.chain_id,
+        quantity=Decimal("0.1"),
+        old_balance=position.get_quantity(),
+        usd_value=170.0,
+        position_id=position.position_id,
+    )
+    check(position)
+
+    # Cache is not part of the state and is not copied when serialising
+    assert "cached_aggregates" not in [f.name for f in dataclasses.fields(position)]
+    assert "cached_aggregates" not in position.to_dict()
+    state2 = State.read_json_blob(state.to_json_safe())
+    position2 = state2.portfolio.open_positions[position.position_id]
+    assert position2.get_quantity() == position.get_quantity()
+    assert position2.get_total_bought_usd() == position.get_total_bought_usd()
+    check(position2)
+
+
+@pytest.mark.slow_test_group
+def test_position_cached_aggregates_benchmark(usdc, weth_usdc, start_ts: datetime.datetime):
+    """Position calculations do not re-sum the trade history of a long running position."""
+
+    state = State()
+    state.update_reserves([ReservePosition(usdc, Decimal(10_000_000), start_ts, 1.0, start_ts)])
+    trader = DummyTestTrader(state)
+    for i in range(2000):
+        position, trade = trader.buy(weth_usdc, Decimal("1.0"), 1700)
+        trader.sell(weth_usdc, Decimal("0.5"), 1800)
+    trades = list(position.trades.values())
+
+    def calculate():
+        return position.get_quantity(), position.get_value(), position.get_total_bought_usd(), position.get_total_sold_usd()
+
+    # Fill the cache
+    expected = calculate()
+
+    started = time.perf_counter()
+    for i in range(100):
+        assert calculate() == expected
+    cached_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(100):
+        sum_decimal([t.get_position_quantity() for t in trades if t.is_success()])
+        sum([t.get_equity_for_position() for t in trades if t.is_accounted_for_equity()])
+        sum([t.get_value() for t in trades if t.is_success() if t.is_buy()])
+        sum([t.get_value() for t in trades if t.is_success() if t.is_sell()])
+    scan_time = time.perf_counter() - started
+
+    print(f"{len(trades):,} trades, cached {cached_time * 1000:.1f} ms, summing trades {scan_time * 1000:.1f} ms")
+    assert cached_time < scan_time / 10
+
+
 def test_state_summary_without_initial_cash(usdc, weth_usdc, start_ts: datetime.datetime):
     """Backward compat test for reverse without init cash info."""
     state = State()
@@ -945,6 +1254,106 @@ def test_validate_state_with_nan():
         validate_nested_state_dict(nan)
 
 
+@pytest.mark.parametrize("mode", [ValidationMode.full, ValidationMode.compiled])
+def test_validate_state_modes(mode: ValidationMode):
+    """Compiled validators catch bad values in typed fields and free-form containers."""
+
+    state = create_synthetic_state(position_count=20)
+    position = next(iter(state.portfolio.closed_positions.values()))
+    trade = position.get_last_trade()
+    validate_nested_state_dict(encode_dataclass(state), State, mode)
+
+    def assert_bad(modify):
+        data = encode_dataclass(state)
+        modify(data)
+        with pytest.raises(BadStateData):
+            validate_nested_state_dict(data, State, mode)
+
+    def get_trade(data):
+        return data["portfolio"]["closed_positions"][position.position_id]["trades"][trade.trade_id]
+
+    # Typed fields
+    assert_bad(lambda data: get_trade(data).update(executed_price=float("nan")))
+    assert_bad(lambda data: get_trade(data).update(executed_price=np.float32(1)))
+    assert_bad(lambda data: get_trade(data).update(trade_id=2**80))
+    assert_bad(lambda data: get_trade(data).update(notes={"foo": np.int64(1)}))
+
+    # Free-form containers
+    assert_bad(lambda data: data["visualisation"]["calculations"].update({1: {"foo": [np.float32(1)]}}))
+    assert_bad(lambda data: get_trade(data)["blockchain_transactions"].append({"other": {"foo": float("inf")}}))
+
+    # Unknown fields and bad keys
+    assert_bad(lambda data: data["portfolio"].update(foo=pd.Timestamp.now().to_numpy()))
+    assert_bad(lambda data: data["portfolio"]["closed_positions"].update({(1, 2): 1}))
+
+
+def test_validate_state_incremental(tmp_path):
+    """Only the parts of the state changed since the last sync are validated."""
+
+    state = create_synthetic_state(position_count=20)
+    store = JSONFileStore(tmp_path / "state.json", incremental_validation=True)
+    store.sync(state)
+
+    validator = store.validator
+    assert len(validator.closed_position_ids) == 20
+    data = encode_dataclass(state)
+    changed = validator.get_changed(data)
+    assert changed["portfolio"]["closed_positions"] == {}
+    assert changed["visualisation"]["plots"]["Indicator 0"]["points"] == {}
+
+    # New data is validated
+    state.visualisation.add_calculations(datetime.datetime(2030, 1, 1), {"foo": np.float32(1)})
+    with pytest.raises(BadStateData):
+        store.sync(state)
+
+    # Bad data is validated again until fixed
+    with pytest.raises(BadStateData):
+        store.sync(state)
+    state.visualisation.calculations.clear()
+    store.sync(state)
+
+    # Already validated history is trusted, until reset
+    position = next(iter(state.portfolio.closed_positions.values()))
+    position.notes = np.float32(1)
+    validator.validate(state, encode_dataclass(state))
+    validator.reset()
+    with pytest.raises(BadStateData):
+        validator.validate(state, encode_dataclass(state))
+
+    # A different state object is validated in full
+    other_state = create_synthetic_state(position_count=20)
+    validator = IncrementalStateValidator()
+    validator.validate(other_state, encode_dataclass(other_state))
+    with pytest.raises(BadStateData):
+        validator.validate(state, encode_dataclass(state))
+
+
+@pytest.mark.slow_test_group
+def test_validate_state_benchmark():
+    """Compare full, compiled and incremental validation speed."""
+
+    state = create_synthetic_state(position_count=2000)
+    data = encode_dataclass(state)
+
+    results = {}
+    for mode in ValidationMode:
+        started = time.perf_counter()
+        validate_nested_state_dict(data, State, mode)
+        results[mode.value] = time.perf_counter() - started
+
+    validator = IncrementalStateValidator()
+    validator.validate(state, data)
+    started = time.perf_counter()
+    validator.validate(state, data)
+    results["incremental"] = time.perf_counter() - started
+
+    for name, duration in results.items():
+        print(f"{name}: {duration * 1000:.1f} ms")
+
+    assert results["compiled"] < results["full"] / 2
+    assert results["incremental"] < results["compiled"] / 2
+
+
 def test_blockchain_transaction_params():
     """Blockchain transactions must be able encode very large numbers."""
     args = (2**80,)
@@ -0,0 +1,81 @@
+"""Compiled state serialisation engine tests."""
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from dataclasses_json.core import _ExtendedEncoder
+
+from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
+from tradeexecutor.state.serialisation import SerialisationEngine, encode_dataclass, decode_dataclass
+from tradeexecutor.state.state import State
+from tradeexecutor.testing.synthetic_state import create_synthetic_state
+
+
+@pytest.fixture(autouse=True)
+def patch_json():
+    patch_dataclasses_json()
+
+
+def _dump(state: State, engine: SerialisationEngine) -> str:
+    return json.dumps(encode_dataclass(state, engine), cls=_ExtendedEncoder)
+
+
+@pytest.mark.parametrize("dump_file", ["legacy-state-dump.json", "legacy-repair-dump.json"])
+def test_serialisation_engines_legacy_state(dump_file: str):
+    """Both engines read and write old state files the same way."""
+
+    f = os.path.join(os.path.dirname(__file__), dump_file)
+    data = json.load(open(f, "rt"))
+
+    reference = decode_dataclass(State, data, SerialisationEngine.dataclasses_json)
+    compiled = decode_dataclass(State, data, SerialisationEngine.compiled)
+
+    assert compiled == reference
+
+    reference_json = _dump(reference, SerialisationEngine.dataclasses_json)
+    assert _dump(reference, SerialisationEngine.compiled) == reference_json
+    assert _dump(compiled, SerialisationEngine.compiled) == reference_json
+
+
+def test_serialisation_engines_synthetic_state():
+    """Both engines produce byte-identical JSON and equal states."""
+
+    state = create_synthetic_state(position_count=50)
+    state.visualisation.add_message(state.created_at, "Hello")
+    state.visualisation.add_calculations(state.created_at, {"foo": 1})
+
+    reference_json = state.to_json_safe(SerialisationEngine.dataclasses_json)
+    compiled_json = state.to_json_safe(SerialisationEngine.compiled)
+    assert compiled_json == reference_json
+
+    reference = State.read_json_blob(reference_json, SerialisationEngine.dataclasses_json)
+    compiled = State.read_json_blob(reference_json, SerialisationEngine.compiled)
+    assert compiled == reference
+    assert compiled.to_json_safe() == reference_json
+
+
+@pytest.mark.slow_test_group
+def test_serialisation_engines_benchmark(tmp_path: Path):
+    """Compare save and load times of the engines across state sizes."""
+
+    for position_count in (100, 1000, 5000):
+        state = create_synthetic_state(position_count=position_count)
+        timings = {}
+        for engine in SerialisationEngine:
+            started = time.perf_counter()
+            text = state.to_json_safe(engine)
+            save_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            State.read_json_blob(text, engine)
+            load_time = time.perf_counter() - started
+
+            timings[engine] = (save_time, load_time)
+            print(f"{position_count:,} positions, {engine.value}: save {save_time * 1000:.1f} ms, load {load_time * 1000:.1f} ms")
+
+        compiled_save, compiled_load = timings[SerialisationEngine.compiled]
+        reference_save, reference_load = timings[SerialisationEngine.dataclasses_json]
+        assert compiled_save < reference_save
+        assert compiled_load < reference_load
@@ -2,9 +2,12 @@
 
 Test summary calculation formulas on a synthetic backtest with random data.
 """
+import copy
+import dataclasses
 import datetime
 import logging
 import os
+import random
 from pathlib import Path
 
 import pytest
@@ -18,6 +21,7 @@ from tradingstrategy.timebucket import TimeBucket
 from tradingstrategy.universe import Universe
 
 from tradeexecutor.analysis.advanced_metrics import calculate_advanced_metrics
+from tradeexecutor.analysis.trade_analyser import build_trade_analysis
 from tradeexecutor.backtest.backtest_routing import BacktestRoutingModel
 from tradeexecutor.backtest.backtest_runner import run_backtest, setup_backtest_for_universe
 from tradeexecutor.cli.log import setup_pytest_logging
@@ -27,6 +31,7 @@ from tradeexecutor.state.statistics import Statistics, calculate_naive_profitabi
 from tradeexecutor.state.validator import validate_nested_state_dict
 from tradeexecutor.statistics.key_metric import calculate_key_metrics
 from tradeexecutor.statistics.summary import calculate_summary_statistics
+from tradeexecutor.statistics.trade_summary_accumulator import TradeSummaryAccumulator
 from tradeexecutor.strategy.cycle import CycleDuration
 from tradeexecutor.strategy.execution_context import ExecutionMode
 from tradeexecutor.strategy.summary import KeyMetricSource
@@ -277,6 +282,37 @@ def test_calculate_all_summary_statistics(state: State):
     validate_nested_state_dict(data)
 
 
+def test_trade_summary_accumulator(state: State):
+    """Incremental trade summary gives the same result as the full trade analysis.
+
+    Replay the closed positions over several cycles, closing some of them out of the position id order.
+    """
+
+    portfolio = copy.deepcopy(state.portfolio)
+    closed_positions = list(portfolio.closed_positions.values())
+    random.Random(1).shuffle(closed_positions)
+    portfolio.closed_positions = {}
+
+    accumulator = TradeSummaryAccumulator()
+
+    for i in range(0, len(closed_positions) + 1, 7):
+        for position in closed_positions[i:i + 7]:
+            portfolio.closed_positions[position.position_id] = position
+
+        incremental = accumulator.calculate_summary_statistics(portfolio)
+        full = build_trade_analysis(portfolio).calculate_summary_statistics()
+
+        for field in dataclasses.fields(full):
+            name = field.name
+            value = getattr(full, name)
+            if isinstance(value, float):
+                assert getattr(incremental, name) == pytest.approx(value), f"Field {name} differs"
+            else:
+                assert getattr(incremental, name) == value, f"Field {name} differs"
+
+    assert accumulator.won + accumulator.lost + accumulator.zero_loss == len(closed_positions)
+
+
 def test_advanced_metrics(state: State):
     """Quantstats metrics calculations."""
 
@@ -15,7 +15,7 @@ from IPython.core.display_functions import display
 import plotly.express as px
 from plotly.graph_objs import Figure
 
-from tradeexecutor.backtest.grid_search import GridSearchResult
+from tradeexecutor.backtest.grid_search import GridSearchResult, GridSearchResultStore, extract_grid_search_metrics, METRIC_COLUMNS
 
 
 VALUE_COLS = ["Annualised return", "Max drawdown", "Sharpe", "Sortino", "Average position", "Median position"]
@@ -44,28 +44,7 @@ def analyse_combination(
         row[param.name] = param.value
         param_names.append(param.name)
 
-    def clean(x):
-        if x == "-":
-            return np.NaN
-        elif x == "":
-            return np.NaN
-        return x
-
-    # import ipdb ; ipdb.set_trace()
-
-    row.update({
-        # "Combination": r.combination.get_label(),
-        "Positions": r.summary.total_positions,
-        # "Return": r.summary.return_percent,
-        # "Return2": r.summary.annualised_return_percent,
-        #"Annualised profit": clean(r.metrics.loc["Expected Yearly"][0]),
-        "Annualised return": clean(r.metrics.loc["Annualised return (raw)"][0]),
-        "Max drawdown": clean(r.metrics.loc["Max Drawdown"][0]),
-        "Sharpe": clean(r.metrics.loc["Sharpe"][0]),
-        "Sortino": clean(r.metrics.loc["Sortino"][0]),
-        "Average position": r.summary.average_trade,
-        "Median position": r.summary.median_trade,
-    })
+    row.update(extract_grid_search_metrics(r.summary, r.metrics))
 
     # Clear all values except position count if this is not a good trade series
     if r.summary.total_positions < min_positions_threshold:
@@ -77,7 +56,7 @@ def analyse_combination(
 
 
 def analyse_grid_search_result(
-        results: List[GridSearchResult],
+        results: List[GridSearchResult] | GridSearchResultStore,
         min_positions_threshold: int = 5,
 ) -> pd.DataFrame:
     """Create aa table showing grid search result of each combination.
@@ -91,6 +70,9 @@ def analyse_grid_search_result(
     :param results:
         Output from :py:meth:`tradeexecutor.backtest.grid_search.perform_grid_search`.
 
+        Or the result store of a grid search, which is read directly
+        without loading individual results.
+
     :param min_positions_threshold:
         If we did less positions than this amount, do not consider this a proper strategy.
 
@@ -99,11 +81,19 @@ def analyse_grid_search_result(
     :return:
         Table of grid search combinations
     """
-    assert len(results) > 0, "No results"
-    rows = [analyse_combination(r, min_positions_threshold) for r in results]
-    df = pd.DataFrame(rows)
-    r = results[0]
-    param_names = [p.name for p in r.combination.parameters]
+
+    if isinstance(results, GridSearchResultStore):
+        df = results.read_table()
+        assert len(df) > 0, "No results"
+        param_names = [c for c in df.columns if c not in METRIC_COLUMNS]
+        df.loc[df["Positions"] < min_positions_threshold, VALUE_COLS] = np.NaN
+    else:
+        assert len(results) > 0, "No results"
+        rows = [analyse_combination(r, min_positions_threshold) for r in results]
+        df = pd.DataFrame(rows)
+        r = results[0]
+        param_names = [p.name for p in r.combination.parameters]
+
     df = df.set_index(param_names)
     df = df.sort_index()
     return df
@@ -155,7 +145,7 @@ def visualise_table(df: pd.DataFrame):
 
 
 def visualise_heatmap_2d(
-        result: pd.DataFrame,
+        result: pd.DataFrame | GridSearchResultStore,
         parameter_1: str,
         parameter_2: str,
         metric: str,
@@ -178,7 +168,8 @@ def visualise_heatmap_2d(
     :param result:
         Grid search results as a DataFrame.
 
-        Created by :py:func:`analyse_grid_search_result`.
+        Created by :py:func:`analyse_grid_search_result`,
+        or read from a result store with it.
 
     :param color_continuous_scale:
         The name of Plotly gradient used for the colour scale.
@@ -195,6 +186,9 @@ def visualise_heatmap_2d(
         Plotly Figure object
     """
 
+    if isinstance(result, GridSearchResultStore):
+        result = analyse_grid_search_result(result)
+
     # Reset multi-index so we can work with parameter 1 and 2 as series
     df = result.reset_index()
 
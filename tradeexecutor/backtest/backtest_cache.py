@@ -0,0 +1,552 @@
+"""Content-addressed cache for backtest results.
+
+Notebook workflows often re-run the same backtest many times, e.g. after restarting the kernel
+or re-running all cells, and the simulation takes minutes each time.
+:py:class:`BacktestResultCache` stores the final state of a backtest
+under a key calculated from everything that affects the result:
+
+- The source code of `decide_trades()` and `create_trading_universe()`,
+  including the values of module level variables, closures and default arguments they use,
+  and the source code of the functions, classes and modules they refer to,
+  unless they come from an installed library
+
+- The versions of installed libraries the strategy refers to
+
+- The installed versions and the source code of `tradeexecutor` and `tradingstrategy` packages,
+  so that upgrading or editing the backtesting engine reruns the backtest
+
+- Backtest parameters: date range, cycle duration, initial deposit, slippage, routing,
+  missing fee handling, trigger check mode, etc.
+
+- A fingerprint of the trading universe data frames: pairs, candles, liquidity and stop loss candles
+
+If any of these change, the key changes and the backtest is run again.
+
+- Only backtests with a prepared trading universe are cached.
+  If the universe is created by `create_trading_universe()` during the backtest,
+  we cannot fingerprint the data before running it.
+
+- Values whose `repr()` is not stable between runs, like objects without
+  a custom `repr()`, cause a cache miss every time
+
+- Code the strategy reaches only indirectly, e.g. through an attribute of an object,
+  is not a part of the key. Use :py:meth:`BacktestResultCache.clear` after changing such code.
+
+- Entries older than `max_age` and the least recently used entries exceeding `max_size`
+  are evicted when a new entry is stored
+
+Each entry is a single file: the state as zlib compressed JSON, followed by
+the zlib compressed pickle of the backtest debug dump.
+
+Example:
+
+.. code-block:: python
+
+    cache = BacktestResultCache(Path("~/.cache/trading-strategy/backtests").expanduser())
+
+    state, universe, debug_dump = run_backtest_inline(
+        start_at=start_at,
+        end_at=end_at,
+        client=client,
+        decide_trades=decide_trades,
+        universe=universe,
+        ...
+        cache=cache,
+    )
+"""
+import dataclasses
+import datetime
+import functools
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import logging
+import os
+import pickle
+import platform
+import struct
+import sys
+import tempfile
+import time
+import types
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import pandas as pd
+from dataclasses_json.core import _ExtendedEncoder
+
+from tradeexecutor.state.serialisation import encode_dataclass, decode_dataclass
+from tradeexecutor.state.state import State
+from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniverse
+
+if TYPE_CHECKING:
+    from tradeexecutor.backtest.backtest_runner import BacktestSetup
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Increment when the cache key or the entry format changes
+BACKTEST_CACHE_VERSION = 2
+
+#: Packages whose versions and source code are a part of every cache key
+ENGINE_PACKAGES = ("tradeexecutor", "tradingstrategy")
+
+#: Magic bytes at the start of a cache entry file, state length
+_HEADER = struct.Struct("<8sQ")
+
+_MAGIC = b"TXBTCAC1"
+
+#: Values hashed by their `repr()`
+_LITERAL_TYPES = (type(None), bool, int, float, complex, str, bytes, datetime.datetime, datetime.timedelta, datetime.date, pd.Timestamp, pd.Timedelta)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_package_distributions() -> Dict[str, List[str]]:
+    return importlib.metadata.packages_distributions()
+
+
+def _is_editable(dist: str) -> bool:
+    try:
+        direct_url = importlib.metadata.distribution(dist).read_text("direct_url.json")
+    except importlib.metadata.PackageNotFoundError:
+        return False
+    return bool(direct_url) and json.loads(direct_url).get("dir_info", {}).get("editable", False)
+
+
+def _get_distribution_versions(package: str) -> str:
+    versions = []
+    for dist in sorted(set(_get_package_distributions().get(package, []))):
+        try:
+            versions.append(f"{dist}=={importlib.metadata.version(dist)}")
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(f"{dist}==unknown")
+    return ",".join(versions)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_library_version(module_name: str) -> Optional[str]:
+    """Get the version of the library a module belongs to.
+
+    :return:
+        Version string, or `None` if the module is strategy code
+        that is not installed as a library, or is installed in the editable mode,
+        and needs its source fingerprinted.
+    """
+    package = module_name.partition(".")[0]
+
+    if package in ENGINE_PACKAGES:
+        # See get_engine_fingerprint()
+        return "engine"
+
+    if package in sys.stdlib_module_names or package == "builtins":
+        return f"python=={platform.python_version()}"
+
+    dists = _get_package_distributions().get(package, [])
+    if not dists or any(_is_editable(dist) for dist in dists):
+        return None
+
+    return _get_distribution_versions(package)
+
+
+@functools.lru_cache(maxsize=None)
+def get_engine_fingerprint() -> str:
+    """Hash the versions and the source code of the backtesting engine.
+
+    Covers :py:data:`ENGINE_PACKAGES`.
+    The source code is hashed as well, as the version of
+    a development checkout does not change when it is edited.
+
+    :return:
+        Hex digest
+    """
+    h = hashlib.sha256()
+    for package in ENGINE_PACKAGES:
+        h.update(f"{package}: {_get_distribution_versions(package)}\n".encode("utf-8"))
+        module = sys.modules.get(package)
+        if module is None or module.__file__ is None:
+            continue
+        root = Path(module.__file__).parent
+        for path in sorted(root.rglob("*.py")):
+            h.update(path.relative_to(root).as_posix().encode("utf-8"))
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _fingerprint_value(value: Any, seen: Set[int]) -> str:
+    """Stable text presentation of a value a strategy function refers to."""
+    if isinstance(value, _LITERAL_TYPES):
+        return repr(value)
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_fingerprint_value(v, seen) for v in value]
+        if isinstance(value, (set, frozenset)):
+            items.sort()
+        return f"{type(value).__name__}({', '.join(items)})"
+
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_fingerprint_value(k, seen)}: {_fingerprint_value(v, seen)}" for k, v in value.items()) + "}"
+
+    if isinstance(value, types.FunctionType):
+        library_version = _get_library_version(value.__module__)
+        if library_version is None:
+            # Helper functions of the strategy
+            return _fingerprint_function(value, seen)
+        return f"function {value.__module__}.{value.__qualname__} {library_version}"
+
+    if isinstance(value, types.ModuleType):
+        library_version = _get_library_version(value.__name__)
+        if library_version is None:
+            return _fingerprint_module(value, seen)
+        return f"module {value.__name__} {library_version}"
+
+    if isinstance(value, type):
+        library_version = _get_library_version(value.__module__)
+        if library_version is None:
+            return _fingerprint_class(value, seen)
+        return f"class {value.__module__}.{value.__qualname__} {library_version}"
+
+    # Enums, dataclasses and such have a stable repr().
+    # Other objects have their memory address in repr() and never hit the cache.
+    return repr(value)
+
+
+def _fingerprint_module(module: types.ModuleType, seen: Set[int]) -> str:
+    if id(module) in seen:
+        return f"module {module.__name__}"
+    seen.add(id(module))
+
+    try:
+        return f"module {module.__name__}\n{inspect.getsource(module)}"
+    except (OSError, TypeError):
+        # Module without source, its contents are unknown and never hit the cache
+        return repr(module) + repr(id(module))
+
+
+def _fingerprint_class(cls: type, seen: Set[int]) -> str:
+    """Fingerprint a class of the strategy by its attributes.
+
+    Works for classes defined in notebooks, which :py:func:`inspect.getsource` cannot read.
+    """
+    if id(cls) in seen:
+        return f"class {cls.__qualname__}"
+    seen.add(id(cls))
+
+    parts = [f"class {cls.__module__}.{cls.__qualname__}"]
+    parts += [_fingerprint_value(base, seen) for base in cls.__bases__ if base is not object]
+
+    if dataclasses.is_dataclass(cls):
+        for f in dataclasses.fields(cls):
+            default = _fingerprint_value(f.default, seen) if f.default is not dataclasses.MISSING else None
+            default_factory = _fingerprint_value(f.default_factory, seen) if f.default_factory is not dataclasses.MISSING else None
+            parts.append(f"field {f.name}: {_fingerprint_value(f.type, seen)} = {default} {default_factory}")
+
+    for name, attr in sorted(vars(cls).items()):
+        if isinstance(attr, (staticmethod, classmethod)):
+            attr = attr.__func__
+        elif isinstance(attr, property):
+            attr = (attr.fget, attr.fset, attr.fdel)
+
+        if isinstance(attr, types.FunctionType):
+            if attr.__code__.co_filename == "<string>":
+                # Generated by dataclasses and such, covered by the fields
+                continue
+        elif name.startswith("_") and name.endswith("_") and name != "__annotations__":
+            # Python and enum internals
+            continue
+
+        parts.append(f"{name}={_fingerprint_value(attr, seen)}")
+
+    return "\n".join(parts)
+
+
+def _get_referred_names(code: types.CodeType) -> List[str]:
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names += _get_referred_names(const)
+    return names
+
+
+def _fingerprint_function(func: Callable, seen: Set[int]) -> str:
+    if id(func) in seen:
+        return f"function {func.__qualname__}"
+    seen.add(id(func))
+
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        # Functions created by exec() and such
+        source = repr(func.__code__.co_code) + repr(func.__code__.co_consts)
+
+    parts = [source]
+
+    if func.__defaults__:
+        parts.append(_fingerprint_value(func.__defaults__, seen))
+
+    if func.__kwdefaults__:
+        parts.append(_fingerprint_value(func.__kwdefaults__, seen))
+
+    if func.__closure__:
+        for name, cell in zip(func.__code__.co_freevars, func.__closure__):
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                # Not yet assigned
+                continue
+            parts.append(f"{name}={_fingerprint_value(contents, seen)}")
+
+    for name in sorted(set(_get_referred_names(func.__code__))):
+        if name in func.__globals__:
+            parts.append(f"{name}={_fingerprint_value(func.__globals__[name], seen)}")
+
+    return "\n".join(parts)
+
+
+def get_function_fingerprint(func: Callable) -> str:
+    """Hash the source code of a strategy function and the values it refers to.
+
+    :return:
+        Hex digest
+    """
+    return hashlib.sha256(_fingerprint_function(func, set()).encode("utf-8")).hexdigest()
+
+
+def _update_with_frame(h: "hashlib._Hash", df: Optional[pd.DataFrame]):
+    if df is None:
+        h.update(b"none")
+        return
+    h.update(repr(list(df.columns)).encode("utf-8"))
+    h.update(repr([str(t) for t in df.dtypes]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+
+
+def get_universe_fingerprint(universe: TradingStrategyUniverse) -> str:
+    """Hash the data of a trading universe.
+
+    Hashes pairs, candles, liquidity and stop loss candles data frames,
+    time buckets and reserve assets.
+
+    :return:
+        Hex digest
+    """
+    h = hashlib.sha256()
+    data_universe = universe.universe
+    h.update(repr((data_universe.time_bucket, data_universe.liquidity_time_bucket, universe.backtest_stop_loss_time_bucket)).encode("utf-8"))
+    h.update(repr(sorted(a.get_identifier() for a in universe.reserve_assets)).encode("utf-8"))
+    _update_with_frame(h, data_universe.pairs.df)
+    _update_with_frame(h, data_universe.candles.df if data_universe.candles else None)
+    _update_with_frame(h, data_universe.liquidity.df if data_universe.liquidity else None)
+    _update_with_frame(h, universe.backtest_stop_loss_candles.df if universe.backtest_stop_loss_candles else None)
+    return h.hexdigest()
+
+
+def get_backtest_cache_key(
+    setup: "BacktestSetup",
+    universe: TradingStrategyUniverse,
+    allow_missing_fees=False,
+    vectorised_trigger_checks=True,
+) -> str:
+    """Calculate the cache key for a backtest.
+
+    :param setup:
+        Backtest that has not been run yet
+
+    :param universe:
+        Trading universe of the backtest
+
+    :param allow_missing_fees:
+        See :py:func:`tradeexecutor.backtest.backtest_runner.run_backtest`
+
+    :param vectorised_trigger_checks:
+        See :py:func:`tradeexecutor.backtest.backtest_runner.run_backtest`
+
+    :return:
+        Hex digest
+    """
+    initial_deposit = sum(e.amount for e in setup.sync_model.fund_flow_queue)
+
+    pricing_model = setup.pricing_model
+    if pricing_model is not None:
+        pricing = (type(pricing_model).__name__, pricing_model.data_delay_tolerance, pricing_model.candle_timepoint_kind)
+    else:
+        pricing = None
+
+    parts = [
+        f"version={BACKTEST_CACHE_VERSION}",
+        f"engine={get_engine_fingerprint()}",
+        f"decide_trades={get_function_fingerprint(setup.decide_trades)}",
+        f"create_trading_universe={get_function_fingerprint(setup.create_trading_universe) if setup.create_trading_universe else None}",
+        f"universe={get_universe_fingerprint(universe)}",
+        f"name={setup.name}",
+        f"start_at={setup.start_at!r}",
+        f"end_at={setup.end_at!r}",
+        f"cycle_duration={setup.cycle_duration!r}",
+        f"universe_options={setup.universe_options!r}",
+        f"initial_deposit={initial_deposit}",
+        f"max_slippage={setup.execution_model.max_slippage!r}",
+        f"lp_fees={setup.execution_model.lp_fees!r}",
+        f"engine_version={setup.trading_strategy_engine_version}",
+        f"trade_routing={setup.trade_routing!r}",
+        f"reserve_currency={setup.reserve_currency!r}",
+        f"routing_model={type(setup.routing_model).__name__}",
+        f"pricing={pricing!r}",
+        f"allow_missing_fees={allow_missing_fees!r}",
+        f"vectorised_trigger_checks={vectorised_trigger_checks!r}",
+        f"stop_loss_data_available={setup.execution_model.stop_loss_data_available!r}",
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class BacktestResultCache:
+    """Store backtest results on the disk by their cache key.
+
+    See :py:mod:`tradeexecutor.backtest.backtest_cache`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_size: int = 2 * 1024**3,
+        max_age: datetime.timedelta = datetime.timedelta(days=30),
+        compression_level: int = 6,
+    ):
+        """
+
+        :param path:
+            Folder for the cache entries.
+
+            Created if it does not exist.
+
+        :param max_size:
+            Evict the least recently used entries if the entries take more bytes than this
+
+        :param max_age:
+            Evict entries not used for this long
+
+        :param compression_level:
+            zlib compression level
+        """
+        assert isinstance(path, Path), f"Got {path}"
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.compression_level = compression_level
+
+        #: How many times a result was found in the cache
+        self.hits = 0
+
+        #: How many times a result was not found in the cache
+        self.misses = 0
+
+    def __repr__(self):
+        return f"<BacktestResultCache at {os.path.abspath(self.path)}, {self.hits} hits, {self.misses} misses>"
+
+    def get_entry_path(self, key: str) -> Path:
+        return self.path.joinpath(f"{key}.backtest")
+
+    def get(self, key: str) -> Optional[Tuple[State, dict]]:
+        """Load a cached backtest result.
+
+        :return:
+            Tuple (final state, debug dump) or `None` if not cached
+        """
+        entry_path = self.get_entry_path(key)
+        try:
+            with open(entry_path, "rb") as inp:
+                raw = inp.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        magic, state_length = _HEADER.unpack_from(raw)
+        if magic != _MAGIC:
+            logger.warning("Ignoring damaged backtest cache entry %s", entry_path)
+            self.misses += 1
+            return None
+
+        state_start = _HEADER.size
+        state_end = state_start + state_length
+        state = decode_dataclass(State, json.loads(zlib.decompress(raw[state_start:state_end])))
+        debug_dump = pickle.loads(zlib.decompress(raw[state_end:])) if state_end < len(raw) else {}
+
+        # Mark as recently used
+        os.utime(entry_path)
+
+        self.hits += 1
+        logger.info("Loaded cached backtest result %s, %d bytes", entry_path, len(raw))
+        return state, debug_dump
+
+    def put(self, key: str, state: State, debug_dump: dict):
+        """Store a backtest result.
+
+        Evicts old entries.
+        """
+        state_data = zlib.compress(json.dumps(encode_dataclass(state), cls=_ExtendedEncoder).encode("utf-8"), self.compression_level)
+
+        try:
+            debug_data = zlib.compress(pickle.dumps(debug_dump), self.compression_level)
+        except Exception as e:
+            # Debug dump is a best effort
+            logger.warning("Could not cache backtest debug dump: %s", e)
+            debug_data = b""
+
+        entry_path = self.get_entry_path(key)
+        temp = tempfile.NamedTemporaryFile(mode="wb", delete=False, dir=self.path, suffix=".tmp")
+        with open(temp.name, "wb") as out:
+            out.write(_HEADER.pack(_MAGIC, len(state_data)))
+            out.write(state_data)
+            out.write(debug_data)
+        temp.close()
+        os.replace(temp.name, entry_path)
+
+        logger.info("Cached backtest result %s, %d bytes", entry_path, entry_path.stat().st_size)
+        self.evict(keep=entry_path)
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Remove entries that are too old or exceed the cache size.
+
+        :param keep:
+            Never remove this entry
+
+        :return:
+            Number of entries removed
+        """
+        entries = []
+        for entry_path in self.path.glob("*.backtest"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                # Evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        # Least recently used first
+        entries.sort()
+
+        oldest_allowed = time.time() - self.max_age.total_seconds()
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, entry_path in entries:
+            if entry_path == keep:
+                continue
+            if mtime >= oldest_allowed and total_size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            removed += 1
+
+        if removed:
+            logger.info("Evicted %d backtest cache entries from %s", removed, self.path)
+        return removed
+
+    def clear(self):
+        """Remove all entries."""
+        for entry_path in self.path.glob("*.backtest"):
+            os.remove(entry_path)
@@ -3,11 +3,13 @@ import datetime
 import math
 import warnings
 from decimal import Decimal, ROUND_DOWN
-from typing import Optional
+from typing import Optional, Collection
 
+import numpy as np
 import pandas as pd
 
 from tradeexecutor.backtest.backtest_execution import BacktestExecutionModel
+from tradeexecutor.backtest.candle_price_index import CandlePriceIndex
 from tradeexecutor.backtest.backtest_routing import BacktestRoutingModel
 from tradeexecutor.ethereum.uniswap_v2.uniswap_v2_routing import UniswapV2SimpleRoutingModel
 from tradeexecutor.state.identifier import TradingPairIdentifier
@@ -101,6 +103,9 @@ class BacktestSimplePricingModel(PricingModel):
         self.time_bucket = time_bucket
         self.allow_missing_fees = allow_missing_fees
 
+        #: NumPy based price lookups, shared with other pricing models using the same candles
+        self.price_index = CandlePriceIndex.get_for_universe(candle_universe)
+
     def __repr__(self):
         return f"<BacktestSimplePricingModel bucket: {self.time_bucket}, candles: {self.candle_universe}>"
 
@@ -131,7 +136,7 @@ class BacktestSimplePricingModel(PricingModel):
         # TODO: Include price impact
         pair_id = pair.internal_id
 
-        mid_price, delay = self.candle_universe.get_price_with_tolerance(
+        mid_price, delay = self.price_index.get_price_with_tolerance(
             pair_id,
             ts,
             tolerance=self.data_delay_tolerance,
@@ -178,7 +183,7 @@ class BacktestSimplePricingModel(PricingModel):
         # TODO: Include price impact
         pair_id = pair.internal_id
 
-        mid_price, delay = self.candle_universe.get_price_with_tolerance(
+        mid_price, delay = self.price_index.get_price_with_tolerance(
             pair_id,
             ts,
             tolerance=self.data_delay_tolerance,
@@ -221,7 +226,7 @@ class BacktestSimplePricingModel(PricingModel):
         """Get the mid price by the candle."""
         pair_id = pair.internal_id
 
-        price, delay = self.candle_universe.get_price_with_tolerance(
+        price, delay = self.price_index.get_price_with_tolerance(
             pair_id,
             ts,
             tolerance=self.data_delay_tolerance,
@@ -229,6 +234,24 @@ class BacktestSimplePricingModel(PricingModel):
         )
         return float(price)
 
+    def get_mid_prices(self,
+                       ts: datetime.datetime,
+                       pairs: Collection[TradingPairIdentifier]) -> np.ndarray:
+        """Get the mid prices of many pairs at once.
+
+        Useful for revaluing all open positions of a portfolio.
+
+        :return:
+            Mid prices in the same order as `pairs`.
+            NaN if the price is not available within `data_delay_tolerance`.
+        """
+        return self.price_index.get_prices_with_tolerance(
+            [p.internal_id for p in pairs],
+            ts,
+            tolerance=self.data_delay_tolerance,
+            kind=self.candle_timepoint_kind,
+        )
+
     def quantize_base_quantity(self, pair: TradingPairIdentifier, quantity: Decimal, rounding=ROUND_DOWN) -> Decimal:
         """Convert any base token quantity to the native token units by its ERC-20 decimals."""
         assert isinstance(pair, TradingPairIdentifier)
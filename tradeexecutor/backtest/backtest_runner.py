@@ -10,6 +10,7 @@ from typing import Optional, Callable, Tuple
 
 import pandas as pd
 
+from tradeexecutor.backtest.backtest_cache import BacktestResultCache, get_backtest_cache_key
 from tradeexecutor.backtest.backtest_execution import BacktestExecutionModel
 from tradeexecutor.backtest.backtest_pricing import BacktestSimplePricingModel
 from tradeexecutor.backtest.backtest_routing import BacktestRoutingModel
@@ -41,6 +42,9 @@ from tradingstrategy.client import Client
 from tradingstrategy.timebucket import TimeBucket
 
 
+logger = logging.getLogger(__name__)
+
+
 @dataclass
 class BacktestSetup:
     """Describe backtest setup, ready to run."""
@@ -292,6 +296,8 @@ def run_backtest(
         client: Optional[Client]=None,
         allow_missing_fees=False,
         execution_test_hook: Optional[ExecutionTestHook] = None,
+        vectorised_trigger_checks=True,
+        cache: Optional[BacktestResultCache] = None,
 ) -> Tuple[State, TradingStrategyUniverse, dict]:
     """Run a strategy backtest.
 
@@ -301,6 +307,17 @@ def run_backtest(
     :param allow_missing_fees:
         Legacy workaround
 
+    :param vectorised_trigger_checks:
+        Check take profit/stop loss triggers only at the ticks where they can trigger.
+
+        See :py:mod:`tradeexecutor.backtest.backtest_trigger_scan`.
+
+    :param cache:
+        Return the result of an identical earlier backtest from this cache.
+
+        Only used if the setup has a prepared trading universe.
+        See :py:mod:`tradeexecutor.backtest.backtest_cache`.
+
     :return:
         Tuple(the final state of the backtest, trading universe, debug dump)
     """
@@ -308,6 +325,22 @@ def run_backtest(
     # State is pristine and not used yet
     assert len(list(setup.state.portfolio.get_all_trades())) == 0
 
+    cache_key = None
+    if cache is not None:
+        if setup.universe is not None and execution_test_hook is None:
+            cache_key = get_backtest_cache_key(
+                setup,
+                setup.universe,
+                allow_missing_fees=allow_missing_fees,
+                vectorised_trigger_checks=vectorised_trigger_checks,
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                state, debug_dump = cached
+                return state, setup.universe, debug_dump
+        else:
+            logger.info("Backtest %s is not cached, as the trading universe is created during the backtest", setup.name)
+
     # Create empty state for this backtest
     store = NoneStore(setup.state)
 
@@ -384,10 +417,14 @@ def run_backtest(
         tick_offset=datetime.timedelta(seconds=1),
         trade_immediately=True,
         execution_test_hook=execution_test_hook,
+        vectorised_trigger_checks=vectorised_trigger_checks,
     )
 
     debug_dump = main_loop.run()
 
+    if cache_key is not None:
+        cache.put(cache_key, setup.state, debug_dump)
+
     return setup.state, backtest_universe, debug_dump
 
 
@@ -411,6 +448,8 @@ def run_backtest_inline(
     data_delay_tolerance: Optional[pd.Timedelta] = None,
     name: str="backtest",
     allow_missing_fees=False,
+    vectorised_trigger_checks=True,
+    cache: Optional[BacktestResultCache] = None,
 ) -> Tuple[State, TradingStrategyUniverse, dict]:
     """Run backtests for given decide_trades and create_trading_universe functions.
 
@@ -487,6 +526,19 @@ def run_backtest_inline(
 
         Only set in legacy backtests.
 
+    :param vectorised_trigger_checks:
+        Check take profit/stop loss triggers only at the ticks where they can trigger.
+
+        Set to `False` to check every stop loss tick.
+        Both give the same results.
+
+    :param cache:
+        Return the result of an identical earlier backtest from this cache,
+        instead of running the backtest again.
+
+        Only used if `universe` is given.
+        See :py:mod:`tradeexecutor.backtest.backtest_cache`.
+
     :return:
         tuple (State of a completely executed strategy, trading strategy universe, debug dump dict)
     """
@@ -562,7 +614,7 @@ def run_backtest_inline(
         data_preload=data_preload,
     )
 
-    return run_backtest(backtest_setup, client, allow_missing_fees=True)
+    return run_backtest(backtest_setup, client, allow_missing_fees=True, vectorised_trigger_checks=vectorised_trigger_checks, cache=cache)
 
 
 def guess_data_delay_tolerance(universe: TradingStrategyUniverse) -> pd.Timedelta:
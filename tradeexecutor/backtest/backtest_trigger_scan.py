@@ -0,0 +1,176 @@
+"""Vectorised take profit/stop loss trigger scanning for backtests.
+
+Backtests check position triggers on every stop loss candle between
+strategy cycles. E.g. with 1 minute stop loss candles and daily strategy cycles
+this is 1440 checks per cycle, most of which do nothing.
+
+:py:class:`BacktestTriggerScanner` looks up the prices for all stop loss ticks
+between two strategy cycles at once and finds the ticks where any position trigger
+would do something: hit stop loss or take profit, or move a trailing stop loss.
+Only at these ticks the normal trigger check,
+:py:func:`tradeexecutor.strategy.stop_loss.check_position_triggers`, is run,
+so the results are the same as checking every tick.
+"""
+import datetime
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tradeexecutor.backtest.backtest_pricing import BacktestSimplePricingModel
+from tradeexecutor.state.identifier import TradingPairIdentifier
+from tradeexecutor.state.position import TradingPosition
+from tradeexecutor.state.state import State
+
+
+logger = logging.getLogger(__name__)
+
+
+class BacktestTriggerScanner:
+    """Find stop loss ticks where position triggers need to be checked.
+
+    The scanner mirrors how :py:meth:`BacktestSimplePricingModel.get_mid_price`
+    and :py:func:`tradeexecutor.strategy.stop_loss.check_position_triggers`
+    evaluate a single tick. If a position cannot be evaluated in a vectorised way,
+    every tick is reported for it and the normal check handles the tick.
+    """
+
+    def __init__(
+            self,
+            pricing_model: BacktestSimplePricingModel,
+            ticks: List[datetime.datetime],
+    ):
+        """
+        :param pricing_model:
+            The pricing model used for the stop loss checks
+
+        :param ticks:
+            Stop loss check timestamps between two strategy cycles
+        """
+        assert isinstance(pricing_model, BacktestSimplePricingModel)
+        self.pricing_model = pricing_model
+        self.ticks = ticks
+        self.tick_ns = np.array(ticks, dtype="datetime64[ns]").view(np.int64)
+
+        #: Pair internal id -> (price available, mid price) for each tick.
+        #:
+        #: `None` if the pair cannot be scanned.
+        self.price_cache: Dict[int, Optional[Tuple[np.ndarray, np.ndarray]]] = {}
+
+    def get_tick_prices(self, pair: TradingPairIdentifier) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Get mid prices for all ticks.
+
+        Same as calling :py:meth:`BacktestSimplePricingModel.get_mid_price` for each tick.
+
+        :return:
+            Tuple (price available, mid price) arrays,
+            or `None` if the candle data cannot be scanned
+        """
+        pair_id = pair.internal_id
+        if pair_id in self.price_cache:
+            return self.price_cache[pair_id]
+
+        result = None
+        try:
+            pair_index = self.pricing_model.price_index.get_pair_index(pair_id)
+        except KeyError:
+            # No candles for the pair, let the normal check raise
+            pair_index = None
+
+        if pair_index is not None and len(pair_index.timestamps) > 0:
+            candle_ns = pair_index.timestamps
+            values = pair_index.get_prices(self.pricing_model.candle_timepoint_kind)
+
+            # Forward fill lookup within the data delay tolerance
+            before_match = np.searchsorted(candle_ns, self.tick_ns, side="right") - 1
+            tolerance_ns = pd.Timedelta(self.pricing_model.data_delay_tolerance).value
+            clipped = np.maximum(before_match, 0)
+            available = (before_match >= 0) & (candle_ns[clipped] >= self.tick_ns - tolerance_ns)
+            prices = np.where(available, values[clipped], np.nan)
+            result = (available, prices)
+
+        self.price_cache[pair_id] = result
+        return result
+
+    def find_next_position_tick(self, position: TradingPosition, start: int) -> Optional[int]:
+        """Find the first tick at or after `start` where the position trigger check does something.
+
+        :return:
+            Tick index or `None` if nothing happens for this position
+        """
+
+        if not position.has_trigger_conditions():
+            return None
+
+        if not position.is_long():
+            # Let the normal check to fail
+            return start
+
+        if position.get_quantity() == 0:
+            return None
+
+        tick_prices = self.get_tick_prices(position.pair)
+        if tick_prices is None:
+            return start
+
+        available, prices = tick_prices
+        available = available[start:]
+        prices = prices[start:]
+
+        if not available.any():
+            return None
+
+        events = np.zeros(len(prices), dtype=bool)
+
+        pricing_model = self.pricing_model
+        if not pricing_model.get_pair_fee(self.ticks[start], position.pair) and not pricing_model.allow_missing_fees:
+            # Let the sell price estimation to fail
+            events |= available
+
+        stop_loss = position.stop_loss
+        if position.trailing_stop_loss_pct:
+            if not stop_loss:
+                events |= available
+            else:
+                # NaN compares False
+                events |= (prices * position.trailing_stop_loss_pct) > stop_loss
+
+        if position.take_profit:
+            events |= prices >= position.take_profit
+
+        if stop_loss:
+            events |= prices <= stop_loss
+
+        # NaN prices in the candle data
+        events |= available & np.isnan(prices)
+
+        if not events.any():
+            return None
+
+        return start + int(np.argmax(events))
+
+    def find_next_tick(self, state: State, start: int) -> Optional[int]:
+        """Find the first tick at or after `start` where any open position trigger check does something."""
+        next_tick = None
+        for position in state.portfolio.open_positions.values():
+            tick = self.find_next_position_tick(position, start)
+            if tick is not None and (next_tick is None or tick < next_tick):
+                next_tick = tick
+                if next_tick == start:
+                    break
+        return next_tick
+
+    def iterate_ticks(self, state: State) -> Iterable[datetime.datetime]:
+        """Iterate ticks where position triggers need to be checked.
+
+        The next tick is searched after the caller has processed the previous one,
+        so that the changes to stop losses and open positions are taken into account.
+        """
+        index = 0
+        while index < len(self.ticks):
+            index = self.find_next_tick(state, index)
+            if index is None:
+                return
+            yield self.ticks[index]
+            index += 1
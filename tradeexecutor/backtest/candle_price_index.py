@@ -0,0 +1,192 @@
+"""Fast candle price lookups for backtesting.
+
+:py:meth:`tradingstrategy.candle.GroupedCandleUniverse.get_price_with_tolerance`
+does several pandas operations per call. Backtest pricing, valuation and stop loss checks
+call it for every position on every cycle, so it dominates the runtime
+of multipair strategies.
+
+:py:class:`CandlePriceIndex` extracts sorted int64 timestamp and float64 price arrays
+for each pair once and answers the same "price at or before a timestamp, within a tolerance"
+question with :py:func:`numpy.searchsorted`.
+
+- The results are the same as with `get_price_with_tolerance()`,
+  including :py:class:`tradingstrategy.candle.CandleSampleUnavailable` errors
+
+- The index is shared by all pricing models using the same candle universe,
+  e.g. backtests of a grid search running in threads
+"""
+import datetime
+import threading
+import weakref
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tradingstrategy.candle import GroupedCandleUniverse, CandleSampleUnavailable
+from tradingstrategy.types import PrimaryKey
+
+
+#: Candle universe -> price index
+_indexes: "weakref.WeakKeyDictionary[GroupedCandleUniverse, CandlePriceIndex]" = weakref.WeakKeyDictionary()
+
+_indexes_lock = threading.Lock()
+
+
+class PairPriceIndex:
+    """Timestamps and prices of a single pair."""
+
+    __slots__ = ("timestamps", "prices", "candles")
+
+    def __init__(self, candles: pd.DataFrame, timestamps: np.ndarray):
+        #: Candle timestamps as int64 nanoseconds, sorted
+        self.timestamps = timestamps
+
+        #: Price column name -> float64 prices
+        self.prices: Dict[str, np.ndarray] = {}
+
+        self.candles = candles
+
+    def get_prices(self, kind: str) -> np.ndarray:
+        prices = self.prices.get(kind)
+        if prices is None:
+            prices = self.prices[kind] = self.candles[kind].to_numpy(dtype=np.float64)
+        return prices
+
+
+class CandlePriceIndex:
+    """Look up candle prices using NumPy arrays.
+
+    Use :py:meth:`get_for_universe` to get a shared instance.
+    """
+
+    def __init__(self, candle_universe: GroupedCandleUniverse):
+        assert isinstance(candle_universe, GroupedCandleUniverse)
+        self.candle_universe = candle_universe
+
+        #: Pair id -> index.
+        #:
+        #: `None` if the pair data cannot be indexed and we need to use
+        #: the pandas lookup.
+        self.pairs: Dict[PrimaryKey, Optional[PairPriceIndex]] = {}
+
+    @staticmethod
+    def get_for_universe(candle_universe: GroupedCandleUniverse) -> "CandlePriceIndex":
+        """Get a price index shared by all users of the candle universe."""
+        with _indexes_lock:
+            index = _indexes.get(candle_universe)
+            if index is None:
+                index = _indexes[candle_universe] = CandlePriceIndex(candle_universe)
+            return index
+
+    def get_pair_index(self, pair_id: PrimaryKey) -> Optional[PairPriceIndex]:
+        """Build the index for a pair on the first use.
+
+        :raise KeyError:
+            If we do not have candles for the pair
+        """
+        try:
+            return self.pairs[pair_id]
+        except KeyError:
+            pass
+
+        candles = self.candle_universe.get_candles_by_pair(pair_id)
+
+        if isinstance(candles.index, pd.MultiIndex):
+            timestamp_index = candles.index.get_level_values(1)
+        else:
+            timestamp_index = candles.index
+
+        if len(timestamp_index) > 0 and isinstance(timestamp_index, pd.DatetimeIndex) and timestamp_index.tz is None and timestamp_index.is_monotonic_increasing and timestamp_index.is_unique:
+            pair_index = PairPriceIndex(candles, timestamp_index.asi8)
+        else:
+            # Fall back to pandas
+            pair_index = None
+
+        self.pairs[pair_id] = pair_index
+        return pair_index
+
+    def get_price_with_tolerance(
+            self,
+            pair_id: PrimaryKey,
+            when: datetime.datetime | pd.Timestamp,
+            tolerance: pd.Timedelta,
+            kind="close",
+    ) -> Tuple[float, pd.Timedelta]:
+        """Get the price at or before a timestamp.
+
+        Same as :py:meth:`tradingstrategy.candle.GroupedCandleUniverse.get_price_with_tolerance`.
+
+        :return:
+            Tuple (price, how old the candle is)
+
+        :raise CandleSampleUnavailable:
+            There were no samples available with the given condition
+        """
+        pair_index = self.get_pair_index(pair_id)
+        if pair_index is None:
+            return self.candle_universe.get_price_with_tolerance(pair_id, when, tolerance=tolerance, kind=kind)
+
+        assert kind in ("open", "close", "high", "low"), f"Got kind: {kind}"
+
+        when_ns = pd.Timestamp(when).value
+        timestamps = pair_index.timestamps
+        i = int(np.searchsorted(timestamps, when_ns, side="right")) - 1
+
+        if i < 0:
+            raise CandleSampleUnavailable(
+                f"Could not find any candles for pair {pair_id}, value kind '{kind}' at or before {when}\n"
+                f"- Pair has {len(timestamps)} samples\n"
+                f"- First sample is at {pd.Timestamp(timestamps[0])}\n"
+            )
+
+        distance = when_ns - int(timestamps[i])
+        if distance > pd.Timedelta(tolerance).value:
+            raise CandleSampleUnavailable(
+                f"Could not find candle data for pair {pair_id}\n"
+                f"- Column '{kind}'\n"
+                f"- At {when}\n"
+                f"- Lower bound of time range tolerance {pd.Timestamp(when) - tolerance}\n"
+                f"\n"
+                f"- Data lag tolerance is set to {tolerance}\n"
+                f"- The pair has {len(timestamps)} candles between {pd.Timestamp(timestamps[0])} - {pd.Timestamp(timestamps[-1])}\n"
+            )
+
+        return float(pair_index.get_prices(kind)[i]), pd.Timedelta(distance)
+
+    def get_prices_with_tolerance(
+            self,
+            pair_ids: Sequence[PrimaryKey],
+            when: datetime.datetime | pd.Timestamp,
+            tolerance: pd.Timedelta,
+            kind="close",
+    ) -> np.ndarray:
+        """Get prices of many pairs at the same timestamp.
+
+        :return:
+            Prices in the same order as `pair_ids`.
+            NaN if the price is not available for a pair within the tolerance,
+            or there is no candle data for the pair.
+        """
+        when_ns = pd.Timestamp(when).value
+        tolerance_ns = pd.Timedelta(tolerance).value
+        result = np.full(len(pair_ids), np.nan)
+        for slot, pair_id in enumerate(pair_ids):
+            try:
+                pair_index = self.get_pair_index(pair_id)
+            except KeyError:
+                continue
+
+            if pair_index is None:
+                try:
+                    result[slot] = self.candle_universe.get_price_with_tolerance(pair_id, when, tolerance=tolerance, kind=kind)[0]
+                except CandleSampleUnavailable:
+                    pass
+                continue
+
+            timestamps = pair_index.timestamps
+            i = int(np.searchsorted(timestamps, when_ns, side="right")) - 1
+            if i >= 0 and when_ns - timestamps[i] <= tolerance_ns:
+                result[slot] = pair_index.get_prices(kind)[i]
+
+        return result
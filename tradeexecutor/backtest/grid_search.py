@@ -2,18 +2,24 @@
 import concurrent
 import datetime
 import itertools
+import json
 import logging
 import os
 import pickle
+import resource
 import shutil
 import signal
+import sqlite3
 import sys
+import threading
+import time
 import warnings
+import zlib
 from collections import Counter
 from dataclasses import dataclass
 from multiprocessing import Process
 from pathlib import Path
-from typing import Protocol, Dict, List, Tuple, Any, Optional, Iterable, Collection, Callable
+from typing import Protocol, Dict, List, Tuple, Any, Optional, Iterable, Collection, Callable, Set
 import concurrent.futures.process
 
 import numpy as np
@@ -31,6 +37,8 @@ from tradeexecutor.analysis.advanced_metrics import calculate_advanced_metrics,
 from tradeexecutor.analysis.trade_analyser import TradeSummary, build_trade_analysis
 from tradeexecutor.backtest.backtest_routing import BacktestRoutingIgnoredModel
 from tradeexecutor.backtest.backtest_runner import run_backtest_inline
+from tradeexecutor.backtest.shared_universe import SharedUniverse
+from tradeexecutor.state.identifier_registry import IdentifierStorage
 from tradeexecutor.state.state import State
 from tradeexecutor.state.types import USDollarAmount
 from tradeexecutor.strategy.cycle import CycleDuration
@@ -44,6 +52,23 @@ from tradeexecutor.visual.equity_curve import calculate_equity_curve, calculate_
 logger = logging.getLogger(__name__)
 
 
+#: File name of :py:class:`GridSearchResultStore` in the grid search result folder
+RESULT_STORE_FILE = "grid-search-results.sqlite"
+
+#: Metrics compared between grid search combinations and their SQL types.
+#:
+#: See :py:func:`extract_grid_search_metrics`.
+METRIC_COLUMNS = {
+    "Positions": "INTEGER",
+    "Annualised return": "REAL",
+    "Max drawdown": "REAL",
+    "Sharpe": "REAL",
+    "Sortino": "REAL",
+    "Average position": "REAL",
+    "Median position": "REAL",
+}
+
+
 def _hide_warnings(func):
     """Function wrapper to suppress warnings caused by quantstats and numpy functions.
 
@@ -154,6 +179,13 @@ class GridCombination:
         """
         return [p.value for p in self.parameters]
 
+    def get_store_key(self) -> str:
+        """Identify this combination in :py:class:`GridSearchResultStore`.
+
+        Unlike the result path, tells `1` and `"1"` apart.
+        """
+        return json.dumps([[p.name, p.value] for p in self.parameters])
+
 
 
 @dataclass(slots=True, frozen=False)
@@ -180,6 +212,16 @@ class GridSearchResult:
     #: Only applicable to multiprocessing
     process_id: int = None
 
+    #: Peak resident memory of the child process in bytes.
+    #:
+    #: Only applicable to multiprocessing
+    process_max_rss: int = None
+
+    #: Seconds from the child process start until it was ready to run its first backtest.
+    #:
+    #: Only applicable to multiprocessing
+    process_time_to_first_backtest: float = None
+
     @staticmethod
     def has_result(combination: GridCombination):
         base_path = combination.result_path
@@ -205,6 +247,225 @@ class GridSearchResult:
             pickle.dump(self, out)
 
 
+def extract_grid_search_metrics(summary: TradeSummary, metrics: pd.DataFrame) -> Dict[str, Any]:
+    """Extract the metrics compared between grid search combinations.
+
+    Missing metrics are `NaN`.
+
+    :param summary:
+        :py:attr:`GridSearchResult.summary`
+
+    :param metrics:
+        :py:attr:`GridSearchResult.metrics`
+
+    :return:
+        Metric name -> value, see :py:data:`METRIC_COLUMNS`
+    """
+
+    def clean(x):
+        if x == "-":
+            return np.NaN
+        elif x == "":
+            return np.NaN
+        return x
+
+    return {
+        "Positions": summary.total_positions,
+        "Annualised return": clean(metrics.loc["Annualised return (raw)"][0]),
+        "Max drawdown": clean(metrics.loc["Max Drawdown"][0]),
+        "Sharpe": clean(metrics.loc["Sharpe"][0]),
+        "Sortino": clean(metrics.loc["Sortino"][0]),
+        "Average position": summary.average_trade,
+        "Median position": summary.median_trade,
+    }
+
+
+#: Slot of :py:attr:`GridSearchResult.state`, bypassing :py:attr:`StoredGridSearchResult.state`
+_state_slot = GridSearchResult.state
+
+
+class StoredGridSearchResult(GridSearchResult):
+    """Grid search result read from :py:class:`GridSearchResultStore`.
+
+    The backtest state is read from the store only when accessed.
+    """
+
+    __slots__ = ("store",)
+
+    def __init__(self, store: "GridSearchResultStore", combination: GridCombination, summary: TradeSummary, metrics: pd.DataFrame):
+        super().__init__(combination=combination, state=None, summary=summary, metrics=metrics, cached=True)
+        self.store = store
+
+    @property
+    def state(self) -> State:
+        state = _state_slot.__get__(self)
+        if state is None:
+            state = self.store.load_state(self.combination)
+            _state_slot.__set__(self, state)
+        return state
+
+    @state.setter
+    def state(self, state: State):
+        _state_slot.__set__(self, state)
+
+
+class GridSearchResultStore:
+    """Keep the results of all grid combinations in a single SQLite file.
+
+    Storing each result as a pickle file, see :py:meth:`GridSearchResult.save`,
+    means tens of thousands of small files for a large search,
+    and reading all of them to compare the combinations.
+
+    - One row per combination, with its parameters, metrics and trade summary
+
+    - The metrics in :py:data:`METRIC_COLUMNS` are columns of their own, so
+      :py:meth:`read_table` builds the comparison table without unpickling anything
+
+    - The backtest states are compressed JSON in a separate table
+      and read only when a result's :py:attr:`GridSearchResult.state` is accessed
+
+    - Each result is committed as soon as it is saved,
+      so an interrupted search continues where it left off
+
+    Example:
+
+    .. code-block:: python
+
+        store = GridSearchResultStore(result_path / RESULT_STORE_FILE)
+        df = store.read_table()
+        best = store.load(combinations[0])
+        print(best.state.portfolio.get_total_equity())
+    """
+
+    #: Store format version
+    VERSION = 1
+
+    def __init__(self, path: Path):
+        """
+
+        :param path:
+            SQLite file. Created if it does not exist.
+        """
+        assert isinstance(path, Path), f"Expected Path, got {type(path)}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        # Multiprocess grid search workers write to the same file
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        metric_columns = "".join(f', "{name}" {sql_type}' for name, sql_type in METRIC_COLUMNS.items())
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("INSERT OR IGNORE INTO metadata VALUES ('version', ?)", (str(self.VERSION),))
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, combination_index INTEGER, parameters TEXT, summary BLOB, metrics BLOB{metric_columns})")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS states (key TEXT PRIMARY KEY, state BLOB)")
+            version = self.connection.execute("SELECT value FROM metadata WHERE key = 'version'").fetchone()[0]
+
+        assert int(version) == self.VERSION, f"{path} has unsupported grid search result store version {version}"
+
+    def __repr__(self):
+        return f"<GridSearchResultStore {len(self)} results at {self.path}>"
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """Close the SQLite connection."""
+        self.connection.close()
+
+    def get_keys(self) -> Set[str]:
+        """Get :py:meth:`GridCombination.get_store_key` of all stored results."""
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT key FROM results")}
+
+    def has_result(self, combination: GridCombination) -> bool:
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM results WHERE key = ?", (combination.get_store_key(),)).fetchone()
+        return row is not None
+
+    def save(self, result: GridSearchResult):
+        """Add or replace the result of a combination."""
+        combination = result.combination
+        key = combination.get_store_key()
+        metrics = extract_grid_search_metrics(result.summary, result.metrics)
+        state = zlib.compress(result.state.to_json_safe(identifier_storage=IdentifierStorage.interned).encode("utf-8"))
+
+        row = (
+            key,
+            combination.index,
+            json.dumps([[p.name, p.value] for p in combination.parameters]),
+            pickle.dumps(result.summary),
+            pickle.dumps(result.metrics),
+        ) + tuple(metrics[name] for name in METRIC_COLUMNS)
+
+        placeholders = ", ".join("?" * len(row))
+        with self.lock, self.connection:
+            self.connection.execute(f"INSERT OR REPLACE INTO results VALUES ({placeholders})", row)
+            self.connection.execute("INSERT OR REPLACE INTO states VALUES (?, ?)", (key, state))
+
+    def load(self, combination: GridCombination) -> StoredGridSearchResult:
+        """Read the result of a combination.
+
+        The state is read when accessed.
+
+        :raise KeyError:
+            If the combination has no result
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT summary, metrics FROM results WHERE key = ?", (combination.get_store_key(),)).fetchone()
+        if row is None:
+            raise KeyError(f"No result for {combination.get_label()}")
+        return StoredGridSearchResult(self, combination, pickle.loads(row[0]), pickle.loads(row[1]))
+
+    def load_all(self) -> List[StoredGridSearchResult]:
+        """Read the results of all combinations, in the combination order.
+
+        The states are read when accessed.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT combination_index, parameters, summary, metrics FROM results ORDER BY combination_index").fetchall()
+
+        results = []
+        for combination_index, parameters, summary, metrics in rows:
+            combination = GridCombination(
+                index=combination_index,
+                result_path=self.path.parent,
+                parameters=tuple(GridParameter(name, value) for name, value in json.loads(parameters)),
+            )
+            results.append(StoredGridSearchResult(self, combination, pickle.loads(summary), pickle.loads(metrics)))
+        return results
+
+    def load_state(self, combination: GridCombination) -> State:
+        """Read the backtest state of a combination."""
+        with self.lock:
+            row = self.connection.execute("SELECT state FROM states WHERE key = ?", (combination.get_store_key(),)).fetchone()
+        if row is None:
+            raise KeyError(f"No state for {combination.get_label()}")
+        return State.read_json_blob(zlib.decompress(row[0]).decode("utf-8"))
+
+    def read_table(self) -> pd.DataFrame:
+        """Read the parameters and :py:data:`METRIC_COLUMNS` of all combinations.
+
+        :return:
+            One row per combination, in the combination order,
+            with a column for each parameter and metric.
+        """
+        metric_columns = ", ".join(f'"{name}"' for name in METRIC_COLUMNS)
+        with self.lock:
+            rows = self.connection.execute(f"SELECT parameters, {metric_columns} FROM results ORDER BY combination_index").fetchall()
+
+        param_rows = []
+        for row in rows:
+            param_rows.append({name: value for name, value in json.loads(row[0])})
+
+        params = pd.DataFrame(param_rows)
+        metrics = pd.DataFrame([row[1:] for row in rows], columns=list(METRIC_COLUMNS.keys()), dtype=object)
+        metrics = metrics.apply(pd.to_numeric, errors="coerce")
+        return pd.concat([params, metrics], axis=1)
+
+
 class GridSearchWorker(Protocol):
     """Define how to create different strategy bodies."""
 
@@ -287,15 +548,13 @@ def run_grid_combination(
         grid_search_worker: GridSearchWorker,
         universe: TradingStrategyUniverse,
         combination: GridCombination,
+        result_store: Optional[GridSearchResultStore] = None,
 ):
-    if GridSearchResult.has_result(combination):
-        result = GridSearchResult.load(combination)
-        return result
-
     result = grid_search_worker(universe, combination)
 
-    # Cache result for the future runs
-    result.save()
+    # Store result for the analysis and the future runs
+    if result_store is not None:
+        result_store.save(result)
 
     return result
 
@@ -303,25 +562,50 @@ def run_grid_combination(
 def run_grid_combination_multiprocess(
         grid_search_worker: GridSearchWorker,
         combination: GridCombination,
+        result_store_path: Optional[Path] = None,
 ):
     global _universe
+    global _process_time_to_first_backtest
 
     universe = _universe
 
-    if GridSearchResult.has_result(combination):
-        result = GridSearchResult.load(combination)
-        return result
+    if _process_time_to_first_backtest is None:
+        _process_time_to_first_backtest = time.perf_counter() - _process_started_at
 
     result = grid_search_worker(universe, combination)
 
-    result.process_id = os.getpid()
+    _record_process_stats(result)
 
-    # Cache result for the future runs
-    result.save()
+    # Store result for the analysis and the future runs
+    if result_store_path is not None:
+        store = _result_stores.get(result_store_path)
+        if store is None:
+            store = _result_stores[result_store_path] = GridSearchResultStore(result_store_path)
+        store.save(result)
 
     return result
 
 
+def _load_earlier_results(
+        store: GridSearchResultStore,
+        combinations: List[GridCombination],
+) -> Dict[GridCombination, GridSearchResult]:
+    """Find the combinations with results from the earlier runs.
+
+    Results saved as pickle files by the earlier versions are moved to the store.
+    """
+    stored_keys = store.get_keys()
+    results = {}
+    for c in combinations:
+        if c.get_store_key() in stored_keys:
+            results[c] = store.load(c)
+        elif GridSearchResult.has_result(c):
+            result = GridSearchResult.load(c)
+            store.save(result)
+            results[c] = result
+    return results
+
+
 @_hide_warnings
 def perform_grid_search(
         grid_search_worker: GridSearchWorker,
@@ -331,17 +615,20 @@ def perform_grid_search(
         clear_cached_results=False,
         stats: Optional[Counter] = None,
         multiprocess=False,
+        shared_memory=False,
+        result_store: Optional[GridSearchResultStore] = None,
 ) -> List[GridSearchResult]:
     """Search different strategy parameters over a grid.
 
     - Run using parallel processing via threads.
       `Numoy should release GIL for threads <https://stackoverflow.com/a/40630594/315168>`__.
 
-    - Save the resulting state files to a directory structure
-      for invidual run analysis
+    - Save the results to :py:class:`GridSearchResultStore`
+      as soon as each backtest finishes
 
     - If a result exists, do not perform the backtest again.
-      However we still load the summary
+      However we still load the summary. The states of the earlier results
+      are read from the store only when accessed.
 
     - Trading Strategy Universe is shared across threads to save memory.
 
@@ -360,8 +647,19 @@ def perform_grid_search(
 
         Scales much better, but disabled by default, as it does not work with Jupyter Notebooks very well.
 
+    :param shared_memory:
+        With `multiprocess`, place candle, liquidity and stop loss candle data
+        to shared memory once, instead of copying it to every child process.
+
+        See :py:mod:`tradeexecutor.backtest.shared_universe`.
+
+    :param result_store:
+        Where to store the results and resume from.
+
+        If not given, use :py:data:`RESULT_STORE_FILE` in the result folder of the combinations.
+
     :return:
-        Grid search results for different combinations.
+        Grid search results for different combinations, in the combination order.
 
     """
 
@@ -369,12 +667,22 @@ def perform_grid_search(
 
     start = datetime.datetime.utcnow()
 
-    logger.info("Performing a grid search over %s combinations, with %d threads",
+    if result_store is None:
+        result_store = GridSearchResultStore(combinations[0].result_path / RESULT_STORE_FILE)
+
+    results_by_combination = _load_earlier_results(result_store, combinations)
+    pending = [c for c in combinations if c not in results_by_combination]
+
+    logger.info("Performing a grid search over %s combinations, %d done in the earlier runs, with %d threads",
                 len(combinations),
+                len(results_by_combination),
                 max_workers,
                 )
 
-    if max_workers > 1:
+    if not pending:
+        results = []
+
+    elif max_workers > 1:
 
         # Do a parallel scan for the maximum speed
         #
@@ -390,13 +698,23 @@ def perform_grid_search(
 
             # Copy universe data to child processes only once when the child process is created
             #
-            pickled_universe = pickle.dumps(universe)
+            if shared_memory:
+                shared_universe = SharedUniverse.create(universe)
+                pickled_universe = pickle.dumps(shared_universe.handle)
+                if stats is not None:
+                    stats["universe_shared_bytes"] = shared_universe.get_shared_bytes()
+            else:
+                shared_universe = None
+                pickled_universe = pickle.dumps(universe)
+
             logger.info("Doing a multiprocess grid search, picked universe is %d bytes", len(pickled_universe))
+            if stats is not None:
+                stats["universe_pickle_bytes"] = len(pickled_universe)
 
             # Set up a process pool executing structure
-            executor = futureproof.ProcessPoolExecutor(max_workers=max_workers, initializer=_process_init, initargs=(pickled_universe,))
+            executor = futureproof.ProcessPoolExecutor(max_workers=max_workers, initializer=_process_init, initargs=(pickled_universe, shared_memory))
             tm = futureproof.TaskManager(executor, error_policy=futureproof.ErrorPolicyEnum.RAISE)
-            task_args = [(grid_search_worker, c) for c in combinations]
+            task_args = [(grid_search_worker, c, result_store.path) for c in pending]
 
             # Set up a signal handler to stop child processes on quit
             _process_pool_executor = executor._executor
@@ -407,19 +725,29 @@ def perform_grid_search(
 
             # Track the child process completion using tqdm progress bar
             results = []
-            label = ", ".join(p.name for p in combinations[0].parameters)
-            with tqdm(total=len(task_args), desc=f"Grid searching using {max_workers} processes: {label}") as progress_bar:
-                # Extract results from the parallel task queue
-                for task in tm.as_completed():
-                    results.append(task.result)
-                    progress_bar.update()
+            label = ", ".join(p.name for p in pending[0].parameters)
+            try:
+                with tqdm(total=len(task_args), desc=f"Grid searching using {max_workers} processes: {label}") as progress_bar:
+                    # Extract results from the parallel task queue
+                    for task in tm.as_completed():
+                        results.append(task.result)
+                        progress_bar.update()
+            finally:
+                if shared_universe is not None:
+                    shared_universe.close()
+
+            if stats is not None:
+                for r in results:
+                    if r.process_id is not None:
+                        stats[f"worker_{r.process_id}_max_rss"] = max(stats[f"worker_{r.process_id}_max_rss"], r.process_max_rss)
+                        stats[f"worker_{r.process_id}_time_to_first_backtest"] = r.process_time_to_first_backtest
 
         else:
             #
             # Run individual searchers threads
             #
 
-            task_args = [(grid_search_worker, universe, c) for c in combinations]
+            task_args = [(grid_search_worker, universe, c, result_store) for c in pending]
             logger.info("Doing a multithread grid search")
             executor = futureproof.ThreadPoolExecutor(max_workers=max_workers)
             tm = futureproof.TaskManager(executor, error_policy=futureproof.ErrorPolicyEnum.RAISE)
@@ -435,16 +763,19 @@ def perform_grid_search(
         #
 
         logger.info("Doing a single thread grid search")
-        task_args = [(grid_search_worker, universe, c) for c in combinations]
+        task_args = [(grid_search_worker, universe, c, result_store) for c in pending]
         iter = itertools.starmap(run_grid_combination, task_args)
 
         # Force workers to finish
         results = list(iter)
 
+    for r in results:
+        results_by_combination[r.combination] = r
+
     duration = datetime.datetime.utcnow() - start
     logger.info("Grid search finished in %s", duration)
 
-    return results
+    return [results_by_combination[c] for c in combinations]
 
 
 def run_grid_search_backtest(
@@ -623,13 +954,41 @@ def pick_best_grid_search_result(
 #: Process global stored universe for multiprocess workers
 _universe: Optional[TradingStrategyUniverse] = None
 
+#: Keeps the shared memory mapped in multiprocess workers
+_shared_universe_handle = None
+
+#: When the worker process initialiser was called
+_process_started_at: float | None = None
+
+#: Seconds from the worker process start until the universe was ready
+_process_time_to_first_backtest: float | None = None
+
 _process_pool: concurrent.futures.process.ProcessPoolExecutor | None = None
 
-def _process_init(pickled_universe):
+#: Result stores opened by multiprocess workers, path -> store
+_result_stores: Dict[Path, GridSearchResultStore] = {}
+
+def _process_init(pickled_universe, shared_memory=False):
     """Child worker process initialiser."""
     # Transfer ove the universe to the child process
     global _universe
-    _universe = pickle.loads(pickled_universe)
+    global _shared_universe_handle
+    global _process_started_at
+    _process_started_at = time.perf_counter()
+    if shared_memory:
+        _shared_universe_handle = pickle.loads(pickled_universe)
+        _universe = _shared_universe_handle.attach()
+    else:
+        _universe = pickle.loads(pickled_universe)
+
+
+def _record_process_stats(result: GridSearchResult):
+    """Add worker process diagnostics to a result."""
+    result.process_id = os.getpid()
+    # Linux reports kilobytes, macOS bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result.process_max_rss = max_rss if sys.platform == "darwin" else max_rss * 1024
+    result.process_time_to_first_backtest = _process_time_to_first_backtest
 
 
 def _handle_sigterm(*args):
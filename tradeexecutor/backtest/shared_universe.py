@@ -0,0 +1,283 @@
+"""Share trading universe candle data between grid search worker processes.
+
+A multiprocess grid search normally pickles the whole :py:class:`TradingStrategyUniverse`
+and unpickles a private copy in every worker process.
+With a large candle universe and many workers, this multiplies the memory usage
+and the worker startup time.
+
+:py:class:`SharedUniverse` copies candle, liquidity and stop loss candle
+DataFrames to :py:mod:`multiprocessing.shared_memory` once.
+Worker processes reconstruct the grouped universes over the shared buffers
+without copying the data.
+
+- Only numpy backed DataFrame blocks are shared. Other columns,
+  e.g. categorical ones, are pickled as usual
+
+- The shared data must be treated as read-only by the workers,
+  as the memory is shared by all processes
+
+Example:
+
+.. code-block:: python
+
+    shared = SharedUniverse.create(universe)
+    try:
+        # Pass the handle to the child processes
+        handle = pickle.dumps(shared.handle)
+
+        # In a child process
+        universe = pickle.loads(handle).attach()
+    finally:
+        shared.close()
+
+"""
+import copy
+import logging
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.core.internals import BlockManager
+from pandas.core.internals.api import make_block
+from tradingstrategy.utils.groupeduniverse import PairGroupedUniverse
+
+from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniverse
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SharedArray:
+    """A numpy array in a shared memory block."""
+
+    #: Shared memory block name
+    name: str
+
+    #: Numpy dtype string
+    dtype: str
+
+    shape: Tuple[int, ...]
+
+    def attach(self, blocks: List[SharedMemory]) -> np.ndarray:
+        """Map the array from the shared memory.
+
+        :param blocks:
+            Opened shared memory blocks are added to this list,
+            as the block must stay open as long as the array is used.
+        """
+        shm = SharedMemory(name=self.name)
+        blocks.append(shm)
+        return np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=shm.buf)
+
+
+@dataclass(slots=True)
+class SharedDataFrame:
+    """A DataFrame whose numpy blocks live in shared memory."""
+
+    columns: pd.Index
+
+    #: Shared index values, or the index itself if it cannot be shared
+    index: SharedArray | pd.Index
+
+    index_name: Any
+
+    #: (block values, column positions of the block)
+    blocks: List[Tuple[SharedArray | Any, List[int]]]
+
+    def attach(self, shared_blocks: List[SharedMemory]) -> pd.DataFrame:
+        """Reconstruct the DataFrame without copying the data."""
+
+        if isinstance(self.index, SharedArray):
+            index = pd.DatetimeIndex(self.index.attach(shared_blocks), name=self.index_name, copy=False)
+        else:
+            index = self.index
+
+        blocks = []
+        for values, placement in self.blocks:
+            if isinstance(values, SharedArray):
+                values = values.attach(shared_blocks)
+            blocks.append(make_block(values, placement=placement, ndim=2))
+
+        mgr = BlockManager(blocks, [self.columns, index])
+        if hasattr(pd.DataFrame, "_from_mgr"):
+            return pd.DataFrame._from_mgr(mgr, mgr.axes)
+        return pd.DataFrame(mgr)
+
+
+@dataclass(slots=True)
+class SharedGroupedUniverse:
+    """A candle or liquidity universe with its data in shared memory."""
+
+    #: The grouped universe without its DataFrame
+    shell: PairGroupedUniverse
+
+    df: SharedDataFrame
+
+    def attach(self, shared_blocks: List[SharedMemory]) -> PairGroupedUniverse:
+        grouped = copy.copy(self.shell)
+        grouped.df = self.df.attach(shared_blocks)
+        grouped.pairs = grouped.df.groupby(["pair_id"])
+        return grouped
+
+
+@dataclass
+class SharedUniverseHandle:
+    """Pickleable reference to a :py:class:`SharedUniverse`.
+
+    Passed to the worker processes.
+    """
+
+    #: The universe with grouped universes detached
+    universe: TradingStrategyUniverse
+
+    #: Detached grouped universes by their attribute name.
+    #:
+    #: The same grouped universe may be used for candles and stop loss candles,
+    #: so the value can be the name of another attribute.
+    grouped: Dict[str, SharedGroupedUniverse | str] = field(default_factory=dict)
+
+    #: Shared memory blocks mapped in this process.
+    #:
+    #: Not pickled.
+    shared_blocks: List[SharedMemory] = field(default_factory=list)
+
+    def __getstate__(self):
+        return {"universe": self.universe, "grouped": self.grouped}
+
+    def __setstate__(self, state):
+        self.universe = state["universe"]
+        self.grouped = state["grouped"]
+        self.shared_blocks = []
+
+    def attach(self) -> TradingStrategyUniverse:
+        """Reconstruct the trading universe over the shared memory."""
+        universe = copy.copy(self.universe)
+        universe.universe = copy.copy(universe.universe)
+
+        attached = {}
+        for name, value in self.grouped.items():
+            if isinstance(value, SharedGroupedUniverse):
+                attached[name] = value.attach(self.shared_blocks)
+
+        for name, value in self.grouped.items():
+            grouped = attached[value] if isinstance(value, str) else attached[name]
+            _set_grouped(universe, name, grouped)
+
+        return universe
+
+
+#: Grouped universes we share
+_SHARED_ATTRIBUTES = ("candles", "liquidity", "backtest_stop_loss_candles")
+
+
+def _get_grouped(universe: TradingStrategyUniverse, name: str) -> Optional[PairGroupedUniverse]:
+    if name == "backtest_stop_loss_candles":
+        return universe.backtest_stop_loss_candles
+    return getattr(universe.universe, name)
+
+
+def _set_grouped(universe: TradingStrategyUniverse, name: str, value: Optional[PairGroupedUniverse]):
+    if name == "backtest_stop_loss_candles":
+        universe.backtest_stop_loss_candles = value
+    else:
+        setattr(universe.universe, name, value)
+
+
+class SharedUniverse:
+    """Trading universe with candle data in shared memory.
+
+    Created by the parent process that owns the shared memory.
+    Call :py:meth:`close` when the worker processes are done.
+    """
+
+    def __init__(self):
+        self.blocks: List[SharedMemory] = []
+        self.handle: Optional[SharedUniverseHandle] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def create(universe: TradingStrategyUniverse) -> "SharedUniverse":
+        """Copy the candle data of a universe to shared memory."""
+        assert isinstance(universe, TradingStrategyUniverse)
+
+        shared = SharedUniverse()
+
+        detached = copy.copy(universe)
+        detached.universe = copy.copy(universe.universe)
+
+        grouped = {}
+        by_id = {}
+        for name in _SHARED_ATTRIBUTES:
+            value = _get_grouped(universe, name)
+            if value is None:
+                continue
+
+            if id(value) in by_id:
+                grouped[name] = by_id[id(value)]
+            else:
+                grouped[name] = shared.share_grouped(value)
+                by_id[id(value)] = name
+
+            _set_grouped(detached, name, None)
+
+        shared.handle = SharedUniverseHandle(detached, grouped)
+        logger.info("Shared %d bytes of universe data in %d shared memory blocks", shared.get_shared_bytes(), len(shared.blocks))
+        return shared
+
+    def get_shared_bytes(self) -> int:
+        return sum(b.size for b in self.blocks)
+
+    def share_array(self, array: np.ndarray) -> SharedArray:
+        shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.blocks.append(shm)
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        target[:] = array
+        return SharedArray(shm.name, array.dtype.str, array.shape)
+
+    def share_dataframe(self, df: pd.DataFrame) -> SharedDataFrame:
+        index = df.index
+        if isinstance(index, pd.DatetimeIndex) and index.tz is None:
+            shared_index = self.share_array(index.values)
+        else:
+            shared_index = index
+
+        # One block per dtype, so that
+        # pandas does not consolidate (copy) blocks in worker processes
+        df = df._consolidate()
+
+        blocks = []
+        for block in df._mgr.blocks:
+            values = block.values
+            if isinstance(values, np.ndarray) and values.dtype != object:
+                values = self.share_array(values)
+            blocks.append((values, list(block.mgr_locs.as_array)))
+
+        return SharedDataFrame(df.columns, shared_index, index.name, blocks)
+
+    def share_grouped(self, grouped: PairGroupedUniverse) -> SharedGroupedUniverse:
+        shell = copy.copy(grouped)
+        shell.df = None
+        shell.pairs = None
+
+        # Caches are not useful with a new DataFrame
+        if hasattr(shell, "candles_cache"):
+            shell.candles_cache = {}
+        if hasattr(shell, "indexer_cache"):
+            shell.indexer_cache = {}
+
+        return SharedGroupedUniverse(shell, self.share_dataframe(grouped.df))
+
+    def close(self):
+        """Free the shared memory."""
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
@@ -32,6 +32,8 @@ from tradeexecutor.ethereum.web3config import Web3Config
 from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
 from tradeexecutor.state.metadata import Metadata, OnChainData
 from tradeexecutor.state.state import State
+from tradeexecutor.state.journal_store import JournalFileStore
+from tradeexecutor.state.sectioned_store import SectionedFileStore, SECTIONED_STATE_FILE_SUFFIX
 from tradeexecutor.state.store import JSONFileStore, StateStore
 from tradeexecutor.strategy.default_routing_options import TradeRouting
 from tradeexecutor.strategy.pricing_model import PricingModelFactory
@@ -211,8 +213,23 @@ def create_approval_model(approval_type: ApprovalType) -> ApprovalModel:
         raise NotImplementedError()
 
 
-def create_state_store(state_file: Path) -> StateStore:
-    store = JSONFileStore(state_file)
+def create_state_store(state_file: Path, journal=False) -> StateStore:
+    """Create the state store for the executor.
+
+    - State files ending with `.state` use :py:class:`SectionedFileStore`
+      that loads closed positions and statistics history lazily
+
+    :param journal:
+        Use :py:class:`JournalFileStore` that appends only changes
+        to a journal instead of rewriting the full state on every sync.
+    """
+    if Path(state_file).suffix == SECTIONED_STATE_FILE_SUFFIX:
+        assert not journal, "State journal is not supported with sectioned state files"
+        store = SectionedFileStore(state_file)
+    elif journal:
+        store = JournalFileStore(state_file)
+    else:
+        store = JSONFileStore(state_file)
     return store
 
 
@@ -11,7 +11,6 @@ from tabulate import tabulate
 from .app import app
 from ..bootstrap import prepare_executor_id, create_state_store
 from ...analysis.position import display_positions
-from ...state.state import State
 from . import shared_options
 
 
@@ -39,7 +38,7 @@ def show_positions(
     store = create_state_store(state_file)
     assert not store.is_pristine(), f"State file does not exists: {state_file}"
 
-    state = State.read_json_file(state_file)
+    state = store.load()
 
     print(f"Displaying positions and trades for state {state.name}")
     print(f"State last updated: {state.last_updated_at}")
@@ -31,7 +31,9 @@ from ..result import display_backtesting_results
 from ..version_info import VersionInfo
 from ..watchdog import stop_watchdog
 from ...ethereum.enzyme.vault import EnzymeVaultSyncModel
+from ...ethereum.token_cache import TokenCache, set_token_cache
 from ...ethereum.uniswap_v2.uniswap_v2_routing import UniswapV2SimpleRoutingModel
+from ...state.identifier_registry import IdentifierStorage, set_default_identifier_storage
 from ...state.state import State
 from ...state.store import NoneStore, JSONFileStore
 from ...strategy.approval import ApprovalType
@@ -45,6 +47,7 @@ from ...strategy.run_state import RunState
 from ...strategy.strategy_cycle_trigger import StrategyCycleTrigger
 from ...strategy.strategy_module import read_strategy_module, StrategyModuleInformation
 from ...utils.timer import timed_task
+from ...visual.web_chart import WebChartCache
 from ...webhook.server import create_webhook_server
 
 
@@ -129,6 +132,11 @@ def start(
     strategy_cycle_trigger: StrategyCycleTrigger = typer.Option("cycle_offset", envvar="STRATEGY_CYCLE_TRIGGER", help="How do decide when to start executing the next live trading strategy cycle"),
     key_metrics_backtest_cut_off_days: float = typer.Option(90, envvar="KEY_METRIC_BACKTEST_CUT_OFF_DAYS", help="How many days live data is collected until key metrics are switched from backtest to live trading based"),
     check_accounts: bool = typer.Option(True, "--check-accounts", envvar="CHECK_ACCOUNTS", help="Do extra accounting checks to track mismatch balances"),
+    state_journal: bool = typer.Option(False, "--state-journal", envvar="STATE_JOURNAL", help="Append only the changed parts of the state to a journal file on each cycle, instead of rewriting the full state file. The full state file is rewritten periodically."),
+    incremental_universe_refresh: bool = typer.Option(False, "--incremental-universe-refresh", envvar="INCREMENTAL_UNIVERSE_REFRESH", help="In live trading, keep the candle data between strategy cycles and only download new candles, instead of reloading the full history on every cycle."),
+    concurrent_tick: bool = typer.Option(False, "--concurrent-tick", envvar="CONCURRENT_TICK", help="Read position valuations in parallel with the treasury sync at the start of each strategy cycle. Account check balances are read at the block the treasury sync ended on."),
+    intern_identifiers: bool = typer.Option(False, "--intern-identifiers", envvar="INTERN_IDENTIFIERS", help="Write each trading pair and asset once in the state file and refer to it elsewhere, instead of repeating it in every position and trade. The webhook still serves the full state."),
+    concurrent_trigger_checks: bool = typer.Option(False, "--concurrent-trigger-checks", envvar="CONCURRENT_TRIGGER_CHECKS", help="Check take profit and stop loss triggers on their own thread, so that a slow strategy cycle does not delay them. The strategy cycle releases the state while it waits for data and transaction confirmations."),
 
     # Logging
     log_level: str = shared_options.log_level,
@@ -211,6 +219,9 @@ def start(
         confirmation_timeout = datetime.timedelta(seconds=confirmation_timeout)
 
         if asset_management_mode in (AssetManagementMode.hot_wallet, AssetManagementMode.dummy, AssetManagementMode.enzyme):
+            # Token metadata is kept over restarts
+            set_token_cache(TokenCache(cache_path / "token-cache.json"))
+
             web3config = create_web3_config(
                 json_rpc_binance=json_rpc_binance,
                 json_rpc_polygon=json_rpc_polygon,
@@ -274,8 +285,11 @@ def start(
 
         approval_model = create_approval_model(approval_type)
 
+        if intern_identifiers:
+            set_default_identifier_storage(IdentifierStorage.interned)
+
         if state_file:
-            store = create_state_store(Path(state_file))
+            store = create_state_store(Path(state_file), journal=state_journal)
         else:
             # Backtests do not have persistent state
             if asset_management_mode == AssetManagementMode.backtest:
@@ -326,6 +340,9 @@ def start(
         run_state.version = VersionInfo.read_docker_version()
         run_state.executor_id = id
 
+        # Web charts rendered by the main loop and served by the webhook
+        chart_cache = WebChartCache()
+
         # Create our webhook server
         if http_enabled:
 
@@ -338,6 +355,7 @@ def start(
                 store,
                 metadata,
                 run_state,
+                chart_cache=chart_cache,
             )
         else:
             logger.info("Web server disabled")
@@ -440,6 +458,10 @@ def start(
         routing_model=routing_model,
         metadata=metadata,
         check_accounts=check_accounts,
+        incremental_universe_refresh=incremental_universe_refresh,
+        chart_cache=chart_cache,
+        concurrent_tick=concurrent_tick,
+        concurrent_trigger_checks=concurrent_trigger_checks,
     )
 
     # Crash gracefully at the start up if our main loop cannot set itself up
@@ -13,7 +13,7 @@ import pickle
 import random
 from pathlib import Path
 from queue import Queue
-from typing import Optional, Callable, List, cast, Tuple
+from typing import Optional, Callable, List, cast, Tuple, Type
 
 import pandas as pd
 from apscheduler.events import EVENT_JOB_ERROR
@@ -25,13 +25,14 @@ from tradeexecutor.ethereum.enzyme.vault import EnzymeVaultSyncModel
 from tradeexecutor.state.metadata import Metadata
 from tradeexecutor.statistics.summary import calculate_summary_statistics
 from tradeexecutor.strategy.account_correction import check_accounts
-from tradeexecutor.strategy.pandas_trader.decision_trigger import wait_for_universe_data_availability_jsonl
+from tradeexecutor.strategy.pandas_trader.decision_trigger import wait_for_universe_data_availability_jsonl, refresh_universe_incremental
 from tradeexecutor.strategy.routing import RoutingModel
 from tradeexecutor.strategy.run_state import RunState
 from tradeexecutor.strategy.strategy_cycle_trigger import StrategyCycleTrigger
 
 try:
     from apscheduler.executors.pool import ThreadPoolExecutor
+    from apscheduler.schedulers.base import BaseScheduler
     from apscheduler.schedulers.blocking import BlockingScheduler
 except ImportError:
     # apscheduler is only required in live trading
@@ -45,12 +46,14 @@ except ImportError:
     from tqdm.auto import tqdm
 
 from tradeexecutor.backtest.backtest_pricing import BacktestSimplePricingModel
+from tradeexecutor.backtest.backtest_trigger_scan import BacktestTriggerScanner
 from tradeexecutor.state.state import State, BacktestData
 from tradeexecutor.state.store import StateStore
 from tradeexecutor.strategy.sync_model import SyncMethodV0, SyncModel
 from tradeexecutor.state.trade import TradeExecution
 from tradeexecutor.state.validator import validate_state_serialisation
 from tradeexecutor.statistics.core import update_statistics
+from tradeexecutor.statistics.trade_summary_accumulator import TradeSummaryAccumulator
 from tradeexecutor.strategy.approval import ApprovalModel
 from tradeexecutor.strategy.description import StrategyExecutionDescription
 from tradeexecutor.strategy.execution_model import ExecutionModel
@@ -58,10 +61,13 @@ from tradeexecutor.strategy.execution_context import ExecutionMode, ExecutionCon
 from tradeexecutor.strategy.factory import StrategyFactory
 from tradeexecutor.strategy.pricing_model import PricingModelFactory
 from tradeexecutor.strategy.runner import StrategyRunner
+from tradeexecutor.strategy.state_lock import StateLock, hold_state
 from tradeexecutor.strategy.cycle import CycleDuration, snap_to_next_tick, snap_to_previous_tick, round_datetime_up
 from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniverse
 from tradeexecutor.strategy.universe_model import UniverseModel, StrategyExecutionUniverse, UniverseOptions
 from tradeexecutor.strategy.valuation import ValuationModelFactory
+from tradeexecutor.utils.metrics import get_metrics_registry
+from tradeexecutor.visual.web_chart import WebChartCache
 from tradingstrategy.client import Client, BaseClient
 from tradingstrategy.timebucket import TimeBucket
 
@@ -140,8 +146,43 @@ class ExecutionLoop:
             execution_test_hook: Optional[ExecutionTestHook] = None,
             metadata: Optional[Metadata] = None,
             check_accounts: Optional[bool] = None,
+            vectorised_trigger_checks: bool = True,
+            incremental_universe_refresh: bool = False,
+            chart_cache: Optional[WebChartCache] = None,
+            concurrent_tick: bool = False,
+            concurrent_trigger_checks: bool = False,
     ):
-        """See main.py for details."""
+        """See main.py for details.
+
+        :param vectorised_trigger_checks:
+            In backtesting, check take profit/stop loss triggers only
+            at the stop loss ticks where something can happen.
+
+            See :py:mod:`tradeexecutor.backtest.backtest_trigger_scan`.
+
+        :param incremental_universe_refresh:
+            In live trading, keep the candles between cycles and only
+            download the new candles, instead of downloading the full history.
+
+            See :py:func:`tradeexecutor.strategy.pandas_trader.decision_trigger.refresh_universe_incremental`.
+
+        :param chart_cache:
+            Share the live state with the webhook, which renders the web charts from it.
+
+            See :py:class:`tradeexecutor.visual.web_chart.WebChartCache`.
+
+        :param concurrent_tick:
+            In live trading, read position valuations
+            in parallel with the treasury sync at the start of a cycle.
+
+            See :py:meth:`tradeexecutor.strategy.runner.StrategyRunner.prefetch_tick_inputs`.
+
+        :param concurrent_trigger_checks:
+            In live trading, check take profit and stop loss triggers on their own thread,
+            so that a slow strategy cycle does not delay them.
+
+            See :py:mod:`tradeexecutor.strategy.state_lock`.
+        """
 
         #
         # TODO: Initialisation needs a major rewrite
@@ -190,6 +231,16 @@ class ExecutionLoop:
         # cycle -> dump mappings
         self.debug_dump_state = {}
 
+        # Keep trade summary statistics between the cycles
+        self.summary_accumulator = TradeSummaryAccumulator()
+
+        self.chart_cache = chart_cache
+
+        #: Shared between the strategy cycle, the trigger check and the webhook threads.
+        #:
+        #: Set up in :py:meth:`setup` if `concurrent_trigger_checks` or `chart_cache` is used.
+        self.state_lock: Optional[StateLock] = None
+
         # Hook in any overrides for strategy cycles
         self.universe_options = UniverseOptions(
             candle_time_bucket_override=self.backtest_candle_time_frame_override,
@@ -239,6 +290,15 @@ class ExecutionLoop:
 
         return state
 
+    def update_chart_cache(self, state: State):
+        """Tell the webhook the state has changed after it has been stored.
+
+        The webhook renders the web charts from our in-memory state
+        when they are asked for, see :py:class:`tradeexecutor.visual.web_chart.WebChartCache`.
+        """
+        if self.chart_cache is not None and self.state_lock is not None:
+            self.chart_cache.update(state, self.state_lock)
+
     def init_execution_model(self):
         """Initialise the execution.
 
@@ -295,31 +355,35 @@ class ExecutionLoop:
             Also update technical charts
         """
 
-        run_state = self.run_state
-
-        # Strategy statistics
-        # Even if the strategy has no action yet (deposits, trades)
-        # we need to calculate these statistics, as this will
-        # calculate the backtested metrics using in strategy summary tiles
-        logger.info("refresh_live_run_state() - calculating summary statistics")
-        stats = calculate_summary_statistics(
-            state,
-            self.execution_context.mode,
-            backtested_state=self.metadata.backtested_state,
-            key_metrics_backtest_cut_off=self.metadata.key_metrics_backtest_cut_off,
-        )
-        self.run_state.summary_statistics = stats
+        with hold_state(self.state_lock):
+            run_state = self.run_state
 
-        # Frozen positions is needed for fault checking hooks
-        run_state.frozen_positions = len(state.portfolio.frozen_positions)
+            # Strategy statistics
+            # Even if the strategy has no action yet (deposits, trades)
+            # we need to calculate these statistics, as this will
+            # calculate the backtested metrics using in strategy summary tiles
+            logger.info("refresh_live_run_state() - calculating summary statistics")
+            stats = calculate_summary_statistics(
+                state,
+                self.execution_context.mode,
+                backtested_state=self.metadata.backtested_state,
+                key_metrics_backtest_cut_off=self.metadata.key_metrics_backtest_cut_off,
+            )
+            self.run_state.summary_statistics = stats
+
+            # Where our time goes
+            run_state.task_metrics = get_metrics_registry().get_summary()
 
-        # Strategy charts
-        if visualisation:
-            assert universe, "Candle data must be available to update visualisations"
-            self.runner.refresh_visualisations(state, universe)
+            # Frozen positions is needed for fault checking hooks
+            run_state.frozen_positions = len(state.portfolio.frozen_positions)
 
-        # Mark last refreshed
-        run_state.bumb_refreshed()
+            # Strategy charts
+            if visualisation:
+                assert universe, "Candle data must be available to update visualisations"
+                self.runner.refresh_visualisations(state, universe)
+
+            # Mark last refreshed
+            run_state.bumb_refreshed()
 
     def tick(self,
              unrounded_timestamp: datetime.datetime,
@@ -365,6 +429,9 @@ class ExecutionLoop:
         assert isinstance(state, State)
         assert isinstance(cycle_duration, CycleDuration)
 
+        # Tasks until the next tick count towards this cycle in the metrics breakdown
+        get_metrics_registry().start_cycle(cycle)
+
         if strategy_cycle_timestamp:
             ts = strategy_cycle_timestamp
         else:
@@ -416,32 +483,36 @@ class ExecutionLoop:
             logger.info("Reusing previously loaded universe: %s", existing_universe)
             universe = existing_universe
 
-        # Run cycle checks
-        self.runner.pretick_check(ts, universe)
-
-        if cycle == 1 and self.backtest_setup is not None:
-            # The hook to set up backtest initial balance.
-            # TODO: Legacy - remove.
-            logger.info("Performing initial backtest account funding")
-            self.backtest_setup(state, universe, self.sync_model)
-
-        # Execute the strategy tick and trades
-        self.runner.tick(
-            strategy_cycle_timestamp=ts,
-            universe=universe,
-            state=state,
-            debug_details=debug_details,
-            cycle_duration=cycle_duration,
-            cycle=cycle,
-        )
+        # The cycle releases the state lock while it waits for transaction confirmations
+        with hold_state(self.state_lock, releasable=True):
+            # Run cycle checks
+            self.runner.pretick_check(ts, universe)
+
+            if cycle == 1 and self.backtest_setup is not None:
+                # The hook to set up backtest initial balance.
+                # TODO: Legacy - remove.
+                logger.info("Performing initial backtest account funding")
+                self.backtest_setup(state, universe, self.sync_model)
+
+            # Execute the strategy tick and trades
+            self.runner.tick(
+                strategy_cycle_timestamp=ts,
+                universe=universe,
+                state=state,
+                debug_details=debug_details,
+                cycle_duration=cycle_duration,
+                cycle=cycle,
+            )
 
-        state.uptime.record_cycle_complete(cycle)
+            state.uptime.record_cycle_complete(cycle)
 
-        # Check that state is good before writing it to the disk
-        state.perform_integrity_check()
+            # Check that state is good before writing it to the disk
+            state.perform_integrity_check()
+
+            # Store the current state to disk
+            self.store.sync(state)
 
-        # Store the current state to disk
-        self.store.sync(state)
+        self.update_chart_cache(state)
 
         if extra_debug_data is not None:
             debug_details.update(extra_debug_data)
@@ -467,26 +538,28 @@ class ExecutionLoop:
         :param clock: Real-time or historical clock
         """
 
-        # Set up the execution to perform the valuation
+        with hold_state(self.state_lock):
+            # Set up the execution to perform the valuation
 
-        if len(state.portfolio.reserves) == 0:
-            logger.info("The strategy has no reserves or deposits yet")
+            if len(state.portfolio.reserves) == 0:
+                logger.info("The strategy has no reserves or deposits yet")
 
-        routing_state, pricing_model, valuation_method = self.runner.setup_routing(universe)
+            routing_state, pricing_model, valuation_method = self.runner.setup_routing(universe)
 
-        with self.timed_task_context_manager("revalue_portfolio_statistics"):
-            logger.info("Updating position valuations")
-            self.runner.revalue_portfolio(clock, state, valuation_method)
+            with self.timed_task_context_manager("revalue_portfolio_statistics"):
+                logger.info("Updating position valuations")
+                self.runner.revalue_portfolio(clock, state, valuation_method)
 
-        with self.timed_task_context_manager("update_statistics"):
-            logger.info("Updating position statistics")
-            update_statistics(clock, state.stats, state.portfolio, execution_mode)
+            with self.timed_task_context_manager("update_statistics"):
+                logger.info("Updating position statistics")
+                update_statistics(clock, state.stats, state.portfolio, execution_mode, summary_accumulator=self.summary_accumulator)
 
-        # Check that state is good before writing it to the disk
-        state.perform_integrity_check()
+            # Check that state is good before writing it to the disk
+            state.perform_integrity_check()
 
-        # Store the current state to disk
-        self.store.sync(state)
+            # Store the current state to disk
+            self.store.sync(state)
+            self.update_chart_cache(state)
 
     def check_position_triggers(self,
                           ts: datetime.datetime,
@@ -507,30 +580,33 @@ class ExecutionLoop:
             List of generated trigger trades
         """
 
-        logger.info("Starting stop loss checks at %s", ts)
+        with hold_state(self.state_lock):
+            logger.info("Starting stop loss checks at %s", ts)
 
-        if len(state.portfolio.reserves) == 0:
-            logger.info("The strategy has no reserves or deposits yet")
-            return []
+            if len(state.portfolio.reserves) == 0:
+                logger.info("The strategy has no reserves or deposits yet")
+                return []
 
-        routing_state, pricing_model, valuation_method = self.runner.setup_routing(universe)
+            routing_state, pricing_model, valuation_method = self.runner.setup_routing(universe)
 
-        # Do stop loss checks for every time point between now and next strategy cycle
-        trades = self.runner.check_position_triggers(
-            ts,
-            state,
-            universe,
-            pricing_model,
-            routing_state
-        )
+            # Do stop loss checks for every time point between now and next strategy cycle
+            trades = self.runner.check_position_triggers(
+                ts,
+                state,
+                universe,
+                pricing_model,
+                routing_state,
+                skip_unconfirmed_positions=self.concurrent_trigger_checks,
+            )
 
-        # Check that state is good before writing it to the disk
-        state.perform_integrity_check()
+            # Check that state is good before writing it to the disk
+            state.perform_integrity_check()
 
-        # Store the current state to disk
-        self.store.sync(state)
+            # Store the current state to disk
+            self.store.sync(state)
+            self.update_chart_cache(state)
 
-        return trades
+            return trades
 
     def warm_up_backtest(self):
         """Load backtesting trading universe.
@@ -606,7 +682,17 @@ class ExecutionLoop:
         tp = 0
         sl = 0
 
+        ticks = []
         while ts < end_ts:
+            ticks.append(ts)
+            ts += tick_size.to_timedelta()
+
+        if self.vectorised_trigger_checks:
+            # Skip ticks where nothing can trigger
+            scanner = BacktestTriggerScanner(stop_loss_pricing_model, ticks)
+            ticks = scanner.iterate_ticks(state)
+
+        for ts in ticks:
             logger.debug("Backtesting take profit/stop loss at %s", ts)
             trades = self.runner.check_position_triggers(
                 ts,
@@ -620,7 +706,6 @@ class ExecutionLoop:
                     sl += 1
                 elif t.is_take_profit():
                     tp += 1
-            ts += tick_size.to_timedelta()
 
         return tp, sl
 
@@ -635,6 +720,8 @@ class ExecutionLoop:
 
         logger.info("Strategy is executed in backtesting mode, starting at %s, cycle duration is %s", ts, self.cycle_duration.value)
 
+        get_metrics_registry().reset_cycles()
+
         cycle = state.cycle
         universe = None
 
@@ -866,6 +953,7 @@ class ExecutionLoop:
                         self.client,
                         universe,
                         max_wait=self.max_data_delay,
+                        incremental=self.incremental_universe_refresh,
                     )
                     logger.trade("Strategy cycle %d, universe updated result received: %s", cycle, universe_update_result)
                     universe = universe_update_result.updated_universe
@@ -885,9 +973,23 @@ class ExecutionLoop:
                             raise RuntimeError(f"Strategy market data lag exceeded.\n"
                                                f"Currently lag to the start of the last candle is {lag}, allowed max lag is {max_allowed_lag}.\n"
                                                f"Last candle is at {last_candle_timestamp}")
+                    existing_universe = universe
+                elif self.incremental_universe_refresh and isinstance(universe, TradingStrategyUniverse):
+                    # Add the new candles to the universe we created on the first cycle
+                    universe = refresh_universe_incremental(
+                        strategy_cycle_timestamp,
+                        self.client,
+                        universe,
+                    )
+
+                    if self.max_data_delay is not None:
+                        self.universe_model.check_data_age(strategy_cycle_timestamp, universe, self.max_data_delay)
+                    existing_universe = universe
                 else:
-                    # Force universe recreation on every cycle
-                    universe = None
+                    # Force universe recreation on every cycle.
+                    # Trigger checks keep using the previous universe
+                    # until the new one has been downloaded.
+                    existing_universe = None
 
                 # Run the main strategy logic
                 universe = self.tick(
@@ -896,7 +998,7 @@ class ExecutionLoop:
                     state,
                     cycle=cycle,
                     strategy_cycle_timestamp=strategy_cycle_timestamp,
-                    existing_universe=universe,
+                    existing_universe=existing_universe,
                     live=True,
                     extra_debug_data=extra_debug_data,
                 )
@@ -979,38 +1081,17 @@ class ExecutionLoop:
             run_state.bumb_refreshed()
 
         # Set up live trading tasks using APScheduler
-        executors = {
-            'default': ThreadPoolExecutor(1),
-        }
-        start_time = datetime.datetime(1970, 1, 1)
-
-        # We use a single thread scheduler to run our various tasks.
-        # Any task blocks other tasks - there is no parallerism or multithread support at the moment.
-        # Multithread support would need making the architecture more complex with various locks
-        # that could then be additional source of bugs.
-        scheduler = BlockingScheduler(executors=executors, timezone=datetime.timezone.utc)
-        scheduler.add_job(
+        scheduler = create_live_scheduler(
             live_cycle,
-            'interval',
-            seconds=self.cycle_duration.to_timedelta().total_seconds(),
-            start_date=start_time + tick_offset,
-            misfire_grace_time = None,  # Will always run the job no matter how late it is
+            live_positions,
+            live_trigger_checks,
+            cycle_interval=self.cycle_duration.to_timedelta(),
+            tick_offset=tick_offset,
+            stats_refresh_frequency=self.stats_refresh_frequency,
+            position_trigger_check_frequency=self.position_trigger_check_frequency,
+            concurrent_trigger_checks=self.concurrent_trigger_checks,
         )
 
-        if self.stats_refresh_frequency not in (datetime.timedelta(0), None):
-            scheduler.add_job(
-                live_positions,
-                'interval',
-                seconds=self.stats_refresh_frequency.total_seconds(),
-                start_date=start_time)
-
-        if self.position_trigger_check_frequency not in (datetime.timedelta(0), None):
-            scheduler.add_job(
-                live_trigger_checks,
-                'interval',
-                seconds=self.position_trigger_check_frequency.total_seconds(),
-                start_date=start_time)
-
         def listen_error(event):
             if event.exception:
                 logger.info("Scheduled task received exception. event: %s, execption: %s", event, event.exception)
@@ -1086,6 +1167,14 @@ class ExecutionLoop:
         # TODO: Pass this as a constructor argument
         # TODO: Accounting checks only supports Enzyme currently
         self.runner.accounting_checks = self.check_accounts and isinstance(self.sync_model, EnzymeVaultSyncModel)
+        self.runner.concurrent_tick = self.concurrent_tick and not self.is_backtest()
+
+        # The webhook renders the web charts from the live state too
+        if (self.concurrent_trigger_checks or self.chart_cache is not None) and not self.is_backtest():
+            self.state_lock = StateLock()
+            self.execution_model.state_lock = self.state_lock
+
+        self.update_chart_cache(state)
 
         # Load cycle_duration from v0.1 strategies,
         # if not given from the command line to override backtesting data
@@ -1124,3 +1213,68 @@ class ExecutionLoop:
         state = self.setup()
         return self.run_with_state(state)
 
+
+def create_live_scheduler(
+    live_cycle: Callable,
+    live_positions: Callable,
+    live_trigger_checks: Callable,
+    cycle_interval: datetime.timedelta,
+    tick_offset: datetime.timedelta,
+    stats_refresh_frequency: Optional[datetime.timedelta],
+    position_trigger_check_frequency: Optional[datetime.timedelta],
+    concurrent_trigger_checks=False,
+    scheduler_class: Optional[Type["BaseScheduler"]] = None,
+    start_time=datetime.datetime(1970, 1, 1),
+) -> "BaseScheduler":
+    """Set up the live trading tasks.
+
+    By default, we use a single thread to run our tasks.
+    Any task blocks other tasks, so a slow strategy cycle delays the trigger checks.
+
+    With `concurrent_trigger_checks`, trigger checks run on their own thread
+    and the tasks share the state using :py:class:`tradeexecutor.strategy.state_lock.StateLock`.
+
+    :param scheduler_class:
+        APScheduler scheduler class.
+
+        Default to :py:class:`BlockingScheduler`.
+
+    :return:
+        Scheduler, not yet started
+    """
+
+    executors = {
+        'default': ThreadPoolExecutor(1),
+    }
+
+    if concurrent_trigger_checks:
+        executors["triggers"] = ThreadPoolExecutor(1)
+
+    scheduler_class = scheduler_class or BlockingScheduler
+    scheduler = scheduler_class(executors=executors, timezone=datetime.timezone.utc)
+    scheduler.add_job(
+        live_cycle,
+        'interval',
+        seconds=cycle_interval.total_seconds(),
+        start_date=start_time + tick_offset,
+        misfire_grace_time = None,  # Will always run the job no matter how late it is
+    )
+
+    if stats_refresh_frequency not in (datetime.timedelta(0), None):
+        scheduler.add_job(
+            live_positions,
+            'interval',
+            seconds=stats_refresh_frequency.total_seconds(),
+            start_date=start_time)
+
+    if position_trigger_check_frequency not in (datetime.timedelta(0), None):
+        scheduler.add_job(
+            live_trigger_checks,
+            'interval',
+            seconds=position_trigger_check_frequency.total_seconds(),
+            start_date=start_time,
+            executor="triggers" if concurrent_trigger_checks else "default",
+            coalesce=True,
+        )
+
+    return scheduler
@@ -110,6 +110,9 @@ class EnzymeVaultSyncModel(SyncModel):
     def get_hot_wallet(self) -> Optional[HotWallet]:
         return self.hot_wallet
 
+    def get_latest_block_number(self) -> Optional[int]:
+        return self.web3.eth.block_number
+
     def is_ready_for_live_trading(self, state: State) -> bool:
         """Have we run init command on the vault."""
         return state.sync.deployment.block_number is not None
@@ -393,18 +396,29 @@ class EnzymeVaultSyncModel(SyncModel):
         deployment.chain_id = ChainId(web3.eth.chain_id)
         deployment.initialised_at = datetime.datetime.utcnow()
 
-    def fetch_onchain_balances(self, assets: List[AssetIdentifier], filter_zero=True) -> Iterable[OnChainBalance]:
+    def fetch_onchain_balances(
+        self,
+        assets: List[AssetIdentifier],
+        filter_zero=True,
+        block_number: Optional[int] = None,
+    ) -> Iterable[OnChainBalance]:
         """Read the on-chain asset details.
 
         - Mark the block we are reading at the start
 
         :param filter_zero:
             Do not return zero balances
+
+        :param block_number:
+            Read balances at this block.
+
+            If not given, use the latest block.
         """
         return fetch_address_balances(
             self.web3,
             self.get_vault_address(),
             assets,
+            block_number=block_number,
             filter_zero=filter_zero,
         )
 
@@ -4,9 +4,11 @@ Value positions based on their "dump" price on Uniswap,
 assuming we get the worst possible single trade execution.
 """
 import datetime
-from typing import Tuple
+from decimal import Decimal
+from typing import Tuple, List, Collection, Optional
 
 from tradeexecutor.ethereum.eth_pricing_model import EthereumPricingModel
+from tradeexecutor.state.identifier import TradingPairIdentifier
 from tradeexecutor.state.position import TradingPosition
 from tradeexecutor.state.types import USDollarAmount
 from tradeexecutor.strategy.valuation import ValuationModel
@@ -57,4 +59,50 @@ class EthereumPoolRevaluator(ValuationModel):
 
         price_structure = self.pricing_model.get_sell_price(ts, pair, quantity)
 
-        return ts, price_structure.price
\ No newline at end of file
+        return ts, price_structure.price
+
+    def revalue_batch(self,
+                      ts: datetime.datetime,
+                      positions: Optional[Collection[TradingPosition]],
+                      block_identifier: Optional[int] = None,
+                      quantities: Optional[Collection[Tuple[TradingPairIdentifier, Decimal]]] = None,
+                      ) -> List[Tuple[datetime.datetime, USDollarAmount]]:
+        """Revalue many positions at once.
+
+        If the pricing model supports batched sell prices,
+        all positions are priced against the same block with a single JSON-RPC call.
+
+        :param positions:
+            Positions to revalue.
+
+            Not used if `quantities` is given.
+
+        :param block_identifier:
+            Price against this block.
+
+            If not given, use the latest block.
+
+        :param quantities:
+            (pair, quantity) tuples to price instead of reading the positions.
+
+            Used when revaluing in a background thread, as the position objects
+            may be changed by the main thread at the same time.
+
+        :return:
+            (revaluation date, price) tuples in the same order as `positions` or `quantities`
+        """
+
+        if quantities is None:
+            for p in positions:
+                assert p.is_long(), "Short not supported"
+            quantities = [(p.pair, p.get_quantity()) for p in positions]
+
+        # Cannot do pricing for zero quantity
+        requests = [(pair, q) for pair, q in quantities if q != 0]
+
+        if hasattr(self.pricing_model, "get_sell_prices"):
+            price_structures = iter(self.pricing_model.get_sell_prices(ts, requests, block_identifier=block_identifier))
+        else:
+            price_structures = iter([self.pricing_model.get_sell_price(ts, pair, q) for pair, q in requests])
+
+        return [(ts, next(price_structures).price) if q != 0 else (ts, 0.0) for pair, q in quantities]
@@ -5,7 +5,7 @@ import datetime
 from collections import Counter
 from decimal import Decimal
 from itertools import chain
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Set, Tuple, Iterable
 from abc import abstractmethod
 
 from eth_account.datastructures import SignedTransaction
@@ -17,14 +17,16 @@ from eth_defi.abi import get_deployed_contract
 from eth_defi.deploy import get_or_create_contract_registry
 from eth_defi.gas import GasPriceSuggestion, apply_gas, estimate_gas_fees
 from eth_defi.hotwallet import HotWallet
-from eth_defi.token import fetch_erc20_details, TokenDetails
-from eth_defi.confirmation import wait_transactions_to_complete, \
-    broadcast_and_wait_transactions_to_complete, broadcast_transactions
+from eth_defi.token import TokenDetails
+from eth_defi.confirmation import ConfirmationTimedOut, broadcast_and_wait_transactions_to_complete, broadcast_transactions
 from eth_defi.trace import trace_evm_transaction, print_symbolic_trace
 from eth_defi.uniswap_v2.deployment import UniswapV2Deployment, FOREVER_DEADLINE 
 from eth_defi.trade import TradeSuccess, TradeFail
 from eth_defi.revert_reason import fetch_transaction_revert_reason
 
+from tradeexecutor.ethereum.onchain_balance import fetch_balances
+from tradeexecutor.ethereum.receipt_watcher import watch_receipts
+from tradeexecutor.ethereum.token_cache import fetch_token_details_cached, get_token_cache
 from tradeexecutor.ethereum.tx import TransactionBuilder
 from tradeexecutor.state.state import State
 from tradeexecutor.state.trade import TradeExecution, TradeStatus
@@ -34,6 +36,7 @@ from tradeexecutor.state.identifier import AssetIdentifier
 from tradeexecutor.ethereum.uniswap_v2.uniswap_v2_routing import UniswapV2SimpleRoutingModel, UniswapV2RoutingState
 from tradeexecutor.ethereum.uniswap_v3.uniswap_v3_routing import UniswapV3SimpleRoutingModel, UniswapV3RoutingState
 from tradeexecutor.strategy.execution_model import ExecutionModel, RoutingStateDetails
+from tradeexecutor.strategy.state_lock import release_state
 from tradingstrategy.chain import ChainId
 
 logger = logging.getLogger(__name__)
@@ -97,6 +100,9 @@ class EthereumExecutionModel(ExecutionModel):
         self.max_slippage = max_slippage
         self.mainnet_fork = mainnet_fork
 
+        #: Router address -> partial deployment used in trade analysis
+        self.analysis_deployments = {}
+
     @property
     def web3(self):
         return self.tx_builder.web3
@@ -137,6 +143,13 @@ class EthereumExecutionModel(ExecutionModel):
     def mock_partial_deployment_for_analysis(self):
         """Links to either uniswap v2 or v3 implementation in eth_defi"""
 
+    def get_analysis_deployment(self, web3: Web3, router_address: str):
+        """Get a partial deployment for trade analysis, created once per router."""
+        deployment = self.analysis_deployments.get(router_address)
+        if deployment is None:
+            deployment = self.analysis_deployments[router_address] = self.mock_partial_deployment_for_analysis(web3, router_address)
+        return deployment
+
     @abstractmethod 
     def is_v3(self):
         """Returns true if instance is related to Uniswap V3, else false. 
@@ -210,6 +223,8 @@ class EthereumExecutionModel(ExecutionModel):
                 stop_on_execution_failure=True)
 
             t.repaired_at = datetime.datetime.utcnow()
+            # Repaired trades no longer count towards the position
+            state.portfolio.get_position_by_id(t.position_id).invalidate_cached_aggregates()
             if not t.notes:
                 # Add human readable note,
                 # but don't override any other notes
@@ -271,6 +286,8 @@ class EthereumExecutionModel(ExecutionModel):
         :param stop_on_execution_failure:
             If any of the transactions fail, then raise an exception.
             Set for unit test.
+
+            The exception is raised after all confirmed trades have been resolved.
         """
 
         web3 = self.web3
@@ -281,19 +298,46 @@ class EthereumExecutionModel(ExecutionModel):
 
         if confirmation_timeout > datetime.timedelta(0):
 
-            receipts = wait_trades_to_complete(
+            completed_trades = watch_trades_to_complete(
                 web3,
                 trades,
                 max_timeout=confirmation_timeout,
                 confirmation_block_count=confirmation_block_count,
             )
 
-            self.resolve_trades(
-                datetime.datetime.now(),
-                state,
-                broadcasted,
-                receipts,
-                stop_on_execution_failure=stop_on_execution_failure)
+            # The first failed trade is raised only after
+            # the rest of the confirmed trades have been resolved
+            execution_failure = None
+
+            while True:
+                # Let the trigger checks run while we wait
+                with release_state(self.state_lock):
+                    try:
+                        completed = next(completed_trades, None)
+                    except ConfirmationTimedOut as e:
+                        if execution_failure is None:
+                            raise
+                        logger.error("Trades left unconfirmed after a failed trade: %s", e)
+                        break
+
+                if completed is None:
+                    break
+
+                # Resolve each trade as soon as its transactions are confirmed,
+                # while the rest are still pending
+                trade, receipts = completed
+                try:
+                    self.resolve_trades(
+                        datetime.datetime.now(),
+                        state,
+                        broadcasted,
+                        receipts,
+                        stop_on_execution_failure=stop_on_execution_failure and execution_failure is None)
+                except TradeExecutionFailed as e:
+                    execution_failure = e
+
+            if execution_failure is not None:
+                raise execution_failure
 
     def execute_trades(self,
                        ts: datetime.datetime,
@@ -372,11 +416,11 @@ class EthereumExecutionModel(ExecutionModel):
         # if the blockchain transaction was successsful.
         # Also get the actual executed token counts.
         for trade in trades:
-            base_token_details = fetch_erc20_details(web3, trade.pair.base.checksum_address)
-            quote_token_details = fetch_erc20_details(web3, trade.pair.quote.checksum_address)
+            base_token_details = fetch_token_details_cached(web3, trade.pair.base.checksum_address)
+            quote_token_details = fetch_token_details_cached(web3, trade.pair.quote.checksum_address)
             reserve = trade.reserve_currency
             swap_tx = get_swap_transactions(trade)
-            uniswap = self.mock_partial_deployment_for_analysis(web3, swap_tx.contract_address)
+            uniswap = self.get_analysis_deployment(web3, swap_tx.contract_address)
 
             tx_dict = swap_tx.get_transaction()
             receipt = receipts[HexBytes(swap_tx.tx_hash)]
@@ -489,6 +533,9 @@ def report_failure(
     """What to do if trade fails"""
     
     logger.error("Trade failed %s: %s", ts, trade)
+
+    # The failure may be caused by a revoked allowance
+    get_token_cache().invalidate_token_allowances(trade.pair.chain_id, [trade.pair.base.address, trade.pair.quote.address])
     
     state.mark_trade_failed(
         ts,
@@ -597,8 +644,8 @@ def prepare_swaps(
 
     for idx, t in enumerate(instructions):
 
-        base_token_details = fetch_erc20_details(web3, t.pair.base.checksum_address)
-        quote_token_details = fetch_erc20_details(web3, t.pair.quote.checksum_address)
+        base_token_details = fetch_token_details_cached(web3, t.pair.base.checksum_address)
+        quote_token_details = fetch_token_details_cached(web3, t.pair.quote.checksum_address)
 
         assert base_token_details.decimals is not None, f"Bad token at {t.pair.base.address}"
         assert quote_token_details.decimals is not None, f"Bad token at {t.pair.quote.address}"
@@ -638,8 +685,8 @@ def approve_tokens(
     approvals = Counter()
 
     for t in instructions:
-        base_token_details = fetch_erc20_details(web3, t.pair.base.checksum_address)
-        quote_token_details = fetch_erc20_details(web3, t.pair.quote.checksum_address)
+        base_token_details = fetch_token_details_cached(web3, t.pair.base.checksum_address)
+        quote_token_details = fetch_token_details_cached(web3, t.pair.quote.checksum_address)
 
         # Update approval counters for the whole batch
         if t.is_buy():
@@ -683,8 +730,8 @@ def approve_infinity(
     approvals = Counter()
 
     for t in instructions:
-        base_token_details = fetch_erc20_details(web3, t.pair.base.checksum_address)
-        quote_token_details = fetch_erc20_details(web3, t.pair.quote.checksum_address)
+        base_token_details = fetch_token_details_cached(web3, t.pair.base.checksum_address)
+        quote_token_details = fetch_token_details_cached(web3, t.pair.quote.checksum_address)
 
         # Update approval counters for the whole batch
         if t.is_buy():
@@ -783,22 +830,57 @@ def broadcast(
     return res
 
 
-def wait_trades_to_complete(
+def watch_trades_to_complete(
         web3: Web3,
         trades: List[TradeExecution],
         confirmation_block_count=0,
         max_timeout=datetime.timedelta(minutes=5),
-        poll_delay=datetime.timedelta(seconds=1)) -> Dict[HexBytes, dict]:
+        poll_delay=datetime.timedelta(seconds=1)) -> Iterable[Tuple[TradeExecution, Dict[HexBytes, dict]]]:
     """Watch multiple transactions executed at parallel.
 
-    :return: Map of transaction hashes -> receipt
+    All receipts are polled with one JSON-RPC batch request per poll,
+    see :py:mod:`tradeexecutor.ethereum.receipt_watcher`.
+
+    :return:
+        Iterator of (trade, map of transaction hashes -> receipt).
+
+        A trade is given out as soon as all of its transactions are confirmed.
     """
     logger.info("Waiting %d trades to confirm, confirm block count %d, timeout %s", len(trades), confirmation_block_count, max_timeout)
     assert isinstance(confirmation_block_count, int)
-    tx_hashes = []
+
+    pending: Dict[HexBytes, TradeExecution] = {}
     for t in trades:
-        tx_hashes.extend(tx.tx_hash for tx in t.blockchain_transactions)
-    receipts = wait_transactions_to_complete(web3, tx_hashes, confirmation_block_count, max_timeout, poll_delay)
+        for tx in t.blockchain_transactions:
+            pending[HexBytes(tx.tx_hash)] = t
+
+    remaining = Counter(pending.values())
+    receipts_by_trade: Dict[TradeExecution, Dict[HexBytes, dict]] = {t: {} for t in trades}
+
+    for receipts in watch_receipts(web3, pending.keys(), confirmation_block_count, max_timeout, poll_delay):
+        for tx_hash, receipt in receipts.items():
+            t = pending[tx_hash]
+            receipts_by_trade[t][tx_hash] = receipt
+            remaining[t] -= 1
+            if remaining[t] == 0:
+                yield t, receipts_by_trade.pop(t)
+
+
+def wait_trades_to_complete(
+        web3: Web3,
+        trades: List[TradeExecution],
+        confirmation_block_count=0,
+        max_timeout=datetime.timedelta(minutes=5),
+        poll_delay=datetime.timedelta(seconds=1)) -> Dict[HexBytes, dict]:
+    """Watch multiple transactions executed at parallel.
+
+    See :py:func:`watch_trades_to_complete`.
+
+    :return: Map of transaction hashes -> receipt
+    """
+    receipts = {}
+    for trade, trade_receipts in watch_trades_to_complete(web3, trades, confirmation_block_count, max_timeout, poll_delay):
+        receipts.update(trade_receipts)
     return receipts
 
 
@@ -821,11 +903,8 @@ def get_swap_transactions(trade: TradeExecution) -> BlockchainTransaction:
 
 
 def get_held_assets(web3: Web3, address: HexAddress, assets: List[AssetIdentifier]) -> Dict[str, Decimal]:
-    """Get list of assets hold by the a wallet  ."""
-
-    result = {}
-    for asset in assets:
-        token_details = fetch_erc20_details(web3, asset.checksum_address)
-        balance = token_details.contract.functions.balanceOf(address).call()
-        result[token_details.address.lower()] = Decimal(balance) / Decimal(10 ** token_details.decimals)
-    return result
\ No newline at end of file
+    """Get list of assets hold by the a wallet  .
+
+    All balances are read with a single multicall, see :py:func:`tradeexecutor.ethereum.onchain_balance.fetch_balances`.
+    """
+    return fetch_balances(web3, address, [asset.address for asset in assets])
\ No newline at end of file
@@ -38,6 +38,9 @@ class HotWalletSyncModel(SyncModel):
     def resync_nonce(self):
         self.hot_wallet.sync_nonce(self.web3)
 
+    def get_latest_block_number(self) -> Optional[int]:
+        return self.web3.eth.block_number
+
     def sync_initial(self, state: State, **kwargs):
         """Set u[ initial sync details."""
         web3 = self.web3
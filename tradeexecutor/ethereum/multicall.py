@@ -0,0 +1,189 @@
+"""Batch smart contract reads with Multicall3.
+
+Perform many read-only contract calls in a single `eth_call` JSON-RPC request
+using `Multicall3 <https://github.com/mds1/multicall>`_ contract
+that is deployed on the same address on most EVM chains.
+
+- All calls are executed against the same block
+
+- If Multicall3 is not deployed on the chain, e.g. a local test chain,
+  the calls are performed one by one against the same block
+"""
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+from eth_abi import decode
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+from web3.contract.contract import ContractFunction
+from web3.types import BlockIdentifier
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Multicall3 address on all major EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+
+#: How many calls we pack in a single `eth_call`.
+#:
+#: Keep the request below JSON-RPC node gas and response size limits.
+DEFAULT_MULTICALL_CHUNK_SIZE = 200
+
+
+#: The part of Multicall3 ABI we use
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+]
+
+
+#: Web3 connection -> is Multicall3 deployed
+_multicall_available: "weakref.WeakKeyDictionary[Web3, bool]" = weakref.WeakKeyDictionary()
+
+
+class MulticallFailed(Exception):
+    """One of the batched calls reverted."""
+
+
+@dataclass(slots=True)
+class MulticallResult:
+    """The result of a single call in a batch."""
+
+    #: Did the call succeed
+    success: bool
+
+    #: Decoded return values of the call.
+    #:
+    #: A single value is unwrapped from the tuple.
+    #: `None` if the call failed.
+    value: Any = None
+
+    #: The error if the call failed
+    error: Optional[str] = None
+
+    def get_value(self) -> Any:
+        """Get the return value.
+
+        :raise MulticallFailed:
+            If the call failed
+        """
+        if not self.success:
+            raise MulticallFailed(self.error)
+        return self.value
+
+
+def is_multicall_available(web3: Web3) -> bool:
+    """Check if Multicall3 is deployed on the chain.
+
+    The result is cached per connection.
+    """
+    available = _multicall_available.get(web3)
+    if available is None:
+        available = _multicall_available[web3] = len(web3.eth.get_code(Web3.to_checksum_address(MULTICALL3_ADDRESS))) > 0
+    return available
+
+
+def _decode_output(call: ContractFunction, data: bytes) -> Any:
+    values = decode(get_abi_output_types(call.abi), data)
+    if len(values) == 1:
+        return values[0]
+    return list(values)
+
+
+def multicall(
+        web3: Web3,
+        calls: Sequence[ContractFunction],
+        block_identifier: BlockIdentifier,
+        chunk_size: int = DEFAULT_MULTICALL_CHUNK_SIZE,
+) -> List[MulticallResult]:
+    """Perform many read-only contract calls at once.
+
+    Example:
+
+    .. code-block:: python
+
+        block_number = web3.eth.block_number
+        results = multicall(web3, [token.functions.balanceOf(address) for token in tokens], block_number)
+        balances = [r.get_value() for r in results]
+
+    :param calls:
+        Contract function calls with their arguments bound
+
+    :param block_identifier:
+        Block number to perform all calls against.
+
+        Should be a block number, so that the fallback
+        path uses the same block for all calls.
+
+    :param chunk_size:
+        Split the calls to several `eth_call` requests
+        of this many calls each.
+
+    :return:
+        Results in the same order as `calls`
+    """
+
+    if len(calls) == 0:
+        return []
+
+    if not is_multicall_available(web3):
+        return _call_one_by_one(calls, block_identifier)
+
+    assert chunk_size > 0
+
+    multicall_contract = web3.eth.contract(address=Web3.to_checksum_address(MULTICALL3_ADDRESS), abi=MULTICALL3_ABI)
+
+    results = []
+    for start in range(0, len(calls), chunk_size):
+        chunk = calls[start:start + chunk_size]
+        encoded = [(call.address, True, call._encode_transaction_data()) for call in chunk]
+        raw_results = multicall_contract.functions.aggregate3(encoded).call(block_identifier=block_identifier)
+
+        for call, (success, data) in zip(chunk, raw_results):
+            if success:
+                results.append(MulticallResult(True, _decode_output(call, data)))
+            else:
+                results.append(MulticallResult(False, error=f"Call {call.fn_name}() on {call.address} reverted, return data {data.hex()}"))
+
+    return results
+
+
+def _call_one_by_one(calls: Sequence[ContractFunction], block_identifier: BlockIdentifier) -> List[MulticallResult]:
+    """Fallback when Multicall3 is not available."""
+    results = []
+    for call in calls:
+        try:
+            results.append(MulticallResult(True, call.call(block_identifier=block_identifier)))
+        except Exception as e:
+            results.append(MulticallResult(False, error=f"Call {call.fn_name}() on {call.address} failed: {e}"))
+    return results
@@ -1,16 +1,96 @@
 """On-chain live balance reader"""
 
-from typing import List, Iterable
+from decimal import Decimal
+from typing import List, Iterable, Dict
 
+from eth_defi.abi import get_deployed_contract
 from eth_defi.chain import fetch_block_timestamp
-from eth_defi.token import fetch_erc20_details
 from eth_typing import HexAddress
 from web3 import Web3
 
+from tradeexecutor.ethereum.multicall import multicall, DEFAULT_MULTICALL_CHUNK_SIZE
+from tradeexecutor.ethereum.token_cache import get_token_cache, get_chain_key
 from tradeexecutor.state.identifier import AssetIdentifier
 from tradeexecutor.strategy.sync_model import OnChainBalance
 
 
+def fetch_token_decimals(
+    web3: Web3,
+    token_addresses: List[HexAddress | str],
+    block_number: int | None = None,
+    chunk_size=DEFAULT_MULTICALL_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """Get ERC-20 decimals for many tokens.
+
+    - Decimals that have not been seen before are read with a multicall
+
+    - Token decimals never change, so they are kept in :py:mod:`tradeexecutor.ethereum.token_cache`
+
+    :return:
+        Token address lowercase -> decimals
+    """
+
+    chain = get_chain_key(web3)
+    cache = get_token_cache()
+    missing = list({a.lower() for a in token_addresses if cache.get_decimals(chain, a) is None})
+
+    if missing:
+        if block_number is None:
+            block_number = web3.eth.block_number
+
+        calls = [get_deployed_contract(web3, "ERC20MockDecimals.json", Web3.to_checksum_address(a)).functions.decimals() for a in missing]
+        for address, result in zip(missing, multicall(web3, calls, block_number, chunk_size=chunk_size)):
+            cache.set_decimals(chain, address, result.get_value())
+
+    return {a.lower(): cache.get_decimals(chain, a) for a in token_addresses}
+
+
+def fetch_balances(
+    web3: Web3,
+    address: HexAddress | str,
+    token_addresses: List[HexAddress | str],
+    block_number: int | None = None,
+    chunk_size=DEFAULT_MULTICALL_CHUNK_SIZE,
+) -> Dict[str, Decimal]:
+    """Get token balances an address is holding.
+
+    - All balances are read at the same block using Multicall3,
+      with a constant number of JSON-RPC calls regardless of the number of tokens.
+      See :py:mod:`tradeexecutor.ethereum.multicall`.
+
+    :param address:
+        Hot wallet or vault address
+
+    :param token_addresses:
+        ERC-20 tokens to check
+
+    :param block_number:
+        Block number when to read the balances.
+
+        Needs an archive node for old blocks.
+
+    :param chunk_size:
+        How many tokens to read in a single `eth_call`
+
+    :return:
+        Token address lowercase -> balance converted to decimal units
+    """
+
+    if not block_number:
+        block_number = web3.eth.block_number
+
+    decimals = fetch_token_decimals(web3, token_addresses, block_number, chunk_size=chunk_size)
+    address = Web3.to_checksum_address(address)
+
+    calls = [get_deployed_contract(web3, "ERC20MockDecimals.json", Web3.to_checksum_address(a)).functions.balanceOf(address) for a in token_addresses]
+
+    result = {}
+    for token_address, call_result in zip(token_addresses, multicall(web3, calls, block_number, chunk_size=chunk_size)):
+        token_address = token_address.lower()
+        result[token_address] = Decimal(call_result.get_value()) / Decimal(10 ** decimals[token_address])
+    return result
+
+
 def fetch_address_balances(
     web3: Web3,
     address: HexAddress | str,
@@ -46,9 +126,10 @@ def fetch_address_balances(
 
     timestamp = fetch_block_timestamp(web3, block_number)
 
+    balances = fetch_balances(web3, address, [a.address for a in assets], block_number)
+
     for asset in assets:
-        token = fetch_erc20_details(web3, asset.address)
-        amount = token.fetch_balance_of(address, block_identifier=block_number)
+        amount = balances[asset.address.lower()]
 
         if filter_zero and amount == 0:
             continue
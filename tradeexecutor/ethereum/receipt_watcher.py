@@ -0,0 +1,234 @@
+"""Watch many transaction receipts with batched JSON-RPC requests.
+
+:py:func:`eth_defi.confirmation.wait_transactions_to_complete` polls
+each transaction receipt and the latest block number one by one,
+so a rebalance of 20 swaps costs 40 round trips per poll interval.
+
+:py:func:`watch_receipts` reads the latest block number and all outstanding receipts
+in a single JSON-RPC batch request per poll and gives out receipts as soon as they land,
+so the caller can start resolving the first trades while the rest are still pending.
+
+- JSON-RPC batch requests are used with :py:class:`web3.HTTPProvider`
+
+- Other providers, e.g. Ethereum Tester, and nodes not supporting batches
+  are polled one request at a time
+
+- Batch requests are posted directly to the node and do not go through
+  the web3 middlewares and their retries. A failed batch request is tried again
+  on the next poll, and a node rejecting batches with a HTTP 4xx error
+  is polled one request at a time from then on
+"""
+import datetime
+import json
+import logging
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from eth_defi.confirmation import ConfirmationTimedOut
+from hexbytes import HexBytes
+from web3 import HTTPProvider, Web3
+from web3._utils.method_formatters import receipt_formatter
+from web3._utils.request import make_post_request
+from web3.exceptions import TransactionNotFound
+
+from tradeexecutor.ethereum.token_cache import get_chain_id
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Web3 connection -> does the node support JSON-RPC batches
+_batch_supported: "weakref.WeakKeyDictionary[Web3, bool]" = weakref.WeakKeyDictionary()
+
+#: Max transaction receipts read in a single JSON-RPC batch request.
+#:
+#: Larger polls are split to several batch requests,
+#: as JSON-RPC providers limit the batch size.
+MAX_BATCH_SIZE = 100
+
+
+class BatchNotSupported(Exception):
+    """JSON-RPC node did not answer a batch request with a batch response."""
+
+
+class ReceiptPollFailed(Exception):
+    """Reading receipts failed this time, but may work on the next poll.
+
+    E.g. a connection error, a timeout or a HTTP 5xx error.
+    """
+
+
+def _post_receipts_batch(web3: Web3, tx_hashes: List[HexBytes]) -> Tuple[int, Dict[HexBytes, Optional[dict]]]:
+    provider = web3.provider
+    assert isinstance(provider, HTTPProvider)
+
+    payload = [{"jsonrpc": "2.0", "id": 0, "method": "eth_blockNumber", "params": []}]
+    for idx, tx_hash in enumerate(tx_hashes, start=1):
+        payload.append({"jsonrpc": "2.0", "id": idx, "method": "eth_getTransactionReceipt", "params": [Web3.to_hex(tx_hash)]})
+
+    try:
+        raw_response = make_post_request(
+            provider.endpoint_uri,
+            json.dumps(payload).encode(),
+            **provider.get_request_kwargs(),
+        )
+    except requests.HTTPError as e:
+        status_code = e.response.status_code if e.response is not None else None
+        # 429 Too Many Requests is a rate limit,
+        # other 4xx errors mean the node does not accept our batches
+        if status_code is not None and 400 <= status_code < 500 and status_code != 429:
+            raise BatchNotSupported(f"HTTP {status_code}: {e}") from e
+        raise ReceiptPollFailed(f"Batch request failed: {e}") from e
+    except requests.RequestException as e:
+        raise ReceiptPollFailed(f"Batch request failed: {e}") from e
+
+    try:
+        responses = json.loads(raw_response)
+    except ValueError as e:
+        raise ReceiptPollFailed(f"Could not decode the batch response: {e}") from e
+
+    if not isinstance(responses, list):
+        raise BatchNotSupported(f"Got {responses}")
+
+    by_id = {r.get("id"): r for r in responses}
+    block_number_response = by_id.get(0)
+    if block_number_response is None or "result" not in block_number_response:
+        raise BatchNotSupported(f"Could not read the block number: {block_number_response}")
+    block_number = int(block_number_response["result"], 16)
+
+    receipts = {}
+    for idx, tx_hash in enumerate(tx_hashes, start=1):
+        response = by_id.get(idx)
+        if response is None or response.get("result") is None:
+            # Not mined yet, or a rate limit error, try again on the next poll
+            if response and "error" in response:
+                logger.debug("Receipt read for %s failed: %s", tx_hash.hex(), response["error"])
+            receipts[tx_hash] = None
+        else:
+            receipts[tx_hash] = receipt_formatter(response["result"])
+
+    return block_number, receipts
+
+
+def _fetch_receipts_batch(web3: Web3, tx_hashes: List[HexBytes]) -> Tuple[int, Dict[HexBytes, Optional[dict]]]:
+    block_number = 0
+    receipts = {}
+    for i in range(0, len(tx_hashes), MAX_BATCH_SIZE):
+        batch_block_number, batch_receipts = _post_receipts_batch(web3, tx_hashes[i:i + MAX_BATCH_SIZE])
+        # Receipts of the later batches may be from newer blocks
+        block_number = max(block_number, batch_block_number)
+        receipts.update(batch_receipts)
+    return block_number, receipts
+
+
+def _fetch_receipts_one_by_one(web3: Web3, tx_hashes: List[HexBytes]) -> Tuple[int, Dict[HexBytes, Optional[dict]]]:
+    block_number = web3.eth.block_number
+    receipts = {}
+    for tx_hash in tx_hashes:
+        try:
+            receipts[tx_hash] = web3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound as e:
+            # BNB Chain get does this instead of returning None
+            logger.debug("Transaction not found yet: %s", e)
+            receipts[tx_hash] = None
+    return block_number, receipts
+
+
+def fetch_receipts(web3: Web3, tx_hashes: List[HexBytes]) -> Tuple[int, Dict[HexBytes, Optional[dict]]]:
+    """Read the latest block number and many transaction receipts.
+
+    Use a single JSON-RPC batch request if possible.
+
+    :return:
+        Tuple (latest block number, tx hash -> receipt or `None` if not mined yet)
+
+    :raise ReceiptPollFailed:
+        If a batch request failed and should be tried again later
+    """
+
+    if isinstance(web3.provider, HTTPProvider) and _batch_supported.get(web3, True):
+        try:
+            return _fetch_receipts_batch(web3, tx_hashes)
+        except BatchNotSupported as e:
+            logger.warning("JSON-RPC node does not support batch requests, polling receipts one by one: %s", e)
+            _batch_supported[web3] = False
+
+    return _fetch_receipts_one_by_one(web3, tx_hashes)
+
+
+def watch_receipts(
+    web3: Web3,
+    tx_hashes: Iterable[HexBytes | str],
+    confirmation_block_count=0,
+    max_timeout=datetime.timedelta(minutes=5),
+    poll_delay=datetime.timedelta(seconds=1),
+) -> Iterable[Dict[HexBytes, dict]]:
+    """Wait for many transactions, giving out receipts as soon as they are confirmed.
+
+    A batched and incremental version of
+    :py:func:`eth_defi.confirmation.wait_transactions_to_complete`.
+
+    Example:
+
+    .. code-block:: python
+
+        for receipts in watch_receipts(web3, tx_hashes):
+            for tx_hash, receipt in receipts.items():
+                assert receipt["status"] == 1
+
+    :param confirmation_block_count:
+        How many blocks wait for the transaction receipt to settle.
+
+    :return:
+        Iterator of tx hash -> receipt mappings, one per poll that confirmed transactions
+
+    :raise ConfirmationTimedOut:
+        If all transactions were not confirmed within `max_timeout`
+    """
+
+    assert isinstance(poll_delay, datetime.timedelta)
+    assert isinstance(max_timeout, datetime.timedelta)
+    assert isinstance(confirmation_block_count, int)
+
+    if get_chain_id(web3) == 61:
+        assert confirmation_block_count == 0, "Ethereum Tester chain does not progress itself, so we cannot wait"
+
+    unconfirmed = {HexBytes(tx_hash) for tx_hash in tx_hashes}
+
+    logger.info("Watching %d transactions to confirm in %d blocks, timeout is %s", len(unconfirmed), confirmation_block_count, max_timeout)
+
+    started_at = datetime.datetime.utcnow()
+
+    while unconfirmed:
+        try:
+            block_number, receipts = fetch_receipts(web3, sorted(unconfirmed))
+        except ReceiptPollFailed as e:
+            logger.warning("Could not read receipts, trying again on the next poll: %s", e)
+            block_number, receipts = None, {}
+
+        confirmed = {}
+        for tx_hash, receipt in receipts.items():
+            if receipt:
+                tx_confirmations = block_number - receipt["blockNumber"]
+                if tx_confirmations >= confirmation_block_count:
+                    logger.debug("Confirmed tx %s with %d confirmations", tx_hash.hex(), tx_confirmations)
+                    confirmed[tx_hash] = receipt
+                else:
+                    logger.debug("Still waiting more confirmations. Tx %s with %d confirmations, %d needed", tx_hash.hex(), tx_confirmations, confirmation_block_count)
+
+        unconfirmed -= confirmed.keys()
+
+        if confirmed:
+            yield confirmed
+
+        if unconfirmed:
+            time.sleep(poll_delay.total_seconds())
+
+            if datetime.datetime.utcnow() > started_at + max_timeout:
+                for tx_hash in unconfirmed:
+                    tx_data = web3.eth.get_transaction(tx_hash)
+                    logger.error("Data for transaction %s was %s", tx_hash.hex(), tx_data)
+                unconfirmed_tx_strs = ", ".join(sorted(tx_hash.hex() for tx_hash in unconfirmed))
+                raise ConfirmationTimedOut(f"Transaction confirmation failed. Started: {started_at}, timed out after {max_timeout} ({max_timeout.total_seconds()}s). Poll delay: {poll_delay.total_seconds()}s. Still unconfirmed: {unconfirmed_tx_strs}")
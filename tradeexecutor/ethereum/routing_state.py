@@ -16,10 +16,10 @@ from web3 import Web3
 from web3.contract import Contract
 
 from eth_defi.abi import get_deployed_contract
-from eth_defi.token import fetch_erc20_details
 from eth_defi.uniswap_v2.deployment import UniswapV2Deployment
 from eth_defi.uniswap_v3.deployment import UniswapV3Deployment
 
+from tradeexecutor.ethereum.token_cache import fetch_token_details_cached, get_token_cache, get_chain_key
 from tradeexecutor.ethereum.tx import HotWalletTransactionBuilder, TransactionBuilder
 from tradeexecutor.state.blockhain_transaction import BlockchainTransaction
 from tradeexecutor.state.identifier import TradingPairIdentifier, AssetIdentifier
@@ -154,7 +154,7 @@ class EthereumRoutingState(RoutingState):
         address = self.tx_builder.get_erc_20_balance_address()
         balance = erc_20.functions.balanceOf(address).call()
         if balance < amount:
-            token_details = fetch_erc20_details(
+            token_details = fetch_token_details_cached(
                 erc_20.w3,
                 erc_20.address,
             )
@@ -171,6 +171,9 @@ class EthereumRoutingState(RoutingState):
 
         - ...or previous approval in this state,
 
+        - ...or approval seen on-chain before by this process,
+          see :py:mod:`tradeexecutor.ethereum.token_cache`
+
         :param token_address:
         :param router_address:
 
@@ -183,17 +186,27 @@ class EthereumRoutingState(RoutingState):
             # Already approved for this cycle in previous trade
             return []
 
-        erc_20 = get_deployed_contract(self.web3, "ERC20MockDecimals.json", Web3.to_checksum_address(token_address))
-
         # Set internal state we are approved
         self.mark_router_approved(token_address, router_address)
 
         approve_address = self.tx_builder.get_token_delivery_address()
 
+        token_cache = get_token_cache()
+        chain = get_chain_key(self.web3)
+        if token_cache.is_approved(chain, token_address, approve_address, router_address):
+            # Already approved in previous execution cycle and no trade has failed since
+            return []
+
+        erc_20 = get_deployed_contract(self.web3, "ERC20MockDecimals.json", Web3.to_checksum_address(token_address))
+
         if erc_20.functions.allowance(approve_address, router_address).call() > 0:
             # already approved in previous execution cycle
+            token_cache.mark_approved(chain, token_address, approve_address, router_address)
             return []
-        
+
+        # Check the allowance on-chain again after the approval has been confirmed
+        token_cache.invalidate_allowance(chain, token_address, approve_address, router_address)
+
         # Create infinite approval
         tx = self.tx_builder.sign_transaction(
             erc_20,
@@ -249,7 +262,7 @@ class EthereumRoutingState(RoutingState):
 
         web3 = self.tx_builder.web3
         holding_address = self.tx_builder.get_erc_20_balance_address()
-        token = fetch_erc20_details(web3, asset.address)
+        token = fetch_token_details_cached(web3, asset.address)
         on_chain_balance = token.contract.functions.balanceOf(holding_address).call()
         if on_chain_balance <  required_amount:
             # Check if we are within epsilon
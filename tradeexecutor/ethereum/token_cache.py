@@ -0,0 +1,288 @@
+"""Process-wide ERC-20 token metadata and router allowance cache.
+
+Preparing and resolving trades needs token decimals and symbols
+for both sides of the pair. Reading them with :py:func:`eth_defi.token.fetch_erc20_details`
+costs several JSON-RPC calls per token, per trade. Token metadata never changes,
+so :py:class:`TokenCache` reads it only once per chain and address and
+optionally keeps it in a sidecar JSON file over restarts.
+
+Chains are told apart by their chain id and genesis block hash, see :py:func:`get_chain_key`.
+Test chains and restarted development chains reuse the chain id
+and token addresses for different tokens.
+
+Router allowances are cached in the memory of the process.
+We always give infinite approvals, so once an allowance has been seen on-chain,
+we assume it is there until
+
+- we send a new approval transaction, or
+
+- a trade using the token fails, because the allowance may have been revoked
+
+Example:
+
+.. code-block:: python
+
+    set_token_cache(TokenCache(Path("cache/token-cache.json")))
+
+    # RPC calls only on the first time
+    details = fetch_token_details_cached(web3, usdc_address)
+"""
+import json
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from eth_defi.abi import get_deployed_contract
+from eth_defi.token import TokenDetails, fetch_erc20_details
+from eth_typing import HexAddress
+from web3 import Web3
+
+
+logger = logging.getLogger(__name__)
+
+
+#: (chain id, genesis block hash)
+ChainKey = Tuple[int, str]
+
+#: (chain id, genesis block hash, token address lowercase)
+TokenKey = Tuple[int, str, str]
+
+#: (chain id, genesis block hash, token address lowercase, owner address lowercase, spender address lowercase)
+AllowanceKey = Tuple[int, str, str, str, str]
+
+
+#: Web3 instance -> chain id
+_chain_ids: "weakref.WeakKeyDictionary[Web3, int]" = weakref.WeakKeyDictionary()
+
+#: Web3 instance -> chain key
+_chain_keys: "weakref.WeakKeyDictionary[Web3, ChainKey]" = weakref.WeakKeyDictionary()
+
+
+def get_chain_id(web3: Web3) -> int:
+    """Get the chain id of a web3 connection, reading it only once."""
+    chain_id = _chain_ids.get(web3)
+    if chain_id is None:
+        chain_id = _chain_ids[web3] = web3.eth.chain_id
+    return chain_id
+
+
+def get_chain_key(web3: Web3) -> ChainKey:
+    """Identify the chain of a web3 connection, reading it only once.
+
+    :return:
+        Tuple (chain id, genesis block hash)
+    """
+    chain_key = _chain_keys.get(web3)
+    if chain_key is None:
+        genesis = web3.eth.get_block(0)["hash"]
+        chain_key = _chain_keys[web3] = (get_chain_id(web3), Web3.to_hex(genesis))
+    return chain_key
+
+
+class TokenCache:
+    """Cache ERC-20 token metadata and router allowances.
+
+    See :py:mod:`tradeexecutor.ethereum.token_cache`.
+
+    Shared by the strategy cycle and the trigger check threads.
+    """
+
+    #: Sidecar file format version
+    VERSION = 2
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+
+        :param path:
+            JSON file where token metadata is kept over restarts.
+
+            If not given, metadata is cached in the memory only.
+        """
+        self.path = path
+        self.lock = threading.RLock()
+
+        #: Token -> name, symbol, decimals.
+        #:
+        #: Tokens seen only by :py:func:`tradeexecutor.ethereum.onchain_balance.fetch_token_decimals`
+        #: have decimals only.
+        self.tokens: Dict[TokenKey, dict] = {}
+
+        #: Allowances known to be approved on-chain
+        self.allowances: Set[AllowanceKey] = set()
+
+        #: How many times token metadata was read from the chain
+        self.metadata_fetches = 0
+
+        #: How many times token metadata was served from the cache
+        self.metadata_hits = 0
+
+        if path is not None and path.exists():
+            self.load()
+
+    def __repr__(self):
+        return f"<TokenCache {len(self.tokens)} tokens, {len(self.allowances)} allowances, at {self.path}>"
+
+    def load(self):
+        """Read token metadata from the sidecar file.
+
+        A damaged file is ignored and rewritten on the next save.
+        """
+        try:
+            data = json.loads(self.path.read_text())
+            assert data["version"] == self.VERSION, f"Unknown token cache version {data['version']}"
+            tokens = {}
+            for key, entry in data["tokens"].items():
+                chain_id, genesis, address = key.split(":")
+                tokens[(int(chain_id), genesis, address)] = entry
+        except Exception as e:
+            logger.warning("Could not read token cache %s: %s", self.path, e)
+            return
+
+        with self.lock:
+            self.tokens.update(tokens)
+
+    def save(self):
+        """Write token metadata to the sidecar file."""
+        if self.path is None:
+            return
+
+        with self.lock:
+            data = {
+                "version": self.VERSION,
+                "tokens": {f"{chain_id}:{genesis}:{address}": entry for (chain_id, genesis, address), entry in self.tokens.items()},
+            }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(self.path.suffix + ".tmp")
+        temp.write_text(json.dumps(data, indent=2, sort_keys=True))
+        os.replace(temp, self.path)
+
+    def clear(self):
+        """Forget everything."""
+        with self.lock:
+            self.tokens.clear()
+            self.allowances.clear()
+        self.save()
+
+    def fetch_token_details(self, web3: Web3, address: HexAddress | str) -> TokenDetails:
+        """Get ERC-20 token details.
+
+        A drop-in replacement for :py:func:`eth_defi.token.fetch_erc20_details`.
+        Needs no RPC calls for tokens seen before.
+
+        Tokens without decimals are not cached, as they are not well-formed.
+
+        :param address:
+            Token address, any case
+
+        :return:
+            Token details.
+
+            `total_supply` is not available for cached tokens.
+        """
+        chain_id, genesis = get_chain_key(web3)
+        checksum_address = Web3.to_checksum_address(address)
+        key = (chain_id, genesis, checksum_address.lower())
+
+        with self.lock:
+            entry = self.tokens.get(key)
+
+        if entry is None or "symbol" not in entry:
+            details = fetch_erc20_details(web3, checksum_address)
+            self.metadata_fetches += 1
+            if details.decimals is not None:
+                with self.lock:
+                    self.tokens[key] = {
+                        "name": details.name,
+                        "symbol": details.symbol,
+                        "decimals": details.decimals,
+                    }
+                self.save()
+        else:
+            self.metadata_hits += 1
+            contract = get_deployed_contract(web3, "ERC20MockDecimals.json", checksum_address)
+            details = TokenDetails(
+                contract,
+                name=entry["name"],
+                symbol=entry["symbol"],
+                decimals=entry["decimals"],
+            )
+
+        # Prime the cached property, so that comparing tokens does not need an RPC call
+        details.__dict__["chain_id"] = chain_id
+        return details
+
+    def get_decimals(self, chain: ChainKey, address: HexAddress | str) -> Optional[int]:
+        """Get token decimals if we have seen the token before.
+
+        :param chain:
+            See :py:func:`get_chain_key`
+        """
+        with self.lock:
+            entry = self.tokens.get((*chain, address.lower()))
+        return entry["decimals"] if entry else None
+
+    def set_decimals(self, chain: ChainKey, address: HexAddress | str, decimals: int):
+        """Record token decimals read elsewhere."""
+        with self.lock:
+            self.tokens.setdefault((*chain, address.lower()), {})["decimals"] = decimals
+
+    def is_approved(self, chain: ChainKey, token: HexAddress | str, owner: HexAddress | str, spender: HexAddress | str) -> bool:
+        """Have we seen an allowance for this token on-chain before.
+
+        :param chain:
+            See :py:func:`get_chain_key`
+        """
+        return (*chain, token.lower(), owner.lower(), spender.lower()) in self.allowances
+
+    def mark_approved(self, chain: ChainKey, token: HexAddress | str, owner: HexAddress | str, spender: HexAddress | str):
+        """Record an allowance seen on-chain."""
+        with self.lock:
+            self.allowances.add((*chain, token.lower(), owner.lower(), spender.lower()))
+
+    def invalidate_allowance(self, chain: ChainKey, token: HexAddress | str, owner: HexAddress | str, spender: HexAddress | str):
+        """Check the allowance on-chain next time.
+
+        Called when an approval transaction is sent.
+        """
+        with self.lock:
+            self.allowances.discard((*chain, token.lower(), owner.lower(), spender.lower()))
+
+    def invalidate_token_allowances(self, chain_id: int, tokens: Iterable[HexAddress | str]):
+        """Check the allowances of all owners and spenders of tokens on-chain next time.
+
+        Called when a trade fails. Covers all chains with this chain id.
+        """
+        tokens = {t.lower() for t in tokens}
+        with self.lock:
+            self.allowances = {a for a in self.allowances if not (a[0] == chain_id and a[2] in tokens)}
+
+
+#: The process-wide cache
+_token_cache = TokenCache()
+
+
+def set_token_cache(cache: TokenCache):
+    """Set the process-wide token cache.
+
+    E.g. to use a sidecar file.
+    """
+    global _token_cache
+    assert isinstance(cache, TokenCache)
+    _token_cache = cache
+
+
+def get_token_cache() -> TokenCache:
+    """Get the process-wide token cache."""
+    return _token_cache
+
+
+def fetch_token_details_cached(web3: Web3, address: HexAddress | str) -> TokenDetails:
+    """Get ERC-20 token details using the process-wide cache.
+
+    See :py:meth:`TokenCache.fetch_token_details`.
+    """
+    return _token_cache.fetch_token_details(web3, address)
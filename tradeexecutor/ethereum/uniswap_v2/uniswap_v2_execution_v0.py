@@ -14,10 +14,10 @@ from web3 import Web3
 from eth_defi.gas import estimate_gas_fees
 from eth_defi.hotwallet import HotWallet
 from eth_defi.uniswap_v2.deployment import UniswapV2Deployment
-from eth_defi.token import fetch_erc20_details
 from eth_defi.trade import TradeSuccess
 from eth_defi.uniswap_v2.deployment import mock_partial_deployment_for_analysis
 from eth_defi.uniswap_v2.analysis import analyse_trade_by_receipt
+from tradeexecutor.ethereum.token_cache import fetch_token_details_cached
 from tradeexecutor.ethereum.tx import HotWalletTransactionBuilder
 from tradeexecutor.ethereum.uniswap_v2.uniswap_v2_routing import UniswapV2RoutingState, UniswapV2SimpleRoutingModel
 from tradeexecutor.ethereum.execution import broadcast, wait_trades_to_complete, report_failure, get_swap_transactions, update_confirmation_status
@@ -316,8 +316,8 @@ def resolve_trades(
     # if the blockchain transaction was successsful.
     # Also get the actual executed token counts.
     for trade in trades:
-        base_token_details = fetch_erc20_details(web3, trade.pair.base.checksum_address)
-        quote_token_details = fetch_erc20_details(web3, trade.pair.quote.checksum_address)
+        base_token_details = fetch_token_details_cached(web3, trade.pair.base.checksum_address)
+        quote_token_details = fetch_token_details_cached(web3, trade.pair.quote.checksum_address)
         reserve = trade.reserve_currency
         swap_tx = get_swap_transactions(trade)
         uniswap = mock_partial_deployment_for_analysis(web3, swap_tx.contract_address)
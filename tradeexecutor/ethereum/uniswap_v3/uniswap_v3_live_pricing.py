@@ -6,13 +6,14 @@ and JSON-RPC API.
 import logging
 import datetime
 from decimal import Decimal
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 from web3 import Web3
 
 from tradeexecutor.ethereum.uniswap_v3.uniswap_v3_execution import UniswapV3ExecutionModel
 from tradeexecutor.ethereum.uniswap_v3.uniswap_v3_routing import UniswapV3SimpleRoutingModel, route_tokens, get_uniswap_for_pair
 from tradeexecutor.ethereum.eth_pricing_model import EthereumPricingModel
+from tradeexecutor.ethereum.multicall import multicall
 from tradeexecutor.state.identifier import TradingPairIdentifier
 from tradeexecutor.strategy.execution_model import ExecutionModel
 from tradeexecutor.state.types import USDollarAmount
@@ -22,6 +23,7 @@ from tradingstrategy.pair import PandasPairUniverse
 
 from eth_defi.uniswap_v3.price import UniswapV3PriceHelper, estimate_sell_received_amount, estimate_buy_received_amount
 from eth_defi.uniswap_v3.deployment import UniswapV3Deployment
+from eth_defi.uniswap_v3.utils import encode_path
 
 logger = logging.getLogger(__name__)
 
@@ -105,10 +107,6 @@ class UniswapV3LivePricing(EthereumPricingModel):
         quantity_raw = target_pair.base.convert_to_raw_amount(quantity)
 
         if intermediate_pair:
-            path = [base_addr, intermediate_addr, quote_addr] 
-            fees = [intermediate_pair.fee, target_pair.fee]
-            total_fee_pct = 1 - (1-fees[0]) * (1-fees[1])
-
             received_raw = estimate_sell_received_amount(
                 uniswap=self.get_uniswap(target_pair),
                 base_token_address=base_addr,
@@ -121,10 +119,6 @@ class UniswapV3LivePricing(EthereumPricingModel):
 
             block_number = None
         else:
-            path = [base_addr, quote_addr]
-            fees = [target_pair.fee]
-            total_fee_pct = 1 - (1-fees[0])
-
             block_number = self.web3.eth.block_number
 
             received_raw = estimate_sell_received_amount(
@@ -138,13 +132,28 @@ class UniswapV3LivePricing(EthereumPricingModel):
                 block_identifier=block_number,
             )
         
+        return self._create_sell_pricing(ts, target_pair, intermediate_pair, quantity, received_raw, block_number)
+
+    def _create_sell_pricing(
+            self,
+            ts: datetime.datetime,
+            target_pair: TradingPairIdentifier,
+            intermediate_pair: Optional[TradingPairIdentifier],
+            quantity: Decimal,
+            received_raw: int,
+            block_number: Optional[int],
+    ) -> TradePricing:
+        """Create a sell price structure from the quoter output."""
+
         if intermediate_pair:
+            fees = [intermediate_pair.fee, target_pair.fee]
+            total_fee_pct = 1 - (1-fees[0]) * (1-fees[1])
             received = intermediate_pair.quote.convert_to_decimal(received_raw)
             path = [intermediate_pair, target_pair]
-            
         else:
+            fees = [target_pair.fee]
+            total_fee_pct = 1 - (1-fees[0])
             received = target_pair.quote.convert_to_decimal(received_raw)
-            price = float(received / quantity)
             path = [target_pair]
         
         price = float(received / quantity)
@@ -173,6 +182,69 @@ class UniswapV3LivePricing(EthereumPricingModel):
             block_number=block_number,
         )
 
+    def get_sell_prices(
+            self,
+            ts: datetime.datetime,
+            requests: List[Tuple[TradingPairIdentifier, Optional[Decimal]]],
+            block_identifier: Optional[int] = None,
+    ) -> List[TradePricing]:
+        """Get live prices for many sells at once.
+
+        All quotes are read in a single `eth_call` using Multicall3,
+        against the same block.
+
+        See :py:mod:`tradeexecutor.ethereum.multicall`.
+
+        :param requests:
+            List of (pair, sell quantity) tuples.
+
+            If the quantity is `None` use a small default quantity.
+
+        :param block_identifier:
+            The block number to price against.
+
+            If not given, use the latest block.
+
+        :return:
+            Price structures in the same order as `requests`
+        """
+
+        if block_identifier is None:
+            block_identifier = self.web3.eth.block_number
+
+        calls = []
+        routes = []
+        for pair, quantity in requests:
+
+            if quantity is None:
+                quantity = Decimal(self.very_small_amount)
+
+            assert isinstance(quantity, Decimal)
+
+            target_pair, intermediate_pair = self.routing_model.route_pair(self.pair_universe, pair)
+            base_addr, quote_addr, intermediate_addr = route_tokens(target_pair, intermediate_pair)
+            quantity_raw = target_pair.base.convert_to_raw_amount(quantity)
+
+            if intermediate_pair:
+                path = [base_addr, intermediate_addr, quote_addr]
+                fees = [int(intermediate_pair.fee * 1_000_000), int(target_pair.fee * 1_000_000)]
+            else:
+                path = [base_addr, quote_addr]
+                fees = [int(target_pair.fee * 1_000_000)]
+
+            quoter = self.get_uniswap(target_pair).quoter
+            calls.append(quoter.functions.quoteExactInput(encode_path(path, fees), quantity_raw))
+            routes.append((target_pair, intermediate_pair, quantity))
+
+        results = multicall(self.web3, calls, block_identifier)
+
+        prices = []
+        for (target_pair, intermediate_pair, quantity), result in zip(routes, results):
+            received_raw = result.get_value()
+            prices.append(self._create_sell_pricing(ts, target_pair, intermediate_pair, quantity, received_raw, block_identifier))
+
+        return prices
+
     def get_buy_price(self,
                        ts: datetime.datetime,
                        pair: TradingPairIdentifier,
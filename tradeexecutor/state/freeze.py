@@ -41,6 +41,7 @@ def freeze_position_on_failed_trade(ts: datetime.datetime, state: State, trades:
             portfolio.frozen_positions[position.position_id] = position
             position.frozen_at = ts
             del portfolio.open_positions[position.position_id]
+            portfolio.invalidate_index()
 
             if position.notes is None:
                 position.notes = ""
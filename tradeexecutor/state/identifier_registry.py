@@ -0,0 +1,314 @@
+"""Interned trading pair and asset identifiers.
+
+Every position, trade, balance update and reserve carries its own copy of
+:py:class:`tradeexecutor.state.identifier.TradingPairIdentifier` and
+:py:class:`tradeexecutor.state.identifier.AssetIdentifier`.
+A state with thousands of positions over a handful of trading pairs
+holds thousands of equal identifier objects in the memory
+and repeats the same pair and token data thousands of times in its JSON.
+
+- :py:class:`IdentifierRegistry` interns identifiers by value,
+  so that equal identifiers are one shared object in the memory
+
+- With :py:attr:`IdentifierStorage.interned` the state JSON stores each identifier once
+  in a top level table and refers to it by its index elsewhere
+
+.. code-block:: text
+
+    {
+        "portfolio": {... "pair": {"$pair": 0}, "reserve_currency": {"$asset": 1} ...},
+        ...
+        "identifiers": {
+            "assets": [{"chain_id": 1, "address": "0x...", ...}, ...],
+            "pairs": [{"base": {"$asset": 0}, "quote": {"$asset": 1}, ...}, ...]
+        }
+    }
+
+State files in either format are read with :py:meth:`tradeexecutor.state.state.State.read_json_file`
+and their identifiers are interned when loaded.
+Other readers of the state file, like `State.from_json()`, understand only the inline format,
+so state files are written in the inline format unless asked otherwise,
+see :py:func:`set_default_identifier_storage`.
+
+The web frontend reads the inline format, so
+:py:meth:`tradeexecutor.state.state.State.to_json_safe` always writes it.
+
+.. note ::
+
+    Identifiers of a loaded state are shared between its positions and trades.
+    Do not mutate them, e.g. to override :py:attr:`TradingPairIdentifier.fee`,
+    but replace them with a copy.
+
+"""
+import contextlib
+import contextvars
+import enum
+from dataclasses import fields
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
+
+
+class IdentifierStorage(enum.Enum):
+    """How trading pair and asset identifiers are written in the state JSON."""
+
+    #: A full copy of the identifier everywhere it is used.
+    #:
+    #: The format read by the web frontend and older versions.
+    inline = "inline"
+
+    #: Each identifier once in the state `identifiers` table,
+    #: references elsewhere
+    interned = "interned"
+
+
+#: The storage used by :py:class:`tradeexecutor.state.store.JSONFileStore`
+#: when the caller does not specify one.
+#:
+#: See :py:func:`set_default_identifier_storage`.
+_default_identifier_storage = IdentifierStorage.inline
+
+#: The identifier table of the state being serialised in this thread
+_active_table: contextvars.ContextVar[Optional["IdentifierTable"]] = contextvars.ContextVar("identifier_table", default=None)
+
+#: Reference key of an asset in the serialised state
+ASSET_REF = "$asset"
+
+#: Reference key of a trading pair in the serialised state
+PAIR_REF = "$pair"
+
+_ASSET_FIELDS = [f.name for f in fields(AssetIdentifier)]
+
+_PAIR_FIELDS = [f.name for f in fields(TradingPairIdentifier) if f.name not in ("base", "quote")]
+
+
+def set_default_identifier_storage(storage: IdentifierStorage):
+    """Set the process-wide default identifier storage for state files."""
+    global _default_identifier_storage
+    assert isinstance(storage, IdentifierStorage)
+    _default_identifier_storage = storage
+
+
+def get_default_identifier_storage() -> IdentifierStorage:
+    """Get the process-wide default identifier storage for state files."""
+    return _default_identifier_storage
+
+
+def _fee_key(fee: Optional[float]) -> object:
+    # NaN fee does not equal to itself and would never hit
+    if fee is not None and fee != fee:
+        return "nan"
+    return fee
+
+
+def get_asset_key(asset: AssetIdentifier) -> tuple:
+    """All data of an asset as a hashable key.
+
+    Unlike :py:meth:`AssetIdentifier.__eq__`, assets differing by their symbol or decimals
+    have different keys, so no data is lost when interning.
+    """
+    return tuple(getattr(asset, name) for name in _ASSET_FIELDS)
+
+
+def get_pair_key(pair: TradingPairIdentifier) -> tuple:
+    """All data of a trading pair as a hashable key.
+
+    See :py:func:`get_asset_key`.
+    """
+    return (
+        get_asset_key(pair.base),
+        get_asset_key(pair.quote),
+    ) + tuple(_fee_key(getattr(pair, name)) if name == "fee" else getattr(pair, name) for name in _PAIR_FIELDS)
+
+
+class IdentifierRegistry:
+    """Intern identifiers by value.
+
+    Equal identifiers are replaced with the first instance seen.
+    """
+
+    def __init__(self):
+        self.assets: Dict[tuple, AssetIdentifier] = {}
+        self.pairs: Dict[tuple, TradingPairIdentifier] = {}
+
+    def __repr__(self):
+        return f"<IdentifierRegistry {len(self.pairs)} pairs, {len(self.assets)} assets>"
+
+    def intern_asset(self, asset: AssetIdentifier) -> AssetIdentifier:
+        """Get the shared instance of an asset."""
+        return self.assets.setdefault(get_asset_key(asset), asset)
+
+    def intern_pair(self, pair: TradingPairIdentifier) -> TradingPairIdentifier:
+        """Get the shared instance of a trading pair.
+
+        The base and the quote assets of a new pair are interned as well.
+        """
+        key = get_pair_key(pair)
+        interned = self.pairs.get(key)
+        if interned is None:
+            pair.base = self.intern_asset(pair.base)
+            pair.quote = self.intern_asset(pair.quote)
+            interned = self.pairs[key] = pair
+        return interned
+
+
+class IdentifierTable:
+    """Identifiers of one serialised state.
+
+    Used by :py:mod:`tradeexecutor.state.serialisation` compiled encoders and decoders
+    when active, see :py:func:`use_identifier_table`.
+    """
+
+    def __init__(self, data: Optional[dict] = None, registry: Optional[IdentifierRegistry] = None):
+        """
+
+        :param data:
+            The serialised table when reading a state.
+
+        :param registry:
+            Registry to intern decoded identifiers in.
+        """
+
+        #: Serialised assets, indexed by references
+        self.assets: List[dict] = list(data["assets"]) if data else []
+
+        #: Serialised pairs, indexed by references
+        self.pairs: List[dict] = list(data["pairs"]) if data else []
+
+        self.registry = registry or IdentifierRegistry()
+
+        # Encoding: id(identifier) -> (identifier, reference)
+        # and identifier key -> reference
+        self._asset_refs_by_id: Dict[int, Tuple[AssetIdentifier, dict]] = {}
+        self._asset_refs: Dict[tuple, dict] = {}
+        self._pair_refs_by_id: Dict[int, Tuple[TradingPairIdentifier, dict]] = {}
+        self._pair_refs: Dict[tuple, dict] = {}
+
+        # Decoding: index -> identifier
+        self._decoded_assets: Dict[int, AssetIdentifier] = {}
+        self._decoded_pairs: Dict[int, TradingPairIdentifier] = {}
+
+    def __repr__(self):
+        return f"<IdentifierTable {len(self.pairs)} pairs, {len(self.assets)} assets>"
+
+    def to_dict(self) -> dict:
+        """The table for the state JSON."""
+        return {"assets": self.assets, "pairs": self.pairs}
+
+    def encode_asset(self, asset: AssetIdentifier, encode: Callable[[AssetIdentifier], dict]) -> dict:
+        cached = self._asset_refs_by_id.get(id(asset))
+        if cached is not None:
+            return cached[1]
+
+        key = get_asset_key(asset)
+        ref = self._asset_refs.get(key)
+        if ref is None:
+            ref = self._asset_refs[key] = {ASSET_REF: len(self.assets)}
+            self.assets.append(encode(asset))
+
+        # Keep the asset alive, so that its id is not reused
+        self._asset_refs_by_id[id(asset)] = (asset, ref)
+        return ref
+
+    def encode_pair(self, pair: TradingPairIdentifier, encode: Callable[[TradingPairIdentifier], dict]) -> dict:
+        cached = self._pair_refs_by_id.get(id(pair))
+        if cached is not None:
+            return cached[1]
+
+        key = get_pair_key(pair)
+        ref = self._pair_refs.get(key)
+        if ref is None:
+            ref = self._pair_refs[key] = {PAIR_REF: len(self.pairs)}
+            # Base and quote are encoded as asset references
+            self.pairs.append(encode(pair))
+
+        self._pair_refs_by_id[id(pair)] = (pair, ref)
+        return ref
+
+    def decode_asset(self, data: dict, decode: Callable[[dict], AssetIdentifier]) -> AssetIdentifier:
+        idx = data.get(ASSET_REF)
+        if idx is None:
+            # Inline format
+            return self.registry.intern_asset(decode(data))
+
+        asset = self._decoded_assets.get(idx)
+        if asset is None:
+            asset = self._decoded_assets[idx] = self.registry.intern_asset(decode(self.assets[idx]))
+        return asset
+
+    def decode_pair(self, data: dict, decode: Callable[[dict], TradingPairIdentifier]) -> TradingPairIdentifier:
+        idx = data.get(PAIR_REF)
+        if idx is None:
+            return self.registry.intern_pair(decode(data))
+
+        pair = self._decoded_pairs.get(idx)
+        if pair is None:
+            pair = self._decoded_pairs[idx] = self.registry.intern_pair(decode(self.pairs[idx]))
+        return pair
+
+
+@contextlib.contextmanager
+def use_identifier_table(table: IdentifierTable):
+    """Encode and decode identifiers through a table.
+
+    Only the compiled serialisation engine supports identifier tables.
+
+    Example:
+
+    .. code-block:: python
+
+        table = IdentifierTable()
+        with use_identifier_table(table):
+            data = encode_dataclass(state, SerialisationEngine.compiled)
+        data["identifiers"] = table.to_dict()
+    """
+    assert isinstance(table, IdentifierTable)
+    token = _active_table.set(table)
+    try:
+        yield table
+    finally:
+        _active_table.reset(token)
+
+
+def wrap_identifier_encoder(cls: type, encode: Callable) -> Callable:
+    """Make a compiled encoder to write references when an identifier table is active."""
+
+    if cls is AssetIdentifier:
+        def encode_asset(obj):
+            table = _active_table.get()
+            if table is None:
+                return encode(obj)
+            return table.encode_asset(obj, encode)
+        return encode_asset
+
+    if cls is TradingPairIdentifier:
+        def encode_pair(obj):
+            table = _active_table.get()
+            if table is None:
+                return encode(obj)
+            return table.encode_pair(obj, encode)
+        return encode_pair
+
+    return encode
+
+
+def wrap_identifier_decoder(cls: type, decode: Callable) -> Callable:
+    """Make a compiled decoder to resolve references and intern identifiers when an identifier table is active."""
+
+    if cls is AssetIdentifier:
+        def decode_asset(kvs):
+            table = _active_table.get()
+            if table is None or isinstance(kvs, AssetIdentifier):
+                return decode(kvs)
+            return table.decode_asset(kvs, decode)
+        return decode_asset
+
+    if cls is TradingPairIdentifier:
+        def decode_pair(kvs):
+            table = _active_table.get()
+            if table is None or isinstance(kvs, TradingPairIdentifier):
+                return decode(kvs)
+            return table.decode_pair(kvs, decode)
+        return decode_pair
+
+    return decode
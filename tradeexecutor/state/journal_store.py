@@ -0,0 +1,441 @@
+"""Append-only state journal.
+
+:py:class:`tradeexecutor.state.store.JSONFileStore` rewrites the whole state
+on every sync. For long-running strategies most of the state is
+trading history that does not change anymore: closed positions,
+past statistics entries and past visualisation points.
+
+:py:class:`JournalFileStore` writes a full snapshot only every now and then
+and in between appends only the parts of the state that have changed
+since the last sync to a journal file, one JSON document per line.
+
+- The snapshot file is the same JSON format as written by :py:class:`JSONFileStore`
+
+- The journal file lives next to the snapshot file, named `<state file>.journal`
+
+- On :py:meth:`JournalFileStore.load` the snapshot is read and the journal
+  is replayed on the top of it
+
+- Journal entries are idempotent: replaying the same entry twice
+  on the top of a snapshot gives the same result, so a crash between writing
+  a new snapshot and truncating the journal is safe
+
+The change detection assumes the following about the state:
+
+- Closed positions are not modified after they have been closed.
+  If you modify closed positions (e.g. manual repair), call :py:meth:`JournalFileStore.compact`.
+
+- Statistics time series and visualisation plot points are append only.
+  If :py:class:`tradeexecutor.state.visualisation.VisualisationRetention`
+  removes old plot points, a full snapshot is written.
+
+Plot points of :py:attr:`tradeexecutor.state.visualisation.PlotStorage.sidecar`
+are not journaled, see :py:mod:`tradeexecutor.state.plot_sidecar`.
+"""
+import datetime
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Set, Optional, Union
+
+from dataclasses_json.core import _ExtendedEncoder
+
+from tradeexecutor.state.identifier_registry import IdentifierStorage
+from tradeexecutor.state.serialisation import encode_dataclass, encode_value
+from tradeexecutor.state.state import State
+from tradeexecutor.state.store import JSONFileStore
+from tradeexecutor.state.validator import validate_nested_state_dict
+from tradeexecutor.state.visualisation import PlotPoints
+
+logger = logging.getLogger(__name__)
+
+
+#: State root fields that are journaled separately
+#:
+#: All other :py:class:`State` fields are written in full on every sync.
+JOURNALED_STATE_FIELDS = {"portfolio", "stats", "visualisation"}
+
+
+@dataclass
+class JournalCursor:
+    """Track what parts of the state have already been written to the disk.
+
+    Only stores counters and ids, not copies of the state data.
+    """
+
+    #: Id of the state object this cursor is tracking.
+    #:
+    #: If a different state object is synced, we need a full snapshot.
+    state_id: int
+
+    #: Closed position ids already written
+    closed_position_ids: Set[int] = field(default_factory=set)
+
+    #: How many :py:attr:`Statistics.portfolio` entries have been written
+    portfolio_stats_count: int = 0
+
+    #: Position id -> how many position statistics entries have been written
+    position_stats_counts: Dict[int, int] = field(default_factory=dict)
+
+    #: Closed position statistics already written
+    closed_position_stats_ids: Set[int] = field(default_factory=set)
+
+    #: Timestamp -> how many messages have been written for the timestamp
+    message_counts: Dict[int, int] = field(default_factory=dict)
+
+    #: Calculation timestamps already written
+    calculation_timestamps: Set[int] = field(default_factory=set)
+
+    #: Plot name -> how many points have been written
+    plot_point_counts: Dict[str, int] = field(default_factory=dict)
+
+    #: Plot name -> :py:attr:`PlotPoints.version` when the points were written
+    plot_point_versions: Dict[str, int] = field(default_factory=dict)
+
+    @staticmethod
+    def create_from_state(state: State) -> "JournalCursor":
+        """Mark everything in the state as written."""
+        stats = state.stats
+        visualisation = state.visualisation
+        return JournalCursor(
+            state_id=id(state),
+            closed_position_ids=set(state.portfolio.closed_positions.keys()),
+            portfolio_stats_count=len(stats.portfolio),
+            position_stats_counts={k: len(v) for k, v in stats.positions.items()},
+            closed_position_stats_ids=set(stats.closed_positions.keys()),
+            message_counts={k: len(v) for k, v in visualisation.messages.items()},
+            calculation_timestamps=set(visualisation.calculations.keys()),
+            plot_point_counts={k: len(p.points) for k, p in visualisation.plots.items()},
+            plot_point_versions={k: p.points.version for k, p in visualisation.plots.items() if isinstance(p.points, PlotPoints)},
+        )
+
+    def is_plot_points_changed(self, state: State) -> bool:
+        """Have already written plot points been removed or changed.
+
+        The journal cannot express removals, so we need a full snapshot.
+        """
+        for name, plot in state.visualisation.plots.items():
+            points = plot.points
+            if isinstance(points, PlotPoints) and not points.sidecar:
+                if points.version != self.plot_point_versions.get(name, 0):
+                    return True
+        return False
+
+    def create_journal_entry(self, state: State) -> dict:
+        """Collect the changed parts of the state.
+
+        Advances the cursor.
+
+        :return:
+            Journal entry as a dict tree that is not yet JSON encoded
+        """
+        assert id(state) == self.state_id, "Cursor used with a different state"
+
+        root = {name: encode_value(getattr(state, name)) for name in state.__dataclass_fields__.keys() if name not in JOURNALED_STATE_FIELDS}
+
+        return {
+            "state": root,
+            "portfolio": self._collect_portfolio(state),
+            "stats": self._collect_stats(state),
+            "visualisation": self._collect_visualisation(state),
+        }
+
+    def _collect_portfolio(self, state: State) -> dict:
+        portfolio = state.portfolio
+
+        new_closed = {}
+        for position_id, position in portfolio.closed_positions.items():
+            if position_id not in self.closed_position_ids:
+                new_closed[position_id] = encode_dataclass(position)
+                self.closed_position_ids.add(position_id)
+
+        return {
+            "next_position_id": portfolio.next_position_id,
+            "next_trade_id": portfolio.next_trade_id,
+            "next_balance_update_id": portfolio.next_balance_update_id,
+            "reserves": encode_value(portfolio.reserves),
+            "open_positions": encode_value(portfolio.open_positions),
+            "frozen_positions": encode_value(portfolio.frozen_positions),
+            "closed_positions": new_closed,
+        }
+
+    def _collect_stats(self, state: State) -> dict:
+        stats = state.stats
+
+        portfolio_start = self.portfolio_stats_count
+        portfolio_entries = [encode_dataclass(s) for s in islice(stats.portfolio, portfolio_start, None)]
+        self.portfolio_stats_count = len(stats.portfolio)
+
+        positions = {}
+        for position_id, entries in stats.positions.items():
+            start = self.position_stats_counts.get(position_id, 0)
+            if start < len(entries):
+                positions[position_id] = {
+                    "start": start,
+                    "entries": [encode_dataclass(s) for s in islice(entries, start, None)],
+                }
+                self.position_stats_counts[position_id] = len(entries)
+
+        closed_positions = {}
+        for position_id, final_stats in stats.closed_positions.items():
+            if position_id not in self.closed_position_stats_ids:
+                closed_positions[position_id] = encode_dataclass(final_stats)
+                self.closed_position_stats_ids.add(position_id)
+
+        return {
+            "portfolio": {"start": portfolio_start, "entries": portfolio_entries},
+            "positions": positions,
+            "closed_positions": closed_positions,
+        }
+
+    def _collect_visualisation(self, state: State) -> dict:
+        visualisation = state.visualisation
+
+        messages = {}
+        for timestamp, timestamp_messages in visualisation.messages.items():
+            if self.message_counts.get(timestamp) != len(timestamp_messages):
+                messages[timestamp] = list(timestamp_messages)
+                self.message_counts[timestamp] = len(timestamp_messages)
+
+        calculations = {}
+        for timestamp, cycle_calculations in visualisation.calculations.items():
+            if timestamp not in self.calculation_timestamps:
+                calculations[timestamp] = encode_value(cycle_calculations)
+                self.calculation_timestamps.add(timestamp)
+
+        plots = {}
+        for name, plot in visualisation.plots.items():
+            # Plot metadata is small and may change on every cycle,
+            # so it is always written
+            start = self.plot_point_counts.get(name, 0)
+            plot_data = {k: encode_value(getattr(plot, k)) for k in plot.__dataclass_fields__.keys() if k != "points"}
+            if isinstance(plot.points, PlotPoints) and plot.points.sidecar:
+                plot_data["points"] = {}
+            else:
+                plot_data["points"] = dict(islice(plot.points.items(), start, None))
+                if isinstance(plot.points, PlotPoints):
+                    self.plot_point_versions[name] = plot.points.version
+            plots[name] = plot_data
+            self.plot_point_counts[name] = len(plot.points)
+
+        return {
+            "messages": messages,
+            "calculations": calculations,
+            "plots": plots,
+        }
+
+
+def apply_journal_entry(data: dict, entry: dict):
+    """Replay one journal entry on a JSON decoded state dict.
+
+    Both `data` and `entry` must have gone through JSON decoding,
+    so that all dictionary keys are strings.
+
+    :param data:
+        State dict, modified in place
+    """
+
+    data.update(entry["state"])
+
+    portfolio = data["portfolio"]
+    portfolio_entry = entry["portfolio"]
+    for name in ("next_position_id", "next_trade_id", "next_balance_update_id", "reserves", "open_positions", "frozen_positions"):
+        portfolio[name] = portfolio_entry[name]
+
+    closed_positions = portfolio["closed_positions"]
+    for position_id, position in portfolio_entry["closed_positions"].items():
+        closed_positions[position_id] = position
+
+    stats = data["stats"]
+    stats_entry = entry["stats"]
+    _splice(stats["portfolio"], stats_entry["portfolio"]["start"], stats_entry["portfolio"]["entries"])
+    for position_id, position_stats in stats_entry["positions"].items():
+        existing = stats["positions"].setdefault(position_id, [])
+        _splice(existing, position_stats["start"], position_stats["entries"])
+    stats["closed_positions"].update(stats_entry["closed_positions"])
+
+    visualisation = data["visualisation"]
+    visualisation_entry = entry["visualisation"]
+    visualisation["messages"].update(visualisation_entry["messages"])
+    visualisation["calculations"].update(visualisation_entry["calculations"])
+    for name, plot_entry in visualisation_entry["plots"].items():
+        plot = visualisation["plots"].get(name)
+        if plot is None:
+            visualisation["plots"][name] = plot_entry
+        else:
+            # Sidecar plots do not have points in the snapshot
+            points = plot.get("points", {})
+            plot.update(plot_entry)
+            points.update(plot_entry["points"])
+            plot["points"] = points
+
+
+def _splice(existing: list, start: int, entries: list):
+    """Write entries to a list position, so that replaying twice is safe."""
+    assert start <= len(existing), f"Journal gap: list has {len(existing)} entries, journal entry starts at {start}"
+    existing[start:start + len(entries)] = entries
+
+
+class JournalFileStore(JSONFileStore):
+    """Store the state as a JSON snapshot plus an append-only journal.
+
+    See the module documentation for details.
+
+    Example:
+
+    .. code-block:: python
+
+        store = JournalFileStore(Path("state/my-strategy.json"))
+        state = store.load()
+        # Only changed positions, statistics and plot points are written
+        store.sync(state)
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        journal_path: Optional[Path] = None,
+        compact_every: int = 100,
+        max_journal_size: int = 64 * 1024 * 1024,
+        identifier_storage: Optional[IdentifierStorage] = None,
+    ):
+        """
+
+        :param path:
+            Snapshot file path
+
+        :param journal_path:
+            Journal file path. If not given, use `<path>.journal`.
+
+        :param compact_every:
+            Write a full snapshot after this many journal entries
+
+        :param max_journal_size:
+            Write a full snapshot if the journal file grows larger than this many bytes
+
+        :param identifier_storage:
+            How trading pairs and assets are written in the snapshot.
+
+            Journal entries are always written inline.
+        """
+        super().__init__(path, identifier_storage=identifier_storage)
+
+        if journal_path is None:
+            journal_path = self.path.with_name(self.path.name + ".journal")
+
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.max_journal_size = max_journal_size
+
+        #: How many entries the journal has since the last snapshot
+        self.journal_entry_count = 0
+
+        #: How many bytes the last sync wrote
+        self.last_sync_bytes = 0
+
+        self.cursor: Optional[JournalCursor] = None
+
+    def __repr__(self):
+        path = os.path.abspath(self.path)
+        return f"<JSON file at {path} with journal>"
+
+    def has_journal(self) -> bool:
+        """Does the snapshot have journal entries that need to be replayed."""
+        return self.journal_path.exists() and self.journal_path.stat().st_size > 0
+
+    def load(self) -> State:
+        """Read the snapshot and replay the journal.
+
+        Loading does not touch the journal cursor, so the webhook can
+        read the state while the main loop keeps syncing.
+        The first :py:meth:`sync` of a loaded state writes a full snapshot.
+        """
+
+        with open(self.path, "rt") as inp:
+            data = json.load(inp)
+
+        entry_count = 0
+        if self.journal_path.exists():
+            with open(self.journal_path, "rt") as inp:
+                for line_number, line in enumerate(inp, start=1):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Process was killed in the middle of writing the last line
+                        logger.warning("Journal %s: ignoring damaged entry on line %d", self.journal_path, line_number)
+                        break
+                    apply_journal_entry(data, entry)
+                    entry_count += 1
+
+        # Snapshot identifiers may be interned, journal entries are inline
+        state = State.read_json_dict(data)
+        self.plot_sidecar.read(state)
+
+        logger.info("Loaded state from %s, replayed %d journal entries", self.path, entry_count)
+        return state
+
+    def is_compaction_needed(self, state: State) -> bool:
+        """Should the next sync write a full snapshot."""
+        if self.cursor is None or self.cursor.state_id != id(state):
+            return True
+
+        if not self.path.exists():
+            return True
+
+        if self.journal_entry_count >= self.compact_every:
+            return True
+
+        if self.journal_path.exists() and self.journal_path.stat().st_size >= self.max_journal_size:
+            return True
+
+        if self.cursor.is_plot_points_changed(state):
+            return True
+
+        return False
+
+    def compact(self, state: State):
+        """Write a full snapshot and truncate the journal."""
+        super().sync(state)
+        if self.journal_path.exists():
+            os.remove(self.journal_path)
+        self.journal_entry_count = 0
+        self.cursor = JournalCursor.create_from_state(state)
+        self.last_sync_bytes = self.path.stat().st_size
+
+    def sync(self, state: State):
+        """Append changed parts of the state to the journal.
+
+        Writes a full snapshot instead if needed.
+        """
+
+        if self.is_compaction_needed(state):
+            self.compact(state)
+            return
+
+        state.last_updated_at = datetime.datetime.utcnow()
+
+        self.plot_sidecar.write(state)
+
+        entry = self.cursor.create_journal_entry(state)
+
+        # Friendly error messages for the JSON serialisation errors
+        validate_nested_state_dict(entry)
+
+        line = json.dumps(entry, cls=_ExtendedEncoder) + "\n"
+
+        with open(self.journal_path, "at") as out:
+            out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+
+        self.journal_entry_count += 1
+        self.last_sync_bytes = len(line)
+        logger.info("Appended state journal entry #%d to %s, total %d chars", self.journal_entry_count, self.journal_path, len(line))
+
+    def create(self, name: str) -> State:
+        if self.journal_path.exists():
+            os.remove(self.journal_path)
+        return super().create(name)
@@ -0,0 +1,261 @@
+"""Plot points persisted in a sidecar file next to the state file.
+
+With :py:attr:`tradeexecutor.state.visualisation.PlotStorage.sidecar`
+plot points are not serialised as a part of the state.
+Instead, the file based state stores write them to `<state file>.plots`:
+
+- On every sync, the points added since the last sync are appended to the file
+  as one chunk per plot. The earlier points are not rewritten.
+
+- The file is rewritten if points have been removed or changed
+  by :py:class:`tradeexecutor.state.visualisation.VisualisationRetention`,
+  or when a state object that was not loaded from this file is synced
+
+- The sidecar is written before the state file. If the process is killed in between,
+  the sidecar may have points for a plot that the state does not know yet,
+  and they are ignored on load.
+
+- A damaged last chunk, from a process killed in the middle of writing, is ignored on load
+
+Plot metadata (name, kind, colour, etc.) stays in the state.
+Clients reading the state file directly do not see the points.
+The webhook `/state` endpoint loads them and serves them as a part of the state,
+see :py:func:`inline_sidecar_points`.
+
+File layout::
+
+    b"TXPLOTS1" | chunk | chunk | ...
+
+    chunk = name length as uint16, point count as uint32 | name as UTF-8 |
+            timestamps as int64 | values as float64 | None mask as uint8
+
+All numbers are little endian.
+"""
+import logging
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Dict, Tuple, Optional, BinaryIO
+
+from tradeexecutor.state.state import State
+from tradeexecutor.state.visualisation import PlotPoints, PlotStorage
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Magic bytes at the start of a plot sidecar file
+PLOT_SIDECAR_MAGIC = b"TXPLOTS1"
+
+#: Name length, point count
+_CHUNK_HEADER = struct.Struct("<HI")
+
+
+def get_plot_sidecar_path(state_path: Path) -> Path:
+    """Get the sidecar file path for a state file."""
+    return state_path.with_name(state_path.name + ".plots")
+
+
+def _to_little_endian(a: array) -> bytes:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _from_little_endian(typecode: str, raw: bytes) -> array:
+    a = array(typecode)
+    a.frombytes(raw)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+def _write_chunk(out: BinaryIO, name: str, points: PlotPoints, start: int) -> int:
+    """Write points of a plot starting from an index.
+
+    :return:
+        Number of bytes written
+    """
+    name_bytes = name.encode("utf-8")
+    count = len(points) - start
+    data = b"".join([
+        _CHUNK_HEADER.pack(len(name_bytes), count),
+        name_bytes,
+        _to_little_endian(points.timestamp_array[start:]),
+        _to_little_endian(points.value_array[start:]),
+        bytes(points.none_mask[start:]),
+    ])
+    out.write(data)
+    return len(data)
+
+
+def inline_sidecar_points(state: State):
+    """Serialise the loaded sidecar plot points as a part of the state.
+
+    For serving the state to clients that do not read the sidecar file,
+    like the web frontend.
+    Do not sync the state afterwards, as the points would be dropped from the sidecar file.
+    """
+    for plot in state.visualisation.plots.values():
+        if isinstance(plot.points, PlotPoints):
+            plot.points.sidecar = False
+
+
+class PlotSidecarFile:
+    """Read and write plot points of one state file.
+
+    Used by the file based state stores, see :py:mod:`tradeexecutor.state.plot_sidecar`.
+    """
+
+    def __init__(self, path: Path):
+        """
+
+        :param path:
+            Sidecar file path.
+
+            See :py:func:`get_plot_sidecar_path`.
+        """
+        self.path = path
+
+        #: Id of the state object whose points have been read or written
+        self.state_id: Optional[int] = None
+
+        #: Plot name -> (points object, points version, how many points are in the file)
+        self.written: Dict[str, Tuple[PlotPoints, int, int]] = {}
+
+    def __repr__(self):
+        return f"<Plot sidecar file at {os.path.abspath(self.path)}>"
+
+    def get_sidecar_points(self, state: State) -> Dict[str, PlotPoints]:
+        """Get plots of the state that are stored in the sidecar."""
+        if state.visualisation.plot_storage != PlotStorage.sidecar:
+            return {}
+        return {name: plot.points for name, plot in state.visualisation.plots.items() if isinstance(plot.points, PlotPoints) and plot.points.sidecar}
+
+    def is_rewrite_needed(self, state: State, plots: Dict[str, PlotPoints]) -> bool:
+        """Can we append to the file or do we need to write it again."""
+        if self.state_id != id(state) or not self.path.exists():
+            return True
+
+        for name, (points, version, count) in self.written.items():
+            current = plots.get(name)
+            if current is not points or current.version != version or len(current) < count:
+                return True
+
+        return False
+
+    def read(self, state: State) -> int:
+        """Load plot points to a state.
+
+        Does nothing if the state does not use :py:attr:`PlotStorage.sidecar`.
+
+        :return:
+            Number of points loaded
+        """
+        plots = self.get_sidecar_points(state)
+        if not plots or not self.path.exists():
+            self.state_id = None
+            self.written = {}
+            return 0
+
+        with open(self.path, "rb") as inp:
+            raw = inp.read()
+
+        assert raw[0:len(PLOT_SIDECAR_MAGIC)] == PLOT_SIDECAR_MAGIC, f"Not a plot sidecar file: {self.path}"
+
+        loaded = 0
+        unknown = set()
+        offset = len(PLOT_SIDECAR_MAGIC)
+        while offset < len(raw):
+            if offset + _CHUNK_HEADER.size > len(raw):
+                logger.warning("Plot sidecar %s: ignoring damaged chunk at %d", self.path, offset)
+                break
+
+            name_length, count = _CHUNK_HEADER.unpack_from(raw, offset)
+            name_start = offset + _CHUNK_HEADER.size
+            timestamps_start = name_start + name_length
+            values_start = timestamps_start + count * 8
+            nones_start = values_start + count * 8
+            end = nones_start + count
+
+            if end > len(raw):
+                logger.warning("Plot sidecar %s: ignoring damaged chunk at %d", self.path, offset)
+                break
+
+            name = raw[name_start:timestamps_start].decode("utf-8")
+            points = plots.get(name)
+            if points is None:
+                unknown.add(name)
+            else:
+                points.extend(
+                    _from_little_endian("q", raw[timestamps_start:values_start]),
+                    _from_little_endian("d", raw[values_start:nones_start]),
+                    raw[nones_start:end],
+                )
+                loaded += count
+
+            offset = end
+
+        if unknown:
+            logger.warning("Plot sidecar %s: ignoring points of plots not in the state: %s", self.path, ", ".join(sorted(unknown)))
+
+        # What is in the memory now is what is in the file,
+        # minus unknown plots that will be dropped on the next rewrite
+        self.state_id = None if unknown else id(state)
+        self.written = {name: (points, points.version, len(points)) for name, points in plots.items()}
+
+        logger.info("Loaded %d plot points from %s", loaded, self.path)
+        return loaded
+
+    def write(self, state: State) -> int:
+        """Write new plot points of a state.
+
+        Does nothing if the state does not use :py:attr:`PlotStorage.sidecar`.
+
+        :return:
+            Number of bytes written
+        """
+        plots = self.get_sidecar_points(state)
+        if not plots:
+            return 0
+
+        if self.is_rewrite_needed(state, plots):
+            return self.rewrite(state, plots)
+
+        written = 0
+        with open(self.path, "ab") as out:
+            for name, points in plots.items():
+                _, _, count = self.written.get(name, (points, points.version, 0))
+                if len(points) > count:
+                    written += _write_chunk(out, name, points, count)
+                self.written[name] = (points, points.version, len(points))
+
+        logger.info("Appended %d bytes to %s", written, self.path)
+        return written
+
+    def rewrite(self, state: State, plots: Dict[str, PlotPoints]) -> int:
+        """Write all plot points using Linux atomic file replacement.
+
+        :return:
+            Number of bytes written
+        """
+        dirname, basename = os.path.split(self.path)
+        temp = tempfile.NamedTemporaryFile(mode="wb", delete=False, dir=dirname)
+        with open(temp.name, "wb") as out:
+            out.write(PLOT_SIDECAR_MAGIC)
+            written = len(PLOT_SIDECAR_MAGIC)
+            for name, points in plots.items():
+                written += _write_chunk(out, name, points, 0)
+        temp.close()
+        shutil.move(temp.name, self.path)
+
+        self.state_id = id(state)
+        self.written = {name: (points, points.version, len(points)) for name, points in plots.items()}
+
+        logger.info("Wrote %d plot points to %s, total %d bytes", sum(len(p) for p in plots.values()), self.path, written)
+        return written
@@ -12,6 +12,7 @@ from pandas import Timestamp
 from dataclasses_json import dataclass_json
 
 from tradeexecutor.state.identifier import TradingPairIdentifier, AssetIdentifier
+from tradeexecutor.state.portfolio_index import PortfolioIndex
 from tradeexecutor.state.position import TradingPosition
 from tradeexecutor.state.reserve import ReservePosition
 from tradeexecutor.state.trade import TradeType
@@ -83,6 +84,19 @@ class Portfolio:
     #: - rug pull token - transfer disabled
     frozen_positions: Dict[int, TradingPosition] = field(default_factory=dict)
 
+    def __post_init__(self):
+        # Lookup indexes, not serialised.
+        # See :py:mod:`tradeexecutor.state.portfolio_index`.
+        self.index = PortfolioIndex()
+
+    def invalidate_index(self):
+        """Rebuild the lookup indexes on the next lookup.
+
+        Call after moving positions between the open, closed and frozen dicts
+        directly, see :py:mod:`tradeexecutor.state.portfolio_index`.
+        """
+        self.index.invalidate()
+
     def is_empty(self):
         """This portfolio has no open or past trades or any reserves."""
         return len(self.open_positions) == 0 and len(self.reserves) == 0 and len(self.closed_positions) == 0
@@ -122,19 +136,12 @@ class Portfolio:
     def get_trade_by_id(self, trade_id: int) -> Optional[TradeExecution]:
         """Look up any trade in all positions.
 
-        .. note ::
-
-            Slow lookup. Only designed for testing.
+        Uses the trade index, see :py:mod:`tradeexecutor.state.portfolio_index`.
 
         :return:
             Found trade or
         """
-        for p in self.get_all_positions():
-            t = p.trades.get(trade_id)
-            if t is not None:
-                return t
-
-        return None
+        return self.index.get_trade(self, trade_id)
 
     def get_all_positions(self) -> Iterable[TradingPosition]:
         """Get open, closed and frozen, positions."""
@@ -150,43 +157,59 @@ class Portfolio:
         filtered_positions = []
 
         for position in all_positions:
-            
-            # to avoid copying with same reference
-            filtered_position = copy.deepcopy(position)
-            filtered_position.trades = {}
-            
-            for key, trade in position.trades.items():
-                if trade.is_repaired() or trade.is_repair_trade():
-                    # These trades have quantity set to zero
-                    continue
-
-                # filter out failed trade
-                if trade.executed_at is None:
-                    continue
-                
-                # Internally negative quantities are for sells
-                quantity = trade.executed_quantity
-
-                if trade.planned_mid_price not in (0, None):
-                    price = trade.planned_mid_price
-                else:
-                    # TODO: Legacy trades.
-                    # mid_price is filled to all latest trades
-                    price = trade.executed_price
-                    
-                assert quantity != 0, f"Got bad quantity for {trade}"
-                assert (price is not None) and price > 0, f"Got invalid trade {trade.get_full_debug_dump_str()} - price is {price}"
-
-                filtered_position.trades[key] = trade
+            filtered_position = self.filter_position_trades(position)
 
             # if there are no trades, skip this position
-            if not filtered_position.trades:
+            if filtered_position is None:
                 continue
 
             filtered_positions.append(filtered_position)
 
         return filtered_positions
 
+    @staticmethod
+    def filter_position_trades(position: TradingPosition) -> Optional[TradingPosition]:
+        """Get a copy of a position with repaired and failed trades removed.
+
+        See :py:meth:`get_all_positions_filtered`.
+
+        :return:
+            None if the position has no trades left
+        """
+
+        # to avoid copying with same reference
+        filtered_position = copy.deepcopy(position)
+        filtered_position.trades = {}
+
+        for key, trade in position.trades.items():
+            if trade.is_repaired() or trade.is_repair_trade():
+                # These trades have quantity set to zero
+                continue
+
+            # filter out failed trade
+            if trade.executed_at is None:
+                continue
+
+            # Internally negative quantities are for sells
+            quantity = trade.executed_quantity
+
+            if trade.planned_mid_price not in (0, None):
+                price = trade.planned_mid_price
+            else:
+                # TODO: Legacy trades.
+                # mid_price is filled to all latest trades
+                price = trade.executed_price
+
+            assert quantity != 0, f"Got bad quantity for {trade}"
+            assert (price is not None) and price > 0, f"Got invalid trade {trade.get_full_debug_dump_str()} - price is {price}"
+
+            filtered_position.trades[key] = trade
+
+        if not filtered_position.trades:
+            return None
+
+        return filtered_position
+
     def get_open_positions(self) -> Iterable[TradingPosition]:
         """Get currently open positions."""
         return self.open_positions.values()
@@ -211,11 +234,8 @@ class Portfolio:
     def get_open_position_for_pair(self, pair: TradingPairIdentifier) -> Optional[TradingPosition]:
         """Get Open position for a trading pair."""
         assert isinstance(pair, TradingPairIdentifier)
-        pos: TradingPosition
-        for pos in self.open_positions.values():
-            if pos.pair.get_identifier() == pair.get_identifier():
-                return pos
-        return None
+        positions = self.index.get_open_positions_by_pool(self, pair)
+        return positions[0] if positions else None
 
     def get_open_position_for_asset(self, asset: AssetIdentifier) -> Optional[TradingPosition]:
         """Get open position for a trading pair.
@@ -232,12 +252,7 @@ class Portfolio:
         """
         assert isinstance(asset, AssetIdentifier)
 
-        matches = []
-
-        pos: TradingPosition
-        for pos in self.open_positions.values():
-            if pos.pair.base == asset:
-                matches.append(pos)
+        matches = self.index.get_open_positions_by_base(self, asset)
 
         if len(matches) > 1:
             raise MultipleOpenPositionsWithAsset(f"Querying asset: {asset} - found multipe open positions: {matches}")
@@ -297,6 +312,7 @@ class Portfolio:
         )
         self.open_positions[p.position_id] = p
         self.next_position_id += 1
+        self.index.add_open_position(self, p)
         return p
 
     def get_position_by_trading_pair(self, pair: TradingPairIdentifier) -> Optional[TradingPosition]:
@@ -305,14 +321,8 @@ class Portfolio:
         For Uniswap-likes we use the pool address as the persistent identifier
         for each trading pair.
         """
-        # https://stackoverflow.com/a/2364277/315168
-        return next((p for p in self.open_positions.values() if p.pair == pair), None)
-        #for p in self.open_positions.values():
-            # TODO: Check with
-            # if p.pair.pool_address.lower() == pair.pool_address.lower():
-        #    if p.pair == pair:
-        #        return p
-        #return None
+        positions = self.index.get_open_positions_by_pair(self, pair)
+        return positions[0] if positions else None
 
     def get_existing_open_position_by_trading_pair(self, pair: TradingPairIdentifier) -> Optional[TradingPosition]:
         """Get a position by a trading pair smart contract address identifier.
@@ -320,7 +330,7 @@ class Portfolio:
         The position must have already executed trades (cannot be planned position(.
         """
         assert isinstance(pair, TradingPairIdentifier), f"Got {pair}"
-        for p in self.open_positions.values():
+        for p in self.index.get_open_positions_by_pool(self, pair):
             if p.has_executed_trades():
                 if p.pair.pool_address == pair.pool_address:
                     return p
@@ -331,9 +341,7 @@ class Portfolio:
 
         Useful to display closed positions after the rebalance.
         """
-        for p in self.closed_positions.values():
-            if p.closed_at == ts:
-                yield p
+        return iter(list(self.index.get_positions_closed_at(self, ts)))
 
     def create_trade(self,
                      strategy_cycle_at: datetime.datetime,
@@ -476,6 +484,7 @@ class Portfolio:
         # Check we accidentally do not reuse trade id somehow
 
         self.next_trade_id += 1
+        self.index.add_trade(self, trade)
 
         return position, trade, created
 
@@ -629,23 +638,52 @@ class Portfolio:
                 for tx in t.blockchain_transactions:
                     assert tx.nonce != nonce, f"Nonce {nonce} is already being used by trade {t} with txinfo {t.tx_info}"
 
-    def revalue_positions(self, ts: datetime.datetime, valuation_method: Callable, revalue_frozen=True):
+    def revalue_positions(
+        self,
+        ts: datetime.datetime,
+        valuation_method: Callable,
+        revalue_frozen=True,
+        prefetched_valuations: Optional[Dict[int, Tuple[datetime.datetime, USDollarPrice]]] = None,
+    ):
         """Revalue all open positions in the portfolio.
 
         Reserves are not revalued.
 
+        If the valuation method has `revalue_batch()`, all positions are revalued with one call.
+        See :py:class:`tradeexecutor.strategy.valuation.BatchValuationModel`.
+
         :param revalue_frozen:
             Revalue frozen positions as well
+
+        :param prefetched_valuations:
+            Position id -> (revaluation date, price) already read from the chain.
+
+            Positions not in here are revalued using `valuation_method`.
         """
         try:
-            for p in self.open_positions.values():
-                ts, price = valuation_method(ts, p)
-                p.set_revaluation_data(ts, price)
-
+            positions = list(self.open_positions.values())
             if revalue_frozen:
-                for p in self.frozen_positions.values():
-                    ts, price = valuation_method(ts, p)
-                    p.set_revaluation_data(ts, price)
+                positions += list(self.frozen_positions.values())
+
+            if prefetched_valuations:
+                remaining = []
+                for p in positions:
+                    valuation = prefetched_valuations.get(p.position_id)
+                    if valuation is not None:
+                        p.set_revaluation_data(*valuation)
+                    else:
+                        remaining.append(p)
+                positions = remaining
+
+            revalue_batch = getattr(valuation_method, "revalue_batch", None)
+            if revalue_batch is not None:
+                for p, (revalued_at, price) in zip(positions, revalue_batch(ts, positions)):
+                    p.set_revaluation_data(revalued_at, price)
+                return
+
+            for p in positions:
+                revalued_at, price = valuation_method(ts, p)
+                p.set_revaluation_data(revalued_at, price)
         except Exception as e:
             raise InvalidValuationOutput(f"Valuation model failed to output proper price: {valuation_method}: {e}") from e
 
@@ -0,0 +1,191 @@
+"""In-memory lookup indexes for a portfolio.
+
+:py:class:`tradeexecutor.state.portfolio.Portfolio` keeps positions in plain dicts
+keyed by position id. Finding a trade, or an open position for a pair or an asset,
+would need a scan over all positions. With a long trading history
+and lookups done in loops over trading pairs, this becomes slow.
+
+:py:class:`PortfolioIndex` maintains
+
+- trade id -> trade
+
+- pair pool address -> open positions
+
+- base and quote asset -> open positions
+
+- base asset -> open positions
+
+- close timestamp -> closed positions
+
+The indexes are not part of the serialised state.
+They are built on the first lookup after the state is loaded.
+
+Opening positions and creating trades through the portfolio, and closing positions
+in :py:meth:`tradeexecutor.state.state.State.mark_trade_success`,
+update the indexes incrementally. Code moving positions between the open,
+closed and frozen dicts otherwise, like freezing and unfreezing positions,
+must call :py:meth:`tradeexecutor.state.portfolio.Portfolio.invalidate_index`
+after it. Replacing a position dict altogether is detected.
+"""
+
+import datetime
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from tradeexecutor.state.identifier import TradingPairIdentifier, AssetIdentifier
+from tradeexecutor.state.position import TradingPosition
+from tradeexecutor.state.trade import TradeExecution
+
+if TYPE_CHECKING:
+    from tradeexecutor.state.portfolio import Portfolio
+
+
+#: Base asset address, quote asset address
+PairKey = Tuple[str, str]
+
+
+def get_pair_key(pair: TradingPairIdentifier) -> PairKey:
+    """Index key matching :py:meth:`TradingPairIdentifier.__eq__`."""
+    return pair.base.address.lower(), pair.quote.address.lower()
+
+
+class PortfolioIndex:
+    """Lookup indexes for one portfolio.
+
+    Created by :py:class:`tradeexecutor.state.portfolio.Portfolio`,
+    use its lookup methods instead of using this class directly.
+    """
+
+    def __init__(self):
+        #: The open positions dict we have indexed, `None` if the index must be rebuilt.
+        #:
+        #: Holds a reference instead of an id, so that a replaced dict
+        #: cannot be garbage collected and its id reused.
+        self.open_positions: Optional[dict] = None
+
+        #: Pool address -> open positions
+        self.open_by_pool: Dict[str, List[TradingPosition]] = {}
+
+        #: Base and quote address -> open positions
+        self.open_by_pair: Dict[PairKey, List[TradingPosition]] = {}
+
+        #: Base asset address -> open positions
+        self.open_by_base: Dict[str, List[TradingPosition]] = {}
+
+        #: The closed positions dict we have indexed, `None` if the index must be rebuilt
+        self.closed_positions: Optional[dict] = None
+
+        #: Close timestamp -> closed positions
+        self.closed_by_timestamp: Dict[datetime.datetime, List[TradingPosition]] = {}
+
+        #: The open, closed and frozen position dicts we have indexed trades from,
+        #: `None` if the index must be rebuilt
+        self.trade_positions: Optional[tuple] = None
+
+        #: Trade id -> trade
+        self.trades: Dict[int, TradeExecution] = {}
+
+    @staticmethod
+    def get_trade_positions(portfolio: "Portfolio") -> tuple:
+        return portfolio.open_positions, portfolio.closed_positions, portfolio.frozen_positions
+
+    def is_trade_index_valid(self, portfolio: "Portfolio") -> bool:
+        if self.trade_positions is None:
+            return False
+        return all(a is b for a, b in zip(self.trade_positions, self.get_trade_positions(portfolio)))
+
+    def invalidate(self):
+        """Rebuild all indexes on the next lookup."""
+        self.open_positions = None
+        self.closed_positions = None
+        self.trade_positions = None
+
+    def index_open_position(self, p: TradingPosition):
+        self.open_by_pool.setdefault(p.pair.get_identifier(), []).append(p)
+        self.open_by_pair.setdefault(get_pair_key(p.pair), []).append(p)
+        self.open_by_base.setdefault(p.pair.base.address.lower(), []).append(p)
+
+    def unindex_open_position(self, p: TradingPosition):
+        for index, key in (
+            (self.open_by_pool, p.pair.get_identifier()),
+            (self.open_by_pair, get_pair_key(p.pair)),
+            (self.open_by_base, p.pair.base.address.lower()),
+        ):
+            positions = index.get(key, [])
+            positions[:] = [o for o in positions if o is not p]
+            if not positions:
+                index.pop(key, None)
+
+    def refresh_open_positions(self, portfolio: "Portfolio"):
+        """Rebuild open position indexes if they have been invalidated."""
+        if self.open_positions is portfolio.open_positions:
+            return
+
+        self.open_by_pool = {}
+        self.open_by_pair = {}
+        self.open_by_base = {}
+        for p in portfolio.open_positions.values():
+            self.index_open_position(p)
+        self.open_positions = portfolio.open_positions
+
+    def refresh_closed_positions(self, portfolio: "Portfolio"):
+        """Rebuild the closed position index if it has been invalidated."""
+        if self.closed_positions is portfolio.closed_positions:
+            return
+
+        self.closed_by_timestamp = {}
+        for p in portfolio.closed_positions.values():
+            self.closed_by_timestamp.setdefault(p.closed_at, []).append(p)
+        self.closed_positions = portfolio.closed_positions
+
+    def refresh_trades(self, portfolio: "Portfolio"):
+        """Rebuild the trade index if it has been invalidated."""
+        if self.is_trade_index_valid(portfolio):
+            return
+
+        self.trades = {}
+        for p in portfolio.get_all_positions():
+            self.trades.update(p.trades)
+        self.trade_positions = self.get_trade_positions(portfolio)
+
+    def add_trade(self, portfolio: "Portfolio", trade: TradeExecution):
+        """Index a newly created trade."""
+        if self.is_trade_index_valid(portfolio):
+            self.trades[trade.trade_id] = trade
+
+    def add_open_position(self, portfolio: "Portfolio", position: TradingPosition):
+        """Index a newly opened position.
+
+        Must be called after the position has been added to the open positions.
+        """
+        if self.open_positions is portfolio.open_positions:
+            self.index_open_position(position)
+
+    def close_position(self, portfolio: "Portfolio", position: TradingPosition):
+        """Move a position from the open to the closed indexes.
+
+        Must be called after the position has been moved to the closed positions.
+        """
+        if self.open_positions is portfolio.open_positions:
+            self.unindex_open_position(position)
+        if self.closed_positions is portfolio.closed_positions:
+            self.closed_by_timestamp.setdefault(position.closed_at, []).append(position)
+
+    def get_trade(self, portfolio: "Portfolio", trade_id: int) -> Optional[TradeExecution]:
+        self.refresh_trades(portfolio)
+        return self.trades.get(trade_id)
+
+    def get_open_positions_by_pool(self, portfolio: "Portfolio", pair: TradingPairIdentifier) -> List[TradingPosition]:
+        self.refresh_open_positions(portfolio)
+        return self.open_by_pool.get(pair.get_identifier(), [])
+
+    def get_open_positions_by_pair(self, portfolio: "Portfolio", pair: TradingPairIdentifier) -> List[TradingPosition]:
+        self.refresh_open_positions(portfolio)
+        return self.open_by_pair.get(get_pair_key(pair), [])
+
+    def get_open_positions_by_base(self, portfolio: "Portfolio", asset: AssetIdentifier) -> List[TradingPosition]:
+        self.refresh_open_positions(portfolio)
+        return self.open_by_base.get(asset.address.lower(), [])
+
+    def get_positions_closed_at(self, portfolio: "Portfolio", ts: datetime.datetime) -> List[TradingPosition]:
+        self.refresh_closed_positions(portfolio)
+        return self.closed_by_timestamp.get(ts, [])
@@ -4,6 +4,7 @@ import enum
 import logging
 from dataclasses import dataclass, field
 from decimal import Decimal
+from itertools import islice
 
 from typing import Dict, Optional, List, Iterable
 
@@ -29,6 +30,112 @@ logger = logging.getLogger(__name__)
 CLOSED_POSITION_DUST_EPSILON = 0.0001
 
 
+class PositionAggregates:
+    """Running sums over the settled trades of a position.
+
+    - Covers the longest run of successfully executed trades from the start of
+      :py:attr:`TradingPosition.trades`. Executed trades do not change,
+      so the sums stay valid when new trades are added or pending trades execute.
+
+    - Trades after the run, usually the planned or pending trades of the current cycle,
+      are summed on every call. This keeps the summation order the same
+      as summing all trades in one go.
+
+    - Balance updates are summed again when their count changes
+
+    - Code that modifies already executed trades must call
+      :py:meth:`TradingPosition.invalidate_cached_aggregates`
+    """
+
+    __slots__ = (
+        "trades",
+        "trade_count",
+        "quantity",
+        "token_equity",
+        "bought_usd",
+        "sold_usd",
+        "buy_quantity",
+        "sell_quantity",
+        "buy_value",
+        "sell_value",
+        "lp_fees_paid",
+        "balance_updates",
+        "balance_update_count",
+        "balance_update_quantity",
+    )
+
+    def __init__(self, trades: Dict[int, TradeExecution]):
+        #: The trades dict the sums were calculated from
+        self.trades = trades
+
+        #: How many trades from the start of the dict are included in the sums
+        self.trade_count = 0
+
+        # Start from int zero like sum() does
+        self.quantity = 0
+        self.token_equity = 0
+        self.bought_usd = 0
+        self.sold_usd = 0
+        self.buy_quantity = 0
+        self.sell_quantity = 0
+        self.buy_value = 0
+        self.sell_value = 0
+        self.lp_fees_paid = 0
+
+        self.balance_updates: Optional[Dict[int, BalanceUpdate]] = None
+        self.balance_update_count = 0
+        self.balance_update_quantity = Decimal(0)
+
+    def add_trades(self):
+        """Include newly executed trades in the sums."""
+        if len(self.trades) == self.trade_count:
+            return
+
+        for t in islice(self.trades.values(), self.trade_count, None):
+            if not t.is_success():
+                break
+
+            quantity = t.get_position_quantity()
+            self.quantity += quantity
+            if t.is_accounted_for_equity():
+                self.token_equity += t.get_equity_for_position()
+            if t.planned_quantity == 0:
+                # Buy/sell concept does not exist for zero quantity
+                pass
+            elif t.is_buy():
+                self.bought_usd += t.get_value()
+                self.buy_quantity += quantity
+                self.buy_value += t.get_executed_value()
+            else:
+                self.sold_usd += t.get_value()
+                self.sell_quantity += abs(quantity)
+                self.sell_value += t.get_executed_value()
+            self.lp_fees_paid += get_trade_lp_fees_paid(t)
+            self.trade_count += 1
+
+    def get_unsettled_trades(self) -> List[TradeExecution]:
+        """Trades not included in the sums."""
+        if len(self.trades) == self.trade_count:
+            return []
+        return list(islice(self.trades.values(), self.trade_count, None))
+
+    def get_balance_update_quantity(self, balance_updates: Dict[int, BalanceUpdate]) -> Decimal:
+        if balance_updates is not self.balance_updates or len(balance_updates) != self.balance_update_count:
+            # Take the sum and the count from the same snapshot
+            updates = list(balance_updates.values())
+            self.balance_update_quantity = sum_decimal([b.quantity for b in updates])
+            self.balance_updates = balance_updates
+            self.balance_update_count = len(updates)
+        return self.balance_update_quantity
+
+
+def get_trade_lp_fees_paid(trade: TradeExecution) -> USDollarAmount:
+    """Get LP fees paid by a trade, as :py:meth:`TradingPosition.get_total_lp_fees_paid` counts them."""
+    if type(trade.lp_fees_paid) == list:
+        return sum(filter(None, trade.lp_fees_paid))
+    return trade.lp_fees_paid or 0
+
+
 @dataclass_json
 @dataclass(slots=True, frozen=True)
 class TriggerPriceUpdate:
@@ -218,6 +325,12 @@ class TradingPosition(GenericPosition):
         return self.position_id == other.position_id
 
     def __post_init__(self):
+        # Cached sums over executed trades, not serialised.
+        # Kept out of the dataclass fields, as dataclasses_json
+        # deep copies the field values even when they are excluded.
+        # See :py:class:`PositionAggregates`.
+        self.cached_aggregates: Optional[PositionAggregates] = None
+
         assert self.position_id > 0
         assert self.last_pricing_at is not None
         assert self.reserve_currency is not None
@@ -371,7 +484,23 @@ class TradingPosition(GenericPosition):
 
             Decimal zero epsilon noted.
         """
-        return sum_decimal([b.quantity for b in self.balance_updates.values()])
+        return self.get_cached_aggregates().get_balance_update_quantity(self.balance_updates)
+
+    def get_cached_aggregates(self) -> PositionAggregates:
+        """Get the running sums over executed trades, updated with newly executed trades."""
+        aggregates = self.cached_aggregates
+        if aggregates is None or aggregates.trades is not self.trades or len(self.trades) < aggregates.trade_count:
+            aggregates = self.cached_aggregates = PositionAggregates(self.trades)
+        aggregates.add_trades()
+        return aggregates
+
+    def invalidate_cached_aggregates(self):
+        """Recalculate the cached sums on the next access.
+
+        Call after modifying a trade that has already been executed,
+        e.g. when repairing trades.
+        """
+        self.cached_aggregates = None
 
     def get_quantity(self) -> Decimal:
         """Get the tied up token quantity in all successfully executed trades.
@@ -387,7 +516,8 @@ class TradingPosition(GenericPosition):
 
             Rounded down to zero if the sum of
         """
-        trades = sum_decimal([t.get_position_quantity() for t in self.trades.values() if t.is_success()])
+        aggregates = self.get_cached_aggregates()
+        trades = sum_decimal([aggregates.quantity] + [t.get_position_quantity() for t in aggregates.get_unsettled_trades() if t.is_success()])
         direct_balance_updates = self.get_balance_update_quantity()
         s = trades + direct_balance_updates
 
@@ -462,8 +592,11 @@ class TradingPosition(GenericPosition):
 
     def calculate_value_using_price(self, token_price: USDollarAmount, reserve_price: USDollarAmount) -> USDollarAmount:
         """Calculate the value of this position using the given prices."""
-        token_quantity = sum([t.get_equity_for_position() for t in self.trades.values() if t.is_accounted_for_equity()])
-        reserve_quantity = sum([t.get_equity_for_reserve() for t in self.trades.values() if t.is_accounted_for_equity()])
+        aggregates = self.get_cached_aggregates()
+        unsettled = [t for t in aggregates.get_unsettled_trades() if t.is_accounted_for_equity()]
+        token_quantity = sum([t.get_equity_for_position() for t in unsettled], aggregates.token_equity)
+        # Executed trades do not have reserves tied
+        reserve_quantity = sum([t.get_equity_for_reserve() for t in unsettled])
         return float(token_quantity) * token_price + float(reserve_quantity) * reserve_price
 
     def get_value(self) -> USDollarAmount:
@@ -652,19 +785,23 @@ class TradingPosition(GenericPosition):
 
     def get_total_bought_usd(self) -> USDollarAmount:
         """How much money we have used on buys"""
-        return sum([t.get_value() for t in self.trades.values() if t.is_success() if t.is_buy()])
+        aggregates = self.get_cached_aggregates()
+        return sum([t.get_value() for t in aggregates.get_unsettled_trades() if t.is_success() if t.is_buy()], aggregates.bought_usd)
 
     def get_total_sold_usd(self) -> USDollarAmount:
         """How much money we have received on sells"""
-        return sum([t.get_value() for t in self.trades.values() if t.is_success() if t.is_sell()])
+        aggregates = self.get_cached_aggregates()
+        return sum([t.get_value() for t in aggregates.get_unsettled_trades() if t.is_success() if t.is_sell()], aggregates.sold_usd)
 
     def get_buy_quantity(self) -> Decimal:
         """How many units we have bought total"""
-        return sum_decimal([t.get_position_quantity() for t in self.trades.values() if t.is_success() if t.is_buy()])
+        aggregates = self.get_cached_aggregates()
+        return sum_decimal([aggregates.buy_quantity] + [t.get_position_quantity() for t in aggregates.get_unsettled_trades() if t.is_success() if t.is_buy()])
 
     def get_sell_quantity(self) -> Decimal:
         """How many units we have sold total"""
-        return sum_decimal([abs(t.get_position_quantity()) for t in self.trades.values() if t.is_success() if t.is_sell()])
+        aggregates = self.get_cached_aggregates()
+        return sum_decimal([aggregates.sell_quantity] + [abs(t.get_position_quantity()) for t in aggregates.get_unsettled_trades() if t.is_success() if t.is_sell()])
 
     def get_net_quantity(self) -> Decimal:
         """The difference in the quantity of assets bought and sold to date."""
@@ -942,24 +1079,23 @@ class TradingPosition(GenericPosition):
     def get_total_lp_fees_paid(self) -> USDollarAmount:
         """Get the total amount of swap fees paid in the position. Includes all trades."""
         
-        lp_fees_paid = 0
+        aggregates = self.get_cached_aggregates()
+        lp_fees_paid = aggregates.lp_fees_paid
 
-        for trade in self.trades.values():
-            if type(trade.lp_fees_paid) == list:
-                lp_fees_paid += sum(filter(None,trade.lp_fees_paid))
-            else:
-                lp_fees_paid += trade.lp_fees_paid or 0
+        for trade in aggregates.get_unsettled_trades():
+            lp_fees_paid += get_trade_lp_fees_paid(trade)
 
         return lp_fees_paid
     
     def get_buy_value(self) -> USDollarAmount:
         """Get the total value of the position when it was bought."""
-        
-        return sum(t.get_executed_value() for t in self.trades.values() if t.is_buy())
+        aggregates = self.get_cached_aggregates()
+        return sum((t.get_executed_value() for t in aggregates.get_unsettled_trades() if t.is_buy()), aggregates.buy_value)
     
     def get_sell_value(self) -> USDollarAmount:
         """Get the total value of the position when it was sold."""
-        return sum(t.get_executed_value() for t in self.trades.values() if t.is_sell())
+        aggregates = self.get_cached_aggregates()
+        return sum((t.get_executed_value() for t in aggregates.get_unsettled_trades() if t.is_sell()), aggregates.sell_value)
     
     def has_bad_data_issues(self) -> bool:
         """Do we have legacy / incompatible data issues."""
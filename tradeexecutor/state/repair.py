@@ -202,6 +202,7 @@ def unfreeze_position(portfolio: Portfolio, position: TradingPosition) -> bool:
 
     position.unfrozen_at = datetime.datetime.utcnow()
     del portfolio.frozen_positions[position.position_id]
+    portfolio.invalidate_index()
 
     if position.notes is None:
         position.notes = ""
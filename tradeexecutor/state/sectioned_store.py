@@ -0,0 +1,500 @@
+"""Sectioned binary state file with lazy loading of trading history.
+
+Most users of the state, like the live trading loop itself,
+need only open and frozen positions and the latest statistics.
+:py:class:`JSONFileStore` needs to decode every closed position
+and every historical statistics entry on a startup,
+making the startup time and the memory usage grow with the trading history.
+
+:py:class:`SectionedFileStore` stores the state in a single binary file where
+the trading history is split to separately addressable sections:
+
+- Each closed position, including its trades, is its own section
+
+- Statistics of each position is its own section, stored column by column
+
+- Portfolio statistics time series is stored column by column in one or more chunks
+
+- The rest of the state is the root section
+
+Each section is zlib compressed JSON, encoded with :py:mod:`tradeexecutor.state.serialisation`,
+so the serialisation rules are the same as with the JSON state files.
+
+When the state is loaded only the root section is decoded.
+:py:attr:`tradeexecutor.state.portfolio.Portfolio.closed_positions`,
+:py:attr:`tradeexecutor.state.statistics.Statistics.positions` and
+:py:attr:`tradeexecutor.state.statistics.Statistics.portfolio` are replaced with
+lazy containers that decode their sections on the first access.
+On sync, sections that have not been accessed are copied to the new file as is,
+without decoding.
+
+File layout::
+
+    b"TXSTATE1" | index offset as uint64 little endian | sections ... | index
+
+The store is used when the state file name ends with `.state`,
+see :py:func:`tradeexecutor.cli.bootstrap.create_state_store`.
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from collections.abc import MutableMapping, MutableSequence
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from dataclasses_json.core import _ExtendedEncoder
+
+from tradeexecutor.state.plot_sidecar import PlotSidecarFile, get_plot_sidecar_path
+from tradeexecutor.state.position import TradingPosition
+from tradeexecutor.state.serialisation import encode_dataclass, encode_value, decode_dataclass
+from tradeexecutor.state.state import State
+from tradeexecutor.state.statistics import PortfolioStatistics, PositionStatistics
+from tradeexecutor.state.store import StateStore
+from tradeexecutor.state.validator import validate_nested_state_dict
+
+
+logger = logging.getLogger(__name__)
+
+
+#: File name suffix that selects :py:class:`SectionedFileStore`
+SECTIONED_STATE_FILE_SUFFIX = ".state"
+
+#: Magic bytes at the start of a sectioned state file
+SECTIONED_STATE_MAGIC = b"TXSTATE1"
+
+#: Format version stored in the index
+SECTIONED_STATE_VERSION = 1
+
+#: zlib compression level for sections.
+#:
+#: Favour speed, as the live loop writes the state on every cycle.
+COMPRESSION_LEVEL = 1
+
+#: Max number of portfolio statistics chunks.
+#:
+#: Portfolio statistics entries appended since the load are written
+#: as a new chunk, without decoding the earlier entries.
+#: After this many chunks, all entries are rewritten as one chunk.
+MAX_PORTFOLIO_STATS_CHUNKS = 32
+
+_HEADER = struct.Struct("<8sQ")
+
+#: Offset and length of a section in the file
+SectionRef = Tuple[int, int]
+
+
+class SectionedStateFileError(Exception):
+    """The file is not a sectioned state file or it is damaged."""
+
+
+def encode_section(data: Any) -> bytes:
+    """Compress JSON encoded section data."""
+    # Friendly error messages for the JSON serialisation errors
+    validate_nested_state_dict(data)
+    return zlib.compress(json.dumps(data, cls=_ExtendedEncoder).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decode_section(raw: bytes) -> Any:
+    """Decompress and JSON decode section data."""
+    return json.loads(zlib.decompress(raw))
+
+
+def encode_columns(rows: List[dict]) -> dict:
+    """Store a time series of encoded dataclasses column by column.
+
+    All rows must be encoded instances of the same dataclass.
+    """
+    if not rows:
+        return {"rows": 0, "columns": {}}
+    names = list(rows[0].keys())
+    return {
+        "rows": len(rows),
+        "columns": {name: [row[name] for row in rows] for name in names},
+    }
+
+
+def decode_columns(data: dict) -> List[dict]:
+    """Reverse of :py:func:`encode_columns`."""
+    names = list(data["columns"].keys())
+    return [dict(zip(names, values)) for values in zip(*data["columns"].values())]
+
+
+class SectionReader:
+    """Read raw sections from a sectioned state file.
+
+    The file is kept open, so sections can be read even
+    after a newer state file has replaced the file on the disk.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+
+        header = os.pread(self.fd, _HEADER.size, 0)
+        if len(header) != _HEADER.size:
+            raise SectionedStateFileError(f"{path}: truncated file")
+
+        magic, index_offset = _HEADER.unpack(header)
+        if magic != SECTIONED_STATE_MAGIC:
+            raise SectionedStateFileError(f"{path}: not a sectioned state file")
+
+        index_length = os.fstat(self.fd).st_size - index_offset
+        self.index = decode_section(self.read_raw((index_offset, index_length)))
+
+        version = self.index.get("version")
+        if version != SECTIONED_STATE_VERSION:
+            raise SectionedStateFileError(f"{path}: unsupported sectioned state file version {version}")
+
+    def __del__(self):
+        fd = getattr(self, "fd", None)
+        if fd is not None:
+            os.close(fd)
+            self.fd = None
+
+    def read_raw(self, ref: SectionRef) -> bytes:
+        offset, length = ref
+        raw = os.pread(self.fd, length, offset)
+        if len(raw) != length:
+            raise SectionedStateFileError(f"{self.path}: truncated section at {offset}")
+        return raw
+
+    def read(self, ref: SectionRef) -> Any:
+        return decode_section(self.read_raw(ref))
+
+
+class SectionWriter:
+    """Write sections to a new sectioned state file."""
+
+    def __init__(self, out):
+        self.out = out
+        out.write(_HEADER.pack(SECTIONED_STATE_MAGIC, 0))
+        self.offset = _HEADER.size
+
+    def write_raw(self, raw: bytes) -> SectionRef:
+        ref = (self.offset, len(raw))
+        self.out.write(raw)
+        self.offset += len(raw)
+        return ref
+
+    def write(self, data: Any) -> SectionRef:
+        return self.write_raw(encode_section(data))
+
+    def finish(self, index: dict):
+        """Write the index and point the header to it."""
+        index_offset = self.offset
+        self.write(index)
+        self.out.seek(0)
+        self.out.write(_HEADER.pack(SECTIONED_STATE_MAGIC, index_offset))
+
+
+class LazySectionMapping(MutableMapping):
+    """A dict whose values are decoded from file sections on the first access.
+
+    Used for closed positions and position statistics.
+    Keys are known without reading the sections.
+    """
+
+    def __init__(self, reader: SectionReader, refs: Dict[int, SectionRef], decoder: Callable[[Any], Any]):
+        self.reader = reader
+        self.refs = refs
+        self.decoder = decoder
+        self.loaded: Dict[int, Any] = {}
+        # Keep the insertion order of the keys
+        self.order: Dict[int, None] = dict.fromkeys(refs.keys())
+
+    def __repr__(self):
+        return f"<LazySectionMapping with {len(self.order)} entries, {len(self.loaded)} loaded>"
+
+    def __getitem__(self, key):
+        try:
+            return self.loaded[key]
+        except KeyError:
+            pass
+        ref = self.refs[key]
+        value = self.loaded[key] = self.decoder(self.reader.read(ref))
+        return value
+
+    def __setitem__(self, key, value):
+        self.loaded[key] = value
+        self.refs.pop(key, None)
+        self.order[key] = None
+
+    def __delitem__(self, key):
+        del self.order[key]
+        self.loaded.pop(key, None)
+        self.refs.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.order
+
+    def __iter__(self) -> Iterator:
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def get_unloaded_refs(self) -> Dict[int, SectionRef]:
+        """Sections that have not been decoded."""
+        return {k: ref for k, ref in self.refs.items() if k not in self.loaded}
+
+    def rebind(self, reader: SectionReader, refs: Dict[int, SectionRef]):
+        """Point the unloaded values to a newly written file."""
+        self.reader = reader
+        self.refs = refs
+
+
+class LazyPortfolioStatistics(MutableSequence):
+    """Portfolio statistics time series decoded on the first access.
+
+    New entries can be appended without decoding the history,
+    as the live loop does on every cycle.
+    """
+
+    def __init__(self, reader: SectionReader, chunks: List[Tuple[int, int, int]]):
+        self.reader = reader
+        #: (offset, length, row count) of each chunk
+        self.chunks = chunks
+        self.history_length = sum(c[2] for c in chunks)
+        #: Entries appended since the load
+        self.tail: List[PortfolioStatistics] = []
+        self.items: Optional[List[PortfolioStatistics]] = None
+
+    def __repr__(self):
+        return f"<LazyPortfolioStatistics with {len(self)} entries, loaded: {self.is_loaded()}>"
+
+    def is_loaded(self) -> bool:
+        return self.items is not None
+
+    def load(self) -> List[PortfolioStatistics]:
+        if self.items is None:
+            items = []
+            for offset, length, rows in self.chunks:
+                items += [decode_dataclass(PortfolioStatistics, d) for d in decode_columns(self.reader.read((offset, length)))]
+            self.items = items + self.tail
+            self.tail = []
+        return self.items
+
+    def __getitem__(self, index):
+        if self.items is None and isinstance(index, int):
+            # Latest entries are served without loading the history
+            if 0 <= index - self.history_length < len(self.tail):
+                return self.tail[index - self.history_length]
+            if -len(self.tail) <= index < 0:
+                return self.tail[index]
+        return self.load()[index]
+
+    def __setitem__(self, index, value):
+        self.load()[index] = value
+
+    def __delitem__(self, index):
+        del self.load()[index]
+
+    def __len__(self):
+        if self.items is None:
+            return self.history_length + len(self.tail)
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def insert(self, index, value):
+        if self.items is None and index >= len(self):
+            self.tail.append(value)
+            return
+        self.load().insert(index, value)
+
+    def append(self, value):
+        self.insert(len(self), value)
+
+    def rebind(self, reader: SectionReader, chunks: List[Tuple[int, int, int]]):
+        """Point the history to a newly written file."""
+        self.reader = reader
+        self.chunks = chunks
+        self.history_length = sum(c[2] for c in chunks)
+        self.tail = []
+
+
+def _decode_position_stats(data: dict) -> List[PositionStatistics]:
+    return [decode_dataclass(PositionStatistics, d) for d in decode_columns(data)]
+
+
+def _write_mapping(writer: SectionWriter, mapping, encoder: Callable[[Any], Any]) -> Tuple[Dict[int, SectionRef], Dict[int, SectionRef]]:
+    """Write each value of a mapping as its own section.
+
+    :return:
+        Tuple (all section refs, refs of sections that were copied without decoding)
+    """
+    refs = {}
+    copied = {}
+    unloaded = {}
+    if isinstance(mapping, LazySectionMapping):
+        unloaded = mapping.get_unloaded_refs()
+
+    for key in mapping:
+        ref = unloaded.get(key)
+        if ref is not None:
+            refs[key] = copied[key] = writer.write_raw(mapping.reader.read_raw(ref))
+        else:
+            refs[key] = writer.write(encoder(mapping[key]))
+    return refs, copied
+
+
+def _write_portfolio_stats(writer: SectionWriter, portfolio_stats) -> List[Tuple[int, int, int]]:
+    """Write portfolio statistics chunks."""
+
+    def _write_chunk(entries: List[PortfolioStatistics]) -> Tuple[int, int, int]:
+        offset, length = writer.write(encode_columns([encode_dataclass(s) for s in entries]))
+        return offset, length, len(entries)
+
+    if isinstance(portfolio_stats, LazyPortfolioStatistics) and not portfolio_stats.is_loaded():
+        if len(portfolio_stats.chunks) < MAX_PORTFOLIO_STATS_CHUNKS:
+            chunks = []
+            for offset, length, rows in portfolio_stats.chunks:
+                new_offset, new_length = writer.write_raw(portfolio_stats.reader.read_raw((offset, length)))
+                chunks.append((new_offset, new_length, rows))
+            if portfolio_stats.tail:
+                chunks.append(_write_chunk(portfolio_stats.tail))
+            return chunks
+
+    entries = list(portfolio_stats)
+    if not entries:
+        return []
+    return [_write_chunk(entries)]
+
+
+def write_sectioned_state(path: Path, state: State) -> dict:
+    """Write the state as a sectioned state file.
+
+    Uses Linux atomic file replacement.
+
+    :return:
+        The index of the written file
+    """
+
+    portfolio = state.portfolio
+    stats = state.stats
+
+    dirname, basename = os.path.split(path)
+    temp = tempfile.NamedTemporaryFile(mode="wb", delete=False, dir=dirname)
+    with open(temp.name, "wb") as out:
+        writer = SectionWriter(out)
+
+        # Root section, without the trading history
+        root = {name: encode_value(getattr(state, name)) for name in state.__dataclass_fields__.keys() if name not in ("portfolio", "stats")}
+        root["portfolio"] = {name: encode_value(getattr(portfolio, name)) for name in portfolio.__dataclass_fields__.keys() if name != "closed_positions"}
+        root["stats"] = {name: encode_value(getattr(stats, name)) for name in stats.__dataclass_fields__.keys() if name not in ("positions", "portfolio")}
+
+        closed_positions, copied_positions = _write_mapping(writer, portfolio.closed_positions, encode_dataclass)
+        position_stats, copied_stats = _write_mapping(
+            writer,
+            stats.positions,
+            lambda entries: encode_columns([encode_dataclass(s) for s in entries])
+        )
+        portfolio_stats = _write_portfolio_stats(writer, stats.portfolio)
+
+        index = {
+            "version": SECTIONED_STATE_VERSION,
+            "root": writer.write(root),
+            "closed_positions": closed_positions,
+            "position_stats": position_stats,
+            "portfolio_stats": portfolio_stats,
+        }
+        writer.finish(index)
+        out.flush()
+        os.fsync(out.fileno())
+
+        written = writer.offset
+
+    temp.close()
+    shutil.move(temp.name, path)
+    logger.info("Saved state to %s, total %d bytes, %d closed positions copied without decoding", path, written, len(copied_positions))
+
+    # Lazy containers must not point to the replaced file anymore
+    if isinstance(portfolio.closed_positions, LazySectionMapping) or isinstance(stats.positions, LazySectionMapping) or isinstance(stats.portfolio, LazyPortfolioStatistics):
+        reader = SectionReader(path)
+        if isinstance(portfolio.closed_positions, LazySectionMapping):
+            portfolio.closed_positions.rebind(reader, copied_positions)
+        if isinstance(stats.positions, LazySectionMapping):
+            stats.positions.rebind(reader, copied_stats)
+        if isinstance(stats.portfolio, LazyPortfolioStatistics) and not stats.portfolio.is_loaded():
+            stats.portfolio.rebind(reader, [tuple(c) for c in portfolio_stats])
+
+    return index
+
+
+def read_sectioned_state(path: Path) -> State:
+    """Read the root section of a sectioned state file.
+
+    The trading history is loaded lazily.
+    """
+    reader = SectionReader(path)
+    index = reader.index
+
+    state = decode_dataclass(State, reader.read(index["root"]))
+
+    state.portfolio.closed_positions = LazySectionMapping(
+        reader,
+        {int(k): tuple(v) for k, v in index["closed_positions"].items()},
+        lambda data: decode_dataclass(TradingPosition, data),
+    )
+
+    state.stats.positions = LazySectionMapping(
+        reader,
+        {int(k): tuple(v) for k, v in index["position_stats"].items()},
+        _decode_position_stats,
+    )
+
+    state.stats.portfolio = LazyPortfolioStatistics(
+        reader,
+        [tuple(c) for c in index["portfolio_stats"]],
+    )
+
+    return state
+
+
+class SectionedFileStore(StateStore):
+    """Store the state of the executor as a sectioned binary file.
+
+    - Closed positions and statistics history are loaded lazily
+
+    - Unchanged history is copied as is on sync
+
+    See :py:mod:`tradeexecutor.state.sectioned_store`.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        assert path
+        if not isinstance(path, Path):
+            path = Path(path)
+        self.path = path
+        self.plot_sidecar = PlotSidecarFile(get_plot_sidecar_path(path))
+
+    def __repr__(self):
+        path = os.path.abspath(self.path)
+        return f"<Sectioned state file at {path}>"
+
+    def is_pristine(self) -> bool:
+        return not self.path.exists()
+
+    def load(self) -> State:
+        state = read_sectioned_state(self.path)
+        self.plot_sidecar.read(state)
+        logger.info("Loaded state from %s, %d closed positions not decoded", self.path, len(state.portfolio.closed_positions))
+        return state
+
+    def sync(self, state: State):
+        state.last_updated_at = datetime.datetime.utcnow()
+        self.plot_sidecar.write(state)
+        write_sectioned_state(self.path, state)
+
+    def create(self, name: str) -> State:
+        logger.info("Created new state for the strategy %s at %s", name, os.path.realpath(self.path))
+        return super().create(name)
@@ -0,0 +1,424 @@
+"""Fast state serialisation.
+
+The state classes use :py:mod:`dataclasses_json` for serialisation.
+:py:mod:`dataclasses_json` resolves type hints, field overrides and deep copies
+values for every single object it encodes or decodes, making
+reading and writing large states slow.
+
+This module provides a pluggable serialisation engine:
+
+- :py:attr:`SerialisationEngine.dataclasses_json` uses :py:mod:`dataclasses_json` as is
+
+- :py:attr:`SerialisationEngine.compiled` builds an encoder and a decoder for each dataclass
+  in the state tree once, from its type hints and :py:mod:`dataclasses_json` field configuration,
+  and reuses them for every object
+
+Both engines produce the same dict tree and thus byte-identical JSON.
+The compiled engine can also write and read trading pair and asset identifiers
+as references to a table, see :py:mod:`tradeexecutor.state.identifier_registry`.
+The compiled engine follows the :py:mod:`dataclasses_json` decoding rules,
+including its quirks, so that states written by an older version load the same way.
+
+Example:
+
+.. code-block:: python
+
+    from tradeexecutor.state.serialisation import encode_dataclass, decode_dataclass
+
+    data = encode_dataclass(state)
+    state = decode_dataclass(State, data)
+
+"""
+import datetime
+import enum
+import logging
+from dataclasses import fields, is_dataclass, MISSING
+from decimal import Decimal
+from typing import Any, Callable, Collection, Dict, Mapping, Optional, Tuple, Type, TypeVar, get_type_hints
+from uuid import UUID
+
+from dataclasses_json import core
+from dataclasses_json.core import _user_overrides_or_exts, _is_supported_generic
+from dataclasses_json.utils import (
+    _get_type_args,
+    _get_type_arg_param,
+    _get_type_cons,
+    _get_type_origin,
+    _is_collection,
+    _is_mapping,
+    _is_new_type,
+    _is_optional,
+    _is_tuple,
+    _issubclass_safe,
+    _NO_ARGS,
+)
+
+from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
+from tradeexecutor.state.identifier_registry import wrap_identifier_encoder, wrap_identifier_decoder
+
+
+logger = logging.getLogger(__name__)
+
+
+class SerialisationEngine(enum.Enum):
+    """How state dataclasses are converted to and from JSON dict trees."""
+
+    #: Use dataclasses_json `to_dict()` and `from_dict()`
+    dataclasses_json = "dataclasses_json"
+
+    #: Use per-class compiled encoders and decoders
+    compiled = "compiled"
+
+
+#: The engine used when the caller does not specify one.
+#:
+#: See :py:func:`set_default_engine`.
+_default_engine = SerialisationEngine.compiled
+
+#: Value types that need no conversion before they are passed to JSON encoder
+_PASSTHROUGH_TYPES = {str, int, float, bool, type(None), datetime.datetime, Decimal}
+
+#: Compiled encoders, class -> encoder function
+_encoders: Dict[type, Callable[[Any], dict]] = {}
+
+#: Compiled decoders, class -> decoder function
+_decoders: Dict[type, Callable[[dict], Any]] = {}
+
+
+def set_default_engine(engine: SerialisationEngine):
+    """Set the process-wide default serialisation engine."""
+    global _default_engine
+    assert isinstance(engine, SerialisationEngine)
+    _default_engine = engine
+
+
+def get_default_engine() -> SerialisationEngine:
+    """Get the process-wide default serialisation engine."""
+    return _default_engine
+
+
+def encode_dataclass(obj: Any, engine: Optional[SerialisationEngine] = None) -> dict:
+    """Convert a state dataclass to a dict tree.
+
+    The result is the same as `obj.to_dict(encode_json=False)`
+    and needs to be serialised with :py:class:`dataclasses_json.core._ExtendedEncoder`.
+
+    Unlike `to_dict()`, the compiled engine does not deep copy leaf values,
+    so the result shares datetime, Decimal and such objects with `obj`.
+    """
+    assert is_dataclass(obj), f"Not a dataclass: {obj}"
+    engine = engine or _default_engine
+    patch_dataclasses_json()
+    if engine == SerialisationEngine.compiled:
+        return get_encoder(type(obj))(obj)
+    return core._asdict(obj, encode_json=False)
+
+
+def decode_dataclass(cls: Type, data: dict, engine: Optional[SerialisationEngine] = None) -> Any:
+    """Create a state dataclass from a JSON decoded dict tree.
+
+    The result is the same as `cls.from_dict(data)`.
+    """
+    engine = engine or _default_engine
+    patch_dataclasses_json()
+    if engine == SerialisationEngine.compiled:
+        return get_decoder(cls)(data)
+    return core._decode_dataclass(cls, data, False)
+
+
+def encode_value(o: Any, engine: Optional[SerialisationEngine] = None) -> Any:
+    """Convert any state value, like a dict of positions, to a dict tree.
+
+    See :py:func:`encode_dataclass`.
+    """
+    engine = engine or _default_engine
+    patch_dataclasses_json()
+    if engine == SerialisationEngine.compiled:
+        return _encode_value(o)
+    return core._asdict(o, encode_json=False)
+
+
+def get_encoder(cls: Type) -> Callable[[Any], dict]:
+    """Get a compiled encoder for a dataclass."""
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        encoder = _encoders[cls] = wrap_identifier_encoder(cls, _compile_encoder(cls))
+    return encoder
+
+
+def get_decoder(cls: Type) -> Callable[[dict], Any]:
+    """Get a compiled decoder for a dataclass."""
+    decoder = _decoders.get(cls)
+    if decoder is None:
+        decoder = _decoders[cls] = wrap_identifier_decoder(cls, _compile_decoder(cls))
+    return decoder
+
+
+def _encode_value(o: Any) -> Any:
+    """Encode any value the same way as `dataclasses_json.core._asdict`."""
+    t = type(o)
+    if t in _PASSTHROUGH_TYPES:
+        return o
+    if hasattr(t, "__dataclass_fields__"):
+        return get_encoder(t)(o)
+    if isinstance(o, Mapping):
+        return {k: _encode_value(v) for k, v in o.items()}
+    if isinstance(o, Collection) and not isinstance(o, (str, bytes)):
+        return [_encode_value(v) for v in o]
+    # Enum, timedelta, bytes, etc.
+    # are handled by the JSON encoder
+    return o
+
+
+def _compile_encoder(cls: Type) -> Callable[[Any], dict]:
+    """Build an encoder function for a dataclass.
+
+    Mirrors `dataclasses_json.core._asdict` and `_encode_overrides`.
+    """
+    overrides = _user_overrides_or_exts(cls)
+
+    plain_fields = []
+    override_fields = []
+    for f in fields(cls):
+        override = overrides[f.name]
+        assert override.letter_case is None, f"letter_case not supported by the compiled serialisation: {cls.__name__}.{f.name}"
+        if override.encoder is not None or override.exclude is not None:
+            override_fields.append((f.name, override.encoder, override.exclude))
+        else:
+            plain_fields.append(f.name)
+
+    field_order = [f.name for f in fields(cls)]
+    passthrough = _PASSTHROUGH_TYPES
+
+    if not override_fields:
+        def encode(obj) -> dict:
+            result = {}
+            for name in plain_fields:
+                v = getattr(obj, name)
+                result[name] = v if type(v) in passthrough else _encode_value(v)
+            return result
+    else:
+        def encode(obj) -> dict:
+            result = {}
+            for name in plain_fields:
+                v = getattr(obj, name)
+                result[name] = v if type(v) in passthrough else _encode_value(v)
+            for name, encoder, exclude in override_fields:
+                v = getattr(obj, name)
+                if exclude is not None and exclude(v):
+                    continue
+                result[name] = encoder(v) if encoder is not None else _encode_value(v)
+            # Keep the field order same as dataclasses_json
+            return {name: result[name] for name in field_order if name in result}
+
+    encode.__name__ = f"encode_{cls.__name__}"
+    return encode
+
+
+def _identity(v):
+    return v
+
+
+def _compile_decoder(cls: Type) -> Callable[[dict], Any]:
+    """Build a decoder function for a dataclass.
+
+    Mirrors `dataclasses_json.core._decode_dataclass` with
+    :py:func:`tradeexecutor.monkeypatch.dataclasses_json.patch_dataclasses_json` applied.
+    """
+    overrides = _user_overrides_or_exts(cls)
+    types = get_type_hints(cls)
+
+    field_plans = []
+    for f in fields(cls):
+        # Not a constructor argument
+        if not f.init:
+            continue
+
+        field_type = types[f.name]
+        while _is_new_type(field_type):
+            field_type = field_type.__supertype__
+
+        override = overrides[f.name]
+        assert override.letter_case is None, f"letter_case not supported by the compiled serialisation: {cls.__name__}.{f.name}"
+
+        if override.decoder is not None:
+            decoder = _make_override_decoder(field_type, override.decoder)
+        elif is_dataclass(field_type):
+            decoder = _make_dataclass_decoder(field_type)
+        elif _is_supported_generic(field_type) and field_type != str:
+            decoder = _compile_generic_decoder(field_type)
+        else:
+            decoder = _compile_extended_decoder(field_type)
+
+        has_default = f.default is not MISSING or f.default_factory is not MISSING
+        field_plans.append((f.name, decoder, has_default))
+
+    def decode(kvs: dict):
+        if isinstance(kvs, cls):
+            return kvs
+
+        init_kwargs = {}
+        for name, decoder, has_default in field_plans:
+            if name not in kvs:
+                if has_default:
+                    # Let the dataclass fill in the default value
+                    continue
+                raise KeyError(name)
+
+            v = kvs[name]
+            if v is None or decoder is _identity:
+                init_kwargs[name] = v
+            else:
+                init_kwargs[name] = decoder(v)
+        return cls(**init_kwargs)
+
+    decode.__name__ = f"decode_{cls.__name__}"
+    return decode
+
+
+def _make_override_decoder(field_type: Type, decoder: Callable) -> Callable:
+    def decode(v):
+        if field_type is type(v):
+            return v
+        return decoder(v)
+    return decode
+
+
+def _make_dataclass_decoder(cls: Type) -> Callable:
+    # Resolved lazily to support recursive types
+    def decode(v):
+        if is_dataclass(v):
+            return v
+        return get_decoder(cls)(v)
+    return decode
+
+
+def _compile_item_decoder(type_arg) -> Callable:
+    """Mirror `dataclasses_json.core._decode_items`.
+
+    Note that collection items do not get extended type conversion (datetime, Decimal).
+    """
+    if is_dataclass(type_arg):
+        return _make_dataclass_decoder(type_arg)
+    if _is_supported_generic(type_arg):
+        return _compile_generic_decoder(type_arg)
+    return _identity
+
+
+def _compile_generic_decoder(type_) -> Callable:
+    """Mirror `dataclasses_json.core._decode_generic`."""
+
+    if _issubclass_safe(type_, enum.Enum):
+        def decode_enum(v):
+            return None if v is None else type_(v)
+        return decode_enum
+
+    if _is_collection(type_):
+        try:
+            materialise = _get_type_cons(type_)
+        except (TypeError, AttributeError):
+            materialise = type_
+
+        if _is_mapping(type_):
+            k_type, v_type = _get_type_args(type_, (Any, Any))
+            key_decoder = _compile_key_decoder(k_type)
+            value_decoder = _compile_item_decoder(v_type)
+
+            if key_decoder is _identity and value_decoder is _identity:
+                def decode_mapping(v):
+                    return None if v is None else materialise(v.items())
+            else:
+                def decode_mapping(v):
+                    if v is None:
+                        return None
+                    return materialise((key_decoder(k), value_decoder(x)) for k, x in v.items())
+            return decode_mapping
+
+        if _is_tuple(type_):
+            # Rare, use the reference implementation
+            def decode_tuple(v):
+                return core._decode_generic(type_, v, False)
+            return decode_tuple
+
+        item_type = _get_type_arg_param(type_, 0)
+        if item_type is _NO_ARGS:
+            # Unparameterised collection, use the reference implementation for its quirks
+            def decode_bare(v):
+                return core._decode_generic(type_, v, False)
+            return decode_bare
+
+        item_decoder = _compile_item_decoder(item_type)
+        if item_decoder is _identity:
+            def decode_collection(v):
+                return None if v is None else materialise(v)
+        else:
+            def decode_collection(v):
+                return None if v is None else materialise([item_decoder(x) for x in v])
+        return decode_collection
+
+    # Optional or Union
+    args = _get_type_args(type_)
+    if args is _NO_ARGS:
+        return _identity
+
+    if _is_optional(type_) and len(args) == 2:
+        type_arg = _get_type_arg_param(type_, 0)
+        if is_dataclass(type_arg):
+            inner = _make_dataclass_decoder(type_arg)
+        elif _is_supported_generic(type_arg):
+            inner = _compile_generic_decoder(type_arg)
+        else:
+            inner = _compile_extended_decoder(type_arg)
+
+        if inner is _identity:
+            return _identity
+
+        def decode_optional(v):
+            return None if v is None else inner(v)
+        return decode_optional
+
+    # Union, passed as is
+    return _identity
+
+
+def _compile_key_decoder(key_type) -> Callable:
+    """Mirror `dataclasses_json.core._decode_dict_keys`."""
+    if key_type is None or key_type == Any or isinstance(key_type, TypeVar):
+        return _identity
+
+    if _get_type_origin(key_type) in {tuple, Tuple}:
+        item_decoder = _compile_item_decoder(key_type)
+        return lambda k: tuple(item_decoder(k))
+
+    item_decoder = _compile_item_decoder(key_type)
+    if item_decoder is _identity:
+        return key_type
+    return lambda k: key_type(item_decoder(k))
+
+
+def _compile_extended_decoder(type_) -> Callable:
+    """Mirror patched `dataclasses_json.core._support_extended_types`.
+
+    See :py:func:`tradeexecutor.monkeypatch.dataclasses_json._patched_support_extended_types`.
+    """
+    if _issubclass_safe(type_, datetime.datetime):
+        def decode_datetime(v):
+            return v if isinstance(v, datetime.datetime) else datetime.datetime.utcfromtimestamp(v)
+        return decode_datetime
+
+    if _issubclass_safe(type_, datetime.timedelta):
+        def decode_timedelta(v):
+            return v if isinstance(v, datetime.timedelta) else datetime.timedelta(seconds=v)
+        return decode_timedelta
+
+    if _issubclass_safe(type_, Decimal):
+        def decode_decimal(v):
+            return v if isinstance(v, Decimal) else Decimal(v)
+        return decode_decimal
+
+    if _issubclass_safe(type_, UUID):
+        def decode_uuid(v):
+            return v if isinstance(v, UUID) else UUID(v)
+        return decode_uuid
+
+    return _identity
@@ -17,9 +17,11 @@ from dataclasses_json.core import _ExtendedEncoder
 
 from .sync import Sync
 from .identifier import AssetIdentifier, TradingPairIdentifier
+from .identifier_registry import IdentifierStorage, IdentifierTable, use_identifier_table
 from .portfolio import Portfolio
 from .position import TradingPosition
 from .reserve import ReservePosition
+from .serialisation import SerialisationEngine, encode_dataclass, decode_dataclass, get_default_engine
 from .statistics import Statistics
 from .trade import TradeExecution, TradeStatus, TradeType
 from .types import USDollarAmount, BPS, USDollarPrice
@@ -360,6 +362,7 @@ class State:
             position.closed_at = executed_at
             del self.portfolio.open_positions[position.position_id]
             self.portfolio.closed_positions[position.position_id] = position
+            self.portfolio.index.close_position(self.portfolio, position)
 
     def mark_trade_failed(self, failed_at: datetime.datetime, trade: TradeExecution):
         """Unroll the allocated capital."""
@@ -371,12 +374,15 @@ class State:
     def update_reserves(self, new_reserves: List[ReservePosition]):
         self.portfolio.update_reserves(new_reserves)
 
-    def revalue_positions(self, ts: datetime.datetime, valuation_method: Callable):
+    def revalue_positions(self, ts: datetime.datetime, valuation_method: Callable, prefetched_valuations: Optional[dict] = None):
         """Revalue all open positions in the portfolio.
 
         Reserves are not revalued.
+
+        :param prefetched_valuations:
+            See :py:meth:`tradeexecutor.state.portfolio.Portfolio.revalue_positions`
         """
-        self.portfolio.revalue_positions(ts, valuation_method)
+        self.portfolio.revalue_positions(ts, valuation_method, prefetched_valuations=prefetched_valuations)
 
     def blacklist_asset(self, asset: AssetIdentifier):
         """Add a asset to the blacklist."""
@@ -460,11 +466,52 @@ class State:
                 if t.is_unfinished():
                     raise UncleanState(f"Position {p}, trade {t} is unfinished")
 
-    def to_json_safe(self) -> str:
+    def to_json_dict(
+        self,
+        engine: Optional[SerialisationEngine] = None,
+        identifier_storage: IdentifierStorage = IdentifierStorage.inline,
+    ) -> dict:
+        """Serialise to a dict tree ready to be written as JSON.
+
+        :param engine:
+            Serialisation engine to use.
+
+            See :py:mod:`tradeexecutor.state.serialisation`.
+
+        :param identifier_storage:
+            Write trading pairs and assets inline or in the `identifiers` table.
+
+            See :py:mod:`tradeexecutor.state.identifier_registry`.
+        """
+        if identifier_storage == IdentifierStorage.inline:
+            return encode_dataclass(self, engine)
+
+        assert engine in (None, SerialisationEngine.compiled), "Interned identifiers need the compiled serialisation engine"
+        table = IdentifierTable()
+        with use_identifier_table(table):
+            data = encode_dataclass(self, SerialisationEngine.compiled)
+        data["identifiers"] = table.to_dict()
+        return data
+
+    def to_json_safe(
+        self,
+        engine: Optional[SerialisationEngine] = None,
+        identifier_storage: IdentifierStorage = IdentifierStorage.inline,
+    ) -> str:
         """Serialise to JSON format with helpful validation and error messages.
 
         Extra validation adds performance overhead.
 
+        :param engine:
+            Serialisation engine to use.
+
+            See :py:mod:`tradeexecutor.state.serialisation`.
+
+        :param identifier_storage:
+            Write trading pairs and assets inline or in the `identifiers` table.
+
+            The web frontend reads the inline format.
+
         :return:
             The full strategy execution state as JSON string.
 
@@ -475,15 +522,10 @@ class State:
         # TODO: Avoid circular imports, refactor modules
         from tradeexecutor.state.validator import validate_nested_state_dict
 
-        # Fix timedelta handling
-        from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
-
-        patch_dataclasses_json()
-
         # Insert special validation logic here to have
         # friendly error messages for the JSON serialisation errors
-        data = self.to_dict(encode_json=False)
-        validate_nested_state_dict(data)
+        data = self.to_json_dict(engine, identifier_storage)
+        validate_nested_state_dict(data, State)
 
         txt = json.dumps(data, cls=_ExtendedEncoder)
         return txt
@@ -501,28 +543,68 @@ class State:
             out.write(txt)
 
     @staticmethod
-    def read_json_file(path: Path) -> "State":
+    def read_json_file(path: Path, engine: Optional[SerialisationEngine] = None) -> "State":
         """Read state from the JSON file.
 
         - Deal with all serialisation quirks
+
+        :param engine:
+            Serialisation engine to use.
+
+            See :py:mod:`tradeexecutor.state.serialisation`.
         """
 
         assert isinstance(path, Path), f"Expected Path, got {path.__class__}"
 
         with open(path, "rt") as inp:
-            return State.read_json_blob(inp.read())
+            return State.read_json_blob(inp.read(), engine)
 
     @staticmethod
-    def read_json_blob(text: str) -> "State":
+    def read_json_blob(text: str, engine: Optional[SerialisationEngine] = None) -> "State":
         """Parse state from JSON blob.
 
         - Deal with all serialisation quirks
+
+        - Read both inline and interned trading pair and asset identifiers
+
+        :param engine:
+            Serialisation engine to use.
+
+            See :py:mod:`tradeexecutor.state.serialisation`.
         """
 
         assert isinstance(text, str)
+        return State.read_json_dict(json.loads(text), engine)
+
+    @staticmethod
+    def read_json_dict(data: dict, engine: Optional[SerialisationEngine] = None) -> "State":
+        """Create state from a JSON decoded dict tree.
+
+        With the compiled serialisation engine,
+        equal trading pair and asset identifiers are loaded as one shared object.
+
+        See :py:mod:`tradeexecutor.state.identifier_registry`.
+
+        :param data:
+            Dict tree as written by :py:meth:`to_json_dict`.
+
+            The `identifiers` table is removed from it.
+
+        :param engine:
+            Serialisation engine to use.
+
+            States with interned identifiers are always read with the compiled engine.
+        """
+        identifiers = data.pop("identifiers", None)
+
+        if identifiers is not None:
+            assert engine in (None, SerialisationEngine.compiled), "Interned identifiers need the compiled serialisation engine"
+            engine = SerialisationEngine.compiled
+
+        engine = engine or get_default_engine()
 
-        # Run in any monkey-patches we need for JSON decoding
-        from tradeexecutor.monkeypatch.dataclasses_json import patch_dataclasses_json
+        if engine == SerialisationEngine.compiled:
+            with use_identifier_table(IdentifierTable(identifiers)):
+                return decode_dataclass(State, data, engine)
 
-        patch_dataclasses_json()
-        return State.from_json(text)
+        return decode_dataclass(State, data, engine)
@@ -13,8 +13,10 @@ from typing import Union, Optional
 
 from dataclasses_json.core import _ExtendedEncoder
 
+from tradeexecutor.state.identifier_registry import IdentifierStorage, get_default_identifier_storage
+from tradeexecutor.state.plot_sidecar import PlotSidecarFile, get_plot_sidecar_path
 from tradeexecutor.state.state import State
-from tradeexecutor.state.validator import validate_nested_state_dict
+from tradeexecutor.state.validator import validate_nested_state_dict, IncrementalStateValidator
 
 logger = logging.getLogger(__name__)
 
@@ -60,13 +62,40 @@ class JSONFileStore(StateStore):
     - Read by strategy on a startup
 
     - Read by webhook when asked over the API
+
+    - Plot points of :py:attr:`tradeexecutor.state.visualisation.PlotStorage.sidecar`
+      are stored in a separate file, see :py:mod:`tradeexecutor.state.plot_sidecar`
     """
 
-    def __init__(self, path: Union[Path, str]):
+    def __init__(
+        self,
+        path: Union[Path, str],
+        incremental_validation=False,
+        identifier_storage: Optional[IdentifierStorage] = None,
+    ):
+        """
+
+        :param path:
+            State file path
+
+        :param incremental_validation:
+            Validate only the parts of the state changed since the last sync.
+
+            See :py:class:`tradeexecutor.state.validator.IncrementalStateValidator`.
+
+        :param identifier_storage:
+            How trading pairs and assets are written in the file.
+
+            The file is always served to the web frontend in the inline format.
+            If not given, use :py:func:`tradeexecutor.state.identifier_registry.get_default_identifier_storage`.
+        """
         assert path
         if not isinstance(path, Path):
             path = Path(path)
         self.path = path
+        self.plot_sidecar = PlotSidecarFile(get_plot_sidecar_path(path))
+        self.validator = IncrementalStateValidator() if incremental_validation else None
+        self.identifier_storage = identifier_storage or get_default_identifier_storage()
 
     def __repr__(self):
         path = os.path.abspath(self.path)
@@ -77,10 +106,13 @@ class JSONFileStore(StateStore):
 
     def load(self) -> State:
         logger.info("Loaded state from %s", self.path)
-        return State.read_json_file(self.path)
+        state = State.read_json_file(self.path)
+        self.plot_sidecar.read(state)
+        return state
 
     def sync(self, state: State):
         """Write new JSON state dump using Linux atomic file replacement."""
+        self.plot_sidecar.write(state)
         dirname, basename = os.path.split(self.path)
         temp = tempfile.NamedTemporaryFile(mode='wt', delete=False, dir=dirname)
         with open(temp.name, "wt") as out:
@@ -89,8 +121,11 @@ class JSONFileStore(StateStore):
 
             # Insert special validation logic here to have
             # friendly error messages for the JSON serialisation errors
-            data = state.to_dict(encode_json=False)
-            validate_nested_state_dict(data)
+            data = state.to_json_dict(identifier_storage=self.identifier_storage)
+            if self.validator:
+                self.validator.validate(state, data)
+            else:
+                validate_nested_state_dict(data, State)
 
             try:
                 txt = json.dumps(data, cls=_ExtendedEncoder)
@@ -5,17 +5,46 @@ We have some common culprits we want to catch.
 
 Any error message contains tree presentation of the state,
 so you can easily locate any values that are bad, unlike with :py:mod:`json`.
+
+Validating a big state by walking every value is almost as slow
+as serialising it. There are two faster options:
+
+- :py:attr:`ValidationMode.compiled` builds a validator for each dataclass
+  once, from its type hints. The validator knows the shape of the dict tree,
+  so typed fields only get quick type and number checks and
+  only free-form containers, like :py:attr:`tradeexecutor.state.visualisation.Visualisation.calculations`
+  and :py:attr:`tradeexecutor.state.blockhain_transaction.BlockchainTransaction.other`, are fully walked.
+  It accepts and rejects exactly the same data as :py:attr:`ValidationMode.full`.
+
+- :py:class:`IncrementalStateValidator` validates only the parts
+  of the state that have changed since the last sync, see
+  :py:class:`tradeexecutor.state.store.JSONFileStore`.
 """
 import datetime
+import enum
+from dataclasses import is_dataclass
 from decimal import Decimal
 from enum import Enum
+from itertools import islice
 from json.encoder import INFINITY
 from types import NoneType
-from typing import Type
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Type, get_type_hints
 
 import pandas as pd
 import numpy as np
 
+from dataclasses_json.utils import (
+    _get_type_args,
+    _get_type_arg_param,
+    _is_collection,
+    _is_mapping,
+    _is_new_type,
+    _is_optional,
+    _is_tuple,
+    _issubclass_safe,
+    _NO_ARGS,
+)
+
 from tradeexecutor.state.state import State
 
 
@@ -117,26 +146,392 @@ def walk(name: str | int, val: dict | list | object, key_type: Type):
         raise BadStateData(f"'{name}' ({val.__class__}) key has errors") from e
 
 
-def validate_nested_state_dict(d: dict | list | object):
+class ValidationMode(enum.Enum):
+    """How a state dict tree is validated."""
+
+    #: Walk every value with :py:func:`walk`
+    full = "full"
+
+    #: Use per-class validators compiled from type hints.
+    #:
+    #: Falls back to :py:attr:`full` if the dataclass of the dict tree is not known.
+    compiled = "compiled"
+
+
+#: The mode used when the caller does not specify one.
+#:
+#: See :py:func:`set_default_validation_mode`.
+_default_mode = ValidationMode.compiled
+
+#: Validator function: key name, value
+Validator = Callable[[str | int, object], None]
+
+#: Compiled validators, class -> validator function
+_validators: Dict[type, Validator] = {}
+
+#: Scalar types that are always valid, no matter what the field type hint says
+_PLAIN_TYPES = {str, bool, NoneType, datetime.datetime, Decimal, datetime.timedelta}
+
+
+def set_default_validation_mode(mode: ValidationMode):
+    """Set the process-wide default validation mode."""
+    global _default_mode
+    assert isinstance(mode, ValidationMode)
+    _default_mode = mode
+
+
+def get_default_validation_mode() -> ValidationMode:
+    """Get the process-wide default validation mode."""
+    return _default_mode
+
+
+def validate_nested_state_dict(
+    d: dict | list | object,
+    cls: Optional[Type] = None,
+    mode: Optional[ValidationMode] = None,
+):
     """Validate state as serialised to a dictionary tree by dataclasses_json.
 
     See `to_dict` in `dataclass_json`.
 
+    :param d:
+        Dict tree to validate
+
+    :param cls:
+        The dataclass the dict tree was serialised from.
+
+        Needed for :py:attr:`ValidationMode.compiled`.
+
+    :param mode:
+        Validation mode. If not given, use the process-wide default.
+
     :raise BadStateData:
         In the case we have sneaked something into the state
         that does not belong there.
     """
-    walk("state", d, type(d))
+    mode = mode or _default_mode
+    if cls is not None and mode == ValidationMode.compiled:
+        get_validator(cls)("state", d)
+    else:
+        walk("state", d, type(d))
 
 
-def validate_state_serialisation(state: State):
+def validate_state_serialisation(state: State, mode: Optional[ValidationMode] = None):
     """Check that we can write the state to the disk,
 
     Unlike `json.dump()` gives user friendly error messages.
 
+    :param mode:
+        Validation mode. If not given, use the process-wide default.
+
     :raise BadStateData:
         In the case we have sneaked something into the state
         that does not belong there.
     """
     d = state.to_dict()
-    validate_nested_state_dict(d)
+    validate_nested_state_dict(d, State, mode)
+
+
+def get_validator(cls: Type) -> Validator:
+    """Get or build the compiled validator for a dataclass."""
+    validator = _validators.get(cls)
+    if validator is None:
+        validator = _compile_dataclass_validator(cls)
+        _validators[cls] = validator
+    return validator
+
+
+def _validate_free_form(name: str | int, val: object):
+    walk(name, val, type(name))
+
+
+def _validate_scalar(name: str | int, val: object):
+    """Validate a value the type hint says is not a container.
+
+    Values that are not plain are checked with :py:func:`walk`,
+    so a mistyped value gets the same verdict as in the full mode.
+    """
+    t = type(val)
+    if t is float:
+        if val != val or val == _inf or val == _neginf:
+            validate_state_value(name, val)
+    elif t is int:
+        if val > JS_MAX_INT:
+            validate_state_value(name, val)
+    elif t not in _PLAIN_TYPES and not isinstance(val, Enum):
+        walk(name, val, type(name))
+
+
+def _validate_items(items, item_validator: Validator):
+    """Validate key, value pairs of a typed container."""
+    for k, v in items:
+        t = type(v)
+        if type(k) not in ALLOWED_KEY_TYPES:
+            walk(k, v, type(k))
+        elif t in _PLAIN_TYPES:
+            continue
+        elif t is float:
+            if v != v or v == _inf or v == _neginf:
+                validate_state_value(k, v)
+        elif t is int:
+            if v > JS_MAX_INT:
+                validate_state_value(k, v)
+        else:
+            item_validator(k, v)
+
+
+def _compile_dataclass_validator(cls: Type) -> Validator:
+    types = get_type_hints(cls)
+    validators = {}
+    for name in cls.__dataclass_fields__.keys():
+        validators[name] = _compile_validator(types.get(name, Any))
+
+    def validate(name, val):
+        if type(val) is not dict:
+            return walk(name, val, type(name))
+
+        try:
+            for k, v in val.items():
+                t = type(v)
+                if t in _PLAIN_TYPES:
+                    continue
+                elif t is float:
+                    if v != v or v == _inf or v == _neginf:
+                        validate_state_value(k, v)
+                elif t is int:
+                    if v > JS_MAX_INT:
+                        validate_state_value(k, v)
+                else:
+                    validators.get(k, _validate_free_form)(k, v)
+        except BadStateData as e:
+            raise BadStateData(f"'{name}' ({val.__class__}) key has errors") from e
+
+    validate.__name__ = f"validate_{cls.__name__}"
+    return validate
+
+
+def _make_dataclass_validator(cls: Type) -> Validator:
+    # Resolved lazily to support recursive types
+    def validate(name, val):
+        return get_validator(cls)(name, val)
+    return validate
+
+
+def _make_container_validator(item_validator: Validator, container_type: type, is_mapping: bool) -> Validator:
+    def validate(name, val):
+        if type(val) is not container_type:
+            return walk(name, val, type(name))
+
+        try:
+            _validate_items(val.items() if is_mapping else enumerate(val), item_validator)
+        except BadStateData as e:
+            raise BadStateData(f"'{name}' ({val.__class__}) key has errors") from e
+
+    return validate
+
+
+def _compile_validator(type_) -> Validator:
+    """Build a validator for a field type hint.
+
+    Containers with `Any` or unknown items, unions and untyped containers are free-form.
+    """
+    while _is_new_type(type_):
+        type_ = type_.__supertype__
+
+    if is_dataclass(type_):
+        return _make_dataclass_validator(type_)
+
+    if type_ in (float, int, str, bool) or _issubclass_safe(type_, (Enum, datetime.datetime, datetime.timedelta, Decimal)):
+        return _validate_scalar
+
+    if _is_optional(type_):
+        args = _get_type_args(type_)
+        if args is not _NO_ARGS and len(args) == 2:
+            # None is a plain value, checked before the validator is called
+            return _compile_validator(_get_type_arg_param(type_, 0))
+        return _validate_free_form
+
+    if _is_collection(type_) and not _is_tuple(type_):
+        if _is_mapping(type_):
+            args = _get_type_args(type_)
+            if args is _NO_ARGS or args[1] is Any:
+                return _validate_free_form
+            return _make_container_validator(_compile_validator(args[1]), dict, is_mapping=True)
+
+        item_type = _get_type_arg_param(type_, 0)
+        if item_type is _NO_ARGS or item_type is Any:
+            return _validate_free_form
+        return _make_container_validator(_compile_validator(item_type), list, is_mapping=False)
+
+    return _validate_free_form
+
+
+class IncrementalStateValidator:
+    """Validate only the parts of a state dict tree that have changed since the last validation.
+
+    Trading history does not change once written, so validating it again
+    on every sync is wasted work. Like :py:class:`tradeexecutor.state.journal_store.JournalCursor`,
+    this assumes
+
+    - Closed positions, closed position statistics and visualisation calculations
+      are not modified after they have been added
+
+    - Statistics time series and plot points are append only.
+      Removing old plot points, e.g. by :py:class:`tradeexecutor.state.visualisation.VisualisationRetention`,
+      causes the plot to be validated in full.
+
+    Everything else is validated on every call with the compiled validators.
+    If you modify the trading history (e.g. manual repair), call :py:meth:`reset`.
+
+    Example:
+
+    .. code-block:: python
+
+        validator = IncrementalStateValidator()
+        data = encode_dataclass(state)
+        validator.validate(state, data)
+    """
+
+    def __init__(self):
+        #: Id of the state object whose parts we have validated
+        self.state_id: Optional[int] = None
+
+        #: Closed position ids already validated
+        self.closed_position_ids: Set[int] = set()
+
+        #: How many :py:attr:`Statistics.portfolio` entries have been validated
+        self.portfolio_stats_count = 0
+
+        #: Position id -> how many position statistics entries have been validated
+        self.position_stats_counts: Dict[int, int] = {}
+
+        #: Closed position statistics already validated
+        self.closed_position_stats_ids: Set[int] = set()
+
+        #: Calculation timestamps already validated
+        self.calculation_timestamps: Set[int] = set()
+
+        #: Plot name -> (first point timestamp, how many points have been validated)
+        self.plot_point_counts: Dict[str, Tuple[object, int]] = {}
+
+    def __repr__(self):
+        return f"<IncrementalStateValidator, {len(self.closed_position_ids)} closed positions validated>"
+
+    def reset(self):
+        """Validate everything on the next call."""
+        self.__init__()
+
+    def validate(self, state: State, data: dict):
+        """Validate the changed parts of a state.
+
+        :param state:
+            The state object `data` was serialised from.
+
+            If a different state object is validated, everything is validated again.
+
+        :param data:
+            The state serialised to a dict tree
+
+        :raise BadStateData:
+            In the case we have sneaked something into the state
+            that does not belong there.
+        """
+        if id(state) != self.state_id:
+            self.reset()
+            self.state_id = id(state)
+
+        get_validator(State)("state", self.get_changed(data))
+
+        # Only mark after success, so that the bad data is checked again on the next call
+        self.mark_validated(data)
+
+    def get_changed(self, data: dict) -> dict:
+        """Create a shallow copy of the state dict tree with the already validated parts left out."""
+        if type(data) is not dict:
+            return data
+
+        data = dict(data)
+
+        portfolio = _copy_dict(data, "portfolio")
+        if portfolio is not None:
+            closed = portfolio.get("closed_positions")
+            if type(closed) is dict:
+                portfolio["closed_positions"] = {k: v for k, v in closed.items() if k not in self.closed_position_ids}
+
+        stats = _copy_dict(data, "stats")
+        if stats is not None:
+            entries = stats.get("portfolio")
+            if type(entries) is list:
+                stats["portfolio"] = _get_new_entries(entries, self.portfolio_stats_count)
+
+            positions = stats.get("positions")
+            if type(positions) is dict:
+                stats["positions"] = {k: _get_new_entries(v, self.position_stats_counts.get(k, 0)) for k, v in positions.items()}
+
+            closed = stats.get("closed_positions")
+            if type(closed) is dict:
+                stats["closed_positions"] = {k: v for k, v in closed.items() if k not in self.closed_position_stats_ids}
+
+        visualisation = _copy_dict(data, "visualisation")
+        if visualisation is not None:
+            calculations = visualisation.get("calculations")
+            if type(calculations) is dict:
+                visualisation["calculations"] = {k: v for k, v in calculations.items() if k not in self.calculation_timestamps}
+
+            plots = visualisation.get("plots")
+            if type(plots) is dict:
+                visualisation["plots"] = {name: self._get_new_plot_points(name, plot) for name, plot in plots.items()}
+
+        return data
+
+    def _get_new_plot_points(self, name: str, plot: dict) -> dict:
+        points = plot.get("points") if type(plot) is dict else None
+        if type(points) is not dict or not points:
+            return plot
+
+        first, count = self.plot_point_counts.get(name, (None, 0))
+        if len(points) < count or next(iter(points)) != first:
+            # Points have been removed
+            return plot
+
+        plot = dict(plot)
+        plot["points"] = dict(islice(points.items(), count, None))
+        return plot
+
+    def mark_validated(self, data: dict):
+        """Mark the trading history in a state dict tree as validated."""
+        if type(data) is not dict:
+            return
+
+        portfolio = data.get("portfolio") or {}
+        self.closed_position_ids = set(portfolio.get("closed_positions", {}).keys())
+
+        stats = data.get("stats") or {}
+        self.portfolio_stats_count = len(stats.get("portfolio", []))
+        self.position_stats_counts = {k: len(v) for k, v in stats.get("positions", {}).items()}
+        self.closed_position_stats_ids = set(stats.get("closed_positions", {}).keys())
+
+        visualisation = data.get("visualisation") or {}
+        self.calculation_timestamps = set(visualisation.get("calculations", {}).keys())
+        self.plot_point_counts = {}
+        for name, plot in visualisation.get("plots", {}).items():
+            points = plot.get("points")
+            if points:
+                self.plot_point_counts[name] = (next(iter(points)), len(points))
+
+
+def _copy_dict(data: dict, key: str) -> Optional[dict]:
+    """Replace a dict in a dict tree with its shallow copy."""
+    value = data.get(key)
+    if type(value) is not dict:
+        return None
+    value = dict(value)
+    data[key] = value
+    return value
+
+
+def _get_new_entries(entries: list, count: int) -> list:
+    if type(entries) is not list or len(entries) < count:
+        # Entries have been removed, validate all
+        return entries
+    return entries[count:]
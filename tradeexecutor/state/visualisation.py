@@ -10,17 +10,24 @@ by a live strategy. Visualisation includes
 - Debug messages
 
 - Technical indicators on a graph
+
+For long-running live strategies the visualisation data can grow
+to be the largest part of the state. See :py:class:`PlotStorage`
+and :py:class:`VisualisationRetention` how to keep it in check.
 """
 
 import datetime
 import enum
+from array import array
+from bisect import bisect_left
+from collections.abc import ItemsView, ValuesView, MutableMapping
 from dataclasses import dataclass, field
 from types import NoneType
-from typing import List, Dict, Optional, Any, Union, Tuple
+from typing import List, Dict, Optional, Any, Union, Tuple, Mapping, Iterator
 import pandas as pd
 import logging
 
-from dataclasses_json import dataclass_json
+from dataclasses_json import dataclass_json, config
 
 from tradeexecutor.utils.timestamp import convert_and_validate_timestamp, convert_and_validate_timestamp_as_int
 from tradeexecutor.state.identifier import TradingPairIdentifier
@@ -98,6 +105,319 @@ class RecordingTime(enum.Enum):
     market_time = "market_time"
 
 
+class PlotStorage(enum.Enum):
+    """How plot points are stored.
+
+    Set with :py:meth:`Visualisation.set_plot_storage`.
+    """
+
+    #: Points are stored in a dict in the state.
+    #:
+    #: The default.
+    inline = "inline"
+
+    #: Points are stored in typed columnar arrays in the state.
+    #:
+    #: See :py:class:`PlotPoints`.
+    columnar = "columnar"
+
+    #: Points are stored in typed columnar arrays and
+    #: persisted in a sidecar file next to the state file, not in the state itself.
+    #:
+    #: The sidecar file is appended to, not rewritten, on every state sync.
+    #: See :py:mod:`tradeexecutor.state.plot_sidecar`.
+    sidecar = "sidecar"
+
+
+class _PlotPointItems(ItemsView):
+
+    def __iter__(self):
+        points = self._mapping
+        for ts, value, none in zip(points.timestamp_array, points.value_array, points.none_mask):
+            yield ts, None if none else value
+
+
+class _PlotPointValues(ValuesView):
+
+    def __iter__(self):
+        points = self._mapping
+        for value, none in zip(points.value_array, points.none_mask):
+            yield None if none else value
+
+
+class PlotPoints(MutableMapping):
+    """Plot points stored as typed columnar arrays.
+
+    A replacement for the `Dict[int, float]` of :py:attr:`Plot.points`,
+    used with :py:attr:`PlotStorage.columnar` and :py:attr:`PlotStorage.sidecar`.
+
+    - Points are kept sorted by their timestamp
+
+    - Adding a point newer than the last point and reading
+      the first and the last point are O(1)
+
+    - Values are stored as float64, with `None` values tracked in a separate mask
+    """
+
+    __slots__ = ("timestamp_array", "value_array", "none_mask", "version", "downsampled_until", "sidecar")
+
+    def __init__(self, points: Optional[Mapping[int, Optional[float]]] = None, sidecar=False):
+        #: UNIX timestamps as int64, sorted
+        self.timestamp_array = array("q")
+
+        #: Values as float64
+        self.value_array = array("d")
+
+        #: 1 if the value is `None`
+        self.none_mask = bytearray()
+
+        #: Incremented when existing points are modified or removed.
+        #:
+        #: Adding new points does not change the version.
+        self.version = 0
+
+        #: Points before this UNIX timestamp have already been downsampled
+        self.downsampled_until = 0
+
+        #: Points are persisted in a sidecar file, not in the state
+        self.sidecar = sidecar
+
+        if points:
+            for timestamp, value in sorted(points.items()):
+                self[timestamp] = value
+
+    def __repr__(self):
+        return f"<PlotPoints with {len(self.timestamp_array)} points>"
+
+    def __len__(self):
+        return len(self.timestamp_array)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.timestamp_array)
+
+    def __reversed__(self) -> Iterator[int]:
+        return reversed(self.timestamp_array)
+
+    def __contains__(self, timestamp) -> bool:
+        return self._find(timestamp) >= 0
+
+    def __getitem__(self, timestamp: int) -> Optional[float]:
+        i = self._find(timestamp)
+        if i < 0:
+            raise KeyError(timestamp)
+        return None if self.none_mask[i] else self.value_array[i]
+
+    def __setitem__(self, timestamp: int, value: Optional[float]):
+        timestamps = self.timestamp_array
+        if not timestamps or timestamp > timestamps[-1]:
+            timestamps.append(timestamp)
+            self.value_array.append(float("nan") if value is None else value)
+            self.none_mask.append(value is None)
+            return
+
+        i = bisect_left(timestamps, timestamp)
+        if i < len(timestamps) and timestamps[i] == timestamp:
+            self.value_array[i] = float("nan") if value is None else value
+            self.none_mask[i] = value is None
+        else:
+            timestamps.insert(i, timestamp)
+            self.value_array.insert(i, float("nan") if value is None else value)
+            self.none_mask.insert(i, value is None)
+        self.version += 1
+
+    def __delitem__(self, timestamp: int):
+        i = self._find(timestamp)
+        if i < 0:
+            raise KeyError(timestamp)
+        del self.timestamp_array[i]
+        del self.value_array[i]
+        del self.none_mask[i]
+        self.version += 1
+
+    def items(self) -> ItemsView:
+        return _PlotPointItems(self)
+
+    def values(self) -> ValuesView:
+        return _PlotPointValues(self)
+
+    def _find(self, timestamp: int) -> int:
+        timestamps = self.timestamp_array
+        if not timestamps or timestamp < timestamps[0] or timestamp > timestamps[-1]:
+            return -1
+        i = bisect_left(timestamps, timestamp)
+        return i if timestamps[i] == timestamp else -1
+
+    def get_first(self) -> Tuple[int, Optional[float]]:
+        """Get the oldest point as UNIX timestamp, value tuple."""
+        return self.timestamp_array[0], None if self.none_mask[0] else self.value_array[0]
+
+    def get_last(self) -> Tuple[int, Optional[float]]:
+        """Get the newest point as UNIX timestamp, value tuple."""
+        return self.timestamp_array[-1], None if self.none_mask[-1] else self.value_array[-1]
+
+    def count_before(self, timestamp: int) -> int:
+        """How many points are older than the timestamp."""
+        return bisect_left(self.timestamp_array, timestamp)
+
+    def extend(self, timestamps: array, values: array, nones: bytes):
+        """Add points, e.g. read from a sidecar file.
+
+        :param timestamps:
+            Sorted UNIX timestamps as int64
+        """
+        if not timestamps:
+            return
+
+        if not self.timestamp_array or timestamps[0] > self.timestamp_array[-1]:
+            self.timestamp_array.extend(timestamps)
+            self.value_array.extend(values)
+            self.none_mask.extend(nones)
+            return
+
+        for timestamp, value, none in zip(timestamps, values, nones):
+            self[timestamp] = None if none else value
+
+    def remove_before(self, timestamp: int) -> int:
+        """Remove points older than the timestamp.
+
+        :return:
+            Number of removed points
+        """
+        i = bisect_left(self.timestamp_array, timestamp)
+        if i:
+            del self.timestamp_array[:i]
+            del self.value_array[:i]
+            del self.none_mask[:i]
+            self.version += 1
+        return i
+
+    def downsample(self, until: int, interval: int) -> int:
+        """Keep only the last point of each interval for points older than `until`.
+
+        :param until:
+            UNIX timestamp. Must be divisible by the interval,
+            so that an interval is never split between two downsampling runs.
+
+        :param interval:
+            Interval as seconds
+
+        :return:
+            Number of removed points
+        """
+        assert until % interval == 0, f"Downsampling must end at an interval boundary, got {until} for interval {interval}"
+
+        timestamps = self.timestamp_array
+        start = bisect_left(timestamps, self.downsampled_until)
+        end = bisect_left(timestamps, until)
+        self.downsampled_until = max(self.downsampled_until, until)
+
+        keep = [
+            i for i in range(start, end)
+            if i == end - 1 or timestamps[i] // interval != timestamps[i + 1] // interval
+        ]
+
+        removed = (end - start) - len(keep)
+        if removed:
+            self.timestamp_array = timestamps[:start] + array("q", [timestamps[i] for i in keep]) + timestamps[end:]
+            self.value_array = self.value_array[:start] + array("d", [self.value_array[i] for i in keep]) + self.value_array[end:]
+            self.none_mask = self.none_mask[:start] + bytearray(self.none_mask[i] for i in keep) + self.none_mask[end:]
+            self.version += 1
+        return removed
+
+
+@dataclass_json
+@dataclass
+class VisualisationRetention:
+    """Retention policy for the visualisation data of a long-running strategy.
+
+    Ages are counted backwards from the latest entry, not from the wall clock,
+    so the same policy works in backtesting.
+
+    Set with :py:meth:`Visualisation.set_plot_storage`.
+    """
+
+    #: Remove plot points, messages and calculations older than this
+    max_age: Optional[datetime.timedelta] = None
+
+    #: Keep at most this many points per plot
+    max_points: Optional[int] = None
+
+    #: Downsample plot points older than this
+    downsample_after: Optional[datetime.timedelta] = None
+
+    #: When downsampling, keep only the last point of each interval of this length
+    downsample_interval: Optional[datetime.timedelta] = None
+
+    #: Remove data only when at least this many points can be removed at once.
+    #:
+    #: With :py:attr:`PlotStorage.sidecar` removing points rewrites the sidecar file,
+    #: so it should not happen on every cycle. Data older than :py:attr:`max_age`
+    #: is kept until there is a full batch of it.
+    prune_batch_size: int = 100
+
+    def __post_init__(self):
+        if self.downsample_after is not None or self.downsample_interval is not None:
+            assert self.downsample_after is not None and self.downsample_interval is not None, "Both downsample_after and downsample_interval must be given"
+            assert self.downsample_interval.total_seconds() >= 1, f"Bad downsample interval {self.downsample_interval}"
+        assert self.max_points is None or self.max_points >= 1, f"Bad max points {self.max_points}"
+        assert self.prune_batch_size >= 1
+
+    def apply(self, points: PlotPoints) -> int:
+        """Apply the policy to plot points.
+
+        :return:
+            Number of removed points
+        """
+        if not points:
+            return 0
+
+        last_timestamp, _ = points.get_last()
+        removed = 0
+
+        if self.max_age is not None:
+            cutoff = last_timestamp - int(self.max_age.total_seconds())
+            if points.count_before(cutoff) >= self.prune_batch_size:
+                removed += points.remove_before(cutoff)
+
+        if self.max_points is not None and len(points) - self.max_points >= self.prune_batch_size:
+            removed += points.remove_before(points.timestamp_array[len(points) - self.max_points])
+
+        if self.downsample_after is not None:
+            interval = int(self.downsample_interval.total_seconds())
+            until = (last_timestamp - int(self.downsample_after.total_seconds())) // interval * interval
+            if points.count_before(until) - points.count_before(points.downsampled_until) >= self.prune_batch_size:
+                removed += points.downsample(until, interval)
+
+        return removed
+
+    def apply_timestamped(self, data: dict) -> int:
+        """Apply :py:attr:`max_age` to messages or calculations keyed by UNIX timestamp.
+
+        Assumes entries are added in the timestamp order.
+
+        :return:
+            Number of removed entries
+        """
+        if self.max_age is None or not data:
+            return 0
+
+        cutoff = next(reversed(data.keys())) - int(self.max_age.total_seconds())
+        if next(iter(data.keys())) >= cutoff:
+            return 0
+
+        old = [k for k in data.keys() if k < cutoff]
+        if len(old) < self.prune_batch_size:
+            return 0
+
+        for k in old:
+            del data[k]
+        return len(old)
+
+
+def _is_in_sidecar(points) -> bool:
+    return getattr(points, "sidecar", False)
+
+
 @dataclass_json
 @dataclass
 class Plot:
@@ -125,7 +445,11 @@ class Plot:
     #:
     #: Also note that entries may not be in order - you might need
     #: to sort the output yourself.
-    points: Dict[int, float] = field(default_factory=dict)
+    #:
+    #: With :py:attr:`PlotStorage.columnar` and :py:attr:`PlotStorage.sidecar`
+    #: this is :py:class:`PlotPoints`, sorted by the timestamp.
+    #: With :py:attr:`PlotStorage.sidecar` points are not serialised as a part of the state.
+    points: Dict[int, float] = field(default_factory=dict, metadata=config(exclude=_is_in_sidecar))
 
     #: Standard is linear. 
     #: Alternative is horizontal-vertical which can be used for stop loss line. 
@@ -170,6 +494,9 @@ class Plot:
 
     def get_last_value(self) -> float:
         """Assume points is an ordered dict."""
+        if isinstance(self.points, PlotPoints):
+            return self.points.get_last()[1]
+
         # https://stackoverflow.com/a/63059166/315168
         key = next(reversed(self.points.keys()))
         return self.points[key]
@@ -180,8 +507,11 @@ class Plot:
         :return:
             timestamp, value tuple
         """
-        last_entry = max(self.points.keys())
-        last_value = self.points[last_entry]
+        if isinstance(self.points, PlotPoints):
+            last_entry, last_value = self.points.get_last()
+        else:
+            last_entry = max(self.points.keys())
+            last_value = self.points[last_entry]
 
         return datetime.datetime.utcfromtimestamp(last_entry), last_value
 
@@ -191,8 +521,11 @@ class Plot:
         :return:
             timestamp, value tuple
         """
-        first_entry = min(self.points.keys())
-        first_value = self.points[first_entry]
+        if isinstance(self.points, PlotPoints):
+            first_entry, first_value = self.points.get_first()
+        else:
+            first_entry = min(self.points.keys())
+            first_value = self.points[first_entry]
 
         return datetime.datetime.utcfromtimestamp(first_entry), first_value
 
@@ -245,11 +578,109 @@ class Visualisation:
     #:
     plots: Dict[str, Plot] = field(default_factory=dict)
 
+    #: How plot points are stored.
+    #:
+    #: See :py:meth:`set_plot_storage`.
+    plot_storage: PlotStorage = PlotStorage.inline
+
+    #: Retention policy for old plot points, messages and calculations.
+    #:
+    #: `None` keeps everything.
+    retention: Optional[VisualisationRetention] = None
+
+    def __post_init__(self):
+        # Plots decoded from the state have dict points
+        if self.plot_storage != PlotStorage.inline:
+            for plot in self.plots.values():
+                if not isinstance(plot.points, PlotPoints):
+                    plot.points = self.create_points(plot.points)
+
     def __repr__(self) -> str:
         plot_count = len(self.plots)
         point_count = sum([len(p.points) for p in self.plots.values()])
         return f"<Visualisation with {plot_count} plots and {point_count} data points>"
 
+    def create_points(self, points: Optional[Mapping[int, Optional[float]]] = None) -> Union[Dict[int, float], PlotPoints]:
+        """Create a points container for a plot matching the plot storage."""
+        if self.plot_storage == PlotStorage.inline:
+            return dict(points) if points else {}
+
+        sidecar = self.plot_storage == PlotStorage.sidecar
+        if isinstance(points, PlotPoints):
+            points.sidecar = sidecar
+            return points
+
+        return PlotPoints(points, sidecar=sidecar)
+
+    def set_plot_storage(
+        self,
+        plot_storage: PlotStorage,
+        retention: Optional[VisualisationRetention] = None,
+    ):
+        """Change how plot points are stored.
+
+        Existing plots are converted.
+        Call in the strategy module before plotting anything,
+        e.g. in `decide_trades`.
+
+        Example:
+
+        .. code-block:: python
+
+            state.visualisation.set_plot_storage(
+                PlotStorage.sidecar,
+                VisualisationRetention(
+                    max_age=datetime.timedelta(days=365),
+                    downsample_after=datetime.timedelta(days=30),
+                    downsample_interval=datetime.timedelta(days=1),
+                )
+            )
+
+        :param plot_storage:
+            How to store plot points.
+
+            :py:attr:`PlotStorage.sidecar` needs a file based state store.
+
+        :param retention:
+            Retention policy for old data
+        """
+        assert isinstance(plot_storage, PlotStorage)
+        self.plot_storage = plot_storage
+        self.retention = retention
+
+        for plot in self.plots.values():
+            plot.points = self.create_points(plot.points)
+
+        if retention is not None:
+            for name in self.plots:
+                self.apply_retention(name)
+            self.apply_retention()
+
+    def apply_retention(self, plot_name: Optional[str] = None):
+        """Remove old data according to :py:attr:`retention`.
+
+        Called automatically when data is added.
+
+        :param plot_name:
+            Apply to the points of this plot.
+
+            If not given, apply to messages and calculations.
+        """
+        retention = self.retention
+        if retention is None:
+            return
+
+        if plot_name is None:
+            retention.apply_timestamped(self.messages)
+            retention.apply_timestamped(self.calculations)
+            return
+
+        points = self.plots[plot_name].points
+        if isinstance(points, PlotPoints):
+            removed = retention.apply(points)
+            if removed:
+                logger.info("Plot %s: removed %d old points, %d points left", plot_name, removed, len(points))
+
     def add_message(self,
                     timestamp: datetime.datetime,
                     content: str):
@@ -269,6 +700,9 @@ class Visualisation:
         timepoint_messages.append(content)
         self.messages[timestamp] = timepoint_messages
 
+        if self.retention is not None:
+            self.apply_retention()
+
     def add_calculations(self,
                          timestamp: datetime.datetime,
                          cycle_calculations: dict):
@@ -295,6 +729,9 @@ class Visualisation:
         timestamp = convert_and_validate_timestamp_as_int(timestamp)
         self.calculations[timestamp] = cycle_calculations
 
+        if self.retention is not None:
+            self.apply_retention()
+
     def plot_indicator(self,
              timestamp: Union[datetime.datetime, pd.Timestamp],
              name: str,
@@ -368,7 +805,9 @@ class Visualisation:
         if kind == PlotKind.technical_indicator_overlay_on_detached:
             assert detached_overlay_name and type(detached_overlay_name) == str, "Detached overlay must be a string for PlotKind.technical_indicator_overlay_on_detached" + _get_helper_message("detached_overlay_name")
 
-        plot = self.plots.get(name, Plot(name=name, kind=kind))
+        plot = self.plots.get(name)
+        if plot is None:
+            plot = Plot(name=name, kind=kind, points=self.create_points())
 
         plot.add_point(timestamp, value)
 
@@ -389,6 +828,9 @@ class Visualisation:
 
         self.plots[name] = plot
 
+        if self.retention is not None:
+            self.apply_retention(name)
+
     def get_timestamp_range(self, plot_name: Optional[str]=None) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
         """Get the time range for which we have data.
 
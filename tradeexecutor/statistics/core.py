@@ -2,12 +2,13 @@
 
 import datetime
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, List, Optional
 from tradeexecutor.analysis.trade_analyser import build_trade_analysis
 
 from tradeexecutor.state.portfolio import Portfolio
 from tradeexecutor.state.position import TradingPosition
 from tradeexecutor.state.statistics import Statistics, PortfolioStatistics, PositionStatistics, FinalPositionStatistics
+from tradeexecutor.statistics.trade_summary_accumulator import TradeSummaryAccumulator
 from tradeexecutor.strategy.execution_context import ExecutionMode
 
 @dataclass
@@ -42,15 +43,29 @@ def calculate_closed_position_statistics(clock: datetime.datetime, position: Tra
     return stats
 
 
-def calculate_statistics(clock: datetime.datetime, portfolio: Portfolio, execution_mode: ExecutionMode) -> NewStatistics:
-    """Calculate statistics for a portfolio."""
+def calculate_statistics(
+    clock: datetime.datetime,
+    portfolio: Portfolio,
+    execution_mode: ExecutionMode,
+    summary_accumulator: Optional[TradeSummaryAccumulator] = None,
+) -> NewStatistics:
+    """Calculate statistics for a portfolio.
+
+    :param summary_accumulator:
+        Calculate the trade summary incrementally from the previous cycle.
+
+        If not given, the full trade analysis is run.
+    """
 
     first_trade, last_trade = portfolio.get_first_and_last_executed_trade()
     
     # comprehensenhive statistics after each trade are not needed for backtesting
     if(execution_mode != ExecutionMode.backtesting):
         
-        trade_analysis = build_trade_analysis(portfolio)
+        if summary_accumulator is not None:
+            summary = summary_accumulator.calculate_summary_statistics(portfolio)
+        else:
+            summary = build_trade_analysis(portfolio).calculate_summary_statistics()
 
         pf_stats = PortfolioStatistics(
             calculated_at=clock,
@@ -65,7 +80,7 @@ def calculate_statistics(clock: datetime.datetime, portfolio: Portfolio, executi
             realised_profit_usd=portfolio.get_closed_profit_usd(),
             first_trade_at=first_trade and first_trade.executed_at or None,
             last_trade_at=last_trade and last_trade.executed_at or None,
-            summary=trade_analysis.calculate_summary_statistics(),
+            summary=summary,
         )
     else:
         pf_stats = PortfolioStatistics(
@@ -84,10 +99,20 @@ def calculate_statistics(clock: datetime.datetime, portfolio: Portfolio, executi
     return stats
 
 
-def update_statistics(clock: datetime.datetime, stats: Statistics, portfolio: Portfolio, execution_mode: ExecutionMode):
-    """Update statistics in a portfolio with a new cycle."""
+def update_statistics(
+    clock: datetime.datetime,
+    stats: Statistics,
+    portfolio: Portfolio,
+    execution_mode: ExecutionMode,
+    summary_accumulator: Optional[TradeSummaryAccumulator] = None,
+):
+    """Update statistics in a portfolio with a new cycle.
+
+    :param summary_accumulator:
+        See :py:func:`calculate_statistics`
+    """
 
-    new_stats = calculate_statistics(clock, portfolio, execution_mode)
+    new_stats = calculate_statistics(clock, portfolio, execution_mode, summary_accumulator=summary_accumulator)
     stats.portfolio.append(new_stats.portfolio)
     for position_id, position_stats in new_stats.positions.items():
         stats.add_positions_stats(position_id, position_stats)
@@ -0,0 +1,391 @@
+"""Incremental trade summary statistics for live trading.
+
+:py:meth:`tradeexecutor.analysis.trade_analyser.TradeAnalysis.calculate_summary_statistics`
+goes through the whole trading history. Live executors calculate the summary
+on every statistics cycle, so the cost grows without a bound over the lifetime of the strategy.
+
+:py:class:`TradeSummaryAccumulator` keeps running win/loss counts, profit sums, durations,
+streak and pullback state of closed positions between the cycles.
+On each cycle only the positions closed since the previous cycle
+and the currently open positions are processed.
+
+- The result is the same :py:class:`TradeSummary` as with the full calculation,
+  within floating point summation order differences
+
+- Closed positions are assumed not to change after they have been closed.
+  Call :py:meth:`TradeSummaryAccumulator.reset` if the trading history is rewritten.
+"""
+import bisect
+import datetime
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pandas as pd
+
+from tradeexecutor.analysis.trade_analyser import TradeSummary, TradeAnalysis, build_trade_analysis
+from tradeexecutor.state.portfolio import Portfolio
+from tradeexecutor.state.position import TradingPosition
+from tradeexecutor.state.types import USDollarAmount
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _ClosedPositionRecord:
+    """What we need to know about a closed position for the streak calculation."""
+
+    position_id: int
+
+    realised_profit_usd: USDollarAmount
+
+    portfolio_value_at_open: Optional[USDollarAmount]
+
+
+@dataclass(slots=True)
+class _StreakState:
+    """Consecutive wins/losses and pullback after a closed position."""
+
+    pos_cons: int = 0
+    neg_cons: int = 0
+    pullback: float = 0
+    max_pos_cons: int = 0
+    max_neg_cons: int = 0
+    max_pullback_pct: float = 0
+
+    def advance(self, record: _ClosedPositionRecord) -> "_StreakState":
+        """Same as the streak calculation in `calculate_summary_statistics()`."""
+        state = _StreakState(self.pos_cons, self.neg_cons, self.pullback, self.max_pos_cons, self.max_neg_cons, self.max_pullback_pct)
+        realised_profit_usd = record.realised_profit_usd
+
+        if realised_profit_usd > 0:
+            state.neg_cons = 0
+            state.pullback = 0
+            state.pos_cons += 1
+        elif realised_profit_usd < 0:
+            state.pos_cons = 0
+            state.neg_cons += 1
+            state.pullback += realised_profit_usd
+
+        if state.neg_cons > state.max_neg_cons:
+            state.max_neg_cons = state.neg_cons
+        if state.pos_cons > state.max_pos_cons:
+            state.max_pos_cons = state.pos_cons
+
+        if record.portfolio_value_at_open:
+            pullback_pct = state.pullback / (record.portfolio_value_at_open + realised_profit_usd)
+            if pullback_pct < state.max_pullback_pct:
+                state.max_pullback_pct = pullback_pct
+        else:
+            # Bad input data / legacy data
+            state.max_pullback_pct = 0
+
+        return state
+
+
+def _sorted_median(values: List[float]) -> Optional[float]:
+    """Same as :py:func:`statistics.median` for a sorted list."""
+    n = len(values)
+    if n == 0:
+        return None
+    i = n // 2
+    if n % 2 == 1:
+        return values[i]
+    return (values[i - 1] + values[i]) / 2
+
+
+def _avg_duration(total: datetime.timedelta, count: int) -> pd.Timedelta:
+    return pd.Timedelta(total / count)
+
+
+class TradeSummaryAccumulator:
+    """Calculate :py:class:`TradeSummary` incrementally over strategy cycles.
+
+    Example:
+
+    .. code-block:: python
+
+        accumulator = TradeSummaryAccumulator()
+
+        # On every statistics cycle
+        summary = accumulator.calculate_summary_statistics(state.portfolio)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything and start from the scratch on the next update."""
+
+        #: The portfolio we are tracking
+        self.portfolio_ref: Optional[weakref.ref] = None
+
+        #: Closed position ids we have processed
+        self.processed_position_ids = set()
+
+        #: Closed positions with profit or loss, sorted by position id
+        self.records: List[_ClosedPositionRecord] = []
+
+        #: Streak state after each record
+        self.streak_states: List[_StreakState] = []
+
+        self.won = self.lost = self.zero_loss = self.stop_losses = self.take_profits = 0
+        self.winning_stop_losses = self.losing_stop_losses = 0
+        self.winning_take_profits = self.losing_take_profits = 0
+
+        self.profit: USDollarAmount = 0
+        self.trade_volume: USDollarAmount = 0
+        self.lp_fees_paid: USDollarAmount = 0
+
+        #: Sorted realised profit % of winning, losing and all closed positions
+        self.winning_trades: List[float] = []
+        self.losing_trades: List[float] = []
+        self.all_trades: List[float] = []
+
+        self.winning_trades_sum = self.losing_trades_sum = 0.0
+
+        self.winning_duration = datetime.timedelta(0)
+        self.losing_duration = datetime.timedelta(0)
+        self.zero_loss_duration = datetime.timedelta(0)
+
+        self.realised_losses_sum = 0.0
+        self.realised_losses_count = 0
+        self.max_realised_loss: Optional[float] = None
+
+        self.max_loss_risk_at_open: Optional[float] = None
+
+        #: We have seen a position without portfolio value at open.
+        #:
+        #: Legacy data, we fall back to the full calculation.
+        self.has_legacy_loss_risk = False
+
+    def update(self, portfolio: Portfolio):
+        """Process positions closed since the last update."""
+
+        if self.portfolio_ref is None or self.portfolio_ref() is not portfolio:
+            if self.portfolio_ref is not None:
+                logger.info("Portfolio changed, resetting the trade summary accumulator")
+            self.reset()
+            self.portfolio_ref = weakref.ref(portfolio)
+
+        new_ids = portfolio.closed_positions.keys() - self.processed_position_ids
+        for position_id in sorted(new_ids):
+            self.add_closed_position(portfolio.closed_positions[position_id])
+
+    def add_closed_position(self, original: TradingPosition):
+        """Add the statistics of a closed position."""
+
+        position_id = original.position_id
+        assert position_id not in self.processed_position_ids, f"Position {position_id} already processed"
+        self.processed_position_ids.add(position_id)
+
+        position = Portfolio.filter_position_trades(original)
+        if position is None:
+            return
+
+        self._add_loss_risk(position)
+        self.lp_fees_paid += position.get_total_lp_fees_paid() or 0
+        for t in position.trades.values():
+            self.trade_volume += abs(float(t.executed_quantity) * t.executed_price)
+
+        is_stop_loss = position.is_stop_loss()
+        is_take_profit = position.is_take_profit()
+
+        if is_stop_loss:
+            self.stop_losses += 1
+
+        if is_take_profit:
+            self.take_profits += 1
+
+        realised_profit_percent = position.get_realised_profit_percent()
+        realised_profit_usd = position.get_realised_profit_usd()
+        duration = position.get_duration()
+
+        if position.is_profitable():
+            self.won += 1
+            bisect.insort(self.winning_trades, realised_profit_percent)
+            bisect.insort(self.all_trades, realised_profit_percent)
+            self.winning_trades_sum += realised_profit_percent
+            self.winning_duration += duration
+
+            if is_stop_loss:
+                self.winning_stop_losses += 1
+
+            if is_take_profit:
+                self.winning_take_profits += 1
+
+        elif position.is_loss():
+            self.lost += 1
+            bisect.insort(self.losing_trades, realised_profit_percent)
+            bisect.insort(self.all_trades, realised_profit_percent)
+            self.losing_trades_sum += realised_profit_percent
+            self.losing_duration += duration
+
+            if portfolio_value_at_open := position.portfolio_value_at_open:
+                realised_loss = realised_profit_usd / portfolio_value_at_open
+            else:
+                # Bad data
+                realised_loss = 0
+
+            self.realised_losses_sum += realised_loss
+            self.realised_losses_count += 1
+            if self.max_realised_loss is None or realised_loss < self.max_realised_loss:
+                self.max_realised_loss = realised_loss
+
+            if is_stop_loss:
+                self.losing_stop_losses += 1
+
+            if is_take_profit:
+                self.losing_take_profits += 1
+
+        else:
+            # Any profit exactly balances out loss in slippage and commission
+            self.zero_loss += 1
+            bisect.insort(self.all_trades, 0)
+            self.zero_loss_duration += duration
+
+        self.profit += realised_profit_usd
+
+        self._add_streak_record(_ClosedPositionRecord(position_id, realised_profit_usd, position.portfolio_value_at_open))
+
+    def _add_streak_record(self, record: _ClosedPositionRecord):
+        """Insert the position to the streak calculation in the position id order.
+
+        Positions are usually closed in the order they were opened,
+        so only the tail of the streak states needs to be recalculated.
+        """
+        if not self.records or record.position_id > self.records[-1].position_id:
+            index = len(self.records)
+        else:
+            index = bisect.bisect_left([r.position_id for r in self.records], record.position_id)
+
+        self.records.insert(index, record)
+        del self.streak_states[index:]
+
+        state = self.streak_states[-1] if self.streak_states else _StreakState()
+        for r in self.records[index:]:
+            state = state.advance(r)
+            self.streak_states.append(state)
+
+    def _add_loss_risk(self, position: TradingPosition):
+        capital_tied_at_open_pct = TradeAnalysis.get_capital_tied_at_open(position)
+        if position.stop_loss:
+            loss_risk = position.get_loss_risk_at_open_pct()
+        else:
+            loss_risk = capital_tied_at_open_pct
+
+        if loss_risk is None:
+            self.has_legacy_loss_risk = True
+        elif self.max_loss_risk_at_open is None or loss_risk > self.max_loss_risk_at_open:
+            self.max_loss_risk_at_open = loss_risk
+
+    def calculate_summary_statistics(self, portfolio: Portfolio) -> TradeSummary:
+        """Get the trade summary of the portfolio.
+
+        Same as :py:meth:`tradeexecutor.analysis.trade_analyser.TradeAnalysis.calculate_summary_statistics`
+        without a time bucket or advanced statistics.
+        """
+
+        self.update(portfolio)
+
+        # Open and frozen positions are calculated every time
+        open_positions = [Portfolio.filter_position_trades(p) for p in portfolio.open_positions.values()]
+        open_positions += [Portfolio.filter_position_trades(p) for p in portfolio.frozen_positions.values()]
+        open_positions = [p for p in open_positions if p is not None]
+
+        open_value: USDollarAmount = 0
+        trade_volume = self.trade_volume
+        lp_fees_paid = self.lp_fees_paid
+        max_loss_risk_at_open_pc = self.max_loss_risk_at_open
+        has_legacy_loss_risk = self.has_legacy_loss_risk
+
+        for position in open_positions:
+            if position.stop_loss:
+                loss_risk = position.get_loss_risk_at_open_pct()
+            else:
+                loss_risk = TradeAnalysis.get_capital_tied_at_open(position)
+
+            if loss_risk is None:
+                has_legacy_loss_risk = True
+            elif max_loss_risk_at_open_pc is None or loss_risk > max_loss_risk_at_open_pc:
+                max_loss_risk_at_open_pc = loss_risk
+
+            lp_fees_paid += position.get_total_lp_fees_paid() or 0
+
+            for t in position.trades.values():
+                trade_volume += abs(float(t.executed_quantity) * t.executed_price)
+
+            open_value += position.get_value()
+
+        if has_legacy_loss_risk:
+            # The full calculation cannot compare missing loss risk values,
+            # let it deal with legacy data as it always has
+            logger.info("Positions without portfolio value at open, using the full trade analysis")
+            return build_trade_analysis(portfolio).calculate_summary_statistics()
+
+        # Cheap, does not copy positions
+        strategy_duration = portfolio.get_trading_history_duration()
+
+        won, lost, zero_loss = self.won, self.lost, self.zero_loss
+        closed_count = won + lost + zero_loss
+
+        streak = self.streak_states[-1] if self.streak_states else _StreakState()
+
+        if closed_count:
+            average_trade = (self.winning_trades_sum + self.losing_trades_sum) / closed_count
+            average_duration_of_all_trades = _avg_duration(self.winning_duration + self.losing_duration + self.zero_loss_duration, closed_count)
+        else:
+            average_trade = None
+            average_duration_of_all_trades = None
+
+        initial_cash = portfolio.get_initial_deposit()
+        extra_return = 0
+
+        return TradeSummary(
+            won=won,
+            lost=lost,
+            zero_loss=zero_loss,
+            stop_losses=self.stop_losses,
+            take_profits=self.take_profits,
+            undecided=len(open_positions),
+            realised_profit=self.profit + extra_return,
+            open_value=open_value,
+            uninvested_cash=portfolio.get_current_cash(),
+            initial_cash=initial_cash or 0,  # Do not pass None for serialisation for live strategies
+            extra_return=extra_return,
+            duration=strategy_duration or datetime.timedelta(seconds=0),  # Do not pass None for serialisation for live strategies
+            average_winning_trade_profit_pc=(self.winning_trades_sum / won if won else None) or 0,
+            average_losing_trade_loss_pc=(self.losing_trades_sum / lost if lost else None) or 0,
+            biggest_winning_trade_pc=self.winning_trades[-1] if won else None,
+            biggest_losing_trade_pc=self.losing_trades[0] if lost else None,
+            average_duration_of_winning_trades=_avg_duration(self.winning_duration, won) if won else pd.Timedelta(datetime.timedelta(0)),
+            average_duration_of_losing_trades=_avg_duration(self.losing_duration, lost) if lost else pd.Timedelta(datetime.timedelta(0)),
+            average_duration_of_zero_loss_trades=_avg_duration(self.zero_loss_duration, zero_loss) if zero_loss else None,
+            average_duration_of_all_trades=average_duration_of_all_trades,
+            average_trade=average_trade,
+            median_trade=_sorted_median(self.all_trades),
+            median_win=_sorted_median(self.winning_trades),
+            median_loss=_sorted_median(self.losing_trades),
+            max_pos_cons=streak.max_pos_cons,
+            max_neg_cons=streak.max_neg_cons,
+            max_pullback=streak.max_pullback_pct,
+            max_drawdown=None,
+            max_runup=None,
+            max_loss_risk=max_loss_risk_at_open_pc,
+            max_realised_loss=self.max_realised_loss,
+            avg_realised_risk=self.realised_losses_sum / self.realised_losses_count if self.realised_losses_count else None,
+            time_bucket=None,
+            trade_volume=trade_volume,
+            lp_fees_paid=lp_fees_paid,
+            lp_fees_average_pc=lp_fees_paid / trade_volume if trade_volume else 0,
+            daily_returns=None,
+            winning_stop_losses=self.winning_stop_losses,
+            losing_stop_losses=self.losing_stop_losses,
+            winning_take_profits=self.winning_take_profits,
+            losing_take_profits=self.losing_take_profits,
+            sharpe_ratio=None,
+            sortino_ratio=None,
+            profit_factor=None,
+        )
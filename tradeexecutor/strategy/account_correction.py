@@ -14,7 +14,7 @@ import datetime
 import enum
 from _decimal import Decimal
 from dataclasses import dataclass
-from typing import List, Iterable, Collection, Tuple
+from typing import List, Iterable, Collection, Tuple, Optional
 
 import pandas as pd
 from eth_defi.enzyme.erc20 import prepare_transfer
@@ -34,7 +34,7 @@ from tradeexecutor.state.state import State
 from tradeexecutor.state.sync import BalanceEventRef
 from tradeexecutor.state.types import USDollarAmount
 from tradeexecutor.strategy.asset import get_relevant_assets, map_onchain_asset_to_position
-from tradeexecutor.strategy.sync_model import SyncModel
+from tradeexecutor.strategy.sync_model import SyncModel, OnChainBalance
 
 
 logger = logging.getLogger(__name__)
@@ -126,6 +126,7 @@ def calculate_account_corrections(
     sync_model: SyncModel,
     epsilon=DUST_EPSILON,
     all_balances=False,
+    onchain_balances: Optional[List[OnChainBalance]] = None,
 ) -> Iterable[AccountingBalanceCheck]:
     """Figure out differences between our internal ledger (state) and on-chain balances.
 
@@ -148,6 +149,11 @@ def calculate_account_corrections(
     :param all_balances:
         If `True` iterate all balances even if there are no mismatch.
 
+    :param onchain_balances:
+        Balances of the relevant assets already read from the chain.
+
+        If not given, read using `sync_model`.
+
     :raise UnexpectedAccountingCorrectionIssue:
         If we find on-chain tokens we do not know how to map any of our strategy positions
 
@@ -162,8 +168,11 @@ def calculate_account_corrections(
 
     logger.info("Scanning for account corrections")
 
-    assets = get_relevant_assets(pair_universe, reserve_assets, state)
-    asset_balances = list(sync_model.fetch_onchain_balances(assets))
+    if onchain_balances is not None:
+        asset_balances = onchain_balances
+    else:
+        assets = get_relevant_assets(pair_universe, reserve_assets, state)
+        asset_balances = list(sync_model.fetch_onchain_balances(assets))
 
     logger.info("Found %d on-chain tokens", len(asset_balances))
 
@@ -413,9 +422,13 @@ def check_accounts(
     state: State,
     sync_model: SyncModel,
     epsilon=DUST_EPSILON,
+    onchain_balances: Optional[List[OnChainBalance]] = None,
 ) -> Tuple[bool, pd.DataFrame]:
     """Get a table output of accounting corrections needed.
 
+    :param onchain_balances:
+        See :py:func:`calculate_account_corrections`
+
     :return:
 
         Tuple (accounts clean, accounting clean Dataframe that can be printed to the console)
@@ -429,6 +442,7 @@ def check_accounts(
         sync_model,
         epsilon,
         all_balances=True,
+        onchain_balances=onchain_balances,
     )
 
     idx = []
@@ -18,6 +18,7 @@ from tradeexecutor.ethereum.tx import TransactionBuilder
 from tradeexecutor.state.state import State
 from tradeexecutor.state.trade import TradeExecution
 from tradeexecutor.strategy.routing import RoutingModel, RoutingState
+from tradeexecutor.strategy.state_lock import StateLock
 from tradeexecutor.state.blockhain_transaction import BlockchainTransaction
 
 
@@ -60,6 +61,12 @@ class ExecutionModel(abc.ABC):
     Used directly by BacktestExecutionModel, and indirectly (through EthereumExecutionModel) by UniswapV2ExecutionModel and UniswapV3ExecutionModel
     """
 
+    #: Released while waiting for transaction confirmations.
+    #:
+    #: Set by the live execution loop when trigger checks run on their own thread,
+    #: see :py:mod:`tradeexecutor.strategy.state_lock`.
+    state_lock: Optional[StateLock] = None
+
     @abc.abstractmethod
     def preflight_check(self):
         """Check that we can start the trade executor
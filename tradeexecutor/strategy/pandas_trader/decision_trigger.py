@@ -4,6 +4,10 @@
 
 - Update :py:class:`TradingStrategyUniverse` with the latest data needed for the current strategy cycle
 
+- In the incremental mode, only download candles newer than we already have
+  and append them to the existing candle data, instead of downloading
+  the whole history period on every cycle
+
 """
 import datetime
 import logging
@@ -20,6 +24,7 @@ from tradingstrategy.timebucket import TimeBucket
 
 from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniverse
 from tradingstrategy.types import PrimaryKey
+from tradingstrategy.utils.groupeduniverse import fix_bad_wicks
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +121,167 @@ def update_universe(
     return updated_universe
 
 
+def get_last_candle_timestamps(candles: GroupedCandleUniverse) -> Dict[PrimaryKey, pd.Timestamp]:
+    """Get the timestamp of the last candle we have for each pair."""
+    df = candles.df
+    if len(df) == 0:
+        return {}
+    return df.groupby("pair_id")[candles.timestamp_column].max().to_dict()
+
+
+def fetch_data_incremental(
+        client: Client,
+        bucket: TimeBucket,
+        timestamp: datetime.datetime,
+        pairs: Set[DEXPair],
+        required_history_period: datetime.timedelta,
+        last_timestamps: Dict[PrimaryKey, pd.Timestamp],
+) -> pd.DataFrame:
+    """Download the pair data we do not have yet.
+
+    - The last candle we have is downloaded again, as it may have been incomplete
+      when we downloaded it
+
+    - If we do not have data for some of the pairs, download the full history period
+      like :py:func:`fetch_data`
+
+    :param last_timestamps:
+        The last candle timestamp we already have for each pair.
+
+        See :py:func:`get_last_candle_timestamps`.
+
+    :return:
+        A candle containing a mix of pair data for all pairs.
+    """
+    pair_ids = {p.pair_id for p in pairs}
+    history_start = timestamp - required_history_period
+
+    if all(pair_id in last_timestamps for pair_id in pair_ids):
+        refresh_start = min(last_timestamps[pair_id] for pair_id in pair_ids).to_pydatetime().replace(tzinfo=None)
+        start_time = max(refresh_start, history_start)
+    else:
+        start_time = history_start
+
+    logger.info("Fetching candles for %d pairs since %s", len(pair_ids), start_time)
+
+    return client.fetch_candles_by_pair_ids(
+        pair_ids,
+        bucket=bucket,
+        start_time=start_time - datetime.timedelta(seconds=1),
+        end_time=timestamp,
+    )
+
+
+def append_candles(
+        candles: GroupedCandleUniverse,
+        df: pd.DataFrame,
+        history_start: Optional[datetime.datetime] = None,
+):
+    """Add new candles to a candle universe in place.
+
+    - Existing candles of a pair at or after the first new candle of the pair are replaced
+
+    - The grouped index is updated and the cached per pair candles are cleared
+
+    :param candles:
+        Candle universe to update
+
+    :param df:
+        New candles for any pairs.
+
+        Unsorted, in the raw format of :py:class:`GroupedCandleUniverse` input.
+
+    :param history_start:
+        Drop candles older than this, so that the memory usage
+        does not grow over time.
+    """
+    timestamp_column = candles.timestamp_column
+    old = candles.df
+
+    new = df.set_index(timestamp_column, drop=False)
+    new = fix_bad_wicks(new)
+
+    if len(new) > 0:
+        first_new = new.groupby("pair_id")[timestamp_column].min()
+        # NaT for pairs without new data, which compares False
+        cutoff = old["pair_id"].map(first_new)
+        keep = ~(old[timestamp_column] >= cutoff)
+    else:
+        keep = pd.Series(True, index=old.index)
+
+    if history_start is not None:
+        keep &= old[timestamp_column] >= pd.Timestamp(history_start)
+
+    merged = pd.concat([old[keep.to_numpy()], new]).sort_index(kind="stable")
+
+    candles.df = merged
+    candles.pairs = merged.groupby(["pair_id"])
+    candles.clear_cache()
+
+
+def update_universe_incremental(
+        universe: TradingStrategyUniverse,
+        df: pd.DataFrame,
+        history_start: Optional[datetime.datetime] = None,
+) -> TradingStrategyUniverse:
+    """Update a Trading Universe with new candles, keeping the old candles.
+
+    Unlike :py:func:`update_universe`, the candle universe is updated in place.
+    See :py:func:`append_candles`.
+
+    :param df:
+        Unsorted DataFrame containing new data for the trading pairs we are interested in.
+    """
+    updated_universe = universe.clone()
+    append_candles(updated_universe.universe.candles, df, history_start)
+    return updated_universe
+
+
+def refresh_universe_incremental(
+        timestamp: datetime.datetime,
+        client: Client,
+        current_universe: TradingStrategyUniverse,
+        required_history_period=datetime.timedelta(days=90),
+) -> TradingStrategyUniverse:
+    """Download the candles we do not have yet and add them to the universe.
+
+    - Used in live execution with :py:attr:`StrategyCycleTrigger.cycle_offset`,
+      instead of constructing the universe from the scratch on every cycle
+
+    - Only candles are refreshed, the pairs and the liquidity data
+      are those of the universe constructed at the start
+
+    :param timestamp:
+        The current strategy decision timestamp.
+
+    :param required_history_period:
+        How much historical data we keep.
+
+        If there is `current_universe.required_history_period` ignore this argument
+        and use the value from the trading universe instead.
+
+    :return:
+        An updated trading universe
+    """
+    if current_universe.required_history_period is not None:
+        required_history_period = current_universe.required_history_period
+
+    pairs = current_universe.universe.pairs
+    bucket = current_universe.universe.time_bucket
+    candles = current_universe.universe.candles
+    pair_set = {pairs.get_pair_by_id(id) for id in pairs.pair_map.keys()}
+
+    df = fetch_data_incremental(
+        client,
+        bucket,
+        timestamp,
+        pair_set,
+        required_history_period,
+        get_last_candle_timestamps(candles),
+    )
+    return update_universe_incremental(current_universe, df, timestamp - required_history_period)
+
+
 def validate_latest_candles(
         pairs: Set[DEXPair],
         df: pd.DataFrame,
@@ -165,6 +331,7 @@ def wait_for_universe_data_availability_jsonl(
         max_wait=datetime.timedelta(minutes=30),
         max_poll_cycles: Optional[int] = None,
         poll_delay = datetime.timedelta(seconds=15),
+        incremental=False,
 ) -> UpdatedUniverseResult:
     """Wait for the data to be available for the latest strategy cycle.
 
@@ -198,6 +365,12 @@ def wait_for_universe_data_availability_jsonl(
 
         Return after this many cycles despite new data being incomplete.
 
+    :param incremental:
+        Only download candles newer than we have in `current_universe`
+        and add them to the existing candles.
+
+        See :py:func:`update_universe_incremental`.
+
     :return:
         An updated trading universe
     """
@@ -269,15 +442,26 @@ def wait_for_universe_data_availability_jsonl(
         # Add we done with all incomplete pairs
         if not incompleted_pairs or poll_cycle >= max_poll_cycles:
             # We have latest data for all pairs and can now update the universe
-            logger.info("Fetching candle data for the history period of %s", required_history_period)
-            df = fetch_data(
-                client,
-                bucket,
-                wanted_timestamp,
-                completed_pairs,
-                required_history_period,
-            )
-            updated_universe = update_universe(current_universe, df)
+            if incremental:
+                df = fetch_data_incremental(
+                    client,
+                    bucket,
+                    wanted_timestamp,
+                    completed_pairs,
+                    required_history_period,
+                    get_last_candle_timestamps(current_universe.universe.candles),
+                )
+                updated_universe = update_universe_incremental(current_universe, df, wanted_timestamp - required_history_period)
+            else:
+                logger.info("Fetching candle data for the history period of %s", required_history_period)
+                df = fetch_data(
+                    client,
+                    bucket,
+                    wanted_timestamp,
+                    completed_pairs,
+                    required_history_period,
+                )
+                updated_universe = update_universe(current_universe, df)
             time_waited = datetime.datetime.utcnow() - started_at
             return UpdatedUniverseResult(
                 updated_universe=updated_universe,
@@ -7,7 +7,7 @@ import logging
 
 import pandas as pd
 
-from tradeexecutor.cli.discord import post_logging_discord_image
+from tradeexecutor.cli.discord import post_logging_discord_image, get_discord_logging_handler
 from tradeexecutor.strategy.pandas_trader.trade_decision import TradeDecider
 from tradeexecutor.strategy.pricing_model import PricingModel
 from tradeexecutor.strategy.sync_model import SyncModel
@@ -16,7 +16,6 @@ from tradeexecutor.strategy.trading_strategy_universe import TradingStrategyUniv
 from tradeexecutor.state.state import State
 from tradeexecutor.state.trade import TradeExecution
 from tradeexecutor.strategy.runner import StrategyRunner, PreflightCheckFailed
-from tradeexecutor.visual.image_output import render_plotly_figure_as_image_file
 from tradeexecutor.visual.strategy_state import draw_single_pair_strategy_state, draw_multi_pair_strategy_state
 from tradeexecutor.state.visualisation import Visualisation
 
@@ -105,58 +104,45 @@ class PandasTraderRunner(StrategyRunner):
             logger.info("Strategy universe is empty - nothing to report")
             return
 
+        # The figure is drawn once per cycle.
+        # Images are rendered from it in a background worker process when
+        # the webhook asks for them, the image export size overrides the figure height.
         if universe.is_single_pair_universe():
-
-            small_figure = draw_single_pair_strategy_state(state, universe, height=512)
-            # Draw the inline plot and expose them tot he web server
-            # TODO: SVGs here are not very readable, have them as a stop gap solution
-            large_figure = draw_single_pair_strategy_state(state, universe, height=1024)
-
-            self.update_strategy_thinking_image_data(small_figure, large_figure)
+            figure = draw_single_pair_strategy_state(state, universe, height=1024)
+            self.run_state.visualisation.update_figure(figure)
 
         elif 1 < universe.get_pair_count() <= 3:
-            
-            small_figure_combined = draw_multi_pair_strategy_state(state, universe, height=1024)
-            large_figure_combined = draw_multi_pair_strategy_state(state, universe, height=2048)
-
-            self.update_strategy_thinking_image_data(small_figure_combined, large_figure_combined)
+            figure = draw_multi_pair_strategy_state(state, universe, height=2048)
+            self.run_state.visualisation.update_figure(figure)
 
         else:
             logger.warning("Charts not yet available for this strategy type. Pair count: %s", universe.get_pair_count())
-    
-    def update_strategy_thinking_image_data(self, small_image, large_image):
-        """Update the strategy thinking image data with small, small dark theme, large, and large dark theme images.
-        
-        :param small_image: 512 x 512 image PNG
-        :param large_image: 1920 x 1920 image SVG
+
+    def post_strategy_thinking_image(self, size: str):
+        """Post the strategy thinking image to Discord when it has been rendered.
+
+        Does not block the trading loop.
         """
+        if not get_discord_logging_handler():
+            return
 
-        small_image, small_image_dark = self.get_small_images(small_image)
-        large_image, large_image_dark = self.get_large_images(large_image)
-        
-        self.run_state.visualisation.update_image_data(
-            small_image,
-            large_image,
-            small_image_dark,
-            large_image_dark,
-        )
+        visualisation = self.run_state.visualisation
+        if visualisation.renderer is None:
+            image = visualisation.get_image(size)
+            if image:
+                post_logging_discord_image(image)
+            return
+
+        future = visualisation.renderer.get_image_future(size)
+        if future is None:
+            return
+
+        def _post(f):
+            if f.cancelled() or f.exception() is not None:
+                return
+            post_logging_discord_image(f.result())
 
-    def get_small_images(self, small_figure):
-        """Gets the png image of the figure and the dark theme png image. Images are 512 x 512."""
-        return self.get_image_and_dark_image(small_figure, width=512, height=512)
-    
-    def get_large_images(self, large_figure):
-        """Gets the png image of the figure and the dark theme png image. Images are 1024 x 1024."""
-        return self.get_image_and_dark_image(large_figure, width=1024, height=1024)
-    
-    def get_image_and_dark_image(self, figure, width, height):
-        """Renders the figure as a PNG image and a dark theme PNG image."""
-        image = render_plotly_figure_as_image_file(figure, width=width, height=height, format="png")
-        
-        figure.update_layout(template="plotly_dark")
-        image_dark = render_plotly_figure_as_image_file(figure, width=width, height=height, format="png")
-
-        return image, image_dark 
+        future.add_done_callback(_post)
 
     def report_strategy_thinking(self,
                                  strategy_cycle_timestamp: datetime.datetime,
@@ -224,8 +210,7 @@ class PandasTraderRunner(StrategyRunner):
 
             logger.trade(buf.getvalue())
 
-            small_image = self.run_state.visualisation.small_image
-            post_logging_discord_image(small_image)
+            self.post_strategy_thinking_image("small")
 
         elif 1 <= universe.get_pair_count() <= 3:
             
@@ -270,8 +255,7 @@ class PandasTraderRunner(StrategyRunner):
                 
             logger.trade(buf.getvalue())
 
-            large_image = self.run_state.visualisation.large_image
-            post_logging_discord_image(large_image)
+            self.post_strategy_thinking_image("large")
 
         else:   
             logger.warning("Reporting of strategy thinking of multipair universes with more than 3 pairs not supported yet")
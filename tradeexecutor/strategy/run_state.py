@@ -3,14 +3,16 @@ import datetime
 import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, TypedDict
+from typing import Dict, Optional, TypedDict
 
 import dataclasses_json
-from dataclasses_json import dataclass_json
+from dataclasses_json import dataclass_json, config
 from tblib import Traceback
 
 from tradeexecutor.cli.version_info import VersionInfo
 from tradeexecutor.strategy.summary import StrategySummaryStatistics
+from tradeexecutor.utils.metrics import TaskMetricSummary
+from tradeexecutor.visual.image_renderer import BackgroundImageRenderer
 
 
 class ExceptionData(TypedDict):
@@ -43,10 +45,56 @@ class LatestStateVisualisation:
     #: Dark theme version
     large_image_dark: Optional[bytes] = None
 
+    #: Renders images of the latest figure on demand.
+    #:
+    #: If set, used instead of the image fields above.
+    #: See :py:meth:`update_figure`.
+    renderer: Optional[BackgroundImageRenderer] = field(default=None, repr=False, compare=False, metadata=config(exclude=lambda _: True))
+
     def __repr__(self) -> str:
         """Don't dump binary"""
         return f"<LatestStateVisualisation at {self.last_refreshed_at}>"
 
+    def update_figure(self, figure):
+        """Set the latest strategy thinking figure.
+
+        Images are rendered in a background worker process when they are asked for,
+        see :py:mod:`tradeexecutor.visual.image_renderer`.
+
+        :param figure:
+            Plotly figure
+        """
+        if self.renderer is None:
+            self.renderer = BackgroundImageRenderer()
+        self.renderer.update_figure(figure)
+        self.last_refreshed_at = datetime.datetime.utcnow()
+
+    def get_image(self, size: str, theme: str = "light") -> Optional[bytes]:
+        """Get the latest image.
+
+        Blocks if the image needs to be rendered.
+
+        :param size:
+            `small` or `large`
+
+        :param theme:
+            `light` or `dark`
+
+        :return:
+            PNG data or `None` if not available yet
+        """
+        if self.renderer is not None:
+            return self.renderer.get_image(size, theme)
+
+        images = {
+            ("small", "light"): self.small_image,
+            ("small", "dark"): self.small_image_dark,
+            ("large", "light"): self.large_image,
+            ("large", "dark"): self.large_image_dark,
+        }
+        assert (size, theme) in images, f"Unknown image {size} {theme}"
+        return images[(size, theme)]
+
     def update_image_data(self,
                           small_image,
                           large_image,
@@ -163,6 +211,13 @@ class RunState:
     #:
     market_data_feed_lag: Optional[datetime.timedelta] = None
 
+    #: Durations of the hot code path tasks.
+    #:
+    #: Task name with labels -> count, p50, p95, max and last duration in seconds.
+    #: See :py:mod:`tradeexecutor.utils.metrics`.
+    #:
+    task_metrics: Dict[str, TaskMetricSummary] = field(default_factory=dict)
+
     #: Docker image version information
     #:
     version: VersionInfo = field(default_factory=VersionInfo)
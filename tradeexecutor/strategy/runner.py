@@ -5,18 +5,22 @@ Define the runner model for different strategy types.
 
 import abc
 import datetime
+from concurrent.futures import ThreadPoolExecutor, Future
 from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
 import logging
+from decimal import Decimal
 from io import StringIO
 
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Dict
 
 from tradeexecutor.strategy.account_correction import check_accounts, UnexpectedAccountingCorrectionIssue
+from tradeexecutor.strategy.asset import get_relevant_assets
 from tradeexecutor.strategy.approval import ApprovalModel
 from tradeexecutor.strategy.cycle import CycleDuration
 from tradeexecutor.strategy.execution_context import ExecutionContext
 from tradeexecutor.strategy.execution_model import ExecutionModel
-from tradeexecutor.strategy.sync_model import SyncMethodV0, SyncModel
+from tradeexecutor.strategy.sync_model import SyncMethodV0, SyncModel, OnChainBalance
 from tradeexecutor.strategy.run_state import RunState
 from tradeexecutor.strategy.output import output_positions, DISCORD_BREAK_CHAR, output_trades
 from tradeexecutor.strategy.pandas_trader.position_manager import PositionManager
@@ -30,6 +34,7 @@ from tradeexecutor.state.state import State
 from tradeexecutor.state.position import TradingPosition
 from tradeexecutor.state.trade import TradeExecution
 from tradeexecutor.state.reserve import ReservePosition
+from tradeexecutor.state.types import USDollarPrice
 from tradeexecutor.strategy.valuation import ValuationModelFactory, ValuationModel
 
 
@@ -40,6 +45,66 @@ class PreflightCheckFailed(Exception):
     """Something was wrong with the datafeeds."""
 
 
+@dataclass
+class TickPrefetch:
+    """On-chain inputs of a strategy cycle read in parallel with the treasury sync.
+
+    See :py:meth:`StrategyRunner.prefetch_tick_inputs`.
+    """
+
+    #: The block the position revaluation is pinned to
+    block_number: Optional[int] = None
+
+    #: Position quantities when the prefetch was started
+    quantities: Dict[int, Decimal] = field(default_factory=dict)
+
+    #: Position revaluation in progress
+    valuations: Optional[Future] = None
+
+    #: Account check balances read in progress,
+    #: pinned to the block the treasury sync ended on
+    onchain_balances: Optional[Future] = None
+
+    def get_valuations(self, state: State) -> Optional[Dict[int, Tuple[datetime.datetime, USDollarPrice]]]:
+        """Get prefetched revaluations.
+
+        Positions the treasury sync has changed are left out and need to be revalued again.
+
+        :return:
+            Position id -> (revaluation date, price) or None if not available
+        """
+        valuations = _get_prefetch_result(self.valuations, "position revaluation")
+        if valuations is None:
+            return None
+
+        portfolio = state.portfolio
+        result = {}
+        for position_id, valuation in valuations.items():
+            position = portfolio.open_positions.get(position_id) or portfolio.frozen_positions.get(position_id)
+            if position is not None and position.get_quantity() == self.quantities[position_id]:
+                result[position_id] = valuation
+        return result
+
+    def get_onchain_balances(self) -> Optional[List[OnChainBalance]]:
+        """Get prefetched balances for the accounting checks.
+
+        :return:
+            None if not available
+        """
+        return _get_prefetch_result(self.onchain_balances, "on-chain balance read")
+
+
+def _get_prefetch_result(future: Optional[Future], name: str):
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        # Do it again in the sequential path where the error is handled normally
+        logger.warning("Concurrent %s failed, retrying sequentially: %s", name, e)
+        return None
+
+
 class StrategyRunner(abc.ABC):
     """A base class for a strategy executor.
 
@@ -64,7 +129,15 @@ class StrategyRunner(abc.ABC):
                  routing_model: Optional[RoutingModel] = None,
                  run_state: Optional[RunState] = None,
                  accounting_checks=False,
+                 concurrent_tick=False,
                  ):
+        """
+        :param concurrent_tick:
+            Read on-chain inputs for the position revaluation
+            in parallel with the treasury sync.
+
+            See :py:meth:`prefetch_tick_inputs`.
+        """
 
         assert isinstance(execution_context, ExecutionContext)
 
@@ -81,6 +154,8 @@ class StrategyRunner(abc.ABC):
         self.run_state = run_state
         self.execution_context = execution_context
         self.accounting_checks = accounting_checks
+        self.concurrent_tick = concurrent_tick
+        self.prefetch_executor: Optional[ThreadPoolExecutor] = None
 
     @abc.abstractmethod
     def pretick_check(self, ts: datetime.datetime, universe: StrategyExecutionUniverse):
@@ -137,11 +212,104 @@ class StrategyRunner(abc.ABC):
         debug_details["total_equity_at_start"] = state.portfolio.get_total_equity()
         debug_details["total_cash_at_start"] = state.portfolio.get_current_cash()
 
-    def revalue_portfolio(self, ts: datetime.datetime, state: State, valuation_method: ValuationModel):
-        """Revalue portfolio based on the data."""
-        state.revalue_positions(ts, valuation_method)
+    def revalue_portfolio(
+        self,
+        ts: datetime.datetime,
+        state: State,
+        valuation_method: ValuationModel,
+        prefetched_valuations: Optional[Dict[int, Tuple[datetime.datetime, USDollarPrice]]] = None,
+    ):
+        """Revalue portfolio based on the data.
+
+        :param prefetched_valuations:
+            Valuations read by :py:meth:`prefetch_tick_inputs`
+        """
+        state.revalue_positions(ts, valuation_method, prefetched_valuations=prefetched_valuations)
         logger.info("After revaluation at %s our equity is %f", ts, state.portfolio.get_total_equity())
 
+    def prefetch_tick_inputs(
+        self,
+        ts: datetime.datetime,
+        universe: StrategyExecutionUniverse,
+        state: State,
+        valuation_model: ValuationModel,
+    ) -> TickPrefetch:
+        """Start reading on-chain inputs of the cycle in background threads.
+
+        `sync_portfolio`, `check_accounts` and `revalue_portfolio` each wait for their own JSON-RPC round trips.
+        Here the position valuations are read in parallel while the treasury sync is running.
+        The state is still updated in the same order as in the sequential tick.
+
+        - Valuations are pinned to the latest block when the prefetch is started
+
+        - Positions the treasury sync changes, e.g. by redemptions, are revalued again
+
+        - Account check balances are read only after the treasury sync,
+          see :py:meth:`prefetch_account_balances`
+
+        - Any failure falls back to the sequential read
+
+        :return:
+            Prefetch with the reads in progress
+        """
+
+        if self.prefetch_executor is None:
+            self.prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tick_prefetch")
+
+        executor = self.prefetch_executor
+        portfolio = state.portfolio
+
+        block_number = self.sync_model.get_latest_block_number() if self.sync_model else None
+        prefetch = TickPrefetch(block_number=block_number)
+
+        revalue_batch = getattr(valuation_model, "revalue_batch", None)
+        positions = list(portfolio.open_positions.values()) + list(portfolio.frozen_positions.values())
+        if revalue_batch is not None and positions:
+            for p in positions:
+                assert p.is_long(), "Short not supported"
+
+            # The main thread keeps changing the positions, e.g. by the treasury sync,
+            # so the worker only gets their snapshot
+            prefetch.quantities = {p.position_id: p.get_quantity() for p in positions}
+            position_ids = [p.position_id for p in positions]
+            quantities = [(p.pair, prefetch.quantities[p.position_id]) for p in positions]
+
+            def revalue():
+                valuations = revalue_batch(ts, None, block_identifier=block_number, quantities=quantities)
+                return dict(zip(position_ids, valuations))
+
+            prefetch.valuations = executor.submit(revalue)
+
+        logger.info("Prefetching tick inputs at block %s", block_number)
+        return prefetch
+
+    def prefetch_account_balances(
+        self,
+        universe: StrategyExecutionUniverse,
+        state: State,
+        prefetch: TickPrefetch,
+    ):
+        """Start reading the account check balances after the treasury sync.
+
+        The balances are read at the block the treasury sync ended on.
+        Reading them any earlier would miss deposits and redemptions the sync picked up
+        after that block and the account check would fail.
+        The read runs in parallel with the still running position revaluation.
+
+        :param prefetch:
+            Prefetch from :py:meth:`prefetch_tick_inputs`
+        """
+
+        portfolio = state.portfolio
+        if not (self.accounting_checks and len(portfolio.reserves) > 0 and isinstance(universe, TradingStrategyUniverse)):
+            return
+
+        block_number = state.sync.treasury.last_block_scanned
+        assets = get_relevant_assets(universe.universe.pairs, [universe.get_reserve_asset()], state)
+        prefetch.onchain_balances = self.prefetch_executor.submit(
+            lambda: list(self.sync_model.fetch_onchain_balances(assets, block_number=block_number))
+        )
+
     def on_clock(self,
                  clock: datetime.datetime,
                  universe: StrategyExecutionUniverse,
@@ -376,17 +544,27 @@ class StrategyRunner(abc.ABC):
             routing_state, pricing_model, valuation_model = self.setup_routing(universe)
             assert pricing_model, "Routing did not provide pricing_model"
 
+            # Read on-chain data for account checks and revaluation
+            # while we are syncing the treasury
+            if self.concurrent_tick:
+                prefetch = self.prefetch_tick_inputs(strategy_cycle_timestamp, universe, state, valuation_model)
+            else:
+                prefetch = TickPrefetch()
+
             # Watch incoming deposits
             with self.timed_task_context_manager("sync_portfolio"):
                 self.sync_portfolio(strategy_cycle_timestamp, universe, state, debug_details)
 
+            if self.concurrent_tick:
+                self.prefetch_account_balances(universe, state, prefetch)
+
             # Double check we handled deposits correctly
             with self.timed_task_context_manager("check_accounts"):
-                self.check_accounts(universe, state)
+                self.check_accounts(universe, state, onchain_balances=prefetch.get_onchain_balances())
 
             # Assing a new value for every existing position
             with self.timed_task_context_manager("revalue_portfolio"):
-                self.revalue_portfolio(strategy_cycle_timestamp, state, valuation_model)
+                self.revalue_portfolio(strategy_cycle_timestamp, state, valuation_model, prefetched_valuations=prefetch.get_valuations(state))
 
             # Log output
             if self.is_progress_report_needed():
@@ -462,6 +640,7 @@ class StrategyRunner(abc.ABC):
         universe: StrategyExecutionUniverse,
         stop_loss_pricing_model: PricingModel,
         routing_state: RoutingState,
+        skip_unconfirmed_positions=False,
         ) -> List[TradeExecution]:
         """Check stop loss/take profit for positions.
 
@@ -476,6 +655,9 @@ class StrategyRunner(abc.ABC):
         - check_position_triggers() is much more lightweight and can be called much more frequently,
           even once per minute
 
+        :param skip_unconfirmed_positions:
+            See :py:func:`tradeexecutor.strategy.stop_loss.check_position_triggers`
+
         :return:
             List of generated stop loss trades
         """
@@ -500,7 +682,7 @@ class StrategyRunner(abc.ABC):
                 stop_loss_pricing_model,
             )
 
-            triggered_trades = check_position_triggers(position_manager)
+            triggered_trades = check_position_triggers(position_manager, skip_unconfirmed_positions=skip_unconfirmed_positions)
 
             approved_trades = self.approval_model.confirm_trades(state, triggered_trades)
 
@@ -550,11 +732,19 @@ class StrategyRunner(abc.ABC):
         The function is overridden by the child class for actual strategy runner specific implementation.
         """
 
-    def check_accounts(self, universe: TradingStrategyUniverse, state: State):
+    def check_accounts(
+        self,
+        universe: TradingStrategyUniverse,
+        state: State,
+        onchain_balances: Optional[List[OnChainBalance]] = None,
+    ):
         """Perform extra accounting checks on live trading startup.
 
         Must be enabled in the settings. Enabled by default for live trading.
 
+        :param onchain_balances:
+            Balances read by :py:meth:`prefetch_tick_inputs`
+
         :raise UnexpectedAccountingCorrectionIssue:
             Aborting execution.
 
@@ -573,6 +763,7 @@ class StrategyRunner(abc.ABC):
                 [universe.get_reserve_asset()],
                 state,
                 self.sync_model,
+                onchain_balances=onchain_balances,
             )
 
             if not clean:
@@ -0,0 +1,158 @@
+"""Share the strategy state between the strategy cycle and the trigger check threads.
+
+In live trading, take profit and stop loss triggers can be checked
+on their own thread, so that they are not delayed by a slow strategy cycle.
+See `concurrent_trigger_checks` in :py:class:`tradeexecutor.cli.loop.ExecutionLoop`.
+
+:py:class:`tradeexecutor.state.state.State` is a plain tree of Python objects.
+All code reading or changing it must hold :py:class:`StateLock`.
+Most of the time the strategy cycle spends is not spent on the state, though:
+
+- Downloading the trading universe happens before the lock is taken
+
+- Waiting for transaction confirmations happens with the lock released,
+  see :py:meth:`StateLock.unlocked`
+
+While the strategy cycle is waiting for its transactions, the trigger thread
+may close positions. Positions with unconfirmed trades are not checked for triggers.
+
+The trigger thread never releases the lock while waiting for its own transactions,
+so the strategy cycle never sees unconfirmed stop loss trades and
+never resyncs the hot wallet nonce while they are pending.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class StateLock:
+    """A reentrant lock that its holder can temporarily release during slow I/O.
+
+    Example:
+
+    .. code-block:: python
+
+        lock = StateLock()
+
+        # Strategy cycle
+        with lock.hold(releasable=True):
+            trades = decide_trades(state)
+            broadcast(trades)
+            with lock.unlocked():
+                # Trigger checks may run here
+                wait_confirmations(trades)
+            resolve(trades)
+
+        # Trigger check thread
+        with lock.hold():
+            check_position_triggers(state)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        #: Thread id of the current holder
+        self.owner: Optional[int] = None
+
+        #: How many times the current holder has entered :py:meth:`hold`
+        self.depth = 0
+
+        #: Can the current holder release the lock in :py:meth:`unlocked`
+        self.releasable = False
+
+        #: The longest time a thread had to wait for the lock, seconds
+        self.max_wait = 0.0
+
+    def __repr__(self):
+        return f"<StateLock held by {self.owner}, max wait {self.max_wait:.3f}s>"
+
+    def is_held(self) -> bool:
+        """Does the current thread hold the lock."""
+        return self.owner == threading.get_ident()
+
+    def _acquire(self):
+        started = time.perf_counter()
+        self.lock.acquire()
+        waited = time.perf_counter() - started
+        if waited > self.max_wait:
+            self.max_wait = waited
+
+    @contextmanager
+    def hold(self, releasable=False):
+        """Hold the lock.
+
+        :param releasable:
+            Allow :py:meth:`unlocked` to release the lock.
+
+            Ignored for nested holds.
+        """
+        me = threading.get_ident()
+        if self.owner == me:
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+            return
+
+        self._acquire()
+        self.owner = me
+        self.depth = 1
+        self.releasable = releasable
+        try:
+            yield
+        finally:
+            self.owner = None
+            self.depth = 0
+            self.releasable = False
+            self.lock.release()
+
+    @contextmanager
+    def unlocked(self):
+        """Release the lock for a slow operation that does not touch the state.
+
+        Does nothing if the current thread does not hold the lock
+        or did not hold it as releasable.
+        """
+        me = threading.get_ident()
+        if self.owner != me or not self.releasable:
+            yield
+            return
+
+        depth = self.depth
+        self.owner = None
+        self.depth = 0
+        self.releasable = False
+        self.lock.release()
+        try:
+            yield
+        finally:
+            self._acquire()
+            self.owner = me
+            self.depth = depth
+            self.releasable = True
+
+
+def hold_state(lock: Optional[StateLock], releasable=False) -> ContextManager:
+    """Hold the state lock if there is one.
+
+    See :py:meth:`StateLock.hold`.
+    """
+    if lock is None:
+        return nullcontext()
+    return lock.hold(releasable=releasable)
+
+
+def release_state(lock: Optional[StateLock]) -> ContextManager:
+    """Release the state lock for a slow operation if there is one.
+
+    See :py:meth:`StateLock.unlocked`.
+    """
+    if lock is None:
+        return nullcontext()
+    return lock.unlocked()
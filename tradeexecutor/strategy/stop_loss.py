@@ -49,6 +49,7 @@ def report_position_triggered(
 
 def check_position_triggers(
         position_manager: PositionManager,
+        skip_unconfirmed_positions=False,
 ) -> List[TradeExecution]:
     """Generate trades that depend on real-time price signals.
 
@@ -77,6 +78,12 @@ def check_position_triggers(
     :param position_manager:
         Encapsulates the current state, universe for closing positions
 
+    :param skip_unconfirmed_positions:
+        Do not check positions with trades waiting for confirmation.
+
+        Used when trigger checks run concurrently with the strategy cycle,
+        see :py:mod:`tradeexecutor.strategy.state_lock`.
+
     :param epsilon:
         The rounding error to zero
 
@@ -98,6 +105,11 @@ def check_position_triggers(
             # This position does not have take profit/stop loss set
             continue
 
+        if skip_unconfirmed_positions and p.has_unexecuted_trades():
+            # The strategy cycle is waiting for the trades of this position to confirm
+            logger.info("Position %s has unconfirmed trades, skipping trigger checks", p)
+            continue
+
         assert p.is_long(), "Stop loss supported only for long positions"
 
         size = p.get_quantity()
@@ -63,6 +63,14 @@ class SyncModel(ABC):
         we are not getting wrong nonce error when broadcasting the transaction.
         """
 
+    def get_latest_block_number(self) -> Optional[int]:
+        """Get the block number to pin on-chain reads of a cycle to.
+
+        :return:
+            None if the sync model is not connected to a blockchain
+        """
+        return None
+
     def is_ready_for_live_trading(self, state: State) -> bool:
         """Check that the state and sync model is ready for live trading."""
         # By default not any checks are needed
@@ -23,6 +23,7 @@ from tradeexecutor.strategy.execution_context import ExecutionMode, ExecutionCon
 from tradingstrategy.token import Token
 
 from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
+from tradeexecutor.state.identifier_registry import IdentifierRegistry
 from tradeexecutor.strategy.universe_model import StrategyExecutionUniverse, UniverseModel, DataTooOld, UniverseOptions
 from tradingstrategy.candle import GroupedCandleUniverse
 from tradingstrategy.chain import ChainId
@@ -40,6 +41,17 @@ from tradingstrategy.utils.groupeduniverse import filter_for_pairs
 logger = logging.getLogger(__name__)
 
 
+#: Forget memoised translated trading pairs after this many,
+#: e.g. when going through many trading universes in a grid search
+MAX_TRANSLATED_PAIRS = 100_000
+
+#: Memoised :py:func:`translate_trading_pair` results
+_translated_pairs: Dict[tuple, TradingPairIdentifier] = {}
+
+#: Assets shared by the translated trading pairs
+_translated_assets = IdentifierRegistry()
+
+
 class TradingUniverseIssue(Exception):
     """Raised in the case trading universe has some bad data etc. issues."""
 
@@ -975,25 +987,70 @@ def translate_trading_pair(pair: DEXPair) -> TradingPairIdentifier:
 
 
     This is called when a trade is made: this is the moment when trade executor data format must be made available.
+
+    Translated pairs are memoised by their pair id: translating the same pair again returns
+    the same :py:class:`TradingPairIdentifier` object, and pairs share their
+    :py:class:`AssetIdentifier` objects. A pair whose :py:attr:`TradingPairIdentifier.fee`
+    has been manually overridden is translated again.
     """
 
     assert isinstance(pair, DEXPair), f"Expected DEXPair, got {type(pair)}"
     assert pair.base_token_decimals is not None, f"Base token missing decimals: {pair}"
     assert pair.quote_token_decimals is not None, f"Quote token missing decimals: {pair}"
 
-    base = AssetIdentifier(
+    fee = _translate_fee(pair)
+
+    # Test universes reuse pair ids, so all translated data is part of the key
+    key = (
+        pair.pair_id,
+        pair.chain_id,
+        pair.address,
+        pair.exchange_address,
+        pair.exchange_slug,
+        pair.pair_slug,
+        pair.base_token_address,
+        pair.base_token_symbol,
+        pair.base_token_decimals,
+        pair.quote_token_address,
+        pair.quote_token_symbol,
+        pair.quote_token_decimals,
+        fee,
+    )
+
+    translated = _translated_pairs.get(key)
+    if translated is not None and translated.fee == fee:
+        return translated
+
+    if len(_translated_pairs) >= MAX_TRANSLATED_PAIRS:
+        clear_translated_pairs()
+
+    base = _translated_assets.intern_asset(AssetIdentifier(
         chain_id=pair.chain_id.value,
         address=pair.base_token_address,
         token_symbol=pair.base_token_symbol,
         decimals=pair.base_token_decimals,
-    )
-    quote = AssetIdentifier(
+    ))
+    quote = _translated_assets.intern_asset(AssetIdentifier(
         chain_id=pair.chain_id.value,
         address=pair.quote_token_address,
         token_symbol=pair.quote_token_symbol,
         decimals=pair.quote_token_decimals,
+    ))
+
+    translated = _translated_pairs[key] = TradingPairIdentifier(
+        base=base,
+        quote=quote,
+        pool_address=pair.address,
+        internal_id=pair.pair_id,
+        info_url=pair.get_trading_pair_page_url(),
+        exchange_address=pair.exchange_address,
+        fee=fee,
     )
+    return translated
 
+
+def _translate_fee(pair: DEXPair) -> Optional[float]:
+    """Convert DEXPair fee to a multiplier or None."""
     if pair.fee and isnan(pair.fee):
         # Repair some broken data
         fee = None
@@ -1018,16 +1075,13 @@ def translate_trading_pair(pair: DEXPair) -> TradingPairIdentifier:
                 assert 0.0001 <= fee <= 0.01, "bug in converting fee to multiplier, make sure bps"
         else:
             fee = None
+    return fee
 
-    return TradingPairIdentifier(
-        base=base,
-        quote=quote,
-        pool_address=pair.address,
-        internal_id=pair.pair_id,
-        info_url=pair.get_trading_pair_page_url(),
-        exchange_address=pair.exchange_address,
-        fee=fee,
-    )
+
+def clear_translated_pairs():
+    """Forget memoised :py:func:`translate_trading_pair` results."""
+    _translated_pairs.clear()
+    _translated_assets.assets.clear()
 
 
 def create_pair_universe_from_code(chain_id: ChainId, pairs: List[TradingPairIdentifier]) -> "PandasPairUniverse":
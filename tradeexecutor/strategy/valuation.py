@@ -12,10 +12,12 @@ For the simplest case, we take all open positions and estimate their sell
 value at the open market.
 """
 import datetime
-from typing import Protocol, Tuple
+from decimal import Decimal
+from typing import Protocol, Tuple, List, Collection, Optional
 
 from tradingstrategy.types import USDollarAmount
 
+from tradeexecutor.state.identifier import TradingPairIdentifier
 from tradeexecutor.state.position import TradingPosition
 from tradeexecutor.strategy.pricing_model import PricingModel
 
@@ -59,6 +61,35 @@ class ValuationModel(Protocol):
         return ts, price_structure.price
 
 
+class BatchValuationModel(ValuationModel, Protocol):
+    """A valuation model that can revalue many positions at once.
+
+    :py:meth:`tradeexecutor.state.portfolio.Portfolio.revalue_positions`
+    uses `revalue_batch()` when the valuation model has it.
+    E.g. live on-chain valuation can then price all positions
+    against the same block with a single JSON-RPC call.
+    """
+
+    def revalue_batch(self,
+                      ts: datetime.datetime,
+                      positions: Optional[Collection[TradingPosition]],
+                      block_identifier: Optional[int] = None,
+                      quantities: Optional[Collection[Tuple[TradingPairIdentifier, Decimal]]] = None,
+                      ) -> List[Tuple[datetime.datetime, USDollarAmount]]:
+        """
+        :param block_identifier:
+            Pin on-chain valuation to this block.
+
+        :param quantities:
+            (pair, quantity) tuples to price instead of reading the positions.
+
+            Given when revaluing in a background thread.
+
+        :return:
+            (revaluation date, price) tuples in the same order as `positions` or `quantities`
+        """
+
+
 class ValuationModelFactory(Protocol):
     """Creates a valuation method.
 
@@ -0,0 +1,426 @@
+"""Array backed alpha model for large trading universes.
+
+:py:class:`tradeexecutor.strategy.alpha_model.AlphaModel` keeps one
+:py:class:`tradeexecutor.strategy.alpha_model.TradingPairSignal` per pair
+and processes them one by one. With momentum strategies scanning hundreds of pairs
+per cycle this becomes the bottleneck of a backtest.
+
+:py:class:`VectorisedAlphaModel` has the same life cycle and method names,
+but
+
+- Signals, weights, old values and targets live in NumPy arrays,
+  one row per pair
+
+- Top-N selection, weighting, normalisation and diffing are done in bulk
+
+- :py:class:`TradingPairSignal` objects are materialised only for pairs that are part of the
+  rebalance (chosen signals and old positions), or when the model is recorded
+  for the visualisation with :py:meth:`VectorisedAlphaModel.to_dict`
+
+The recorded data is compatible with :py:class:`AlphaModel`, so
+:py:mod:`tradeexecutor.analysis.alpha_model_analyser` works as is.
+
+Example:
+
+.. code-block:: python
+
+    alpha_model = VectorisedAlphaModel(timestamp)
+    alpha_model.set_signals(pairs, momentum)
+    alpha_model.select_top_signals(max_assets_in_portfolio)
+    alpha_model.assign_weights(method=weight_by_1_slash_n)
+    alpha_model.normalise_weights()
+    alpha_model.update_old_weights(state.portfolio)
+    alpha_model.calculate_target_positions(position_manager, portfolio_target_value)
+    trades = alpha_model.generate_rebalance_trades_and_triggers(position_manager)
+    state.visualisation.add_calculations(timestamp, alpha_model.to_dict())
+
+"""
+import datetime
+import logging
+from types import NoneType
+from typing import Optional, Dict, List, Sequence, Iterable, Callable
+
+import numpy as np
+import pandas as pd
+
+from tradeexecutor.state.identifier import TradingPairIdentifier
+from tradeexecutor.state.portfolio import Portfolio
+from tradeexecutor.state.trade import TradeExecution
+from tradeexecutor.state.types import PairInternalId, USDollarAmount, Percent
+from tradeexecutor.strategy.alpha_model import AlphaModel, TradingPairSignal
+from tradeexecutor.strategy.pandas_trader.position_manager import PositionManager
+from tradeexecutor.strategy.weighting import weight_by_1_slash_n, normalise_weights_array, ARRAY_WEIGHTING_METHODS, \
+    check_normalised_weights
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Per-pair float columns of :py:class:`VectorisedAlphaModel`.
+#:
+#: Match the attributes of :py:class:`TradingPairSignal`.
+FLOAT_COLUMNS = (
+    "signal",
+    "raw_weight",
+    "normalised_weight",
+    "old_weight",
+    "old_value",
+    "position_target",
+    "position_adjust_usd",
+    "position_adjust_quantity",
+)
+
+
+class VectorisedAlphaModel:
+    """Capture alpha model state for one strategy cycle in NumPy arrays.
+
+    - Drop-in replacement for :py:class:`AlphaModel` in `decide_trades()`
+
+    - Each pair gets a row when it receives a signal or has an open position
+
+    - Unlike :py:meth:`AlphaModel.select_top_signals`, the top signals are chosen
+      by the signal strength, the highest signal first
+
+    See the module documentation for details.
+    """
+
+    def __init__(
+            self,
+            timestamp: Optional[datetime.datetime] = None,
+            close_position_weight_epsilon: Percent = 0.005,
+            capacity=64,
+    ):
+        """
+
+        :param timestamp:
+            Timestamp of the strategy cycle
+
+        :param close_position_weight_epsilon:
+            See :py:attr:`AlphaModel.close_position_weight_epsilon`
+
+        :param capacity:
+            How many pairs we preallocate the arrays for
+        """
+        if isinstance(timestamp, pd.Timestamp):
+            timestamp = timestamp.to_pydatetime()
+        assert isinstance(timestamp, (datetime.datetime, NoneType))
+
+        self.timestamp = timestamp
+        self.close_position_weight_epsilon = close_position_weight_epsilon
+
+        #: How much we can afford to invest on this cycle
+        self.investable_equity: Optional[USDollarAmount] = 0.0
+
+        #: Row -> trading pair
+        self.pairs: List[TradingPairIdentifier] = []
+
+        #: Pair internal id -> row
+        self.pair_index: Dict[PairInternalId, int] = {}
+
+        #: Row -> (stop loss, take profit, trailing stop loss)
+        self.risk_parameters: List[tuple] = []
+
+        #: Rows chosen by :py:meth:`select_top_signals`, the highest signal first
+        self.selected_rows = np.zeros(0, dtype=np.int64)
+
+        #: Rows of the open positions in the order :py:meth:`update_old_weights` saw them
+        self.old_position_rows: List[int] = []
+
+        #: Set by :py:meth:`generate_rebalance_trades_and_triggers`
+        self.materialised: Optional[AlphaModel] = None
+
+        self.size = 0
+        self.capacity = 0
+        self._grow(capacity)
+
+    def _grow(self, capacity: int):
+        """Reallocate the column arrays."""
+        for name in FLOAT_COLUMNS:
+            column = np.zeros(capacity)
+            if self.capacity:
+                column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+
+        selected = np.zeros(capacity, dtype=bool)
+        has_old_position = np.zeros(capacity, dtype=bool)
+        if self.capacity:
+            selected[:self.size] = self.selected[:self.size]
+            has_old_position[:self.size] = self.has_old_position[:self.size]
+        self.selected = selected
+        self.has_old_position = has_old_position
+        self.capacity = capacity
+
+    def get_row(self, pair: TradingPairIdentifier) -> int:
+        """Get the array row of a pair, add the pair if needed."""
+        row = self.pair_index.get(pair.internal_id)
+        if row is None:
+            assert isinstance(pair, TradingPairIdentifier)
+            if self.size == self.capacity:
+                self._grow(max(self.capacity * 2, 1))
+            row = self.size
+            self.size += 1
+            self.pairs.append(pair)
+            self.pair_index[pair.internal_id] = row
+            self.risk_parameters.append((None, None, None))
+        return row
+
+    def get_active_rows(self) -> np.ndarray:
+        """Rows of the pairs taking part in the rebalance.
+
+        Chosen signals first, then the old positions that were not chosen,
+        the same order :py:attr:`AlphaModel.signals` would have.
+        """
+        old_rows = [row for row in self.old_position_rows if not self.selected[row]]
+        return np.concatenate([self.selected_rows, np.asarray(old_rows, dtype=np.int64)])
+
+    def set_signal(
+            self,
+            pair: TradingPairIdentifier,
+            alpha: float | np.float32,
+            stop_loss: Percent | NoneType = None,
+            take_profit: Percent | NoneType = None,
+            trailing_stop_loss: Percent | NoneType = None,
+            ):
+        """Set trading pair alpha to a value.
+
+        See :py:meth:`AlphaModel.set_signal`.
+
+        Zero alpha excludes the pair from further computations.
+        """
+        row = self.get_row(pair)
+        self.signal[row] = alpha
+        self.risk_parameters[row] = (stop_loss, take_profit, trailing_stop_loss)
+
+    def set_signals(
+            self,
+            pairs: Sequence[TradingPairIdentifier],
+            alphas: Sequence[float] | np.ndarray,
+            stop_loss: Percent | NoneType = None,
+            take_profit: Percent | NoneType = None,
+            trailing_stop_loss: Percent | NoneType = None,
+            ):
+        """Set alpha for many trading pairs at once.
+
+        :param pairs:
+            Trading pairs
+
+        :param alphas:
+            Alpha of each pair, in the same order as `pairs`
+
+        :param stop_loss:
+            Stop loss threshold used for all the pairs.
+
+            See :py:meth:`AlphaModel.set_signal`.
+
+        :param take_profit:
+            Take profit threshold used for all the pairs.
+
+        :param trailing_stop_loss:
+            Trailing stop loss threshold used for all the pairs.
+        """
+        assert len(pairs) == len(alphas), f"Got {len(pairs)} pairs and {len(alphas)} signals"
+        rows = np.fromiter((self.get_row(p) for p in pairs), dtype=np.int64, count=len(pairs))
+        self.signal[rows] = alphas
+        risk_parameters = (stop_loss, take_profit, trailing_stop_loss)
+        for row in rows:
+            self.risk_parameters[row] = risk_parameters
+
+    def select_top_signals(self,
+                           count: int,
+                           threshold=0.0,
+                           ):
+        """Chooses top long signals.
+
+        See :py:meth:`AlphaModel.select_top_signals`.
+
+        Ties are broken by the order the signals were set.
+        """
+        signal = self.signal[:self.size]
+        candidates = np.flatnonzero((signal != 0) & (signal >= threshold))
+        order = np.argsort(-signal[candidates], kind="stable")[:count]
+        self.selected_rows = candidates[order]
+        self.selected[:] = False
+        self.selected[self.selected_rows] = True
+
+    def assign_weights(self, method: Callable = weight_by_1_slash_n):
+        """Convert raw signals to their portfolio weight counterparts.
+
+        :param method:
+            What method we use to convert a trading signal to a portfolio weights.
+
+            Methods in :py:data:`tradeexecutor.strategy.weighting.ARRAY_WEIGHTING_METHODS`
+            are run in bulk, others are called with a pair id -> signal dict
+            of the chosen signals.
+        """
+        rows = self.selected_rows
+        array_method = ARRAY_WEIGHTING_METHODS.get(method)
+        if array_method:
+            self.raw_weight[rows] = array_method(self.signal[rows])
+        else:
+            raw_signals = {self.pairs[row].internal_id: self.signal[row] for row in rows}
+            weights = method(raw_signals)
+            for pair_id, raw_weight in weights.items():
+                self.raw_weight[self.pair_index[pair_id]] = raw_weight
+
+    def normalise_weights(self):
+        rows = self.selected_rows
+        self.normalised_weight[rows] = normalise_weights_array(self.raw_weight[rows])
+
+    def update_old_weights(self, portfolio: Portfolio):
+        """Update the old weights of the last strategy cycle to the alpha model.
+
+        See :py:meth:`AlphaModel.update_old_weights`.
+        """
+        total = portfolio.get_open_position_equity()
+        for position in portfolio.open_positions.values():
+            value = position.get_value()
+            row = self.get_row(position.pair)
+            self.old_weight[row] = value / total
+            self.old_value[row] = value
+            if not self.has_old_position[row]:
+                self.has_old_position[row] = True
+                self.old_position_rows.append(row)
+
+    def calculate_weight_diffs(self) -> Dict[PairInternalId, float]:
+        """Calculate how much % asset weight has changed between strategy cycles.
+
+        :return:
+            Pair id, weight delta dict
+        """
+        rows = self.get_active_rows()
+        pair_ids = [self.pairs[row].internal_id for row in rows]
+
+        # Check that both inputs are sane
+        check_normalised_weights(dict(zip(pair_ids, self.normalised_weight[rows].tolist())))
+        check_normalised_weights(dict(zip(pair_ids, self.old_weight[rows].tolist())))
+
+        diffs = self.normalised_weight[rows] - self.old_weight[rows]
+        return dict(zip(pair_ids, diffs.tolist()))
+
+    def calculate_target_positions(self, position_manager: PositionManager, investable_equity: USDollarAmount):
+        """Calculate individual dollar amount for each position based on its normalised weight.
+
+        The asset quantity is estimated only for the positions we decrease.
+        """
+        self.investable_equity = investable_equity
+
+        rows = self.get_active_rows()
+        self.position_target[rows] = self.normalised_weight[rows] * investable_equity
+        self.position_adjust_usd[rows] = self.position_target[rows] - self.old_value[rows]
+        self.position_adjust_quantity[rows] = 0
+
+        for row in rows[self.position_adjust_usd[rows] < 0]:
+            self.position_adjust_quantity[row] = position_manager.estimate_asset_quantity(self.pairs[row], float(self.position_adjust_usd[row]))
+
+    def create_signal(self, row: int) -> TradingPairSignal:
+        """Materialise a trading pair signal taking part in the rebalance for a row.
+
+        If the pair was not chosen but has an old position,
+        it is recorded with zero signal like :py:meth:`AlphaModel.set_old_weight` does.
+        """
+        values = {name: float(getattr(self, name)[row]) for name in FLOAT_COLUMNS}
+        if self.selected[row]:
+            stop_loss, take_profit, trailing_stop_loss = self.risk_parameters[row]
+        else:
+            values["signal"] = 0.0
+            stop_loss = take_profit = trailing_stop_loss = None
+        return TradingPairSignal(
+            pair=self.pairs[row],
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            trailing_stop_loss=trailing_stop_loss,
+            **values,
+        )
+
+    def create_raw_signal(self, row: int) -> TradingPairSignal:
+        """Materialise a raw signal for a row that was not chosen for the rebalance."""
+        stop_loss, take_profit, trailing_stop_loss = self.risk_parameters[row]
+        return TradingPairSignal(
+            pair=self.pairs[row],
+            signal=float(self.signal[row]),
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            trailing_stop_loss=trailing_stop_loss,
+        )
+
+    def to_alpha_model(self, record_raw_signals=True) -> AlphaModel:
+        """Materialise the model as :py:class:`AlphaModel`.
+
+        - After :py:meth:`generate_rebalance_trades_and_triggers` the signals
+          carry the position and trade information
+
+        :param record_raw_signals:
+            Also materialise all raw signals in :py:attr:`AlphaModel.raw_signals`.
+
+            Needed by :py:func:`tradeexecutor.analysis.alpha_model_analyser.analyse_alpha_model_weights`.
+        """
+        if self.materialised:
+            signals = self.materialised.signals
+        else:
+            signals = {self.pairs[row].internal_id: self.create_signal(row) for row in self.get_active_rows()}
+
+        raw_signals = {}
+        if record_raw_signals:
+            for row in np.flatnonzero(self.signal[:self.size]):
+                pair_id = self.pairs[row].internal_id
+                if self.selected[row]:
+                    raw_signals[pair_id] = signals[pair_id]
+                else:
+                    raw_signals[pair_id] = self.create_raw_signal(row)
+
+        return AlphaModel(
+            timestamp=self.timestamp,
+            raw_signals=raw_signals,
+            signals=signals,
+            investable_equity=self.investable_equity,
+            close_position_weight_epsilon=self.close_position_weight_epsilon,
+        )
+
+    def to_dict(self, record_raw_signals=True) -> dict:
+        """Serialise for :py:meth:`tradeexecutor.state.visualisation.Visualisation.add_calculations`.
+
+        The output can be read back with `AlphaModel.from_dict()`.
+        """
+        return self.to_alpha_model(record_raw_signals).to_dict()
+
+    def iterate_signals(self) -> Iterable[TradingPairSignal]:
+        """Iterate over the signals taking part in the rebalance."""
+        yield from self.to_alpha_model(record_raw_signals=False).iterate_signals()
+
+    def get_signal_by_pair_id(self, pair_id: PairInternalId) -> Optional[TradingPairSignal]:
+        """Get a trading pair signal instance for one pair.
+
+        Before trades are generated, this is a snapshot of the current array values.
+        """
+        if self.materialised:
+            return self.materialised.get_signal_by_pair_id(pair_id)
+
+        row = self.pair_index.get(pair_id)
+        if row is None or not (self.selected[row] or self.has_old_position[row]):
+            return None
+        return self.create_signal(row)
+
+    def get_signal_by_pair(self, pair: TradingPairIdentifier) -> Optional[TradingPairSignal]:
+        """Get a trading pair signal instance for one pair."""
+        return self.get_signal_by_pair_id(pair.internal_id)
+
+    def get_debug_print(self) -> str:
+        """Present the alpha model in a format suitable for the console."""
+        return self.to_alpha_model(record_raw_signals=False).get_debug_print()
+
+    def generate_rebalance_trades_and_triggers(
+            self,
+            position_manager: PositionManager,
+            min_trade_threshold: USDollarAmount = 10.0,
+    ) -> List[TradeExecution]:
+        """Generate the trades that will rebalance the portfolio.
+
+        Signals are materialised only for the pairs taking part in the rebalance.
+        See :py:meth:`AlphaModel.generate_rebalance_trades_and_triggers`.
+        """
+        self.materialised = None
+        self.materialised = self.to_alpha_model(record_raw_signals=False)
+        return self.materialised.generate_rebalance_trades_and_triggers(
+            position_manager,
+            min_trade_threshold=min_trade_threshold,
+        )
@@ -3,7 +3,9 @@
 Various helper functions to calculate weights for assets, normalise them.
 """
 
-from typing import Dict
+from typing import Dict, Callable
+
+import numpy as np
 
 
 class BadWeightsException(Exception):
@@ -115,3 +117,69 @@ def weight_passthrouh(alpha_signals: Dict[int, float]) -> Dict[int, float]:
     """Use the given raw weight value as is as the portfolio weight."""
     return alpha_signals
 
+
+def normalise_weights_array(
+        weights: np.ndarray,
+        epsilon=0.00003,
+        very_small_subtract=0.00001,
+) -> np.ndarray:
+    """Normalise weight distribution so that the sum of weights is 1.
+
+    NumPy counterpart of :py:func:`normalise_weights`, used by
+    :py:class:`tradeexecutor.strategy.vectorised_alpha_model.VectorisedAlphaModel`.
+
+    - Like :py:func:`clip_to_normalised`, the largest weight absorbs
+      the floating point error so that the sum never goes above 1
+
+    :param weights:
+        Raw weights
+
+    :return:
+        New array of normalised weights
+    """
+
+    if len(weights) == 0:
+        return weights.astype(float)
+
+    normalised = weights / weights.sum()
+    largest = np.argmax(normalised)
+
+    # Sum as Python floats, in the same order as check_normalised_weights() does,
+    # as NumPy pairwise summation may round differently
+    for round_substract_helper in (0, very_small_subtract):
+        diff = sum(normalised.tolist()) - 1
+        fixed = normalised.copy()
+        fixed[largest] = normalised[largest] - diff - round_substract_helper
+
+        total = sum(fixed.tolist())
+
+        if total > 1:
+            # We somehow still ended above one
+            # Try again with more subtract
+            continue
+
+        assert abs(total - 1) < epsilon, f"Assumed all weights total is 1, got {total}, epsilon is {epsilon}"
+        return fixed
+
+    raise AssertionError("Should never happen")
+
+
+def weight_by_1_slash_n_array(alpha_signals: np.ndarray) -> np.ndarray:
+    """NumPy counterpart of :py:func:`weight_by_1_slash_n`.
+
+    :param alpha_signals:
+        Signals, the highest signal first
+    """
+    return 1 / np.arange(1, len(alpha_signals) + 1, dtype=float)
+
+
+def weight_passthrouh_array(alpha_signals: np.ndarray) -> np.ndarray:
+    """NumPy counterpart of :py:func:`weight_passthrouh`."""
+    return alpha_signals.astype(float)
+
+
+#: Dict based weighting method -> its NumPy counterpart
+ARRAY_WEIGHTING_METHODS: Dict[Callable, Callable[[np.ndarray], np.ndarray]] = {
+    weight_by_1_slash_n: weight_by_1_slash_n_array,
+    weight_passthrouh: weight_passthrouh_array,
+}
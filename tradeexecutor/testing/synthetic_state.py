@@ -0,0 +1,151 @@
+"""Generate large synthetic states.
+
+Used in unit tests and benchmarks that need a state
+with a long trading history, without running a backtest.
+"""
+import datetime
+import random
+from decimal import Decimal
+from typing import List
+
+from tradingstrategy.chain import ChainId
+
+from tradeexecutor.state.identifier import AssetIdentifier, TradingPairIdentifier
+from tradeexecutor.state.reserve import ReservePosition
+from tradeexecutor.state.state import State
+from tradeexecutor.state.statistics import PortfolioStatistics, PositionStatistics, FinalPositionStatistics
+from tradeexecutor.state.visualisation import PlotKind
+from tradeexecutor.testing.dummy_trader import DummyTestTrader
+
+
+def create_synthetic_pairs(pair_count: int) -> List[TradingPairIdentifier]:
+    """Create mock trading pairs against a mock USDC."""
+    usdc = AssetIdentifier(ChainId.ethereum.value, "0x0000000000000000000000000000000000000001", "USDC", 6)
+    pairs = []
+    for i in range(pair_count):
+        base = AssetIdentifier(ChainId.ethereum.value, f"0x{i + 100:040x}", f"TOKEN{i}", 18, internal_id=i + 100)
+        pair = TradingPairIdentifier(
+            base,
+            usdc,
+            pool_address=f"0x{i + 10_000:040x}",
+            exchange_address="0x0000000000000000000000000000000000000002",
+            internal_id=i + 1,
+            internal_exchange_id=1,
+            fee=0.0030,
+        )
+        pairs.append(pair)
+    return pairs
+
+
+def create_synthetic_state(
+    position_count: int = 1000,
+    pair_count: int = 10,
+    stats_per_position: int = 3,
+    plot_count: int = 4,
+    seed: int = 1,
+) -> State:
+    """Create a state with a long trading history.
+
+    - Each position is opened with one buy and closed with one sell
+
+    - One portfolio statistics entry and one visualisation point per plot
+      is generated for each position, as the strategy would have done on each cycle
+
+    :param position_count:
+        How many closed positions the state has
+
+    :param pair_count:
+        How many different trading pairs we trade
+
+    :param stats_per_position:
+        How many position statistics entries each position has
+
+    :param plot_count:
+        How many technical indicator plots are recorded
+
+    :param seed:
+        Random seed for the price generation
+    """
+    rand = random.Random(seed)
+
+    state = State(name="synthetic")
+    pairs = create_synthetic_pairs(pair_count)
+    usdc = pairs[0].quote
+
+    start_at = datetime.datetime(2021, 1, 1)
+    state.created_at = start_at
+
+    reserve = ReservePosition(usdc, Decimal(10**9), start_at, 1.0, start_at)
+    state.portfolio.reserves[reserve.get_identifier()] = reserve
+
+    trader = DummyTestTrader(state)
+    trader.time_travel(start_at)
+
+    for i in range(position_count):
+        advance_synthetic_state(state, trader, pairs[i % pair_count], stats_per_position, plot_count, rand)
+
+    return state
+
+
+def advance_synthetic_state(
+    state: State,
+    trader: DummyTestTrader,
+    pair: TradingPairIdentifier,
+    stats_per_position: int = 3,
+    plot_count: int = 4,
+    rand: random.Random = random,
+):
+    """Simulate one strategy cycle that opens and closes a position.
+
+    Updates portfolio, statistics and visualisation the same way
+    a live strategy cycle would.
+    """
+    cycle_at = trader.ts.replace(microsecond=0)
+
+    buy_price = 1000 * (1 + rand.random())
+    sell_price = buy_price * (0.9 + rand.random() * 0.2)
+
+    position, _ = trader.buy(pair, Decimal(1), buy_price)
+
+    for j in range(stats_per_position):
+        state.stats.add_positions_stats(
+            position.position_id,
+            PositionStatistics(
+                calculated_at=trader.ts,
+                last_valuation_at=trader.ts,
+                profitability=0.01 * j,
+                profit_usd=float(j),
+                quantity=float(position.get_quantity()),
+                value=position.get_value(),
+            )
+        )
+
+    trader.sell(pair, position.get_quantity(), sell_price)
+
+    state.stats.closed_positions[position.position_id] = FinalPositionStatistics(
+        calculated_at=trader.ts,
+        trade_count=len(position.trades),
+        value_at_open=position.get_value_at_open(),
+        value_at_max=position.get_max_size(),
+    )
+
+    state.stats.portfolio.append(
+        PortfolioStatistics(
+            calculated_at=trader.ts,
+            total_equity=state.portfolio.get_total_equity(),
+        )
+    )
+
+    for plot_idx in range(plot_count):
+        state.visualisation.plot_indicator(
+            cycle_at,
+            f"Indicator {plot_idx}",
+            PlotKind.technical_indicator_on_price,
+            sell_price * (1 + plot_idx / 100),
+        )
+
+    state.cycle += 1
+    state.uptime.record_cycle_complete(state.cycle, cycle_at)
+
+    # Move to the next cycle
+    trader.time_travel(cycle_at + datetime.timedelta(hours=1))
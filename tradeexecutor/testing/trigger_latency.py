@@ -0,0 +1,144 @@
+"""Measure how quickly take profit and stop loss triggers react under a slow strategy cycle.
+
+Runs the live trading scheduler from :py:func:`tradeexecutor.cli.loop.create_live_scheduler`
+with fake tasks that only sleep, so no blockchain or market data is needed:
+
+- The strategy cycle downloads data, decides trades and waits for transaction confirmations
+
+- A market thread moves the price over a trigger level at random moments
+
+- The trigger check task records how long it took to notice each move
+
+See :py:mod:`tradeexecutor.strategy.state_lock`.
+"""
+import datetime
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from tradeexecutor.cli.loop import create_live_scheduler
+from tradeexecutor.strategy.state_lock import StateLock, hold_state, release_state
+
+
+@dataclass
+class TriggerLatencyResult:
+    """Result of :py:func:`measure_trigger_latency`."""
+
+    #: Seconds from a price move until a trigger check noticed it
+    latencies: List[float] = field(default_factory=list)
+
+    #: How many strategy cycles were completed
+    cycles: int = 0
+
+    #: How many trigger checks were completed
+    trigger_checks: int = 0
+
+    #: The longest time a task waited for the state lock, seconds
+    max_lock_wait: float = 0.0
+
+    def get_max_latency(self) -> float:
+        return max(self.latencies)
+
+    def get_mean_latency(self) -> float:
+        return sum(self.latencies) / len(self.latencies)
+
+
+def measure_trigger_latency(
+    concurrent_trigger_checks: bool,
+    cycle_interval=datetime.timedelta(seconds=1),
+    slow_download=0.5,
+    locked_work=0.05,
+    slow_confirmation=1.0,
+    position_trigger_check_frequency=datetime.timedelta(seconds=0.1),
+    price_moves=4,
+    seed=1,
+) -> TriggerLatencyResult:
+    """Measure trigger check latency with a fake strategy cycle.
+
+    :param concurrent_trigger_checks:
+        Run trigger checks on their own thread
+
+    :param cycle_interval:
+        How often the strategy cycle is run
+
+    :param slow_download:
+        Seconds the cycle spends downloading data, without the state lock
+
+    :param locked_work:
+        Seconds the cycle spends with the state, before and after broadcasting its trades
+
+    :param slow_confirmation:
+        Seconds the cycle waits for its transactions, with the state lock released
+
+    :param position_trigger_check_frequency:
+        How often triggers are checked
+
+    :param price_moves:
+        How many times the price moves over a trigger level.
+
+        The moves happen at random moments, one per strategy cycle on average.
+
+    :return:
+        Latencies of all price moves
+    """
+    lock = StateLock() if concurrent_trigger_checks else None
+    result = TriggerLatencyResult()
+
+    # Timestamps of price moves not yet seen by a trigger check
+    pending: List[float] = []
+    pending_lock = threading.Lock()
+
+    def live_cycle():
+        time.sleep(slow_download)
+        with hold_state(lock, releasable=True):
+            time.sleep(locked_work)
+            with release_state(lock):
+                time.sleep(slow_confirmation)
+            time.sleep(locked_work)
+            result.cycles += 1
+
+    def live_trigger_checks():
+        with hold_state(lock):
+            now = time.perf_counter()
+            with pending_lock:
+                result.latencies += [now - moved_at for moved_at in pending]
+                pending.clear()
+            result.trigger_checks += 1
+
+    scheduler = create_live_scheduler(
+        live_cycle,
+        lambda: None,
+        live_trigger_checks,
+        cycle_interval=cycle_interval,
+        tick_offset=datetime.timedelta(0),
+        stats_refresh_frequency=None,
+        position_trigger_check_frequency=position_trigger_check_frequency,
+        concurrent_trigger_checks=concurrent_trigger_checks,
+        scheduler_class=BackgroundScheduler,
+    )
+
+    rand = random.Random(seed)
+    scheduler.start()
+    try:
+        for i in range(price_moves):
+            time.sleep(rand.uniform(0.5, 1.5) * cycle_interval.total_seconds())
+            with pending_lock:
+                pending.append(time.perf_counter())
+
+        # Let the last move to be noticed
+        deadline = time.perf_counter() + 10 * cycle_interval.total_seconds()
+        while len(result.latencies) < price_moves and time.perf_counter() < deadline:
+            time.sleep(0.01)
+    finally:
+        scheduler.shutdown(wait=True)
+
+    assert len(result.latencies) == price_moves, f"Only {len(result.latencies)} price moves out of {price_moves} noticed"
+
+    if lock:
+        result.max_lock_wait = lock.max_wait
+
+    return result
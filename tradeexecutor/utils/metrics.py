@@ -0,0 +1,244 @@
+"""Hot code path metrics.
+
+Collect wall clock durations of the tasks measured with :py:func:`tradeexecutor.utils.timer.timed_task`.
+
+- Each task name and label combination gets its own histogram:
+  count, total, p50, p95, max and the last duration
+
+- Exported as Prometheus text format in `/metrics` webhook endpoint
+  and as a compact summary in :py:class:`tradeexecutor.strategy.run_state.RunState`
+
+- Per-cycle breakdown tells which task the time of each strategy cycle went to,
+  useful for backtests
+
+Example:
+
+.. code-block:: python
+
+    from tradeexecutor.utils.metrics import get_metrics_registry
+
+    registry = get_metrics_registry()
+    df = registry.get_cycle_breakdown()
+    print(df.mean())
+
+"""
+import threading
+from collections import deque, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple, Optional, Deque, Iterable
+
+import numpy as np
+import pandas as pd
+from dataclasses_json import dataclass_json
+
+
+#: How many latest durations per task we use to calculate percentiles
+DEFAULT_SAMPLE_SIZE = 1024
+
+#: How many latest cycles we keep in the per-cycle breakdown
+DEFAULT_MAX_CYCLES = 100_000
+
+
+#: Task name, sorted (label, value) tuples
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass_json
+@dataclass
+class TaskMetricSummary:
+    """Compact summary of a task duration histogram.
+
+    All durations are in seconds.
+    """
+
+    #: How many times the task has been run
+    count: int
+
+    #: Median duration
+    p50: float
+
+    #: 95th percentile duration
+    p95: float
+
+    #: The longest duration seen
+    max: float
+
+    #: The duration of the latest run
+    last: float
+
+
+class TaskMetric:
+    """Duration histogram of a single task and label combination."""
+
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+        #: Latest durations for percentiles
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def record(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.max:
+            self.max = duration
+        self.samples.append(duration)
+
+    def get_quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        return float(np.quantile(self.samples, q))
+
+    def get_summary(self) -> TaskMetricSummary:
+        return TaskMetricSummary(
+            count=self.count,
+            p50=self.get_quantile(0.5),
+            p95=self.get_quantile(0.95),
+            max=self.max,
+            last=self.last,
+        )
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_metric_key(key: MetricKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    """Format task name and labels as `task{label="value"}`."""
+    task_name, labels = key
+    labels = list(labels) + list(extra)
+    if not labels:
+        return task_name
+    label_str = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels)
+    return f"{task_name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """Collect task durations.
+
+    Thread safe, as the main loop and the webhook server
+    access the registry from different threads.
+    """
+
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE, max_cycles=DEFAULT_MAX_CYCLES):
+        self.lock = threading.Lock()
+        self.sample_size = sample_size
+        self.max_cycles = max_cycles
+        self.metrics: Dict[MetricKey, TaskMetric] = {}
+
+        #: The strategy cycle tasks are currently recorded for
+        self.current_cycle: Optional[int] = None
+
+        #: cycle -> task name -> seconds spent
+        self.cycles: OrderedDict[int, Dict[str, float]] = OrderedDict()
+
+    def reset(self):
+        """Clear all collected metrics."""
+        with self.lock:
+            self.metrics = {}
+            self.cycles = OrderedDict()
+            self.current_cycle = None
+
+    def reset_cycles(self):
+        """Clear the per-cycle breakdown, e.g. when a new backtest starts."""
+        with self.lock:
+            self.cycles = OrderedDict()
+            self.current_cycle = None
+
+    def start_cycle(self, cycle: int):
+        """Attribute the following tasks to a strategy cycle in the per-cycle breakdown."""
+        with self.lock:
+            self.current_cycle = cycle
+
+    def end_cycle(self):
+        """Stop attributing tasks to a cycle."""
+        with self.lock:
+            self.current_cycle = None
+
+    def record(self, task_name: str, duration: float, labels: Optional[Dict[str, str]] = None):
+        """Record a task duration.
+
+        :param task_name:
+            E.g. `decide_trades`
+
+        :param duration:
+            Wall clock duration in seconds
+
+        :param labels:
+            Low cardinality labels like cycle duration
+        """
+        key = (task_name, tuple(sorted(labels.items())) if labels else ())
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = self.metrics[key] = TaskMetric(self.sample_size)
+            metric.record(duration)
+
+            if self.current_cycle is not None:
+                breakdown = self.cycles.get(self.current_cycle)
+                if breakdown is None:
+                    breakdown = self.cycles[self.current_cycle] = {}
+                    if len(self.cycles) > self.max_cycles:
+                        self.cycles.popitem(last=False)
+                breakdown[task_name] = breakdown.get(task_name, 0.0) + duration
+
+    def get_summary(self) -> Dict[str, TaskMetricSummary]:
+        """Get the compact summary of all tasks.
+
+        :return:
+            `task{label="value"}` -> summary
+        """
+        with self.lock:
+            return {format_metric_key(key): metric.get_summary() for key, metric in sorted(self.metrics.items(), key=lambda item: item[0])}
+
+    def get_cycle_breakdown(self) -> pd.DataFrame:
+        """Get the time spent in each task per strategy cycle.
+
+        :return:
+            DataFrame indexed by cycle number, task names as columns, durations in seconds.
+            Missing values if the task was not run in the cycle.
+        """
+        with self.lock:
+            data = {cycle: dict(tasks) for cycle, tasks in self.cycles.items()}
+        return pd.DataFrame.from_dict(data, orient="index")
+
+    def export_prometheus(self, prefix="trade_executor_task") -> str:
+        """Export the metrics in Prometheus text exposition format."""
+
+        with self.lock:
+            rows = [
+                ((("task", key[0]),) + key[1], metric.get_quantile(0.5), metric.get_quantile(0.95), metric.total, metric.count, metric.max, metric.last)
+                for key, metric in sorted(self.metrics.items(), key=lambda item: item[0])
+            ]
+
+        name = f"{prefix}_duration_seconds"
+        lines = [
+            f"# HELP {name} Wall clock duration of trade executor tasks",
+            f"# TYPE {name} summary",
+        ]
+        for labels, p50, p95, total, count, _, _ in rows:
+            lines.append(f"{format_metric_key((name, labels), [('quantile', '0.5')])} {p50}")
+            lines.append(f"{format_metric_key((name, labels), [('quantile', '0.95')])} {p95}")
+            lines.append(f"{format_metric_key((name + '_sum', labels))} {total}")
+            lines.append(f"{format_metric_key((name + '_count', labels))} {count}")
+
+        for index, kind, help in ((5, "max", "The longest duration"), (6, "last", "The latest duration")):
+            name = f"{prefix}_{kind}_duration_seconds"
+            lines.append(f"# HELP {name} {help} of trade executor tasks")
+            lines.append(f"# TYPE {name} gauge")
+            for row in rows:
+                lines.append(f"{format_metric_key((name, row[0]))} {row[index]}")
+
+        return "\n".join(lines) + "\n"
+
+
+#: Process-wide registry :py:func:`tradeexecutor.utils.timer.timed_task` records to
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry."""
+    return _registry
@@ -5,9 +5,13 @@ Provide helpers to understand which parts of the hot code paths take most of the
 
 import contextlib
 import datetime
+import enum
 import logging
+import time
 from contextlib import contextmanager
 
+from tradeexecutor.utils.metrics import get_metrics_registry
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,14 +19,18 @@ logger = logging.getLogger(__name__)
 def timed_task(task_name: str, **context_info) -> contextlib.AbstractContextManager[None]:
     """A simple context manger to measure the duration of different tasks.
 
-    Can be later plugged in to a metrics system like Statsd / Grafana / Datadog.
+    The duration is recorded in :py:mod:`tradeexecutor.utils.metrics`.
+    String and enum values in `context_info` are used as metric labels,
+    other values like timestamps and counts are only logged.
     """
     started = datetime.datetime.utcnow()
+    started_counter = time.perf_counter()
     logger.info("Starting task %s at %s, context is %s", task_name, started, context_info)
 
     try:
         yield
     finally:
         duration = datetime.datetime.utcnow() - started
+        labels = {k: str(v.value) if isinstance(v, enum.Enum) else v for k, v in context_info.items() if isinstance(v, (str, enum.Enum))}
+        get_metrics_registry().record(task_name, time.perf_counter() - started_counter, labels)
         logger.info("Ended task %s, took %s", task_name, duration)
-
@@ -391,7 +391,30 @@ def calculate_compounding_realised_trading_profitability(
     # https://stackoverflow.com/a/42672553/315168
     compounded = realised_profitability.add(1).cumprod().sub(1)
 
-    if fill_time_gaps and len(compounded) > 0:
+    if fill_time_gaps:
+        compounded = fill_compounding_time_gaps(state, compounded)
+
+    return compounded
+
+
+def fill_compounding_time_gaps(
+    state: State,
+    compounded: pd.Series,
+) -> pd.Series:
+    """Extend compounded profitability over the whole strategy time range.
+
+    See :py:func:`calculate_compounding_realised_trading_profitability`.
+
+    :param compounded:
+        Pandas series (DatetimeIndex, cumulative % profit)
+
+    :return:
+        Series starting at zero profit and ending at the last strategy timestamp.
+
+        Empty series is returned as is.
+    """
+
+    if len(compounded) > 0:
 
         started_at, last_ts = state.get_strategy_time_range()
         last_value = compounded.iloc[-1]
@@ -0,0 +1,261 @@
+"""Render strategy thinking images in a background worker process.
+
+Exporting a Plotly figure as an image through Kaleido takes seconds.
+Doing it for two sizes and two themes inside the trading loop
+adds many seconds to every live cycle.
+:py:class:`BackgroundImageRenderer` moves this out of the loop:
+
+- The strategy runner draws one figure per cycle and hands it over as a new frame.
+  Drawing needs the state and the trading universe, so it stays in the main process,
+  but only the figure JSON is passed to the worker process.
+
+- Images are rendered per variant (size, theme) only when somebody asks for them,
+  e.g. the webhook `/visualisation` endpoint. A variant is rendered at most once per frame.
+
+- Variants that have been asked for before are rendered in the background
+  as soon as a new frame arrives, so the webhook usually finds them ready
+
+- A new frame cancels the renders of the previous frame that have not started yet,
+  and results of stale frames are dropped
+
+The image size given to the export overrides the figure layout size,
+so the same figure is used for all sizes.
+"""
+import datetime
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, CancelledError
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import plotly.graph_objects as go
+import plotly.io
+
+from tradeexecutor.visual.image_output import render_plotly_figure_as_image_file
+
+
+logger = logging.getLogger(__name__)
+
+
+#: Image size name -> width, height
+DEFAULT_IMAGE_SIZES = {
+    "small": (512, 512),
+    "large": (1024, 1024),
+}
+
+#: Supported themes
+IMAGE_THEMES = ("light", "dark")
+
+#: Image size name, theme
+ImageVariant = Tuple[str, str]
+
+#: Render function called in the worker process.
+#:
+#: Figure JSON, width, height, theme -> image data
+RenderFunction = Callable[[str, int, int, str], bytes]
+
+
+def render_figure_json(figure_json: str, width: int, height: int, theme: str) -> bytes:
+    """Render a Plotly figure serialised as JSON as a PNG image.
+
+    Runs in the worker process.
+    """
+    figure = plotly.io.from_json(figure_json)
+    if theme == "dark":
+        figure.update_layout(template="plotly_dark")
+    return render_plotly_figure_as_image_file(figure, format="png", width=width, height=height)
+
+
+class BackgroundImageRenderer:
+    """Render images of the latest figure on demand in a worker process.
+
+    See :py:mod:`tradeexecutor.visual.image_renderer`.
+
+    Example:
+
+    .. code-block:: python
+
+        renderer = BackgroundImageRenderer()
+        renderer.update_figure(draw_single_pair_strategy_state(state, universe))
+        png = renderer.get_image("small", "dark")
+    """
+
+    def __init__(
+        self,
+        sizes: Optional[Dict[str, Tuple[int, int]]] = None,
+        executor: Optional[Executor] = None,
+        render_function: RenderFunction = render_figure_json,
+        timeout: float = 120.0,
+    ):
+        """
+
+        :param sizes:
+            Image size name -> width, height.
+
+            Default to :py:data:`DEFAULT_IMAGE_SIZES`.
+
+        :param executor:
+            Executor for rendering.
+
+            If not given, a single worker process is started on the first render.
+
+        :param render_function:
+            Function rendering the figure JSON in the worker.
+
+            Must be picklable for process executors.
+
+        :param timeout:
+            How many seconds :py:meth:`get_image` waits for a render
+        """
+        self.sizes = sizes or DEFAULT_IMAGE_SIZES
+        self.executor = executor
+        self.render_function = render_function
+        self.timeout = timeout
+
+        # Done callbacks may run in the thread holding the lock
+        self.lock = threading.RLock()
+
+        #: Incremented on every new figure
+        self.frame = 0
+
+        #: Figure of the current frame as Plotly JSON
+        self.figure_json: Optional[str] = None
+
+        #: When the current frame was set
+        self.frame_updated_at: Optional[datetime.datetime] = None
+
+        #: Rendered images of the current frame
+        self.images: Dict[ImageVariant, bytes] = {}
+
+        #: Renders of the current frame in progress
+        self.renders: Dict[ImageVariant, Future] = {}
+
+        #: Variants that have been asked for.
+        #:
+        #: Rendered in the background for every new frame.
+        self.requested: Set[ImageVariant] = set()
+
+        #: How many images have been rendered
+        self.render_count = 0
+
+        #: How many renders were cancelled or thrown away because a newer frame arrived
+        self.dropped_count = 0
+
+    def __repr__(self):
+        return f"<BackgroundImageRenderer frame #{self.frame}, {len(self.images)} images ready, {len(self.renders)} rendering>"
+
+    def __deepcopy__(self, memo):
+        # Copies of the run state share the worker process,
+        # dataclasses_json deep copies field values before excluding them
+        return self
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            # Do not fork the process with the web server threads
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def close(self):
+        """Stop the worker process."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def update_figure(self, figure: go.Figure):
+        """Set the figure of a new frame.
+
+        Starts rendering the variants that have been asked for before.
+        """
+        figure_json = figure.to_json()
+        with self.lock:
+            self.frame += 1
+            self.figure_json = figure_json
+            self.frame_updated_at = datetime.datetime.utcnow()
+            self.images = {}
+
+            stale = self.renders
+            self.renders = {}
+            for future in stale.values():
+                if future.cancel():
+                    self.dropped_count += 1
+
+            for variant in sorted(self.requested):
+                self._start_render(variant)
+
+    def _start_render(self, variant: ImageVariant) -> Future:
+        size, theme = variant
+        width, height = self.sizes[size]
+        frame = self.frame
+        future = self.get_executor().submit(self.render_function, self.figure_json, width, height, theme)
+        self.renders[variant] = future
+        future.add_done_callback(lambda f: self._on_rendered(frame, variant, f))
+        return future
+
+    def _on_rendered(self, frame: int, variant: ImageVariant, future: Future):
+        if future.cancelled():
+            return
+
+        with self.lock:
+            if frame != self.frame:
+                self.dropped_count += 1
+                return
+
+            self.renders.pop(variant, None)
+
+            e = future.exception()
+            if e is not None:
+                # Not cached, the next request tries again
+                logger.error("Rendering strategy thinking image %s failed: %s", variant, e)
+                return
+
+            self.images[variant] = future.result()
+            self.render_count += 1
+
+    def get_image_future(self, size: str, theme: str = "light") -> Optional[Future]:
+        """Get an image of the current frame.
+
+        :return:
+            Future resolving to the image data.
+
+            `None` if there is no figure yet.
+        """
+        assert size in self.sizes, f"Unknown image size {size}"
+        assert theme in IMAGE_THEMES, f"Unknown theme {theme}"
+        variant = (size, theme)
+
+        with self.lock:
+            if self.figure_json is None:
+                return None
+
+            self.requested.add(variant)
+
+            image = self.images.get(variant)
+            if image is not None:
+                future = Future()
+                future.set_result(image)
+                return future
+
+            future = self.renders.get(variant)
+            if future is None:
+                future = self._start_render(variant)
+            return future
+
+    def get_image(self, size: str, theme: str = "light") -> Optional[bytes]:
+        """Get an image of the current frame, rendering it if needed.
+
+        Blocks until the image is ready.
+
+        :return:
+            Image data.
+
+            `None` if there is no figure yet.
+        """
+        while True:
+            future = self.get_image_future(size, theme)
+            if future is None:
+                return None
+            try:
+                return future.result(timeout=self.timeout)
+            except CancelledError:
+                # A new frame arrived, get that instead
+                continue
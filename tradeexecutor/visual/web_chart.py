@@ -1,16 +1,26 @@
 """Chart generation for the web frontend."""
+import datetime
 import enum
+import hashlib
+import logging
+import threading
 from dataclasses import dataclass
-from typing import List, Tuple
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from dataclasses_json import dataclass_json
 from eth_defi.utils import to_unix_timestamp
 
 from tradeexecutor.state.state import State
-from tradeexecutor.visual.equity_curve import calculate_compounding_realised_trading_profitability, calculate_equity_curve, calculate_investment_flow
+from tradeexecutor.strategy.state_lock import StateLock, hold_state
+from tradeexecutor.visual.equity_curve import calculate_compounding_realised_trading_profitability, calculate_equity_curve, calculate_investment_flow, \
+    fill_compounding_time_gaps
 
 
+logger = logging.getLogger(__name__)
+
 class WebChartType(enum.Enum):
     """Different charts we can generate for frontend rendering."""
 
@@ -75,23 +85,27 @@ def render_web_chart(
     match type:
         case WebChartType.compounding_realised_profitability:
             df = calculate_compounding_realised_trading_profitability(state)
-            description = "Compounded realised trading position % profit"
-            help_link = "https://tradingstrategy.ai/glossary/profitability"
         case WebChartType.total_equity:
             df = calculate_equity_curve(state, fill_time_gaps=True)
-            description = "Total equity"
-            help_link = "https://tradingstrategy.ai/glossary/total-equity"
         case WebChartType.netflow:
             df = calculate_investment_flow(state)
-            description = "Netflow"
-            help_link = "https://tradingstrategy.ai/glossary/netflow"
         case _:
             raise NotImplementedError(f"{type}")
 
+    description, help_link = _CHART_TITLES[type]
+
     # Convert
     return _export_chart(df, description, help_link, source)
 
 
+#: Chart type -> (description, help link)
+_CHART_TITLES = {
+    WebChartType.compounding_realised_profitability: ("Compounded realised trading position % profit", "https://tradingstrategy.ai/glossary/profitability"),
+    WebChartType.total_equity: ("Total equity", "https://tradingstrategy.ai/glossary/total-equity"),
+    WebChartType.netflow: ("Netflow", "https://tradingstrategy.ai/glossary/netflow"),
+}
+
+
 def export_time_series(series: pd.Series) -> List[Tuple[float, float]]:
     """Export Pandas series for web frontend rendering."""
 
@@ -99,7 +113,16 @@ def export_time_series(series: pd.Series) -> List[Tuple[float, float]]:
         return []
 
     assert isinstance(series.index, pd.DatetimeIndex), f"Got index: {series.index.__class__}"
-    return [(index.timestamp(), value) for index, value in series.items()]
+
+    return list(zip(_export_timestamps(series.index), series.tolist()))
+
+
+def _export_timestamps(index: pd.DatetimeIndex | List[datetime.datetime]) -> List[float]:
+    """Convert timestamps to UNIX seconds.
+
+    Same as Timestamp.timestamp(), but for the whole index at once.
+    """
+    return np.round(pd.DatetimeIndex(index).asi8 / 1e9, 6).tolist()
 
 
 def _export_chart(
@@ -117,3 +140,271 @@ def _export_chart(
         source=source,
     )
 
+
+
+class _ChartPoints:
+    """Live trading chart points read so far from an append-only list or dict of the state.
+
+    Each render only reads the entries added after the previous render.
+    """
+
+    def __init__(self, source: list | dict | None = None):
+        #: The list or dict the points are read from
+        self.source = source
+
+        #: How many entries of the source have been read
+        self.count = 0
+
+        #: (UNIX timestamp, value) points
+        self.data: List[Tuple[float, float]] = []
+
+        #: Timestamps of the points for charts post-processed with Pandas
+        self.index: List[datetime.datetime] = []
+
+        #: Values of the points for charts post-processed with Pandas
+        self.values: List[float] = []
+
+        #: Running product of (1 + profit) for the compounded profitability
+        self.compounded = 1.0
+
+    def read_new_entries(self, source: list | dict) -> list:
+        """Get the source entries added after the last read."""
+        if source is not self.source or len(source) < self.count:
+            # The state was replaced or rewritten, start over
+            self.__init__(source)
+
+        entries = source.values() if isinstance(source, dict) else source
+        new_entries = list(islice(entries, self.count, None))
+        self.count += len(new_entries)
+        return new_entries
+
+    def add_points(self, index: List[datetime.datetime], values: List[float]):
+        self.data += zip(_export_timestamps(index), values)
+
+
+def _extend_web_chart(
+    state: State,
+    type: WebChartType,
+    points: _ChartPoints,
+) -> WebChart:
+    """Render a live trading chart, reading only the state entries added after the last render.
+
+    Gives the same chart as :py:func:`render_web_chart`.
+    The caller must hold the state lock.
+    """
+
+    match type:
+        case WebChartType.compounding_realised_profitability:
+            # See calculate_compounding_realised_trading_profitability()
+            for p in points.read_new_entries(state.portfolio.closed_positions):
+                if not p.is_closed():
+                    continue
+                profit = p.get_size_relative_realised_profit_percent()
+                if profit is None or np.isnan(profit):
+                    # cumprod() skips missing values
+                    value = np.nan
+                else:
+                    points.compounded *= profit + 1
+                    value = points.compounded - 1
+                points.index.append(p.closed_at)
+                points.values.append(value)
+
+            compounded = pd.Series(points.values, index=pd.DatetimeIndex(points.index), dtype="float64")
+            data = export_time_series(fill_compounding_time_gaps(state, compounded))
+
+        case WebChartType.total_equity:
+            # See calculate_equity_curve(fill_time_gaps=True)
+            portfolio_stats = state.stats.portfolio
+            new_stats = points.read_new_entries(portfolio_stats)
+            points.add_points([s.calculated_at for s in new_stats], [float(s.total_equity) for s in new_stats])
+            data = points.data.copy()
+            if data:
+                start, end = state.get_strategy_time_range()
+                start_ts, end_ts = _export_timestamps([start, end])
+                if portfolio_stats[0].calculated_at != start:
+                    data.insert(0, (start_ts, 0.0))
+                data.append((end_ts, data[-1][1]))
+
+        case WebChartType.netflow:
+            # See calculate_investment_flow()
+            new_refs = points.read_new_entries(state.sync.treasury.balance_update_refs)
+            points.add_points([e.strategy_cycle_included_at for e in new_refs], [float(e.usd_value) for e in new_refs])
+            data = points.data.copy()
+
+        case _:
+            raise NotImplementedError(f"{type}")
+
+    description, help_link = _CHART_TITLES[type]
+    return WebChart(
+        data,
+        description,
+        help_link,
+        source=WebChartSource.live_trading,
+    )
+
+
+@dataclass(slots=True, frozen=True)
+class CachedWebChart:
+    """A rendered chart reply in :py:class:`WebChartCache`."""
+
+    #: State version the chart was rendered from
+    version: int
+
+    #: JSON reply body
+    text: str
+
+    #: HTTP ETag of the reply body
+    etag: str
+
+
+class WebChartCache:
+    """Keep rendered web charts between /chart requests.
+
+    - The main loop shares its in-memory state with the webhook and tells
+      when the state has changed. The main loop does not render any charts.
+
+    - Live trading charts are rendered from the in-memory state
+      while holding the state lock, so the webhook does not need to load and parse the state file
+
+    - Each render reads only the state entries added since the previous render,
+      see :py:class:`_ChartPoints`
+
+    - A chart is rendered once per state version. Concurrent requests
+      wait for the same render.
+
+    - The chart reply carries an ETag, so unchanged charts can be answered
+      with `304 Not Modified`
+
+    The cache is shared between the main loop and the webhook server threads.
+    """
+
+    def __init__(self):
+        #: Protects the attributes below.
+        #: Never held while waiting for the state lock.
+        self.lock = threading.Lock()
+
+        #: Held while rendering, so that concurrent requests share a render
+        self.render_lock = threading.Lock()
+
+        #: Incremented every time the live state changes
+        self.version = 0
+
+        #: (type, source) -> rendered chart
+        self.charts: Dict[Tuple[WebChartType, WebChartSource], CachedWebChart] = {}
+
+        #: The live state of the main loop
+        self.state: Optional[State] = None
+
+        #: The lock the main loop holds while changing :py:attr:`state`
+        self.state_lock: Optional[StateLock] = None
+
+        #: Live trading chart type -> points read from the state so far.
+        #:
+        #: Only accessed while holding :py:attr:`render_lock`.
+        self.points: Dict[WebChartType, _ChartPoints] = {}
+
+    def update(self, state: State, state_lock: StateLock):
+        """The live state has changed.
+
+        Called by the main loop after the state has been written to the disk.
+        The charts are rendered when the webhook asks for them.
+
+        :param state:
+            The in-memory state of the main loop
+
+        :param state_lock:
+            The lock the main loop holds while changing the state
+        """
+        assert state_lock is not None, "The live state cannot be shared without a lock"
+        with self.lock:
+            self.state = state
+            self.state_lock = state_lock
+            self.version += 1
+
+    def get_chart(
+        self,
+        type: WebChartType,
+        source: WebChartSource,
+        load_state: Callable[[], Optional[State]],
+    ) -> Optional[CachedWebChart]:
+        """Get a chart, render it if we do not have an up-to-date copy.
+
+        :param load_state:
+            Load the state to render from if the main loop is not sharing its state.
+
+        :return:
+            None if `load_state` did not give a state
+        """
+
+        if source == WebChartSource.live_trading:
+            with self.lock:
+                live = self.state is not None
+
+            if live:
+                return self._get_live_chart(type)
+
+            # The main loop is not keeping us up to date,
+            # so we cannot know when the state changes
+            state = load_state()
+            if state is None:
+                return None
+            return self._create_cached_chart(0, render_web_chart(state, type, source))
+
+        # Backtest is generated only once and never changes
+        with self.lock:
+            cached = self.charts.get((type, source))
+
+        if cached is not None:
+            return cached
+
+        state = load_state()
+        if state is None:
+            return None
+
+        return self._store(type, source, 0, render_web_chart(state, type, source))
+
+    def _get_current_chart(self, type: WebChartType) -> Optional[CachedWebChart]:
+        with self.lock:
+            cached = self.charts.get((type, WebChartSource.live_trading))
+            if cached is not None and cached.version == self.version:
+                return cached
+        return None
+
+    def _get_live_chart(self, type: WebChartType) -> CachedWebChart:
+        cached = self._get_current_chart(type)
+        if cached is not None:
+            return cached
+
+        with self.render_lock:
+            # Another request rendered this version while we waited
+            cached = self._get_current_chart(type)
+            if cached is not None:
+                return cached
+
+            with self.lock:
+                state_lock = self.state_lock
+
+            with hold_state(state_lock):
+                # Read the version the state is at while the main loop cannot change it
+                with self.lock:
+                    state = self.state
+                    version = self.version
+                points = self.points.setdefault(type, _ChartPoints())
+                chart = _extend_web_chart(state, type, points)
+
+            return self._store(type, WebChartSource.live_trading, version, chart)
+
+    @staticmethod
+    def _create_cached_chart(version: int, chart: WebChart) -> CachedWebChart:
+        text = chart.to_json()
+        etag = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return CachedWebChart(version, text, etag)
+
+    def _store(self, type: WebChartType, source: WebChartSource, version: int, chart: WebChart) -> CachedWebChart:
+        cached = self._create_cached_chart(version, chart)
+        with self.lock:
+            existing = self.charts.get((type, source))
+            # Do not overwrite a chart rendered from a newer state
+            if existing is None or existing.version <= version:
+                self.charts[(type, source)] = cached
+        return cached
@@ -11,12 +11,17 @@ from pyramid.response import Response, FileResponse
 from pyramid.view import view_config
 
 from tradeexecutor.cli.log import get_ring_buffer_handler
+from tradeexecutor.state.identifier_registry import IdentifierStorage
 from tradeexecutor.state.metadata import Metadata
+from tradeexecutor.state.journal_store import JournalFileStore
+from tradeexecutor.state.plot_sidecar import inline_sidecar_points
+from tradeexecutor.state.sectioned_store import SectionedFileStore
 from tradeexecutor.state.store import JSONFileStore
 from tradeexecutor.state.validator import validate_state_serialisation, validate_nested_state_dict
 from tradeexecutor.strategy.summary import StrategySummary
 from tradeexecutor.strategy.run_state import RunState
-from tradeexecutor.visual.web_chart import WebChartType, render_web_chart, WebChartSource
+from tradeexecutor.utils.metrics import get_metrics_registry
+from tradeexecutor.visual.web_chart import WebChartType, WebChartSource, WebChartCache
 from tradeexecutor.webhook.error import exception_response
 
 
@@ -86,6 +91,15 @@ def web_notify(request: Request):
     return {"status": "TODO"}
 
 
+def _materialise_state(store: JSONFileStore | SectionedFileStore) -> Response:
+    """Serve the full state as the inline JSON format read by the web frontend."""
+    state = store.load()
+    inline_sidecar_points(state)
+    r = Response(content_type="application/json")
+    r.text = state.to_json_safe()
+    return r
+
+
 @view_config(route_name='web_state', renderer='json', permission='view')
 def web_state(request: Request):
     """/state endpoint.
@@ -104,6 +118,23 @@ def web_state(request: Request):
         logger.warning("Someone is eager to access the serverPlain. IP:%s, user agent:%s", request.client_addr, request.user_agent)
         return exception_response(404, detail="Status file not yet created")
 
+    if isinstance(store, JournalFileStore) and store.has_journal():
+        # The snapshot file is behind the journal,
+        # we need to materialise the latest state
+        return _materialise_state(store)
+
+    if isinstance(store, SectionedFileStore):
+        # Binary file, convert to JSON
+        return _materialise_state(store)
+
+    if store.identifier_storage != IdentifierStorage.inline:
+        # The web frontend does not understand identifier references
+        return _materialise_state(store)
+
+    if store.plot_sidecar.path.exists():
+        # Plot points are not in the state file
+        return _materialise_state(store)
+
     assert 'wsgi.file_wrapper' in request.environ, "We need wsgi.file_wrapper or we will be too slow"
     r = FileResponse(content_type="application/json", request=request, path=fname)
     return r
@@ -138,6 +169,19 @@ def web_logs(request: Request):
     return logs
 
 
+@view_config(route_name='web_metrics', permission='view')
+def web_metrics(request: Request):
+    """/metrics endpoint.
+
+    Return the durations of the hot code path tasks in Prometheus text format.
+
+    See :py:mod:`tradeexecutor.utils.metrics`.
+    """
+    r = Response(content_type="text/plain")
+    r.text = get_metrics_registry().export_prometheus()
+    return r
+
+
 @view_config(route_name='web_source', permission='view')
 def web_source(request: Request):
     """/source endpoint.
@@ -165,30 +209,22 @@ def web_visulisation(request: Request):
 
     logger.info("Reading visualisation image, last updated %s", execution_state.visualisation.last_refreshed_at)
 
-    if type == "small":
-
-        if theme == "light":
-            data = execution_state.visualisation.small_image
-        else:
-            data = execution_state.visualisation.small_image_dark
-
-        if not data:
-            return exception_response(501, detail=f"Image data not available. It will be generated on the first strategy cycle.")
+    if type in ("small", "large"):
 
-        r = Response(content_type="image/png")
-        r.body = data
-        return r
-    elif type =="large":
+        if theme != "light":
+            theme = "dark"
 
-        if theme == "light":
-            data = execution_state.visualisation.large_image
-        else:
-            data = execution_state.visualisation.large_image_dark
+        try:
+            data = execution_state.visualisation.get_image(type, theme)
+        except Exception as e:
+            logger.error("Could not render visualisation image: %s", e, exc_info=e)
+            return exception_response(501, detail=f"Image rendering failed: {e}")
 
         if not data:
             return exception_response(501, detail=f"Image data not available. It will be generated on the first strategy cycle.")
 
-        r = Response(content_type="image/svg+xml")
+        content_type = "image/png" if type == "small" else "image/svg+xml"
+        r = Response(content_type=content_type)
         r.body = data
         return r
     else:
@@ -230,7 +266,9 @@ def web_chart(request: Request):
     Return chart data.
 
     Unlike other endpoints, this endpoint does processing, albeit light.
-    Under wrong circumstances
+    Rendered charts are cached in :py:class:`tradeexecutor.visual.web_chart.WebChartCache`
+    and served with an ETag, so the client can poll with `If-None-Match`
+    and get `304 Not Modified` if the chart has not changed.
     """
 
     type_str = request.params.get("type")
@@ -246,19 +284,29 @@ def web_chart(request: Request):
     except:
         return exception_response(501, detail=f"Not implemented. Unknown source {source_str}")
 
+    chart_cache: WebChartCache = request.registry["chart_cache"]
+
     if source == WebChartSource.live_trading:
         store: JSONFileStore = request.registry["store"]
 
-        #: We load from the disk to prevent any
-        #: modify in place issues.... slow
-        state = store.load()
+        #: Charts are rendered from the in-memory state of the main loop.
+        #: We load from the disk only if the main loop
+        #: is not sharing its state with us... slow.
+        load_state = store.load
     else:
         metadata = cast(Metadata, request.registry["metadata"])
-        state = metadata.backtested_state
-        if not state or state.is_empty():
-            return exception_response(404, detail=f"Backtest data not available")
 
-    data = render_web_chart(state, type, source)
-    r = Response(content_type="application/json")
-    r.text = data.to_json()
+        def load_state():
+            state = metadata.backtested_state
+            if not state or state.is_empty():
+                return None
+            return state
+
+    chart = chart_cache.get_chart(type, source, load_state)
+    if chart is None:
+        return exception_response(404, detail=f"Backtest data not available")
+
+    r = Response(content_type="application/json", conditional_response=True)
+    r.text = chart.text
+    r.etag = chart.etag
     return r
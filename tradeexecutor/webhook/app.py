@@ -23,6 +23,7 @@ from .error import exception_view
 from ..state.metadata import Metadata
 from ..state.store import JSONFileStore
 from ..strategy.run_state import RunState
+from ..visual.web_chart import WebChartCache
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +69,9 @@ def init_web_api(config: Configurator):
 
     config.pyramid_openapi3_register_routes()
 
+    # Prometheus scrape endpoint, not part of the OpenAPI spec
+    config.add_route("web_metrics", "/metrics")
+
     config.scan(package='tradeexecutor.webhook.api')
     config.scan(package='tradeexecutor.webhook.events')
 
@@ -79,8 +83,16 @@ def create_pyramid_app(
         store: JSONFileStore,
         metadata: Metadata,
         run_state: RunState,
-        production=False) -> Router:
-    """Create WSGI app for Trading Strategy backend."""
+        production=False,
+        chart_cache: WebChartCache | None = None,
+) -> Router:
+    """Create WSGI app for Trading Strategy backend.
+
+    :param chart_cache:
+        Rendered /chart replies shared with the main loop.
+
+        If not given, live trading charts are rendered on every request.
+    """
 
     settings = {
         'production': production,
@@ -120,6 +132,7 @@ def create_pyramid_app(
         config.registry["store"] = store
         config.registry["metadata"] = metadata
         config.registry["run_state"] = run_state
+        config.registry["chart_cache"] = chart_cache or WebChartCache()
 
         config.add_exception_view(exception_view)
 
@@ -11,6 +11,7 @@ from .app import create_pyramid_app
 from ..state.metadata import Metadata
 from ..state.store import JSONFileStore
 from ..strategy.run_state import RunState
+from ..visual.web_chart import WebChartCache
 
 logger =  logging.getLogger(__name__)
 
@@ -51,13 +52,16 @@ def create_webhook_server(
         store: JSONFileStore,
         metadata: Metadata,
         execution_state: RunState,
+        chart_cache: WebChartCache | None = None,
 ) -> WebhookServer:
     """Starts the webhook web  server in a separate thread.
 
     :param queue: The command queue for commands posted in the webhook that offers async execution.
+
+    :param chart_cache: Chart cache the main loop keeps up to date
     """
 
-    app = create_pyramid_app(username, password, queue, store, metadata, execution_state, production=False)
+    app = create_pyramid_app(username, password, queue, store, metadata, execution_state, production=False, chart_cache=chart_cache)
     server = WebhookServer.create(app, host=host, port=port, clear_untrusted_proxy_headers=True)
     logger.info("Webhook server will spawn at %s:%d, using username %s", host, port, username)
     # Wait until the server has started